@@ -0,0 +1,175 @@
+"""
+In-process stand-ins for GitHubRepository and the chat model, with configurable latency.
+"""
+
+import hashlib
+import threading
+import time
+from typing import Any, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+from core.instrumentation.stages import stage
+from core.models.comment import Comment
+from core.models.pull_request import PullRequest
+
+
+class FakePullRequestFile:
+    """Mimics the file objects PyGithub returns when listing a pull request's files."""
+
+    def __init__(self, filename: str, patch: str):
+        self.filename = filename
+        self.patch = patch
+
+
+class FakeGitHubRepository:
+    """
+    Serves a synthetic pull request through the GitHubRepository interface.
+
+    Every method sleeps for the configured latency and counts as one GitHub request.
+    """
+
+    def __init__(
+        self,
+        pull_request: PullRequest,
+        patches: list[str],
+        latency_seconds: float = 0.0,
+        repo_owner: str = "owner",
+        repo_name: str = "repo",
+        pr_number: int = 1,
+    ):
+        self.repo_owner = repo_owner
+        self.repo_name = repo_name
+        self.pr_number = pr_number
+        self.latency_seconds = latency_seconds
+        self.requests = 0
+        self.comments: list[Comment] = []
+        self._pull_request = pull_request
+        self._files = [
+            FakePullRequestFile(pull_request_file.path, patch)
+            for pull_request_file, patch in zip(pull_request.files, patches)
+        ]
+        self._contents = {
+            pull_request_file.path: "\n".join(
+                line.content for line in pull_request_file.content
+            )
+            for pull_request_file in pull_request.files
+        }
+        self._lock = threading.Lock()
+
+    def _request(self):
+        with self._lock:
+            self.requests += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+    def get_pull_request_title(self) -> str:
+        return self._pull_request.title
+
+    def get_pull_request_description(self):
+        return self._pull_request.description
+
+    def get_pull_request_files(self):
+        self._request()
+        return self._files
+
+    def get_file_content(self, file_path: str):
+        self._request()
+        return self._contents.get(file_path, "")
+
+    def add_comment_to_file(
+        self, text: str, file_path: str, line: int, commit_sha: str = None
+    ) -> Comment:
+        with stage("comment_post", file_path=file_path, requests=2):
+            self._request()
+            self._request()
+        comment = Comment(text=text, file_path=file_path, line=line, sha=commit_sha)
+        with self._lock:
+            self.comments.append(comment)
+        return comment
+
+
+class FakeReviewChatModel(BaseChatModel):
+    """
+    A chat model answering review prompts after a configurable latency.
+
+    It comments on the first added line of a share of the chunks, chosen deterministically
+    from the chunk content, by calling the add comment tool. Other chunks get a review
+    without comments. Token usage is estimated at four characters per token.
+    """
+
+    latency_seconds: float = 0.0
+    comment_rate: float = 0.3
+    _calls: int = PrivateAttr(default=0)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-review-chat-model"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        with self._lock:
+            self._calls += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+        prompt = "\n".join(str(message.content) for message in messages)
+        if isinstance(messages[-1], ToolMessage):
+            message = AIMessage(content=str(messages[-1].content))
+        else:
+            chunk = next(
+                (m.content for m in reversed(messages) if isinstance(m, HumanMessage)),
+                "",
+            )
+            message = self._review(str(chunk))
+
+        message.usage_metadata = {
+            "input_tokens": len(prompt) // 4,
+            "output_tokens": len(str(message.content)) // 4 + 20,
+            "total_tokens": len(prompt) // 4 + len(str(message.content)) // 4 + 20,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _review(self, chunk: str) -> AIMessage:
+        added_line = next(
+            (line for line in chunk.splitlines() if line.startswith("+")), None
+        )
+        digest = int(hashlib.sha1(chunk.encode()).hexdigest()[:8], 16)
+        if added_line is None or digest % 1000 >= self.comment_rate * 1000:
+            return AIMessage(
+                content='{"analysis": {"reasoning": "", "needs_comments": false}, "comments": []}'
+            )
+
+        return AIMessage(
+            content="",
+            tool_calls=[
+                {
+                    "name": "add_comment_tool",
+                    "args": {
+                        "comments_to_add": [
+                            {
+                                "line_content": added_line,
+                                "comment": "Consider extracting this into a helper.",
+                            }
+                        ]
+                    },
+                    "id": f"call_{digest}",
+                }
+            ],
+        )
@@ -0,0 +1,302 @@
+"""
+Micro-benchmarks of the parsing, rendering and splitting functions of the review pipeline.
+
+Each function runs against synthetic pull requests of different shapes. Its median wall time
+and its peak traced memory are compared with a saved baseline, and the command exits with a
+non-zero status when any of them regresses by more than the threshold.
+
+Usage:
+    python benchmarks/micro_benchmarks.py --save-baseline
+    python benchmarks/micro_benchmarks.py --threshold 0.25
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Optional
+
+from application.parsers.github_pull_request_parser import parse_changes
+from application.parsers.llm_text_pull_request_parser import (
+    parse_pull_request_to_text,
+    reduce_unchanged_text,
+)
+from application.text_splitters.pull_request_file_text_splitter import (
+    split_pull_request_file,
+)
+from core.models.content_with_line import ContentWithLine
+from synthetic_pull_request import generate_pull_request
+
+default_baseline_path = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "baselines", "micro_benchmarks.json"
+)
+
+# Pull request shapes: (file count, file length, hunk count, change density)
+scenarios = {
+    "small": (5, 100, 2, 0.1),
+    "medium": (20, 500, 5, 0.2),
+    "large": (40, 1000, 10, 0.2),
+    "dense": (10, 1000, 40, 0.6),
+}
+
+
+def measure(function: Callable, setup: Callable, repeat: int) -> dict[str, float]:
+    """
+    Measures the wall time and peak traced memory of a function.
+
+    Args:
+        function (Callable): The function to measure, called with the output of setup.
+        setup (Callable): Builds a fresh input for each run, outside of the measurement.
+        repeat (int): The number of timed runs.
+
+    Returns:
+        dict[str, float]: The median and minimum wall time and the peak memory of the function.
+    """
+    durations = []
+    for _ in range(repeat):
+        function_input = setup()
+        started_at = time.perf_counter()
+        function(function_input)
+        durations.append(time.perf_counter() - started_at)
+
+    # Memory is traced in a separate run since tracemalloc slows the code down
+    function_input = setup()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline_memory = tracemalloc.get_traced_memory()[0]
+        function(function_input)
+        peak_memory = tracemalloc.get_traced_memory()[1] - baseline_memory
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_seconds": statistics.median(durations),
+        "min_seconds": min(durations),
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+def split_is_available() -> bool:
+    """The splitter needs the tiktoken encoding, which is downloaded on first use."""
+    try:
+        split_pull_request_file("+a = 1")
+        return True
+    except Exception as e:
+        print(f"Skipping split_pull_request_file: {e.__class__.__name__}: {e}")
+        return False
+
+
+def run_scenario(
+    file_count: int,
+    file_length: int,
+    hunk_count: int,
+    change_density: float,
+    repeat: int,
+    include_split: bool,
+) -> dict[str, dict[str, float]]:
+    """Benchmarks every function on a synthetic pull request of the given shape."""
+    pull_request, patches = generate_pull_request(
+        file_count=file_count,
+        file_length=file_length,
+        hunk_count=hunk_count,
+        change_density=change_density,
+    )
+    # Rendering shifts line numbers in place, so every run needs its own copy of the files
+    rendered_texts = [
+        parse_pull_request_to_text(pull_request_file.model_copy(deep=True))
+        for pull_request_file in pull_request.files
+    ]
+    rendered_contents = [
+        [
+            ContentWithLine(line=index + 1, content=line)
+            for index, line in enumerate(text.splitlines())
+        ]
+        for text in rendered_texts
+    ]
+
+    results = {
+        "parse_changes": measure(
+            lambda patches: [parse_changes(patch) for patch in patches],
+            lambda: patches,
+            repeat,
+        ),
+        "parse_pull_request_to_text": measure(
+            lambda files: [parse_pull_request_to_text(file) for file in files],
+            lambda: [file.model_copy(deep=True) for file in pull_request.files],
+            repeat,
+        ),
+        "reduce_unchanged_text": measure(
+            lambda contents: [reduce_unchanged_text(content) for content in contents],
+            lambda: rendered_contents,
+            repeat,
+        ),
+    }
+    if include_split:
+        results["split_pull_request_file"] = measure(
+            lambda texts: [split_pull_request_file(text) for text in texts],
+            lambda: rendered_texts,
+            repeat,
+        )
+
+    return results
+
+
+def find_regressions(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Compares benchmark results with a baseline.
+
+    Args:
+        results (dict): The results by scenario and function.
+        baseline (dict): The baseline results, with the same structure.
+        threshold (float): The tolerated relative increase, 0.25 means 25%.
+
+    Returns:
+        list[str]: A description of every regression.
+    """
+    regressions = []
+    for scenario, functions in results.items():
+        for function, measurements in functions.items():
+            baseline_measurements = baseline.get(scenario, {}).get(function)
+            if not baseline_measurements:
+                continue
+
+            for metric in ["median_seconds", "peak_memory_bytes"]:
+                baseline_value = baseline_measurements[metric]
+                value = measurements[metric]
+                if baseline_value > 0 and value > baseline_value * (1 + threshold):
+                    regressions.append(
+                        f"{scenario}/{function} {metric}: {value:.6g} vs baseline {baseline_value:.6g} "
+                        f"(+{value / baseline_value - 1:.0%})"
+                    )
+
+    return regressions
+
+
+def print_results(results: dict, baseline: Optional[dict]):
+    print(
+        f"{'scenario':<10} {'function':<28} {'median ms':>10} {'min ms':>10} {'peak KiB':>10} {'vs base':>8}"
+    )
+    for scenario, functions in results.items():
+        for function, measurements in functions.items():
+            baseline_measurements = (baseline or {}).get(scenario, {}).get(function)
+            change = (
+                f"{measurements['median_seconds'] / baseline_measurements['median_seconds'] - 1:+.0%}"
+                if baseline_measurements and baseline_measurements["median_seconds"]
+                else "-"
+            )
+            print(
+                f"{scenario:<10} {function:<28} "
+                f"{measurements['median_seconds'] * 1000:>10.3f} "
+                f"{measurements['min_seconds'] * 1000:>10.3f} "
+                f"{measurements['peak_memory_bytes'] / 1024:>10.1f} {change:>8}"
+            )
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(scenarios),
+        help="Scenario to run, can be repeated (default: all)",
+    )
+    parser.add_argument(
+        "--file-count", type=int, help="Run a custom scenario with this many files"
+    )
+    parser.add_argument(
+        "--file-length",
+        type=int,
+        default=500,
+        help="Lines per file of the custom scenario",
+    )
+    parser.add_argument(
+        "--hunk-count",
+        type=int,
+        default=5,
+        help="Hunks per file of the custom scenario",
+    )
+    parser.add_argument(
+        "--change-density",
+        type=float,
+        default=0.2,
+        help="Changed share of each hunk of the custom scenario",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per function")
+    parser.add_argument(
+        "--baseline", default=default_baseline_path, help="Baseline JSON file"
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Save the results as the new baseline",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Tolerated relative regression (0.25 = 25%%)",
+    )
+    parser.add_argument(
+        "--skip-split",
+        action="store_true",
+        help="Do not benchmark split_pull_request_file",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = get_args()
+
+    selected_scenarios = {
+        name: scenarios[name] for name in (args.scenario or sorted(scenarios))
+    }
+    if args.file_count:
+        selected_scenarios = {
+            f"custom-{args.file_count}x{args.file_length}-{args.hunk_count}h-{args.change_density}": (
+                args.file_count,
+                args.file_length,
+                args.hunk_count,
+                args.change_density,
+            )
+        }
+
+    include_split = not args.skip_split and split_is_available()
+    results = {
+        name: run_scenario(*shape, repeat=args.repeat, include_split=include_split)
+        for name, shape in selected_scenarios.items()
+    }
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        saved_baseline = {**(baseline or {}), **results}
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(saved_baseline, baseline_file, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(
+            f"No baseline found at {args.baseline}, run with --save-baseline to create one."
+        )
+        return 0
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
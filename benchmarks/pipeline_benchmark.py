@@ -0,0 +1,152 @@
+"""
+End-to-end benchmark of ReviewAgent.review_pull_request against in-process fakes.
+
+The real pipeline (parsing, rendering, splitting, agent, comment tool) runs against a fake
+GitHub repository and a fake chat model with configurable latency. Each scenario runs in
+its own process so that its peak RSS is isolated.
+
+Usage:
+    python benchmarks/pipeline_benchmark.py --llm-latency 0.5 --github-latency 0.05
+    python benchmarks/pipeline_benchmark.py --concurrency 1 --concurrency 8
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import resource
+import sys
+import time
+
+from core.instrumentation.run_metrics import RunMetrics
+from core.instrumentation.stages import observe_stages
+from fakes import FakeGitHubRepository, FakeReviewChatModel
+from infrastructure.agents.review_agent import ReviewAgent
+from synthetic_pull_request import generate_pull_request
+
+# Pull request shapes: (file count, file length, hunk count, change density)
+scenarios = {
+    "few-small-files": (3, 100, 2, 0.2),
+    "many-small-files": (30, 100, 2, 0.2),
+    "few-large-files": (3, 2000, 20, 0.2),
+}
+
+
+def run_scenario(
+    shape: tuple,
+    concurrency: int,
+    llm_latency: float,
+    github_latency: float,
+    comment_rate: float,
+) -> dict:
+    """Reviews a synthetic pull request and reports what the run cost."""
+    pull_request, patches = generate_pull_request(*shape)
+    github_repository = FakeGitHubRepository(
+        pull_request, patches, latency_seconds=github_latency
+    )
+    llm = FakeReviewChatModel(latency_seconds=llm_latency, comment_rate=comment_rate)
+    review_agent = ReviewAgent(
+        llm=llm,
+        repo_owner=github_repository.repo_owner,
+        repo_name=github_repository.repo_name,
+        pr_number=github_repository.pr_number,
+        github_repository=github_repository,
+        max_concurrency=concurrency,
+        verbose=False,
+    )
+    run_metrics = RunMetrics()
+
+    started_at = time.perf_counter()
+    # The pipeline prints progress, which would drown the benchmark output
+    with observe_stages(run_metrics), contextlib.redirect_stdout(io.StringIO()):
+        review_agent.review_pull_request()
+    wall_time = time.perf_counter() - started_at
+
+    return {
+        "wall_time_seconds": wall_time,
+        "llm_calls": llm.calls,
+        "github_requests": github_repository.requests,
+        "comments": len(github_repository.comments),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "stages": {
+            name: metrics.model_dump()
+            for name, metrics in run_metrics.report().stages.items()
+        },
+    }
+
+
+def run_scenario_in_process(*args) -> dict:
+    """Runs a scenario in a fresh process so that its peak RSS is not shared with others."""
+    with multiprocessing.get_context("spawn").Pool(processes=1) as pool:
+        return pool.apply(run_scenario, args)
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(scenarios),
+        help="Scenario to run, can be repeated (default: all)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        action="append",
+        type=int,
+        help="Files reviewed concurrently, can be repeated to compare modes (default: 1 and 8)",
+    )
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.2, help="Seconds per fake llm call"
+    )
+    parser.add_argument(
+        "--github-latency",
+        type=float,
+        default=0.02,
+        help="Seconds per fake GitHub request",
+    )
+    parser.add_argument(
+        "--comment-rate",
+        type=float,
+        default=0.3,
+        help="Share of chunks the fake llm comments on",
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = get_args()
+    concurrencies = args.concurrency or [1, 8]
+
+    results = []
+    print(
+        f"{'scenario':<18} {'concurrency':>11} {'wall s':>8} {'llm calls':>9} {'gh reqs':>8} {'comments':>8} {'peak RSS MiB':>12}"
+    )
+    for scenario in args.scenario or list(scenarios):
+        for concurrency in concurrencies:
+            result = run_scenario_in_process(
+                scenarios[scenario],
+                concurrency,
+                args.llm_latency,
+                args.github_latency,
+                args.comment_rate,
+            )
+            result.update(scenario=scenario, concurrency=concurrency)
+            results.append(result)
+            print(
+                f"{scenario:<18} {concurrency:>11} {result['wall_time_seconds']:>8.2f} "
+                f"{result['llm_calls']:>9} {result['github_requests']:>8} {result['comments']:>8} "
+                f"{result['peak_rss_bytes'] / 2**20:>12.1f}"
+            )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+Cold-start benchmark of the command line entry points.
+
+Every entry point runs `--help` in fresh interpreters under `python -X importtime`. Its median
+wall time, its import time and the number of modules it imports are appended to a history file
+and compared with the previous run, the command exits with a non-zero status when any of them
+regresses by more than the threshold.
+
+Usage:
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --threshold 0.25 --top 10
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+repository_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+source_root = os.path.join(repository_root, "src")
+default_history_path = os.path.join(
+    repository_root, "benchmarks", "baselines", "startup_history.jsonl"
+)
+
+entry_points = {
+    "cli": "presentation/cli.py",
+    "batch_cli": "presentation/batch_cli.py",
+    "webhook_server": "presentation/webhook_server.py",
+    "review_worker": "presentation/review_worker.py",
+}
+
+# Metrics compared with the previous run of the history
+compared_metrics = ["median_seconds", "import_seconds", "modules"]
+
+
+def parse_import_times(importtime_output: str) -> list[dict]:
+    """
+    Parses the output of `python -X importtime`.
+
+    Args:
+        importtime_output (str): The stderr of the interpreter.
+
+    Returns:
+        list[dict]: Every imported module with its nesting depth, self and cumulative import time in microseconds.
+    """
+    imports = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        self_time, cumulative_time, module = line[len("import time:") :].split("|")
+        imports.append(
+            {
+                "module": module.strip(),
+                "depth": (len(module) - len(module.lstrip()) - 1) // 2,
+                "self_us": int(self_time),
+                "cumulative_us": int(cumulative_time),
+            }
+        )
+    return imports
+
+
+def measure_entry_point(script: str, repeat: int, top: int) -> dict:
+    """
+    Measures the cold start of an entry point running `--help`.
+
+    Args:
+        script (str): The path of the entry point, relative to src.
+        repeat (int): The number of fresh interpreters to start.
+        top (int): The number of slowest top-level imports to report.
+
+    Returns:
+        dict: The median and minimum wall time, the import time, the module count and the slowest imports.
+    """
+    environment = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(
+            filter(None, [source_root, os.environ.get("PYTHONPATH")])
+        ),
+    }
+    command = [
+        sys.executable,
+        "-X",
+        "importtime",
+        os.path.join(source_root, script),
+        "--help",
+    ]
+
+    durations = []
+    imports: list[dict] = []
+    # Run outside of the repository so that no .env file is picked up
+    with tempfile.TemporaryDirectory() as working_directory:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            completed = subprocess.run(
+                command,
+                cwd=working_directory,
+                env=environment,
+                capture_output=True,
+                text=True,
+            )
+            durations.append(time.perf_counter() - start)
+            if completed.returncode != 0:
+                raise RuntimeError(
+                    f"{script} --help exited with {completed.returncode}:\n{completed.stderr[-2000:]}"
+                )
+            imports = parse_import_times(completed.stderr)
+
+    top_level_imports = [imported for imported in imports if imported["depth"] == 0]
+    slowest_imports = sorted(
+        top_level_imports, key=lambda imported: imported["cumulative_us"], reverse=True
+    )[:top]
+
+    return {
+        "median_seconds": statistics.median(durations),
+        "min_seconds": min(durations),
+        "import_seconds": sum(imported["self_us"] for imported in imports) / 1e6,
+        "modules": len(imports),
+        "slowest_imports": {
+            imported["module"]: imported["cumulative_us"] / 1e6
+            for imported in slowest_imports
+        },
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=repository_root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def read_history(path: str) -> list[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as history_file:
+        return [json.loads(line) for line in history_file if line.strip()]
+
+
+def find_regressions(results: dict, previous: dict, threshold: float) -> list[str]:
+    """
+    Compares the results with those of a previous run.
+
+    Args:
+        results (dict): The measurements, by entry point.
+        previous (dict): The measurements of the previous run, with the same structure.
+        threshold (float): The tolerated relative regression.
+
+    Returns:
+        list[str]: A description of every regression.
+    """
+    regressions = []
+    for entry_point, measurements in results.items():
+        previous_measurements = previous.get(entry_point)
+        if not previous_measurements:
+            continue
+
+        for metric in compared_metrics:
+            value = measurements[metric]
+            previous_value = previous_measurements[metric]
+            if previous_value > 0 and value > previous_value * (1 + threshold):
+                regressions.append(
+                    f"{entry_point} {metric}: {value:.6g} vs previous {previous_value:.6g} "
+                    f"(+{value / previous_value - 1:.0%})"
+                )
+    return regressions
+
+
+def print_results(results: dict, previous: Optional[dict]):
+    print(
+        f"{'entry point':<16} {'median s':>9} {'min s':>7} {'imports s':>10} {'modules':>8} {'vs previous':>12}"
+    )
+    for entry_point, measurements in results.items():
+        previous_measurements = (previous or {}).get(entry_point)
+        change = (
+            f"{measurements['median_seconds'] / previous_measurements['median_seconds'] - 1:+.0%}"
+            if previous_measurements and previous_measurements["median_seconds"]
+            else "-"
+        )
+        print(
+            f"{entry_point:<16} {measurements['median_seconds']:>9.3f} {measurements['min_seconds']:>7.3f} "
+            f"{measurements['import_seconds']:>10.3f} {measurements['modules']:>8} {change:>12}"
+        )
+        for module, cumulative_seconds in measurements["slowest_imports"].items():
+            print(f"{'':<18}{cumulative_seconds:>8.3f}s  {module}")
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--entry-point",
+        action="append",
+        choices=sorted(entry_points),
+        help="Entry point to measure, can be repeated, all of them by default",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Fresh interpreters per entry point"
+    )
+    parser.add_argument(
+        "--top", type=int, default=5, help="Slowest top-level imports to report"
+    )
+    parser.add_argument(
+        "--history", default=default_history_path, help="History JSON lines file"
+    )
+    parser.add_argument(
+        "--no-record",
+        action="store_true",
+        help="Compare with the history without appending this run to it",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Tolerated relative regression (0.25 = 25%%)",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = get_args()
+
+    results = {
+        name: measure_entry_point(entry_points[name], args.repeat, args.top)
+        for name in (args.entry_point or entry_points)
+    }
+
+    history = read_history(args.history)
+    previous = history[-1]["results"] if history else None
+    print_results(results, previous)
+
+    if not args.no_record:
+        os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+        with open(args.history, "a", encoding="utf-8") as history_file:
+            record = {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "results": results,
+            }
+            history_file.write(json.dumps(record) + "\n")
+        print(f"Run appended to {args.history}")
+
+    if previous is None:
+        return 0
+
+    regressions = find_regressions(results, previous, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
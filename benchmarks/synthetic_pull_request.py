@@ -0,0 +1,142 @@
+import random
+
+from application.parsers.github_pull_request_parser import parse_changes
+from core.models.content_with_line import ContentWithLine
+from core.models.pull_request import PullRequest
+from core.models.pull_request_file import PullRequestFile
+
+# The unchanged lines git shows around each hunk
+hunk_context_lines = 3
+
+
+def generate_line(rng: random.Random, line_number: int) -> str:
+    """Generates a plausible line of Python code."""
+    indent = "    " * rng.randint(0, 3)
+    templates = [
+        "value_{n} = compute_{n}(items, threshold={n})",
+        "if value_{n} > limit and not flags.get('skip_{n}'):",
+        "return [item for item in items_{n} if item.is_valid()]",
+        "logger.debug('processing %s', record_{n})",
+        "# Keep track of the state of record {n}",
+        "",
+    ]
+    return indent + rng.choice(templates).format(n=line_number)
+
+
+def generate_file(
+    rng: random.Random, file_length: int, hunk_count: int, change_density: float
+) -> tuple[list[str], str]:
+    """
+    Generates the base content of a file and a unified diff patch modifying it.
+
+    Args:
+        rng (random.Random): The random generator to draw from.
+        file_length (int): The number of lines of the base file.
+        hunk_count (int): The number of hunks of the patch.
+        change_density (float): The share of lines of each hunk's region that are changed.
+
+    Returns:
+        tuple[list[str], str]: The base file lines and the patch.
+    """
+    base_lines = [generate_line(rng, n) for n in range(1, file_length + 1)]
+    hunk_count = max(min(hunk_count, file_length), 1)
+    region_length = max(file_length // hunk_count, 1)
+    changed_lines_per_hunk = max(int(region_length * change_density), 1)
+
+    # Changed lines are replaced one for one, so hunks start at the same line on both sides
+    patch_lines = []
+    for hunk_index in range(hunk_count):
+        region_start = hunk_index * region_length
+        changes_start = region_start + max(
+            (region_length - changed_lines_per_hunk) // 2, 0
+        )
+        changes_end = min(changes_start + changed_lines_per_hunk, file_length)
+        hunk_start = max(changes_start - hunk_context_lines, 0)
+        hunk_end = min(changes_end + hunk_context_lines, file_length)
+        if hunk_start >= hunk_end:
+            continue
+
+        hunk_body = [f" {line}" for line in base_lines[hunk_start:changes_start]]
+        hunk_body += [f"-{line}" for line in base_lines[changes_start:changes_end]]
+        hunk_body += [
+            f"+{generate_line(rng, index + file_length)}"
+            for index in range(changes_start, changes_end)
+        ]
+        hunk_body += [f" {line}" for line in base_lines[changes_end:hunk_end]]
+
+        hunk_length = hunk_end - hunk_start
+        patch_lines.append(
+            f"@@ -{hunk_start + 1},{hunk_length} +{hunk_start + 1},{hunk_length} @@"
+        )
+        patch_lines.extend(hunk_body)
+
+    return base_lines, "\n".join(patch_lines)
+
+
+def generate_pull_request_file(
+    rng: random.Random,
+    path: str,
+    file_length: int,
+    hunk_count: int,
+    change_density: float,
+) -> tuple[PullRequestFile, str]:
+    """
+    Generates a pull request file the same way the github parser builds it.
+
+    Returns:
+        tuple[PullRequestFile, str]: The pull request file and its patch.
+    """
+    base_lines, patch = generate_file(rng, file_length, hunk_count, change_density)
+    additions, deletions = parse_changes(patch)
+    pull_request_file = PullRequestFile(
+        path=path,
+        content=[
+            ContentWithLine(line=index + 1, content=line)
+            for index, line in enumerate(base_lines)
+        ],
+        additions=additions,
+        deletions=deletions,
+    )
+    return pull_request_file, patch
+
+
+def generate_pull_request(
+    file_count: int = 10,
+    file_length: int = 300,
+    hunk_count: int = 5,
+    change_density: float = 0.2,
+    seed: int = 0,
+) -> tuple[PullRequest, list[str]]:
+    """
+    Generates a deterministic synthetic pull request.
+
+    Args:
+        file_count (int): The number of changed files.
+        file_length (int): The number of lines of each base file.
+        hunk_count (int): The number of hunks per file.
+        change_density (float): The share of lines of each hunk's region that are changed.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        tuple[PullRequest, list[str]]: The pull request and the patch of each of its files.
+    """
+    rng = random.Random(seed)
+    files = []
+    patches = []
+    for file_index in range(file_count):
+        pull_request_file, patch = generate_pull_request_file(
+            rng,
+            path=f"src/module_{file_index}.py",
+            file_length=file_length,
+            hunk_count=hunk_count,
+            change_density=change_density,
+        )
+        files.append(pull_request_file)
+        patches.append(patch)
+
+    pull_request = PullRequest(
+        title=f"Synthetic pull request ({file_count} files)",
+        description="Generated for benchmarks.",
+        files=files,
+    )
+    return pull_request, patches
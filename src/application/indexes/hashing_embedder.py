@@ -0,0 +1,52 @@
+import hashlib
+import re
+
+import numpy as np
+
+identifier_pattern = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+# Splits "parseChanges", "parse_changes" and "HTTPClient" into their words
+word_pattern = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+
+class HashingEmbedder:
+    """
+    Embeds code offline and deterministically, by hashing its identifiers and their words into a
+    fixed number of signed buckets. Snippets sharing names end up close, without any model call.
+
+    It exposes the `embed_documents` and `embed_query` methods of LangChain embeddings, so that
+    it can stand in for a remote embedding model, in tests or without network access.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        """
+        :param dimensions: The size of the vectors.
+        """
+        self.dimensions = dimensions
+        self.model = f"hashing-{dimensions}"
+
+    def _bucket(self, token: str) -> tuple[int, float]:
+        # Python's hash() is salted per process, the vectors must survive restarts
+        digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dimensions, 1.0 if value >> 63 else -1.0
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for identifier in identifier_pattern.findall(text):
+            tokens = [identifier] + [
+                word.lower() for word in word_pattern.findall(identifier)
+            ]
+            for token in tokens:
+                bucket, sign = self._bucket(token)
+                vector[bucket] += sign
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_documents(self, texts: list[str]) -> np.ndarray:
+        """Embeds texts into the rows of a matrix of unit vectors."""
+        if not texts:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        return np.stack([self._embed(text) for text in texts])
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self._embed(text)
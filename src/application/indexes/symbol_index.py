@@ -0,0 +1,173 @@
+import builtins
+import keyword
+import re
+import threading
+from typing import Callable, Iterable, Optional
+
+from core.models.file_symbols import FileSymbols, SymbolDefinition
+from core.models.token_usage import estimate_tokens
+
+identifier_pattern = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+# A definition added or removed by a chunk, in the "+ line" / "- line" format of the review prompt
+changed_definition_pattern = re.compile(
+    r"^[+-]\s*(?:async\s+)?(?:def|class)\s+([A-Za-z_][A-Za-z0-9_]*)"
+)
+ignored_names = set(keyword.kwlist) | set(dir(builtins)) | {"self", "cls"}
+
+
+class SymbolIndex:
+    """
+    Maps the symbols of a repository to their definitions and usages, file by file so that the
+    index can be refreshed incrementally when the files change.
+
+    It attaches to every reviewed chunk the signatures of the symbols the chunk uses, and the
+    callers of the definitions it changes, within a token budget. Lookups are dictionary reads.
+    Reads and updates are thread-safe.
+    """
+
+    def __init__(self, base_sha: str = "", files: Iterable[FileSymbols] = ()):
+        """
+        :param base_sha: The commit the index was built from.
+        :param files: The symbols of every indexed file.
+        """
+        self.base_sha = base_sha
+        self._files: dict[str, FileSymbols] = {}
+        self._definitions: dict[str, list[SymbolDefinition]] = {}
+        self._usages: dict[str, dict[str, list[int]]] = {}
+        self._lock = threading.RLock()
+        for file_symbols in files:
+            self.update_file(file_symbols)
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def files(self) -> list[FileSymbols]:
+        with self._lock:
+            return list(self._files.values())
+
+    def update_file(self, file_symbols: FileSymbols):
+        """Indexes the symbols of a file, replacing the ones it had."""
+        with self._lock:
+            self.remove_file(file_symbols.path)
+            self._files[file_symbols.path] = file_symbols
+            for definition in file_symbols.definitions:
+                self._definitions.setdefault(definition.name, []).append(definition)
+            for name, lines in file_symbols.usages.items():
+                self._usages.setdefault(name, {})[file_symbols.path] = lines
+
+    def remove_file(self, path: str):
+        with self._lock:
+            file_symbols = self._files.pop(path, None)
+            if file_symbols is None:
+                return
+            for name in {definition.name for definition in file_symbols.definitions}:
+                remaining = [
+                    definition
+                    for definition in self._definitions[name]
+                    if definition.path != path
+                ]
+                if remaining:
+                    self._definitions[name] = remaining
+                else:
+                    del self._definitions[name]
+            for name in file_symbols.usages:
+                self._usages[name].pop(path, None)
+                if not self._usages[name]:
+                    del self._usages[name]
+
+    def definitions(self, name: str) -> list[SymbolDefinition]:
+        with self._lock:
+            return list(self._definitions.get(name, []))
+
+    def usages(self, name: str) -> dict[str, list[int]]:
+        """Returns the lines the name is used on, by file."""
+        with self._lock:
+            return dict(self._usages.get(name, {}))
+
+    def context_for(
+        self,
+        chunk_text: str,
+        file_path: str,
+        max_tokens: int = 400,
+        max_definitions_per_name: int = 3,
+        max_usages_per_name: int = 5,
+        count_tokens: Optional[Callable[[str], int]] = None,
+    ) -> str:
+        """
+        Builds the context attachment of a chunk: where the definitions the chunk adds or removes
+        are used in other files, then the signatures of the symbols the chunk uses.
+
+        Args:
+            chunk_text (str): The chunk, in the format of the review prompt.
+            file_path (str): The path of the reviewed file.
+            max_tokens (int): The size of the attachment is kept under it.
+            max_definitions_per_name (int): Names defined more often are too ambiguous to be attached.
+            max_usages_per_name (int): The number of usages listed per changed definition.
+            count_tokens (Callable, optional): Counts the tokens of a text, 4 characters per token when None.
+
+        Returns:
+            str: The attachment, empty when the index knows none of the chunk's symbols.
+        """
+        count_tokens = count_tokens or estimate_tokens
+        changed_names = list(
+            dict.fromkeys(
+                match.group(1)
+                for match in map(
+                    changed_definition_pattern.match, chunk_text.splitlines()
+                )
+                if match
+            )
+        )
+        used_names = [
+            name
+            for name in dict.fromkeys(identifier_pattern.findall(chunk_text))
+            if len(name) > 2 and name not in ignored_names and name not in changed_names
+        ]
+
+        entries = []
+        with self._lock:
+            for name in changed_names:
+                usages = [
+                    f"{path}:{line}"
+                    for path, lines in self._usages.get(name, {}).items()
+                    if path != file_path
+                    for line in lines
+                ]
+                if usages:
+                    more = len(usages) - max_usages_per_name
+                    entries.append(
+                        f"- `{name}` is used at {', '.join(usages[:max_usages_per_name])}"
+                        + (f" and {more} more places" if more > 0 else "")
+                    )
+            for name in used_names:
+                definitions = self._definitions.get(name, [])
+                if not definitions or len(definitions) > max_definitions_per_name:
+                    continue
+                for definition in definitions:
+                    entries.append(
+                        f"- `{name}` is defined at {definition.path}:{definition.line}: "
+                        f"{definition.signature}"
+                    )
+
+        if not entries:
+            return ""
+        header = (
+            "\nAttachments, definitions and usages from the rest of the repository:\n"
+        )
+        context = header
+        tokens = count_tokens(header)
+        for entry in entries:
+            entry_tokens = count_tokens(entry) + 1
+            if tokens + entry_tokens > max_tokens:
+                break
+            context += entry + "\n"
+            tokens += entry_tokens
+        return context if context != header else ""
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "base_sha": self.base_sha,
+                "files": len(self._files),
+                "symbols": len(self._definitions),
+            }
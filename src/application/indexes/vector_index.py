@@ -0,0 +1,273 @@
+import json
+import os
+import threading
+from typing import Callable, Optional
+
+import numpy as np
+
+from core.models.code_snippet import CodeSnippet
+from core.models.token_usage import estimate_tokens
+
+
+def format_related_snippets(
+    matches: list[tuple[CodeSnippet, float]],
+    max_tokens: int = 600,
+    count_tokens: Optional[Callable[[str], int]] = None,
+) -> str:
+    """
+    Formats the snippets related to a chunk as an attachment of the review prompt.
+
+    Args:
+        matches (list[tuple[CodeSnippet, float]]): The snippets and their similarity, the most similar first.
+        max_tokens (int): The size of the attachment is kept under it, snippets that do not fit are left out.
+        count_tokens (Callable, optional): Counts the tokens of a text, 4 characters per token when None.
+
+    Returns:
+        str: The attachment, empty when no snippet fits.
+    """
+    count_tokens = count_tokens or estimate_tokens
+    header = "\nRelated code from the rest of the repository:\n"
+    context = header
+    tokens = count_tokens(header)
+    for snippet, _ in matches:
+        entry = f"- {snippet.path}:{snippet.start_line}-{snippet.end_line}\n```\n{snippet.text}\n```\n"
+        entry_tokens = count_tokens(entry)
+        if tokens + entry_tokens > max_tokens:
+            continue
+        context += entry
+        tokens += entry_tokens
+    return context if context != header else ""
+
+
+class VectorIndex:
+    """
+    Stores the code snippets of a repository with their embeddings, for the related-code search.
+
+    The embeddings are the rows of a float32 matrix memory-mapped from a .npy file, so that an
+    index larger than memory is paged in by the OS and opening one costs no read. A query is a
+    single matrix product over the rows, batched across the chunks of a file.
+
+    Files are tracked by git blob SHA: an unchanged file is never embedded again. Rows of updated
+    or removed files are only masked, and the matrix is compacted when it is saved with more dead
+    rows than live ones. Reads and updates are thread-safe.
+    """
+
+    def __init__(self, directory: str, model: str, dimensions: int):
+        """
+        :param directory: Where the matrix and the snippets are saved, loaded from it when it holds an index
+            of the same model.
+        :param model: The name of the embedding model, an index of another model is discarded.
+        :param dimensions: The size of the vectors.
+        """
+        self.directory = directory
+        self.model = model
+        self.dimensions = dimensions
+        self.base_sha = ""
+        self._snippets: list[Optional[CodeSnippet]] = []
+        self._blob_shas: dict[str, str] = {}
+        self._rows: dict[str, list[int]] = {}
+        self._path_ids: dict[str, int] = {}
+        self._file_ids = np.zeros(0, dtype=np.int32)
+        self._vectors: Optional[np.memmap] = None
+        self._generation = 0
+        self._stale_files: list[str] = []
+        self._lock = threading.RLock()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._blob_shas)
+
+    @property
+    def snippet_count(self) -> int:
+        with self._lock:
+            return sum(len(rows) for rows in self._rows.values())
+
+    def paths(self) -> list[str]:
+        with self._lock:
+            return list(self._blob_shas)
+
+    def blob_sha(self, path: str) -> Optional[str]:
+        """Returns the blob SHA of the indexed version of a file, None when it is not indexed."""
+        with self._lock:
+            return self._blob_shas.get(path)
+
+    def update_file(
+        self,
+        path: str,
+        blob_sha: str,
+        snippets: list[CodeSnippet],
+        vectors: np.ndarray,
+    ):
+        """
+        Indexes the snippets of a file, replacing the ones it had.
+
+        Args:
+            path (str): The file path.
+            blob_sha (str): The git blob SHA of the indexed content.
+            snippets (list[CodeSnippet]): The snippets of the file.
+            vectors (np.ndarray): The embedding of every snippet, one per row.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimensions)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        with self._lock:
+            self.remove_file(path)
+            self._blob_shas[path] = blob_sha
+            path_id = self._path_ids.setdefault(path, len(self._path_ids))
+            first_row = len(self._snippets)
+            self._reserve(first_row + len(snippets))
+            self._vectors[first_row : first_row + len(snippets)] = vectors
+            self._file_ids[first_row : first_row + len(snippets)] = path_id
+            self._snippets.extend(snippets)
+            self._rows[path] = list(range(first_row, first_row + len(snippets)))
+
+    def remove_file(self, path: str):
+        with self._lock:
+            self._blob_shas.pop(path, None)
+            for row in self._rows.pop(path, []):
+                self._snippets[row] = None
+                self._file_ids[row] = -1
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 3,
+        exclude_path: Optional[str] = None,
+        min_score: float = 0.2,
+    ) -> list[list[tuple[CodeSnippet, float]]]:
+        """
+        Finds the snippets most similar to every query, by cosine similarity.
+
+        Args:
+            queries (np.ndarray): The embedding of every query, one per row.
+            k (int): The maximum number of snippets per query.
+            exclude_path (str, optional): A file whose snippets are left out, usually the reviewed one.
+            min_score (float): Less similar snippets are left out.
+
+        Returns:
+            list[list[tuple[CodeSnippet, float]]]: The snippets of every query and their similarity, the most
+                similar first.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dimensions)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+        with self._lock:
+            row_count = len(self._snippets)
+            if row_count == 0 or k <= 0:
+                return [[] for _ in queries]
+            scores = self._vectors[:row_count] @ queries.T
+            file_ids = self._file_ids[:row_count]
+            excluded = file_ids < 0
+            if exclude_path in self._path_ids:
+                excluded |= file_ids == self._path_ids[exclude_path]
+            scores[excluded] = -np.inf
+
+            results = []
+            top_count = min(k, row_count)
+            for query_scores in scores.T:
+                top_rows = np.argpartition(-query_scores, top_count - 1)[:top_count]
+                top_rows = top_rows[np.argsort(-query_scores[top_rows])]
+                results.append(
+                    [
+                        (self._snippets[row], float(query_scores[row]))
+                        for row in top_rows
+                        if query_scores[row] >= min_score
+                    ]
+                )
+            return results
+
+    def _vectors_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"vectors-{generation}.npy")
+
+    def _metadata_path(self) -> str:
+        return os.path.join(self.directory, "index.json")
+
+    def _reserve(self, row_count: int):
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if row_count > capacity:
+            self._rewrite(max(row_count, capacity * 2, 64), compact=False)
+
+    def _rewrite(self, capacity: int, compact: bool):
+        """Moves the rows to a new matrix file, leaving the saved one untouched until the metadata points to it."""
+        os.makedirs(self.directory, exist_ok=True)
+        rows = (
+            [row for row, snippet in enumerate(self._snippets) if snippet is not None]
+            if compact
+            else list(range(len(self._snippets)))
+        )
+        self._generation += 1
+        vectors = np.lib.format.open_memmap(
+            self._vectors_path(self._generation),
+            mode="w+",
+            dtype=np.float32,
+            shape=(capacity, self.dimensions),
+        )
+        file_ids = np.full(capacity, -1, dtype=np.int32)
+        if rows:
+            vectors[: len(rows)] = self._vectors[rows]
+            file_ids[: len(rows)] = self._file_ids[rows]
+        if self._vectors is not None:
+            self._stale_files.append(self._vectors.filename)
+        self._vectors = vectors
+        self._file_ids = file_ids
+
+        if compact:
+            self._snippets = [self._snippets[row] for row in rows]
+            self._rows = {}
+            for row, snippet in enumerate(self._snippets):
+                self._rows.setdefault(snippet.path, []).append(row)
+
+    def save(self):
+        """Saves the index to its directory, a crash while saving leaves the previous version readable."""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            live_rows = self.snippet_count
+            if len(self._snippets) - live_rows > live_rows:
+                self._rewrite(max(live_rows, 64), compact=True)
+            if self._vectors is not None:
+                self._vectors.flush()
+            metadata = {
+                "model": self.model,
+                "dimensions": self.dimensions,
+                "base_sha": self.base_sha,
+                "generation": self._generation,
+                "files": self._blob_shas,
+                "snippets": [
+                    snippet.model_dump() if snippet is not None else None
+                    for snippet in self._snippets
+                ],
+            }
+            temporary_path = self._metadata_path() + ".tmp"
+            with open(temporary_path, "w", encoding="utf-8") as metadata_file:
+                json.dump(metadata, metadata_file)
+            os.replace(temporary_path, self._metadata_path())
+
+            for stale_file in self._stale_files:
+                if os.path.exists(stale_file):
+                    os.remove(stale_file)
+            self._stale_files = []
+
+    def _load(self):
+        if not os.path.exists(self._metadata_path()):
+            return
+        with open(self._metadata_path(), encoding="utf-8") as metadata_file:
+            metadata = json.load(metadata_file)
+        if metadata["model"] != self.model or metadata["dimensions"] != self.dimensions:
+            return
+
+        self.base_sha = metadata["base_sha"]
+        self._generation = metadata["generation"]
+        self._blob_shas = metadata["files"]
+        self._snippets = [
+            CodeSnippet.model_validate(snippet) if snippet is not None else None
+            for snippet in metadata["snippets"]
+        ]
+        # Rows past the saved ones were appended after the last save, they belong to nobody
+        self._vectors = np.load(self._vectors_path(self._generation), mmap_mode="r+")
+        self._file_ids = np.full(self._vectors.shape[0], -1, dtype=np.int32)
+        for row, snippet in enumerate(self._snippets):
+            if snippet is None:
+                continue
+            path_id = self._path_ids.setdefault(snippet.path, len(self._path_ids))
+            self._file_ids[row] = path_id
+            self._rows.setdefault(snippet.path, []).append(row)
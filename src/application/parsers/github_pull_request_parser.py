@@ -1,3 +1,6 @@
+import math
+
+from core.instrumentation.stages import stage
 from core.models.content_with_line import ContentWithLine
 from core.models.pull_request import PullRequest
 from core.models.pull_request_file import PullRequestFile
@@ -6,49 +9,71 @@ from infrastructure.repositories.github_repository import GitHubRepository
 # A list of lines git adds to files that we should ignore as they are invisible in the commit
 git_lines_to_ignore = ["\\ No newline at end of file"]
 
+# The number of files GitHub returns per page when listing a pull request's files
+github_files_page_size = 30
+
 
 def parse_pull_request(githubRepository: GitHubRepository) -> PullRequest:
     """Convert a GitHub pull request into the desired file structure."""
-    pull_request_title = githubRepository.get_pull_request_title()
-    pull_request_description = githubRepository.get_pull_request_description()
-    pull_request_files = parse_pull_request_files(githubRepository=githubRepository)
-
-    return PullRequest(
-        title=pull_request_title,
-        description=pull_request_description,
-        files=pull_request_files,
-    )
+    with stage("pull_request_parse"):
+        pull_request_title = githubRepository.get_pull_request_title()
+        pull_request_description = githubRepository.get_pull_request_description()
+        pull_request_files = parse_pull_request_files(githubRepository=githubRepository)
+
+        return PullRequest(
+            title=pull_request_title,
+            description=pull_request_description,
+            files=pull_request_files,
+        )
 
 
 def parse_pull_request_files(
     githubRepository: GitHubRepository,
 ) -> list[PullRequestFile]:
     """Convert a GitHub pull request's files into the desired file structure."""
-    files = githubRepository.get_pull_request_files()
-    pull_request_files: list[PullRequestFile] = []
+    with stage("pull_request_files_parse") as files_stage_attributes:
+        files = fetch_pull_request_files(githubRepository)
+        files_stage_attributes["files"] = len(files)
+        return [parse_pull_request_file(githubRepository, file) for file in files]
+
+
+def fetch_pull_request_files(githubRepository: GitHubRepository) -> list:
+    """Lists the changed files of a pull request, with their patches but without their content."""
+    with stage("pr_fetch") as stage_attributes:
+        files = list(githubRepository.get_pull_request_files())
+        stage_attributes["requests"] = max(
+            math.ceil(len(files) / github_files_page_size), 1
+        )
+    return files
 
-    for file in files:
-        file_name = file.filename
-        file_diff = file.patch
+
+def parse_pull_request_file(
+    githubRepository: GitHubRepository, file
+) -> PullRequestFile:
+    """Fetches the content of a changed file and combines it with the changes of its patch."""
+    file_name = file.filename
+    file_diff = file.patch
+    with stage("diff_parse", file_path=file_name):
         additions_deletions_tuple = parse_changes(file_diff)
+    with stage(
+        "file_content_fetch", file_path=file_name, requests=1
+    ) as stage_attributes:
         file_content = githubRepository.get_file_content(file_name)
-        additions = additions_deletions_tuple[0]
-        deletions = additions_deletions_tuple[1]
-
-        # Combine content and changes
-        content_with_lines = [
-            ContentWithLine(line=i + 1, content=lineContent)
-            for i, lineContent in enumerate(file_content.splitlines())
-        ]
-        pull_request_file = PullRequestFile(
-            path=file_name,
-            content=content_with_lines,
-            additions=additions,
-            deletions=deletions,
-        )
-        pull_request_files.append(pull_request_file)
-
-    return pull_request_files
+        stage_attributes["bytes"] = len((file_content or "").encode())
+    additions = additions_deletions_tuple[0]
+    deletions = additions_deletions_tuple[1]
+
+    # Combine content and changes
+    content_with_lines = [
+        ContentWithLine(line=i + 1, content=lineContent)
+        for i, lineContent in enumerate(file_content.splitlines())
+    ]
+    return PullRequestFile(
+        path=file_name,
+        content=content_with_lines,
+        additions=additions,
+        deletions=deletions,
+    )
 
 
 def parse_changes(file_diff) -> tuple:
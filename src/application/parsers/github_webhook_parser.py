@@ -0,0 +1,69 @@
+import hashlib
+import hmac
+from datetime import datetime
+from typing import Optional
+
+from core.models.review_job import ReviewJob
+
+# The pull_request event actions that bring new code to review
+reviewable_actions = ["opened", "reopened", "synchronize", "ready_for_review"]
+
+
+def verify_webhook_signature(
+    secret: str, body: bytes, signature_header: Optional[str]
+) -> bool:
+    """
+    Verifies the X-Hub-Signature-256 header GitHub signs webhook deliveries with.
+
+    Args:
+        secret (str): The webhook secret configured on GitHub.
+        body (bytes): The raw request body.
+        signature_header (str, optional): The value of the X-Hub-Signature-256 header.
+
+    Returns:
+        bool: Whether the body was signed with the secret.
+    """
+    if not signature_header or not signature_header.startswith("sha256="):
+        return False
+
+    expected_signature = hmac.new(
+        secret.encode("utf-8"), body, hashlib.sha256
+    ).hexdigest()
+    return hmac.compare_digest(f"sha256={expected_signature}", signature_header)
+
+
+def parse_pull_request_event(
+    payload: dict, delivery_id: Optional[str] = None
+) -> Optional[ReviewJob]:
+    """
+    Converts a pull_request webhook payload into a review job.
+
+    Args:
+        payload (dict): The webhook payload.
+        delivery_id (str, optional): The value of the X-GitHub-Delivery header.
+
+    Returns:
+        Optional[ReviewJob]: The job, None when the event does not call for a review.
+    """
+    if payload.get("action") not in reviewable_actions:
+        return None
+
+    pull_request = payload.get("pull_request") or {}
+    if pull_request.get("draft") or pull_request.get("state", "open") != "open":
+        return None
+
+    repository = payload["repository"]
+    updated_at = pull_request.get("updated_at")
+    return ReviewJob(
+        repo_owner=repository["owner"]["login"],
+        repo_name=repository["name"],
+        pr_number=pull_request.get("number") or payload["number"],
+        head_sha=(pull_request.get("head") or {}).get("sha"),
+        # A redelivered or late event carries the update time of its older head commit
+        head_updated_at=(
+            datetime.fromisoformat(updated_at.replace("Z", "+00:00"))
+            if updated_at
+            else None
+        ),
+        delivery_id=delivery_id,
+    )
@@ -0,0 +1,41 @@
+import json
+
+from core.models.llm_review import LlmReview
+
+# Models sometimes wrap their JSON output in a markdown code fence
+code_fence = "```"
+
+
+def strip_code_fence(text: str) -> str:
+    """Returns the raw llm output without surrounding whitespace and the markdown code fence wrapping it, if any."""
+    stripped_text = text.strip()
+    if stripped_text.startswith(code_fence):
+        # Drop the opening fence (and its language tag) and the closing fence
+        stripped_text = stripped_text.split("\n", 1)[1] if "\n" in stripped_text else ""
+        stripped_text = stripped_text.rsplit(code_fence, 1)[0]
+    return stripped_text
+
+
+def parse_llm_review(text: str) -> LlmReview:
+    """
+    Parses the raw JSON output of an llm reviewing a pull request file chunk.
+
+    Args:
+        text (str): The raw llm output, optionally wrapped in a markdown code fence.
+
+    Returns:
+        LlmReview: The parsed review.
+
+    Raises:
+        ValueError: If the output is not a valid review.
+    """
+    try:
+        review = LlmReview.model_validate(json.loads(strip_code_fence(text)))
+    except ValueError as e:
+        raise ValueError(f"Invalid llm review output: {e}") from e
+
+    if not review.analysis.needs_comments:
+        # The prompt requires an empty comments array in that case
+        review.comments = []
+
+    return review
@@ -1,3 +1,4 @@
+from core.instrumentation.stages import stage
 from core.models.content_with_line import ContentWithLine
 from core.models.pull_request_file import PullRequestFile
 
@@ -81,37 +82,40 @@ def parse_pull_request_to_text(pull_request_file: PullRequestFile) -> str:
     Returns:
         str: The human readable converted text.
     """
-    content = pull_request_file.content
+    with stage("render", file_path=pull_request_file.path) as stage_attributes:
+        content = pull_request_file.content
 
-    # Remove deletions and mark them with a "-" prefix
-    deletion_lines = {deletion.line for deletion in pull_request_file.deletions}
-    deletions_to_print = []
+        # Remove deletions and mark them with a "-" prefix
+        deletion_lines = {deletion.line for deletion in pull_request_file.deletions}
+        deletions_to_print = []
 
-    updated_content = []
-    for entry in content:
-        if entry.line in deletion_lines:
-            deletions_to_print.append(ContentWithLine(line=entry.line, content=f"-{entry.content}"))
-        else:
-            updated_content.append(entry)
+        updated_content = []
+        for entry in content:
+            if entry.line in deletion_lines:
+                deletions_to_print.append(ContentWithLine(line=entry.line, content=f"-{entry.content}"))
+            else:
+                updated_content.append(entry)
 
-    content = updated_content
+        content = updated_content
 
-    # Shift lines for additions
-    for addition in pull_request_file.additions:
-        shift_from_index(content, addition.line, 1)
+        # Shift lines for additions
+        for addition in pull_request_file.additions:
+            shift_from_index(content, addition.line, 1)
 
-    # Prepare and prefix additions
-    additions_to_print = [
-        ContentWithLine(line=addition.line, content=f"+{addition.content}")
-        for addition in pull_request_file.additions
-    ]
+        # Prepare and prefix additions
+        additions_to_print = [
+            ContentWithLine(line=addition.line, content=f"+{addition.content}")
+            for addition in pull_request_file.additions
+        ]
 
-    # Add additions and deletions, then sort content by line number
-    content.extend(deletions_to_print + additions_to_print)
-    content.sort(key=lambda x: x.line)
+        # Add additions and deletions, then sort content by line number
+        content.extend(deletions_to_print + additions_to_print)
+        content.sort(key=lambda x: x.line)
 
-    # Combine content into a single formatted string
-    return "\n".join(entry.content for entry in content)
+        # Combine content into a single formatted string
+        text = "\n".join(entry.content for entry in content)
+        stage_attributes["bytes"] = len(text.encode())
+        return text
 
 if __name__ == "__main__":
     pull_request_file_obj = {
@@ -0,0 +1,107 @@
+import ast
+
+from core.models.file_symbols import FileSymbols, SymbolDefinition
+
+# Longer variable definitions are cut, the context only needs to tell what the symbol is
+max_signature_length = 160
+
+
+def _signature(node: ast.AST, source_lines: list[str]) -> str:
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+        signature = f"{prefix} {node.name}({ast.unparse(node.args)})"
+        if node.returns is not None:
+            signature += f" -> {ast.unparse(node.returns)}"
+        return signature
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(base) for base in node.bases + node.keywords]
+        return (
+            f"class {node.name}({', '.join(bases)})" if bases else f"class {node.name}"
+        )
+    return source_lines[node.lineno - 1].strip()[:max_signature_length]
+
+
+class _SymbolVisitor(ast.NodeVisitor):
+    def __init__(self, path: str, source_lines: list[str]):
+        self.path = path
+        self.source_lines = source_lines
+        self.definitions: list[SymbolDefinition] = []
+        self.usages: dict[str, set[int]] = {}
+        self._depth = 0
+
+    def _define(self, name: str, kind: str, node: ast.AST):
+        self.definitions.append(
+            SymbolDefinition(
+                name=name,
+                kind=kind,
+                path=self.path,
+                line=node.lineno,
+                signature=_signature(node, self.source_lines),
+            )
+        )
+
+    def _use(self, name: str, line: int):
+        self.usages.setdefault(name, set()).add(line)
+
+    def _visit_definition(self, node: ast.AST, kind: str):
+        self._define(node.name, kind, node)
+        self._depth += 1
+        self.generic_visit(node)
+        self._depth -= 1
+
+    def visit_FunctionDef(self, node: ast.FunctionDef):
+        self._visit_definition(node, "function")
+
+    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef):
+        self._visit_definition(node, "function")
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        self._visit_definition(node, "class")
+
+    def visit_Assign(self, node: ast.Assign):
+        # Only module variables, local ones mean nothing to other files
+        if self._depth == 0:
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    self._define(target.id, "variable", node)
+        self.generic_visit(node)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign):
+        if self._depth == 0 and isinstance(node.target, ast.Name):
+            self._define(node.target.id, "variable", node)
+        self.generic_visit(node)
+
+    def visit_Name(self, node: ast.Name):
+        if isinstance(node.ctx, ast.Load):
+            self._use(node.id, node.lineno)
+
+    def visit_Attribute(self, node: ast.Attribute):
+        if isinstance(node.ctx, ast.Load):
+            self._use(node.attr, node.lineno)
+        self.generic_visit(node)
+
+
+def parse_python_symbols(path: str, source: str) -> FileSymbols:
+    """
+    Extracts the functions, classes and module variables a Python file defines, and the lines
+    every name is used on. A file that does not parse has no symbols.
+
+    Args:
+        path (str): The file path.
+        source (str): The file content.
+
+    Returns:
+        FileSymbols: The symbols of the file.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return FileSymbols(path=path)
+
+    visitor = _SymbolVisitor(path, source.splitlines())
+    visitor.visit(tree)
+    return FileSymbols(
+        path=path,
+        definitions=visitor.definitions,
+        usages={name: sorted(lines) for name, lines in visitor.usages.items()},
+    )
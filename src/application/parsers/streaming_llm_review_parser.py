@@ -0,0 +1,122 @@
+import json
+import re
+from typing import Optional
+
+from core.models.llm_comment import LlmComment
+
+needs_comments_pattern = re.compile(r'"needs_comments"\s*:\s*(true|false)')
+
+
+class StreamingLlmReviewParser:
+    """
+    Parses the JSON review of a chunk while the llm streams it.
+
+    Every comment object of the top-level "comments" array is returned by `feed` as soon as its
+    closing brace arrives, and `needs_comments` is set as soon as the analysis decides it, so that
+    comments can be posted, or the generation stopped, before the output is complete.
+    Text around the JSON object, like a markdown code fence, is ignored. Comments that are not valid
+    LlmComments are skipped and their errors recorded in `invalid_comments`.
+    """
+
+    def __init__(self):
+        self.needs_comments: Optional[bool] = None
+        self.comments: list[LlmComment] = []
+        self.invalid_comments: list[str] = []
+        self._text = ""
+        self._position = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        # The open objects and arrays, with the key they are the value of
+        self._containers: list[tuple[str, Optional[str]]] = []
+        self._expecting_key = False
+        self._last_key: Optional[str] = None
+        self._comment_start: Optional[int] = None
+        # Where the "needs_comments" key starts, its value is matched from there instead of scanning the output
+        self._needs_comments_start: Optional[int] = None
+
+    def feed(self, text: str) -> list[LlmComment]:
+        """
+        Parses the next piece of the streamed output.
+
+        Args:
+            text (str): The streamed text since the previous call.
+
+        Returns:
+            list[LlmComment]: The valid comments completed by this piece.
+        """
+        self._text += text
+        completed_comments = []
+
+        while self._position < len(self._text):
+            character = self._text[self._position]
+            self._position += 1
+            if self._in_string:
+                self._read_string_character(character)
+            elif character == '"':
+                self._in_string = True
+                self._string_start = self._position - 1
+            elif character in "{[":
+                self._open(character)
+            elif character in "}]" and self._containers:
+                comment = self._close(character)
+                if comment is not None:
+                    completed_comments.append(comment)
+            elif character == ",":
+                self._expecting_key = self._in_object()
+
+        if self.needs_comments is None and self._needs_comments_start is not None:
+            match = needs_comments_pattern.match(self._text, self._needs_comments_start)
+            if match:
+                self.needs_comments = match.group(1) == "true"
+
+        self.comments.extend(completed_comments)
+        return completed_comments
+
+    def _in_object(self) -> bool:
+        return bool(self._containers) and self._containers[-1][0] == "{"
+
+    def _read_string_character(self, character: str):
+        if self._escaped:
+            self._escaped = False
+        elif character == "\\":
+            self._escaped = True
+        elif character == '"':
+            self._in_string = False
+            if self._expecting_key:
+                self._last_key = json.loads(
+                    self._text[self._string_start : self._position]
+                )
+                self._expecting_key = False
+                if self._last_key == "needs_comments":
+                    self._needs_comments_start = self._string_start
+
+    def _open(self, character: str):
+        if (
+            character == "{"
+            and len(self._containers) == 2
+            and self._containers[-1] == ("[", "comments")
+        ):
+            self._comment_start = self._position - 1
+
+        key = self._last_key if self._in_object() else None
+        self._containers.append((character, key))
+        self._expecting_key = character == "{"
+        self._last_key = None
+
+    def _close(self, character: str) -> Optional[LlmComment]:
+        self._containers.pop()
+        if (
+            character != "}"
+            or self._comment_start is None
+            or len(self._containers) != 2
+        ):
+            return None
+
+        comment_text = self._text[self._comment_start : self._position]
+        self._comment_start = None
+        try:
+            return LlmComment.model_validate(json.loads(comment_text))
+        except ValueError as e:
+            self.invalid_comments.append(f"Invalid llm comment output: {e}")
+            return None
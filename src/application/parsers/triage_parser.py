@@ -0,0 +1,23 @@
+import json
+
+from application.parsers.llm_review_parser import strip_code_fence
+from core.models.triage_decision import TriageDecisions
+
+
+def parse_triage_decisions(text: str) -> TriageDecisions:
+    """
+    Parses the raw JSON output of the triage model.
+
+    Args:
+        text (str): The raw llm output, optionally wrapped in a markdown code fence.
+
+    Returns:
+        TriageDecisions: The parsed decisions.
+
+    Raises:
+        ValueError: If the output is not a valid triage.
+    """
+    try:
+        return TriageDecisions.model_validate(json.loads(strip_code_fence(text)))
+    except ValueError as e:
+        raise ValueError(f"Invalid llm triage output: {e}") from e
@@ -0,0 +1,26 @@
+from abc import ABC, abstractmethod
+
+from core.models.comment import Comment
+
+
+class CommentSink(ABC):
+    """
+    Base class of the destinations of the comments resolved by a review, like the pull request
+    itself or a file.
+    """
+
+    @abstractmethod
+    def add_comment(self, comment: Comment) -> Comment:
+        """
+        Adds a comment.
+
+        Args:
+            comment (Comment): The comment, resolved to a file path and line.
+
+        Returns:
+            Comment: The added comment, with the commit it was placed on when known.
+        """
+
+    def close(self) -> None:
+        """Flushes the comments added so far."""
+        pass
@@ -0,0 +1,37 @@
+from core.models.code_snippet import CodeSnippet
+
+
+def split_code_snippets(
+    path: str, source: str, max_lines: int = 40
+) -> list[CodeSnippet]:
+    """
+    Splits a repository file into snippets of consecutive lines for the related-code search.
+
+    A snippet ends at the last blank line of its window when there is one in its second half,
+    so that functions and classes are rarely cut in the middle. Blank snippets are dropped.
+
+    Args:
+        path (str): The file path.
+        source (str): The file content.
+        max_lines (int): The maximum number of lines of a snippet.
+
+    Returns:
+        list[CodeSnippet]: The snippets, in the order of the file.
+    """
+    lines = source.splitlines()
+    snippets = []
+    start = 0
+    while start < len(lines):
+        end = min(start + max_lines, len(lines))
+        if end < len(lines):
+            for candidate in range(end - 1, start + max_lines // 2, -1):
+                if not lines[candidate].strip():
+                    end = candidate + 1
+                    break
+        text = "\n".join(lines[start:end]).strip("\n")
+        if text.strip():
+            snippets.append(
+                CodeSnippet(path=path, start_line=start + 1, end_line=end, text=text)
+            )
+        start = end
+    return snippets
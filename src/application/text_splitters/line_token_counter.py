@@ -0,0 +1,109 @@
+import itertools
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Optional
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    import tiktoken
+
+    return tiktoken.encoding_for_model("gpt-4")
+
+
+def count_tokens(text: str) -> int:
+    """Counts the tokens of a text for gpt-4 models, encoding it entirely."""
+    return len(_encoding().encode(text, disallowed_special=()))
+
+
+class LineTokenCounts:
+    """
+    The token counts of the lines of a text, answering the count of any range of lines in constant time
+    from their prefix sums. Every line break counts as one token.
+    """
+
+    def __init__(self, line_counts: list[int]):
+        self.line_counts = line_counts
+        self._prefix_sums = [0] + list(
+            itertools.accumulate(count + 1 for count in line_counts)
+        )
+
+    def __len__(self) -> int:
+        return len(self.line_counts)
+
+    def range(self, first: int, last: int) -> int:
+        """Returns the tokens of the lines from `first` to `last` included, joined by line breaks."""
+        if last < first:
+            return 0
+        return self._prefix_sums[last + 1] - self._prefix_sums[first] - 1
+
+    @property
+    def total(self) -> int:
+        return self.range(0, len(self.line_counts) - 1)
+
+
+class LineTokenCounter:
+    """
+    Counts tokens line by line, encoding every distinct line once. The counts are memoized by line hash
+    in a bounded LRU cache shared by the chunkers, so that packing, collapsing and re-splitting a file
+    never encode the same line twice.
+
+    The count of a text is the sum of the counts of its lines plus one token per line break, which is
+    within a few tokens of encoding the text at once, and rarely under it.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int] = count_tokens,
+        max_lines: int = 100_000,
+    ):
+        """
+        :param count_tokens: Counts the tokens of a single line.
+        :param max_lines: The number of line counts kept, the least recently used ones are forgotten.
+        """
+        self.count_tokens = count_tokens
+        self.max_lines = max_lines
+        self._counts: OrderedDict[int, int] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def count_line(self, line: str) -> int:
+        key = hash(line)
+        with self._lock:
+            count = self._counts.get(key)
+            if count is not None:
+                self._counts.move_to_end(key)
+                self._hits += 1
+                return count
+        # Encoded outside the lock, two threads may both encode a new line but never wait on each other
+        count = self.count_tokens(line)
+        with self._lock:
+            self._misses += 1
+            self._counts[key] = count
+            if len(self._counts) > self.max_lines:
+                self._counts.popitem(last=False)
+        return count
+
+    def count_lines(self, lines: list[str]) -> LineTokenCounts:
+        """Counts the tokens of every line, for range queries."""
+        return LineTokenCounts([self.count_line(line) for line in lines])
+
+    def count_text(self, text: str) -> int:
+        """Counts the tokens of a text from the counts of its lines."""
+        return self.count_lines(text.split("\n")).total
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "lines": len(self._counts),
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+@lru_cache(maxsize=1)
+def default_line_token_counter() -> LineTokenCounter:
+    """The counter of gpt-4 tokens shared by every chunker of the process."""
+    return LineTokenCounter()
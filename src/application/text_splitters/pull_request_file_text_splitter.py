@@ -1,6 +1,14 @@
+from typing import Optional
+
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
+from application.text_splitters.line_token_counter import default_line_token_counter
+from application.text_splitters.python_text_splitter import (
+    split_python_pull_request_file,
+)
+from core.instrumentation.stages import stage
+
 
 def remove_changes_markers_from_overlap(chunks: list[Document]):
     """
@@ -36,15 +44,44 @@ def remove_changes_markers_from_overlap(chunks: list[Document]):
     return processed_chunks
 
 
-def split_pull_request_file(pull_request_file_text: str):
-    text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        model_name="gpt-4",
+def _split_text(pull_request_file_text: str) -> list[Document]:
+    # The splitter measures every candidate chunk, the line counts make it a sum of cached counts
+    text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=500,
         chunk_overlap=50,
+        length_function=default_line_token_counter().count_text,
     )
     chunks = text_splitter.create_documents([pull_request_file_text])
-    chunks = remove_changes_markers_from_overlap(chunks=chunks)
-    return chunks
+    return remove_changes_markers_from_overlap(chunks=chunks)
+
+
+def split_pull_request_file(
+    pull_request_file_text: str, file_path: Optional[str] = None
+) -> list[Document]:
+    """
+    Splits a rendered pull request file into chunks of about 500 tokens.
+
+    Python files are cut between their definitions, leaving out the unchanged ones. Other files,
+    and Python files that do not parse, are cut by characters with overlapping chunks.
+
+    Args:
+        pull_request_file_text (str): The file, rendered with its additions and deletions.
+        file_path (str, optional): The file path, telling the language of the file.
+
+    Returns:
+        list[Document]: The chunks.
+    """
+    with stage("split", bytes=len(pull_request_file_text.encode())) as stage_attributes:
+        chunks = None
+        if file_path is not None and file_path.endswith(".py"):
+            chunks = split_python_pull_request_file(
+                pull_request_file_text, fallback_splitter=_split_text
+            )
+        stage_attributes["splitter"] = "text" if chunks is None else "python"
+        if chunks is None:
+            chunks = _split_text(pull_request_file_text)
+        stage_attributes["chunks"] = len(chunks)
+        return chunks
 
 
 if __name__ == "__main__":
@@ -52,7 +89,9 @@ if __name__ == "__main__":
         "src/application/text_splitters/examples/pull_request_file_example.txt"
     ) as f:
         pull_request_file_text = f.read()
-        chunks = split_pull_request_file(pull_request_file_text)
+        chunks = split_pull_request_file(
+            pull_request_file_text, file_path="src/agents/sentiment.py"
+        )
         for index, chunk in enumerate(chunks):
             print(f"*********Chunk {index}*********")
             print(chunk.page_content)
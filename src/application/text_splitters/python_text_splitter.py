@@ -0,0 +1,218 @@
+import ast
+import bisect
+from typing import Callable, Optional
+
+from langchain_core.documents import Document
+
+from application.text_splitters.line_token_counter import (
+    LineTokenCounter,
+    LineTokenCounts,
+    default_line_token_counter,
+)
+
+# Marks the unchanged definitions left out between two definitions of a chunk
+gap_marker = "...."
+
+
+class _Piece:
+    """Consecutive rendered lines of a top-level statement, or of a class member with the header of its class."""
+
+    def __init__(
+        self,
+        first: int,
+        last: int,
+        lines: list[str],
+        line_counts: LineTokenCounts,
+        header: str = "",
+    ):
+        self.first = first
+        self.last = last
+        self.text = "\n".join(lines[first : last + 1])
+        self.tokens = line_counts.range(first, last)
+        self.changed = any(
+            line.startswith(("+", "-")) for line in lines[first : last + 1]
+        )
+        self.header = header
+        # The header of the class this piece starts, which its members are not repeated under
+        self.opened_header = None
+
+
+def _new_side(rendered_lines: list[str]) -> tuple[str, list[int]]:
+    """
+    Returns the code of the file after the pull request, and the line of that code every rendered line
+    belongs to. A deleted line belongs to the line following it.
+    """
+    new_lines = []
+    owners = []
+    for line in rendered_lines:
+        if line.startswith("-"):
+            owners.append(len(new_lines) + 1)
+        else:
+            new_lines.append(line[1:] if line.startswith("+") else line)
+            owners.append(len(new_lines))
+    owners = [min(owner, max(len(new_lines), 1)) for owner in owners]
+    return "\n".join(new_lines), owners
+
+
+def _statement_spans(
+    body: list[ast.stmt], first_line: int, last_line: int
+) -> list[tuple]:
+    """
+    Spans every statement of a body over code lines. Comments and blank lines before a statement are part of it,
+    the last statement spans up to `last_line`.
+    """
+    spans = []
+    start = first_line
+    for index, node in enumerate(body):
+        end = node.end_lineno if index < len(body) - 1 else last_line
+        spans.append((start, end, node))
+        start = end + 1
+    return spans
+
+
+class _PythonChunker:
+    def __init__(
+        self,
+        rendered_lines: list[str],
+        owners: list[int],
+        chunk_size: int,
+        line_counts: LineTokenCounts,
+    ):
+        self.rendered_lines = rendered_lines
+        self.owners = owners
+        self.chunk_size = chunk_size
+        self.line_counts = line_counts
+
+    def _rendered_range(self, start: int, end: int) -> tuple[int, int]:
+        return (
+            bisect.bisect_left(self.owners, start),
+            bisect.bisect_right(self.owners, end) - 1,
+        )
+
+    def pieces(
+        self, body: list[ast.stmt], first_line: int, last_line: int, header: str = ""
+    ) -> list[_Piece]:
+        pieces = []
+        for start, end, node in _statement_spans(body, first_line, last_line):
+            first, last = self._rendered_range(start, end)
+            if first > last:
+                continue
+            piece = _Piece(first, last, self.rendered_lines, self.line_counts, header)
+            if (
+                isinstance(node, ast.ClassDef)
+                and piece.changed
+                and piece.tokens > self.chunk_size
+            ):
+                # A large class is cut between its members, each one reviewed under the class header
+                body_start = min(
+                    [node.body[0].lineno]
+                    + [
+                        decorator.lineno
+                        for decorator in getattr(node.body[0], "decorator_list", [])
+                    ]
+                )
+                header_first, header_last = self._rendered_range(start, body_start - 1)
+                header_piece = _Piece(
+                    header_first,
+                    header_last,
+                    self.rendered_lines,
+                    self.line_counts,
+                    header,
+                )
+                class_header = "\n".join(
+                    [header]
+                    + [
+                        line[1:] if line.startswith("+") else line
+                        for line in self.rendered_lines[header_first : header_last + 1]
+                        if not line.startswith("-")
+                    ]
+                ).strip("\n")
+                if header_piece.changed:
+                    header_piece.opened_header = class_header
+                    pieces.append(header_piece)
+                pieces.extend(self.pieces(node.body, body_start, end, class_header))
+            else:
+                pieces.append(piece)
+        return pieces
+
+
+def split_python_pull_request_file(
+    pull_request_file_text: str,
+    chunk_size: int = 500,
+    token_counter: Optional[LineTokenCounter] = None,
+    fallback_splitter: Optional[Callable[[str], list[Document]]] = None,
+) -> Optional[list[Document]]:
+    """
+    Splits a rendered Python file between its top-level functions, classes and statements, and between the
+    members of the classes too large for a chunk. Definitions the pull request does not change are left out,
+    and no chunk overlaps another.
+
+    Args:
+        pull_request_file_text (str): The file, rendered with its additions and deletions.
+        chunk_size (int): The maximum size of a chunk, unless a single function is larger.
+        token_counter (LineTokenCounter, optional): Counts the tokens of the lines, the shared gpt-4 counter when None.
+        fallback_splitter (Callable, optional): Splits the functions larger than a chunk, they are kept whole when None.
+
+    Returns:
+        list[Document]: The chunks, or None when the code after the pull request is not valid Python.
+    """
+    token_counter = token_counter or default_line_token_counter()
+    rendered_lines = pull_request_file_text.split("\n")
+    source, owners = _new_side(rendered_lines)
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    if not tree.body:
+        return None
+
+    # Every line is counted once, the sizes of pieces and chunks are then sums
+    chunker = _PythonChunker(
+        rendered_lines, owners, chunk_size, token_counter.count_lines(rendered_lines)
+    )
+    pieces = chunker.pieces(tree.body, 1, max(owners))
+
+    chunks = []
+    texts = []
+    chunk_tokens = 0
+    last_piece = None
+    current_header = ""
+    for piece in (piece for piece in pieces if piece.changed):
+        separator = []
+        if last_piece is not None and piece.first != last_piece.last + 1:
+            separator.append(gap_marker)
+        if piece.header and piece.header != current_header:
+            separator.append(piece.header)
+        added_tokens = piece.tokens + sum(
+            token_counter.count_text(text) + 1 for text in separator
+        )
+        if texts and chunk_tokens + 1 + added_tokens > chunk_size:
+            chunks.append(("\n".join(texts), chunk_tokens))
+            texts, chunk_tokens, last_piece = [], 0, None
+            separator = [piece.header] if piece.header else []
+            added_tokens = piece.tokens + sum(
+                token_counter.count_text(text) + 1 for text in separator
+            )
+        chunk_tokens += added_tokens + (1 if texts else 0)
+        texts.extend(separator + [piece.text])
+        last_piece = piece
+        current_header = piece.opened_header or piece.header
+    if texts:
+        chunks.append(("\n".join(texts), chunk_tokens))
+
+    documents = []
+    for chunk, chunk_tokens in chunks:
+        chunk = chunk.strip("\n")
+        if fallback_splitter is not None and chunk_tokens > chunk_size:
+            # Parts of a large function without any change were only context
+            documents.extend(
+                document
+                for document in fallback_splitter(chunk)
+                if any(
+                    line.startswith(("+", "-"))
+                    for line in document.page_content.splitlines()
+                )
+            )
+        else:
+            documents.append(Document(page_content=chunk))
+    return documents
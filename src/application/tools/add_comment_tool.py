@@ -1,11 +1,18 @@
+import threading
+from concurrent.futures import Future
+from functools import partial
 from typing import Optional, Type, Callable
+from application.sinks.comment_sink import CommentSink
 from application.use_cases.add_comment_to_pull_request import AddCommentUseCase
 from application.use_cases.get_pull_request import GetPullRequestUseCase
+from core.concurrency.cancellation import CancellationToken
+from core.concurrency.pipeline import PipelineStage
 from core.models.comment import Comment
 from core.models.content_with_line import ContentWithLine
 from core.models.llm_comment import LlmComment
 from core.models.pull_request_file import PullRequestFile
 from infrastructure.repositories.github_repository import GitHubRepository
+from infrastructure.sinks.github_comment_sink import GitHubCommentSink
 from langchain.tools import BaseTool
 from langchain.callbacks.manager import (
     AsyncCallbackManagerForToolRun,
@@ -28,18 +35,49 @@ class AddCommentTool(BaseTool):
     _pull_request_file: PullRequestFile
     _add_comment_to_file_use_case: AddCommentUseCase
     _gitHubRepository: GitHubRepository
+    _review_progress: Optional[object]
+    _cancellation_token: Optional[CancellationToken]
+    _comment_sink: CommentSink
+    _post_stage: Optional[PipelineStage]
+    _pending_posts: list[Future]
+    _queue_posts: bool
+    _queued_comments: list[Comment]
+    _dispatched_comments: set[tuple]
+    _dispatch_lock: threading.Lock
 
     def __init__(
         self,
         pull_request_file,
         add_comment_to_file_use_case,
         github_repository,
+        review_progress=None,
+        cancellation_token=None,
+        comment_sink: Optional[CommentSink] = None,
+        post_stage: Optional[PipelineStage] = None,
+        queue_posts: bool = False,
         **kwargs,
     ):
         super().__init__(**kwargs)
         self._pull_request_file = pull_request_file
         self._add_comment_to_file_use_case = add_comment_to_file_use_case
         self._gitHubRepository = github_repository
+        # Records posted comments so that a resumed review does not post them twice
+        self._review_progress = review_progress
+        # Comments of a superseded review are not posted
+        self._cancellation_token = cancellation_token
+        # Comments are posted on the pull request unless another sink, like a file, is given
+        self._comment_sink = comment_sink or GitHubCommentSink(
+            github_repository, add_comment_to_file_use_case
+        )
+        # Posts the comments on its own threads while the review goes on, see `wait_for_posts`
+        self._post_stage = post_stage
+        self._pending_posts = []
+        # Comments are held until `post_queued_comments`, so that the llm call choosing them never posts
+        self._queue_posts = queue_posts
+        self._queued_comments = []
+        # A retried llm call chooses the comments of the failed attempt again, they are only posted once
+        self._dispatched_comments = set()
+        self._dispatch_lock = threading.Lock()
 
     def _run(
         self,
@@ -56,9 +94,10 @@ class AddCommentTool(BaseTool):
                     file_path=self._pull_request_file.path,
                     line=line,
                 )
-                self._add_comment_to_file_use_case.invoke(
-                    githubRepository=self._gitHubRepository, comment=comment
-                )
+                if self._queue_posts:
+                    self._queued_comments.append(comment)
+                else:
+                    self._dispatch(comment)
 
             return "all comments added successfully"
         except StopIteration as e:
@@ -68,6 +107,51 @@ class AddCommentTool(BaseTool):
             raise e
             return "comments not added. Error"
 
+    def _dispatch(self, comment: Comment):
+        key = (comment.file_path, comment.line, comment.text)
+        with self._dispatch_lock:
+            if key in self._dispatched_comments:
+                return
+            self._dispatched_comments.add(key)
+        if self._post_stage is not None:
+            self._pending_posts.append(
+                self._post_stage.put(partial(self._post_comment, comment))
+            )
+        else:
+            self._post_comment(comment)
+
+    def post_queued_comments(self):
+        """Posts the comments queued since the last post or discard, in the post stage if there is one."""
+        queued_comments, self._queued_comments = self._queued_comments, []
+        for comment in queued_comments:
+            self._dispatch(comment)
+
+    def discard_queued_comments(self):
+        """Drops the queued comments, like the ones of a failed llm call about to be retried."""
+        self._queued_comments = []
+
+    def _post_comment(self, comment: Comment):
+        if self._cancellation_token:
+            self._cancellation_token.raise_if_cancelled()
+        if self._review_progress and self._review_progress.is_comment_posted(
+            comment.file_path, comment.line, comment.text
+        ):
+            return
+
+        self._comment_sink.add_comment(comment)
+        if self._review_progress:
+            self._review_progress.record_comment_posted(
+                comment.file_path, comment.line, comment.text
+            )
+
+    def wait_for_posts(self):
+        """
+        Waits for the comments queued in the post stage so far, raising the error of the first failed post.
+        """
+        pending_posts, self._pending_posts = self._pending_posts, []
+        for pending_post in pending_posts:
+            pending_post.result()
+
     async def _arun(
         self,
         comments_to_add: list[LlmComment],
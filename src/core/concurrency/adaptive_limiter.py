@@ -0,0 +1,264 @@
+import collections
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from core.concurrency.cancellation import ReviewCancelledError
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    # The OpenAI client names it status_code, PyGithub status
+    status_code = getattr(error, "status_code", getattr(error, "status", None))
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code if isinstance(status_code, int) else None
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Whether the error is a 429 response, like the RateLimitError of the OpenAI client."""
+    return _status_code(error) == 429
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """Whether the error tells the provider is overloaded: a 429, a 5xx or a timeout."""
+    status_code = _status_code(error)
+    if status_code is not None:
+        return status_code == 429 or status_code >= 500
+    return isinstance(error, TimeoutError) or "Timeout" in type(error).__name__
+
+
+def is_unavailable_error(error: BaseException) -> bool:
+    """Whether the error tells the provider is down or degraded: a 5xx, a timeout or a connection error."""
+    status_code = _status_code(error)
+    if status_code is not None:
+        return status_code >= 500
+    return (
+        isinstance(error, (TimeoutError, ConnectionError))
+        or "Timeout" in type(error).__name__
+        or "Connection" in type(error).__name__
+    )
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """
+    Reads the delay asked by the `retry-after-ms` or `retry-after` header of an error response.
+
+    Returns:
+        Optional[float]: The delay in seconds, None when the response asks for none.
+    """
+    headers = getattr(error, "headers", None) or getattr(
+        getattr(error, "response", None), "headers", None
+    )
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(float(retry_after_ms) / 1000, 0.0)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    try:
+        # An HTTP date
+        return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    A context manager limiting the llm calls in flight, like a semaphore whose size follows the
+    provider's health (additive increase, multiplicative decrease).
+
+    Every call completing within `latency_tolerance` times the usual latency raises the limit by
+    about one per limit calls. A call rejected with a 429, a 5xx or a timeout, or slower than
+    tolerated, halves it, at most once per usual latency so that a burst of failures counts once.
+    A 429 also holds every new call back for the delay of its `Retry-After` header.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        decrease_ratio: float = 0.5,
+        latency_tolerance: float = 2.0,
+        default_retry_after_seconds: float = 1.0,
+        throughput_window_seconds: float = 60.0,
+    ):
+        """
+        :param initial_limit: The number of calls allowed in flight at first.
+        :param min_limit: The limit never goes below it.
+        :param max_limit: The limit never goes above it.
+        :param decrease_ratio: The factor applied to the limit when backing off.
+        :param latency_tolerance: How many times the usual latency a call may take before the limit backs off.
+        :param default_retry_after_seconds: The pause after a 429 without a Retry-After header.
+        :param throughput_window_seconds: The period over which the throughput is measured.
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_ratio = decrease_ratio
+        self.latency_tolerance = latency_tolerance
+        self.default_retry_after_seconds = default_retry_after_seconds
+        self.throughput_window_seconds = throughput_window_seconds
+
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = float("-inf")
+        # Moving average of the latency of successful calls
+        self._usual_latency: Optional[float] = None
+        self._completions: collections.deque[float] = collections.deque()
+        self._outcomes = {"success": 0, "rate_limited": 0, "error": 0, "slow": 0}
+        self._condition = threading.Condition()
+        self._started_at = threading.local()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def __enter__(self):
+        with self._condition:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause <= 0 and self._in_flight < self.limit:
+                    break
+                self._condition.wait(timeout=pause if pause > 0 else None)
+            self._in_flight += 1
+
+        self._started_at.__dict__.setdefault("stack", []).append(time.monotonic())
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        now = time.monotonic()
+        latency = now - self._started_at.stack.pop()
+
+        with self._condition:
+            self._in_flight -= 1
+            if exc_value is None:
+                self._record_success(now, latency)
+            elif isinstance(exc_value, Exception) and not isinstance(
+                exc_value, ReviewCancelledError
+            ):
+                self._record_error(now, exc_value)
+            self._condition.notify_all()
+        return False
+
+    def _record_success(self, now: float, latency: float):
+        self._completions.append(now)
+        usual_latency = self._usual_latency
+        # Slow calls are averaged in too, so that a lasting change of latency becomes the norm
+        self._usual_latency = (
+            latency if usual_latency is None else 0.9 * usual_latency + 0.1 * latency
+        )
+
+        if (
+            usual_latency is not None
+            and latency > usual_latency * self.latency_tolerance
+        ):
+            self._outcomes["slow"] += 1
+            self._decrease(now)
+        else:
+            self._outcomes["success"] += 1
+            self._limit = min(self._limit + 1 / self._limit, float(self.max_limit))
+
+    def _record_error(self, now: float, error: Exception):
+        if not is_overload_error(error):
+            # Errors of the review itself, like an unparsable output, say nothing of the load
+            return
+
+        if is_rate_limit_error(error):
+            self._outcomes["rate_limited"] += 1
+            retry_after = retry_after_seconds(error)
+            self._paused_until = max(
+                self._paused_until,
+                now
+                + (
+                    retry_after
+                    if retry_after is not None
+                    else self.default_retry_after_seconds
+                ),
+            )
+        else:
+            self._outcomes["error"] += 1
+        self._decrease(now)
+
+    def _decrease(self, now: float):
+        if now - self._last_decrease < (self._usual_latency or 0.0):
+            return
+        self._last_decrease = now
+        self._limit = max(self._limit * self.decrease_ratio, float(self.min_limit))
+
+    def stats(self) -> dict:
+        """Returns the current limit, the calls in flight, the throughput and the outcome counters."""
+        with self._condition:
+            now = time.monotonic()
+            while (
+                self._completions
+                and self._completions[0] < now - self.throughput_window_seconds
+            ):
+                self._completions.popleft()
+            return {
+                "limit": self.limit,
+                "in_flight": self._in_flight,
+                "throughput_per_second": len(self._completions)
+                / self.throughput_window_seconds,
+                "usual_latency_seconds": self._usual_latency or 0.0,
+                "paused_seconds": max(self._paused_until - now, 0.0),
+                "outcomes": dict(self._outcomes),
+            }
+
+    def to_prometheus(self) -> str:
+        """Renders the limiter state in the Prometheus text exposition format."""
+        stats = self.stats()
+        gauges = [
+            (
+                "llm_concurrency_limit",
+                "Llm calls currently allowed in flight.",
+                "limit",
+            ),
+            ("llm_in_flight", "Llm calls in flight.", "in_flight"),
+            (
+                "llm_throughput_per_second",
+                "Llm calls completed per second over the throughput window.",
+                "throughput_per_second",
+            ),
+            (
+                "llm_usual_latency_seconds",
+                "Moving average of the latency of successful llm calls.",
+                "usual_latency_seconds",
+            ),
+            (
+                "llm_paused_seconds",
+                "Remaining pause asked by the last Retry-After header.",
+                "paused_seconds",
+            ),
+        ]
+
+        lines = []
+        for metric_name, description, key in gauges:
+            lines.append(f"# HELP reviewpal_{metric_name} {description}")
+            lines.append(f"# TYPE reviewpal_{metric_name} gauge")
+            lines.append(f"reviewpal_{metric_name} {stats[key]}")
+
+        lines.append(
+            "# HELP reviewpal_llm_calls_total Llm calls completed through the limiter, by outcome."
+        )
+        lines.append("# TYPE reviewpal_llm_calls_total counter")
+        for outcome, count in stats["outcomes"].items():
+            lines.append(f'reviewpal_llm_calls_total{{outcome="{outcome}"}} {count}')
+
+        return "\n".join(lines) + "\n"
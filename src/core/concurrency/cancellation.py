@@ -0,0 +1,159 @@
+import threading
+from datetime import datetime
+from typing import Optional
+
+
+class ReviewCancelledError(Exception):
+    """Raised inside a review once its cancellation token is cancelled."""
+
+
+class CancellationToken:
+    """
+    A cooperative cancellation flag, checked by a review before every llm call and comment post.
+    """
+
+    def __init__(self, head_sha: Optional[str] = None):
+        """
+        :param head_sha: The head commit the cancellable review is for.
+        """
+        self.head_sha = head_sha
+        self.reason: Optional[str] = None
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self, reason: str):
+        if not self.cancelled:
+            self.reason = reason
+            self._cancelled.set()
+
+    def raise_if_cancelled(self):
+        """
+        Raises:
+            ReviewCancelledError: When the token was cancelled.
+        """
+        if self.cancelled:
+            raise ReviewCancelledError(self.reason)
+
+
+class ReviewRunRegistry:
+    """
+    Tracks the latest head commit of every pull request and the tokens of its in-flight reviews.
+
+    When a newer head commit is announced, the reviews of older commits are cancelled: their
+    remaining llm calls and comment posts are skipped. A head commit is newer when the pull request
+    was updated later, or announced later when an update time is unknown, so that a late or
+    redelivered webhook for an older commit does not cancel the review of the newest one.
+    The latest head commit of a pull request is forgotten once none of its reviews is in flight.
+    """
+
+    def __init__(self):
+        self._latest_heads: dict[tuple, tuple[str, Optional[datetime]]] = {}
+        self._tokens: dict[tuple, list[CancellationToken]] = {}
+        self._lock = threading.Lock()
+
+    def supersede(
+        self,
+        repo_owner: str,
+        repo_name: str,
+        pr_number: int,
+        head_sha: Optional[str],
+        head_updated_at: Optional[datetime] = None,
+    ) -> int:
+        """
+        Records the latest head commit of a pull request and cancels the in-flight reviews of other commits.
+        Reviews without a known head commit are never superseded, and an older head commit supersedes nothing.
+
+        Returns:
+            int: The number of cancelled in-flight reviews.
+        """
+        key = (repo_owner, repo_name, pr_number)
+        if head_sha is None:
+            return 0
+
+        with self._lock:
+            if not self._tokens.get(key) or self._is_older(
+                key, head_sha, head_updated_at
+            ):
+                return 0
+            self._latest_heads[key] = (head_sha, head_updated_at)
+            superseded = [
+                token
+                for token in self._tokens[key]
+                if token.head_sha != head_sha and not token.cancelled
+            ]
+        for token in superseded:
+            token.cancel(f"superseded by {head_sha}")
+        return len(superseded)
+
+    def is_superseded(
+        self,
+        repo_owner: str,
+        repo_name: str,
+        pr_number: int,
+        head_sha: Optional[str],
+        head_updated_at: Optional[datetime] = None,
+    ) -> bool:
+        """Whether a newer head commit than the given one was announced for an in-flight review."""
+        with self._lock:
+            return self._is_older(
+                (repo_owner, repo_name, pr_number), head_sha, head_updated_at
+            )
+
+    def start(
+        self,
+        repo_owner: str,
+        repo_name: str,
+        pr_number: int,
+        head_sha: Optional[str],
+        head_updated_at: Optional[datetime] = None,
+    ) -> CancellationToken:
+        """
+        Registers a review and cancels the reviews of the older head commits of the pull request.
+
+        Returns:
+            CancellationToken: The token of the review, already cancelled if a newer commit was announced.
+        """
+        token = CancellationToken(head_sha)
+        key = (repo_owner, repo_name, pr_number)
+        with self._lock:
+            self._tokens.setdefault(key, []).append(token)
+            latest_head = self._latest_heads.get(key)
+            is_superseded = self._is_older(key, head_sha, head_updated_at)
+        if is_superseded:
+            token.cancel(f"superseded by {latest_head[0]}")
+        else:
+            self.supersede(repo_owner, repo_name, pr_number, head_sha, head_updated_at)
+        return token
+
+    def finish(
+        self, repo_owner: str, repo_name: str, pr_number: int, token: CancellationToken
+    ):
+        """Unregisters a finished review."""
+        key = (repo_owner, repo_name, pr_number)
+        with self._lock:
+            tokens = self._tokens.get(key, [])
+            if token in tokens:
+                tokens.remove(token)
+            if not tokens:
+                self._tokens.pop(key, None)
+                self._latest_heads.pop(key, None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return sum(len(tokens) for tokens in self._tokens.values())
+
+    def _is_older(
+        self, key: tuple, head_sha: Optional[str], head_updated_at: Optional[datetime]
+    ) -> bool:
+        latest_head = self._latest_heads.get(key)
+        if head_sha is None or latest_head is None or head_sha == latest_head[0]:
+            return False
+        latest_updated_at = latest_head[1]
+        return (
+            head_updated_at is not None
+            and latest_updated_at is not None
+            and head_updated_at < latest_updated_at
+        )
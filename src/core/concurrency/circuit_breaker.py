@@ -0,0 +1,139 @@
+import threading
+import time
+from typing import Callable
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+    def __init__(self, dependency: str, retry_after_seconds: float):
+        super().__init__(
+            f"The {dependency} circuit is open, retry in {retry_after_seconds:.1f}s"
+        )
+        self.dependency = dependency
+        self.retry_after_seconds = retry_after_seconds
+
+
+def find_circuit_open_error(error: BaseException):
+    """Returns the CircuitOpenError an error was raised from, if any."""
+    while error is not None:
+        if isinstance(error, CircuitOpenError):
+            return error
+        error = error.__cause__ or error.__context__
+    return None
+
+
+class CircuitBreaker:
+    """
+    Stops calling a dependency once it fails `failure_threshold` times in a row, so that the
+    reviews in flight fail fast instead of piling their retries onto a degraded service.
+
+    The circuit stays open for `reset_timeout_seconds`, then lets `half_open_probes` calls
+    through: a successful probe closes it, a failed one opens it again for twice as long.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout_seconds: float = 10.0,
+        max_reset_timeout_seconds: float = 120.0,
+        half_open_probes: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param name: The name of the dependency, in errors and metrics.
+        :param failure_threshold: The number of consecutive failures opening the circuit.
+        :param reset_timeout_seconds: How long the circuit first stays open before a probe is let through.
+        :param max_reset_timeout_seconds: The longest the circuit stays open after repeated failed probes.
+        :param half_open_probes: The number of probe calls in flight while the circuit is half-open.
+        :param clock: Returns the current time in seconds.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.max_reset_timeout_seconds = max_reset_timeout_seconds
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._open_seconds = reset_timeout_seconds
+        self._probes_in_flight = 0
+        self._times_opened = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """closed, open or half_open."""
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self.clock() - self._opened_at < self._open_seconds:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        """
+        Lets a call through.
+
+        Returns:
+            bool: Whether the call is a probe of a half-open circuit.
+
+        Raises:
+            CircuitOpenError: When the circuit is open, or half-open with enough probes in flight.
+        """
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return False
+            if state == "half_open" and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            retry_after = max(self._opened_at + self._open_seconds - self.clock(), 0.0)
+            raise CircuitOpenError(
+                self.name,
+                retry_after if state == "open" else self.reset_timeout_seconds,
+            )
+
+    def record_success(self, probe: bool):
+        """Records a call the dependency answered, closing the circuit after a probe."""
+        with self._lock:
+            self._consecutive_failures = 0
+            if probe:
+                self._probes_in_flight -= 1
+                self._opened_at = None
+                self._open_seconds = self.reset_timeout_seconds
+
+    def release_probe(self):
+        """Gives back the slot of a probe that ended without telling whether the dependency recovered."""
+        with self._lock:
+            self._probes_in_flight -= 1
+
+    def record_failure(self, probe: bool):
+        """Records a call the dependency failed, opening the circuit past the threshold or after a probe."""
+        with self._lock:
+            self._consecutive_failures += 1
+            if probe:
+                self._probes_in_flight -= 1
+                self._open(min(self._open_seconds * 2, self.max_reset_timeout_seconds))
+            elif (
+                self._opened_at is None
+                and self._consecutive_failures >= self.failure_threshold
+            ):
+                self._open(self.reset_timeout_seconds)
+
+    def _open(self, open_seconds: float):
+        self._opened_at = self.clock()
+        self._open_seconds = open_seconds
+        self._times_opened += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._state(),
+                "consecutive_failures": self._consecutive_failures,
+                "times_opened": self._times_opened,
+            }
@@ -0,0 +1,263 @@
+import collections
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional, TypeVar
+
+import tenacity
+
+from core.concurrency.adaptive_limiter import (
+    is_rate_limit_error,
+    is_unavailable_error,
+    retry_after_seconds,
+)
+from core.concurrency.cancellation import ReviewCancelledError
+from core.concurrency.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+T = TypeVar("T")
+
+
+class RetryBudget:
+    """
+    Caps the retries of a dependency across every review: over the last `window_seconds`,
+    retries may add at most `ratio` of the calls, plus `min_retries_per_second` so that a
+    quiet process can still retry. A failing dependency then sees a bounded extra load
+    instead of every concurrent review retrying on its own.
+    """
+
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        min_retries_per_second: float = 1.0,
+        window_seconds: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param ratio: The share of the calls that may be retries.
+        :param min_retries_per_second: Retries always allowed, whatever the number of calls.
+        :param window_seconds: The period the calls and retries are counted over.
+        :param clock: Returns the current time in seconds.
+        """
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.window_seconds = window_seconds
+        self.clock = clock
+        self._calls: collections.deque[float] = collections.deque()
+        self._retries: collections.deque[float] = collections.deque()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        for timestamps in (self._calls, self._retries):
+            while timestamps and timestamps[0] <= now - self.window_seconds:
+                timestamps.popleft()
+
+    def record_call(self):
+        """Records a call, each one earns `ratio` retries."""
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            self._calls.append(now)
+
+    def try_spend(self) -> bool:
+        """Spends a retry, returns False when the budget is exhausted."""
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            allowed = (
+                self.ratio * len(self._calls)
+                + self.min_retries_per_second * self.window_seconds
+            )
+            if len(self._retries) >= allowed:
+                return False
+            self._retries.append(now)
+            return True
+
+
+class DependencyGuard:
+    """
+    Wraps the calls to a dependency, GitHub or the llm provider, with a circuit breaker and
+    tenacity retries drawn from a retry budget, both shared by every review of the process.
+
+    A call rejected by an open circuit raises CircuitOpenError, which is never retried: the
+    review fails fast and its job can be deferred until the circuit lets probes through.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        is_failure: Callable[[BaseException], bool] = is_unavailable_error,
+        is_retryable: Optional[Callable[[BaseException], bool]] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        retry_budget: Optional[RetryBudget] = None,
+        max_attempts: int = 3,
+        initial_wait_seconds: float = 0.5,
+        max_wait_seconds: float = 10.0,
+    ):
+        """
+        :param name: The name of the dependency, in metrics.
+        :param is_failure: Whether an error counts against the circuit breaker, other errors mean the
+            dependency answered.
+        :param is_retryable: Whether a failed call is retried, failures and 429s by default.
+        :param circuit_breaker: The breaker of the dependency, calls are never rejected when None.
+        :param retry_budget: The budget the retries are drawn from, retries are not capped when None.
+        :param max_attempts: The number of attempts of a call, the first one included.
+        :param initial_wait_seconds: The base of the jittered exponential wait between attempts.
+        :param max_wait_seconds: The longest wait between attempts, unless the dependency asks for more.
+        """
+        self.name = name
+        self.is_failure = is_failure
+        self.is_retryable = is_retryable or (
+            lambda error: is_failure(error) or is_rate_limit_error(error)
+        )
+        self.circuit_breaker = circuit_breaker
+        self.retry_budget = retry_budget
+        self.max_attempts = max_attempts
+        self._wait_exponential = tenacity.wait_random_exponential(
+            multiplier=initial_wait_seconds, max=max_wait_seconds
+        )
+        self._outcomes = {"success": 0, "failure": 0, "rejected": 0}
+        self._retries = 0
+        self._denied_retries = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def attempt(self):
+        """
+        Runs one attempt of a call through the circuit breaker.
+
+        Raises:
+            CircuitOpenError: When the circuit breaker rejects the attempt.
+        """
+        try:
+            probe = self.circuit_breaker.allow() if self.circuit_breaker else False
+        except CircuitOpenError:
+            self._count("rejected")
+            raise
+
+        try:
+            yield
+        except ReviewCancelledError:
+            # Says nothing about the dependency
+            if probe:
+                self.circuit_breaker.release_probe()
+            raise
+        except Exception as e:
+            failed = self.is_failure(e)
+            self._count("failure" if failed else "success")
+            if self.circuit_breaker:
+                if failed:
+                    self.circuit_breaker.record_failure(probe)
+                else:
+                    self.circuit_breaker.record_success(probe)
+            raise
+        self._count("success")
+        if self.circuit_breaker:
+            self.circuit_breaker.record_success(probe)
+
+    def retrying(
+        self,
+        max_attempts: Optional[int] = None,
+        is_retryable: Optional[Callable[[BaseException], bool]] = None,
+        wait=None,
+        before_sleep=None,
+    ) -> tenacity.Retrying:
+        """
+        Creates the tenacity retrying of a single call, its retries are drawn from the retry budget.
+
+        Args:
+            max_attempts (int, optional): The number of attempts, `max_attempts` of the guard when None.
+            is_retryable (Callable, optional): Whether an error is retried, `is_retryable` of the guard when None.
+            wait (optional): A tenacity wait, the `retry-after` of the error or a jittered exponential wait when None.
+            before_sleep (Callable, optional): Called with the tenacity retry state before every retry.
+        """
+        if self.retry_budget:
+            self.retry_budget.record_call()
+        max_attempts = max_attempts or self.max_attempts
+        is_retryable = is_retryable or self.is_retryable
+
+        def should_retry(retry_state: tenacity.RetryCallState) -> bool:
+            error = retry_state.outcome.exception()
+            if (
+                error is None
+                or isinstance(error, (CircuitOpenError, ReviewCancelledError))
+                or retry_state.attempt_number >= max_attempts
+                or not is_retryable(error)
+            ):
+                return False
+            if self.retry_budget and not self.retry_budget.try_spend():
+                with self._lock:
+                    self._denied_retries += 1
+                return False
+            with self._lock:
+                self._retries += 1
+            return True
+
+        return tenacity.Retrying(
+            retry=should_retry,
+            wait=wait if wait is not None else self._wait,
+            before_sleep=before_sleep,
+            reraise=True,
+        )
+
+    def call(self, request: Callable[[], T], retry: bool = True) -> T:
+        """
+        Calls the dependency, retrying failed calls.
+
+        Args:
+            request (Callable): Sends the request.
+            retry (bool): Whether the call is retried, not for requests that are unsafe to repeat.
+        """
+        for attempt in self.retrying(max_attempts=None if retry else 1):
+            with attempt, self.attempt():
+                return request()
+
+    def _wait(self, retry_state: tenacity.RetryCallState) -> float:
+        retry_after = retry_after_seconds(retry_state.outcome.exception())
+        if retry_after is not None:
+            return retry_after
+        return self._wait_exponential(retry_state)
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self._outcomes[outcome] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                "outcomes": dict(self._outcomes),
+                "retries": self._retries,
+                "denied_retries": self._denied_retries,
+            }
+        if self.circuit_breaker:
+            stats.update(self.circuit_breaker.stats())
+        return stats
+
+    def to_prometheus(self) -> str:
+        """Renders the calls, retries and circuit state in the Prometheus text exposition format."""
+        stats = self.stats()
+        prefix = f"reviewpal_{self.name}"
+        lines = [
+            f"# HELP {prefix}_calls_total Attempts of {self.name} calls, by outcome.",
+            f"# TYPE {prefix}_calls_total counter",
+        ]
+        for outcome, count in stats["outcomes"].items():
+            lines.append(f'{prefix}_calls_total{{outcome="{outcome}"}} {count}')
+        lines += [
+            f"# HELP {prefix}_retries_total Retries of failed {self.name} calls.",
+            f"# TYPE {prefix}_retries_total counter",
+            f"{prefix}_retries_total {stats['retries']}",
+            f"# HELP {prefix}_denied_retries_total Retries given up because the retry budget was spent.",
+            f"# TYPE {prefix}_denied_retries_total counter",
+            f"{prefix}_denied_retries_total {stats['denied_retries']}",
+        ]
+        if self.circuit_breaker:
+            circuit_open = {"closed": 0, "half_open": 0.5, "open": 1}[stats["state"]]
+            lines += [
+                f"# HELP {prefix}_circuit_open Whether the {self.name} circuit is open, 0.5 when half-open.",
+                f"# TYPE {prefix}_circuit_open gauge",
+                f"{prefix}_circuit_open {circuit_open}",
+                f"# HELP {prefix}_circuit_opened_total Times the {self.name} circuit opened.",
+                f"# TYPE {prefix}_circuit_opened_total counter",
+                f"{prefix}_circuit_opened_total {stats['times_opened']}",
+            ]
+        return "\n".join(lines) + "\n"
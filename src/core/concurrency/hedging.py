@@ -0,0 +1,166 @@
+import collections
+import random
+import threading
+from typing import Callable, Optional
+
+
+def percentile(values: list[float], share: float) -> float:
+    """Returns the value below which the given share of the values fall, 0 when there is none."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(share * len(ordered)), len(ordered) - 1)]
+
+
+class HedgingPolicy:
+    """
+    Decides when an llm call is hedged: once a call has taken longer than the `percentile` of the
+    latency of recent calls, a duplicate request is sent and the first valid response wins.
+
+    A `control_share` of the calls is never hedged, so that the latency of hedged and unhedged
+    calls can be compared to tell whether the hedges are worth their extra requests.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        min_samples: int = 20,
+        window: int = 500,
+        min_delay_seconds: float = 0.5,
+        control_share: float = 0.05,
+        random_source: Callable[[], float] = random.random,
+    ):
+        """
+        :param percentile: The share of the calls expected to complete before a hedge is sent, 0.95 hedges about 5%.
+        :param min_samples: The number of calls observed before any call is hedged.
+        :param window: The number of recent calls the latency percentile is computed on.
+        :param min_delay_seconds: Calls are never hedged sooner than this.
+        :param control_share: The share of the calls never hedged, to measure the latency without hedging.
+        :param random_source: Returns a random number in [0, 1), to pick the control calls.
+        """
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay_seconds = min_delay_seconds
+        self.control_share = control_share
+        self.random_source = random_source
+        self._latencies: collections.deque[float] = collections.deque(maxlen=window)
+        self._hedgeable_latencies: collections.deque[float] = collections.deque(
+            maxlen=window
+        )
+        self._control_latencies: collections.deque[float] = collections.deque(
+            maxlen=window
+        )
+        self._calls = 0
+        self._hedged_calls = 0
+        self._hedge_wins = 0
+        self._lock = threading.Lock()
+
+    def plan(self) -> tuple[Optional[float], bool]:
+        """
+        Plans the hedging of a new call.
+
+        Returns:
+            tuple[Optional[float], bool]: The delay after which the call is hedged, None to never
+                hedge it, and whether the call belongs to the control group.
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None, False
+            if self.random_source() < self.control_share:
+                return None, True
+            return (
+                max(
+                    percentile(list(self._latencies), self.percentile),
+                    self.min_delay_seconds,
+                ),
+                False,
+            )
+
+    def record(
+        self,
+        latency: float,
+        delay: Optional[float],
+        control: bool,
+        hedged: bool,
+        hedge_won: bool,
+    ):
+        """
+        Records the outcome of a call planned by `plan`.
+
+        Args:
+            latency (float): The time until the winning response.
+            delay (Optional[float]): The planned hedge delay.
+            control (bool): Whether the call belongs to the control group.
+            hedged (bool): Whether a hedge was sent.
+            hedge_won (bool): Whether the hedge responded first.
+        """
+        with self._lock:
+            self._calls += 1
+            self._hedged_calls += 1 if hedged else 0
+            self._hedge_wins += 1 if hedge_won else 0
+            self._latencies.append(latency)
+            if control:
+                self._control_latencies.append(latency)
+            elif delay is not None:
+                self._hedgeable_latencies.append(latency)
+
+    def stats(self) -> dict:
+        """
+        Returns the hedge rate and the latency percentiles of the hedgeable and control calls.
+        `p99_improvement_seconds` is how much sooner the slowest 1% of the hedgeable calls completed.
+        """
+        with self._lock:
+            hedgeable_latencies = list(self._hedgeable_latencies)
+            control_latencies = list(self._control_latencies)
+            stats = {
+                "calls": self._calls,
+                "hedged_calls": self._hedged_calls,
+                "hedge_wins": self._hedge_wins,
+                "hedge_rate": self._hedged_calls / self._calls if self._calls else 0.0,
+            }
+
+        for group, latencies in [
+            ("hedgeable", hedgeable_latencies),
+            ("control", control_latencies),
+        ]:
+            for quantile in [0.5, 0.95, 0.99]:
+                stats[f"{group}_p{round(quantile * 100)}_seconds"] = percentile(
+                    latencies, quantile
+                )
+        stats["p99_improvement_seconds"] = (
+            stats["control_p99_seconds"] - stats["hedgeable_p99_seconds"]
+            if hedgeable_latencies and control_latencies
+            else 0.0
+        )
+        return stats
+
+    def to_prometheus(self) -> str:
+        """Renders the hedging statistics in the Prometheus text exposition format."""
+        stats = self.stats()
+        lines = [
+            "# HELP reviewpal_llm_calls_hedged_total Llm calls for which a hedge request was sent.",
+            "# TYPE reviewpal_llm_calls_hedged_total counter",
+            f"reviewpal_llm_calls_hedged_total {stats['hedged_calls']}",
+            "# HELP reviewpal_llm_hedge_wins_total Hedge requests that responded first.",
+            "# TYPE reviewpal_llm_hedge_wins_total counter",
+            f"reviewpal_llm_hedge_wins_total {stats['hedge_wins']}",
+            "# HELP reviewpal_llm_hedge_rate Share of the llm calls that were hedged.",
+            "# TYPE reviewpal_llm_hedge_rate gauge",
+            f"reviewpal_llm_hedge_rate {stats['hedge_rate']}",
+            "# HELP reviewpal_llm_hedging_latency_seconds Latency of hedgeable and never hedged llm calls.",
+            "# TYPE reviewpal_llm_hedging_latency_seconds gauge",
+        ]
+        for group in ["hedgeable", "control"]:
+            for quantile in ["50", "95", "99"]:
+                lines.append(
+                    f'reviewpal_llm_hedging_latency_seconds{{group="{group}",quantile="0.{quantile}"}} '
+                    f"{stats[f'{group}_p{quantile}_seconds']}"
+                )
+        lines.append(
+            "# HELP reviewpal_llm_hedging_p99_improvement_seconds How much sooner the slowest 1% of hedgeable calls complete."
+        )
+        lines.append("# TYPE reviewpal_llm_hedging_p99_improvement_seconds gauge")
+        lines.append(
+            f"reviewpal_llm_hedging_p99_improvement_seconds {stats['p99_improvement_seconds']}"
+        )
+        return "\n".join(lines) + "\n"
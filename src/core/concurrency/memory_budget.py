@@ -0,0 +1,90 @@
+import threading
+
+
+class MemoryBudget:
+    """
+    Caps the bytes of pull request files held by the reviews in flight. A review fetching files one
+    at a time reserves the estimated size of every file before fetching it, and waits while the files
+    already in flight, of any review sharing the budget, take the whole cap. Once fetched, the reservation
+    is resized to the actual size of the file.
+
+    A file larger than its estimate goes over the cap until it is released. A file larger than the cap
+    is reviewed alone.
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        :param max_bytes: The maximum bytes of files in flight.
+        """
+        self.max_bytes = max_bytes
+        self._used_bytes = 0
+        self._peak_bytes = 0
+        self._waits = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, size: int) -> int:
+        """
+        Reserves the size of a file, waiting until the cap allows it.
+
+        Returns:
+            int: The reserved bytes, to release once the file is reviewed.
+        """
+        reserved = min(size, self.max_bytes)
+        with self._condition:
+            if self._used_bytes and self._used_bytes + reserved > self.max_bytes:
+                self._waits += 1
+                self._condition.wait_for(
+                    lambda: not self._used_bytes
+                    or self._used_bytes + reserved <= self.max_bytes
+                )
+            self._used_bytes += reserved
+            self._peak_bytes = max(self._peak_bytes, self._used_bytes)
+        return reserved
+
+    def resize(self, reserved: int, size: int) -> int:
+        """
+        Resizes a reservation to the actual size of its file, without waiting since the file is already held.
+
+        Returns:
+            int: The bytes now reserved.
+        """
+        resized = min(size, self.max_bytes)
+        with self._condition:
+            self._used_bytes += resized - reserved
+            self._peak_bytes = max(self._peak_bytes, self._used_bytes)
+            if resized < reserved:
+                self._condition.notify_all()
+        return resized
+
+    def release(self, reserved: int):
+        with self._condition:
+            self._used_bytes -= reserved
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "max_bytes": self.max_bytes,
+                "used_bytes": self._used_bytes,
+                "peak_bytes": self._peak_bytes,
+                "waits": self._waits,
+            }
+
+    def to_prometheus(self) -> str:
+        """Renders the memory budget in the Prometheus text exposition format."""
+        stats = self.stats()
+        lines = [
+            "# HELP reviewpal_memory_budget_bytes Maximum bytes of pull request files in flight.",
+            "# TYPE reviewpal_memory_budget_bytes gauge",
+            f"reviewpal_memory_budget_bytes {stats['max_bytes']}",
+            "# HELP reviewpal_memory_budget_used_bytes Bytes of pull request files in flight.",
+            "# TYPE reviewpal_memory_budget_used_bytes gauge",
+            f"reviewpal_memory_budget_used_bytes {stats['used_bytes']}",
+            "# HELP reviewpal_memory_budget_peak_bytes Most bytes of pull request files in flight at once.",
+            "# TYPE reviewpal_memory_budget_peak_bytes gauge",
+            f"reviewpal_memory_budget_peak_bytes {stats['peak_bytes']}",
+            "# HELP reviewpal_memory_budget_waits_total Files whose review waited for the memory budget.",
+            "# TYPE reviewpal_memory_budget_waits_total counter",
+            f"reviewpal_memory_budget_waits_total {stats['waits']}",
+        ]
+        return "\n".join(lines) + "\n"
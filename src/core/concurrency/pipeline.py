@@ -0,0 +1,138 @@
+import contextvars
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Iterable, Optional
+
+# Tells a worker of a stage that no item is left
+_stop = object()
+
+
+class PipelineStage:
+    """
+    A step of a pipeline, running its function on the items of a bounded queue with its own worker threads.
+    The result of the function goes to the next stage, unless it is None. Putting an item in a full queue
+    blocks, so a slow stage holds back the stages feeding it instead of letting its queue grow.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        function: Callable[[Any], Any],
+        workers: int = 1,
+        queue_size: Optional[int] = None,
+        discard: Optional[Callable[[Any], None]] = None,
+    ):
+        """
+        :param name: The name of the stage, naming its threads.
+        :param function: Processes an item, returning the item of the next stage or None.
+        :param workers: The number of items processed concurrently.
+        :param queue_size: The number of items waiting for a worker, twice the workers when None.
+        :param discard: Releases what an item holds when it is dropped because the pipeline failed.
+        """
+        self.name = name
+        self.function = function
+        self.workers = max(workers, 1)
+        self.discard = discard
+        self.next_stage: Optional["PipelineStage"] = None
+        self._queue = queue.Queue(maxsize=queue_size or 2 * self.workers)
+        self._threads: list[threading.Thread] = []
+        self._failed = threading.Event()
+        self._on_error: Callable[[BaseException], None] = lambda error: None
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"{self.name}-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def put(self, item) -> Future:
+        """
+        Queues an item, processed in a copy of the current context so that its stages stay observed.
+
+        Returns:
+            Future: The result of the function on the item, cancelled when the item is dropped.
+        """
+        future = Future()
+        self._queue.put((item, future, contextvars.copy_context()))
+        return future
+
+    def close(self):
+        """Waits for the queued items to be processed and stops the workers."""
+        for _ in self._threads:
+            self._queue.put(_stop)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _work(self):
+        while True:
+            entry = self._queue.get()
+            if entry is _stop:
+                return
+            item, future, context = entry
+            if self._failed.is_set():
+                # Items are drained without being processed, so that no stage stays blocked on a full queue
+                future.cancel()
+                if self.discard is not None:
+                    self.discard(item)
+                continue
+            try:
+                result = context.run(self.function, item)
+            except BaseException as e:
+                future.set_exception(e)
+                self._on_error(e)
+                continue
+            future.set_result(result)
+            if result is not None and self.next_stage is not None:
+                self.next_stage.put(result)
+
+
+class Pipeline:
+    """
+    Chains stages through bounded queues, so that every stage works on the next items while the following
+    stages work on the previous ones. The first error of any stage stops the pipeline: the items left are
+    dropped and the error is raised by `run`.
+    """
+
+    def __init__(self, stages: list[PipelineStage]):
+        self.stages = stages
+        self._failed = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.next_stage = next_stage
+        for stage in stages:
+            stage._failed = self._failed
+            stage._on_error = self._fail
+
+    def _fail(self, error: BaseException):
+        with self._lock:
+            if self._error is None:
+                self._error = error
+        self._failed.set()
+
+    def run(self, items: Iterable):
+        """
+        Feeds the items to the first stage and waits until every stage is done with them.
+
+        Raises:
+            BaseException: The first error of a stage, or of the items.
+        """
+        for stage in self.stages:
+            stage.start()
+        try:
+            for item in items:
+                if self._failed.is_set():
+                    break
+                self.stages[0].put(item)
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            # A stage only stops once the stages before it stopped feeding it
+            for stage in self.stages:
+                stage.close()
+        if self._error is not None:
+            raise self._error
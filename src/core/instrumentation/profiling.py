@@ -0,0 +1,241 @@
+import cProfile
+import os
+import pstats
+import threading
+import tracemalloc
+
+from core.instrumentation.stages import StageObserver, StageRun
+
+# Frames of the profiling machinery itself are left out of the allocation statistics
+ignored_allocation_files = [
+    tracemalloc.__file__,
+    __file__,
+    "<frozen importlib._bootstrap>",
+]
+
+
+class _ActiveStage:
+    def __init__(self, profile: cProfile.Profile, traced_memory_at_start: int):
+        self.profile = profile
+        self.traced_memory_at_start = traced_memory_at_start
+        self.peak_traced_memory = traced_memory_at_start
+        self.enabled = False
+        self.profiled = False
+        self.missed = False
+
+
+class StageProfiler(StageObserver):
+    """
+    Profiles every pipeline stage with cProfile and tracks its peak memory with tracemalloc.
+
+    A stage's profile only covers its own code: nested stages get their own profile.
+    tracemalloc is process-wide, so peak memory is only exact when stages do not run concurrently.
+
+    Before Python 3.12 cProfile observes the thread a stage runs in, and stages of concurrent threads
+    are profiled side by side. From Python 3.12 a single cProfile can be active per process and it
+    observes every thread: while a stage of one thread is profiled, the stages starting in other threads,
+    or while another profiling tool runs, are timed but not profiled, and the summary counts them.
+    """
+
+    def __init__(self, top: int = 15):
+        """
+        :param top: The number of hot functions and allocators listed per stage in the summary.
+        """
+        self.top = top
+        self._profiles: dict[str, list[cProfile.Profile]] = {}
+        self._calls: dict[str, int] = {}
+        self._unprofiled_calls: dict[str, int] = {}
+        self.peak_memory: dict[str, int] = {}
+        self._allocators: dict[str, list[tracemalloc.Statistic]] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._started_tracemalloc = False
+
+    def start(self):
+        """Starts tracing memory allocations."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        return self
+
+    def stop(self):
+        """Stops tracing memory allocations if this profiler started it."""
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def on_stage_start(self, stage_run: StageRun) -> None:
+        stack = self._stack()
+        current_memory, peak_memory = (
+            tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        )
+        if stack:
+            # Pause the enclosing stage and remember its peak before resetting it
+            self._disable(stack[-1])
+            stack[-1].peak_traced_memory = max(
+                stack[-1].peak_traced_memory, peak_memory
+            )
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+        active_stage = _ActiveStage(cProfile.Profile(), current_memory)
+        stack.append(active_stage)
+        self._enable(active_stage)
+
+    def on_stage_end(self, stage_run: StageRun) -> None:
+        stack = self._stack()
+        if not stack:
+            return
+
+        active_stage = stack.pop()
+        self._disable(active_stage)
+        peak_memory = 0
+        if tracemalloc.is_tracing():
+            stage_peak = max(
+                active_stage.peak_traced_memory, tracemalloc.get_traced_memory()[1]
+            )
+            peak_memory = stage_peak - active_stage.traced_memory_at_start
+            if stack:
+                stack[-1].peak_traced_memory = max(
+                    stack[-1].peak_traced_memory, stage_peak
+                )
+
+        with self._lock:
+            if active_stage.profiled:
+                self._profiles.setdefault(stage_run.name, []).append(
+                    active_stage.profile
+                )
+            if active_stage.missed:
+                self._unprofiled_calls[stage_run.name] = (
+                    self._unprofiled_calls.get(stage_run.name, 0) + 1
+                )
+            self._calls[stage_run.name] = self._calls.get(stage_run.name, 0) + 1
+            is_new_peak = peak_memory > self.peak_memory.get(stage_run.name, -1)
+            if is_new_peak:
+                self.peak_memory[stage_run.name] = peak_memory
+
+        if is_new_peak and tracemalloc.is_tracing():
+            self._allocators[stage_run.name] = self._largest_allocators()
+
+        if stack:
+            self._enable(stack[-1])
+
+    def write(self, profile_directory: str) -> str:
+        """
+        Writes a pstats file per stage, one for all the stages, and a text summary.
+
+        Args:
+            profile_directory (str): The directory to write to, created if needed.
+
+        Returns:
+            str: The path of the summary.
+        """
+        os.makedirs(profile_directory, exist_ok=True)
+        summary_lines = []
+        all_stats = None
+
+        with self._lock:
+            stage_names = sorted(
+                self._profiles, key=lambda name: -self._total_time(name)
+            )
+            for stage_name in stage_names:
+                stats = pstats.Stats(*self._profiles[stage_name])
+                stats.dump_stats(os.path.join(profile_directory, f"{stage_name}.prof"))
+                if all_stats is None:
+                    all_stats = pstats.Stats(*self._profiles[stage_name])
+                else:
+                    all_stats.add(*self._profiles[stage_name])
+
+                summary_lines += self._summarize(stage_name, stats)
+
+            for stage_name in sorted(set(self._calls) - set(self._profiles)):
+                summary_lines += [
+                    f"=== {stage_name}: {self._calls[stage_name]} calls, not profiled, "
+                    "another stage or profiling tool held the profiler",
+                    "",
+                ]
+
+        if all_stats is not None:
+            all_stats.dump_stats(os.path.join(profile_directory, "all_stages.prof"))
+
+        summary_path = os.path.join(profile_directory, "summary.txt")
+        with open(summary_path, "w", encoding="utf-8") as summary_file:
+            summary_file.write("\n".join(summary_lines) + "\n")
+
+        return summary_path
+
+    def _enable(self, active_stage: _ActiveStage):
+        try:
+            active_stage.profile.enable()
+        except ValueError:
+            # Python 3.12+: another stage or profiling tool holds the process-wide profiler
+            active_stage.missed = True
+            return
+        active_stage.enabled = True
+        active_stage.profiled = True
+
+    def _disable(self, active_stage: _ActiveStage):
+        if active_stage.enabled:
+            active_stage.profile.disable()
+            active_stage.enabled = False
+
+    def _stack(self) -> list[_ActiveStage]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _total_time(self, stage_name: str) -> float:
+        return sum(
+            pstats.Stats(profile).total_tt for profile in self._profiles[stage_name]
+        )
+
+    def _largest_allocators(self) -> list[tracemalloc.Statistic]:
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [
+                tracemalloc.Filter(False, file_name)
+                for file_name in ignored_allocation_files
+            ]
+        )
+        return snapshot.statistics("lineno")[: self.top]
+
+    def _summarize(self, stage_name: str, stats: pstats.Stats) -> list[str]:
+        lines = [
+            f"=== {stage_name}: {self._calls[stage_name]} calls, "
+            f"{stats.total_tt:.3f}s profiled, "
+            f"peak memory {self.peak_memory.get(stage_name, 0) / 1024:.1f} KiB",
+        ]
+        unprofiled_calls = self._unprofiled_calls.get(stage_name, 0)
+        if unprofiled_calls:
+            lines.append(
+                f"{unprofiled_calls} calls not fully profiled, "
+                "another stage or profiling tool held the profiler"
+            )
+        lines.append(f"Top {self.top} hot functions (self time):")
+
+        hot_functions = sorted(
+            stats.stats.items(), key=lambda item: item[1][2], reverse=True
+        )[: self.top]
+        for (file_name, line, function_name), (
+            _,
+            calls,
+            self_time,
+            cumulative_time,
+            _,
+        ) in hot_functions:
+            lines.append(
+                f"  {self_time:9.4f}s self {cumulative_time:9.4f}s cumulative "
+                f"{calls:8d} calls  {function_name} ({file_name}:{line})"
+            )
+
+        allocators = self._allocators.get(stage_name, [])
+        if allocators:
+            lines.append("Largest live allocations when its highest-peak run ended:")
+            for statistic in allocators:
+                frame = statistic.traceback[0]
+                lines.append(
+                    f"  {statistic.size / 1024:10.1f} KiB {statistic.count:8d} blocks  "
+                    f"{frame.filename}:{frame.lineno}"
+                )
+
+        lines.append("")
+        return lines
@@ -0,0 +1,131 @@
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from core.instrumentation.stages import StageObserver, StageRun
+from core.models.run_report import RunReport
+from core.models.stage_metrics import StageMetrics
+
+# Stage attributes that are summed up into the stage metrics
+counted_attributes = [
+    "requests",
+    "input_tokens",
+    "output_tokens",
+    "cached_tokens",
+    "bytes",
+    "avoided_requests",
+    "avoided_input_tokens",
+]
+
+
+class RunMetrics(StageObserver):
+    """
+    Aggregates wall time, request counts, tokens and bytes of every pipeline stage of a run.
+    """
+
+    def __init__(self, pull_request: Optional[str] = None):
+        """
+        :param pull_request: The pull request the run reviews, used to label the report.
+        """
+        self.pull_request = pull_request
+        self.started_at = datetime.now(timezone.utc)
+        self._started_at = time.perf_counter()
+        self._stages: dict[str, StageMetrics] = {}
+        self._lock = threading.Lock()
+
+    def on_stage_end(self, stage_run: StageRun) -> None:
+        with self._lock:
+            metrics = self._stages.setdefault(stage_run.name, StageMetrics())
+            metrics.calls += 1
+            metrics.errors += 1 if stage_run.error else 0
+            metrics.wall_time_seconds += stage_run.duration
+            metrics.self_time_seconds += stage_run.self_duration
+            for attribute in counted_attributes:
+                value = getattr(metrics, attribute) + int(
+                    stage_run.attributes.get(attribute) or 0
+                )
+                setattr(metrics, attribute, value)
+
+    def report(self) -> RunReport:
+        """Returns a snapshot of the metrics gathered so far."""
+        with self._lock:
+            stages = {
+                name: metrics.model_copy() for name, metrics in self._stages.items()
+            }
+
+        return RunReport(
+            pull_request=self.pull_request,
+            started_at=self.started_at,
+            wall_time_seconds=time.perf_counter() - self._started_at,
+            stages=stages,
+        )
+
+    def write_report(self, report_path: str) -> RunReport:
+        """Writes a JSON run report to the given path and returns it."""
+        report = self.report()
+        with open(report_path, "w", encoding="utf-8") as report_file:
+            report_file.write(report.model_dump_json(indent=2))
+        return report
+
+    def to_prometheus(self) -> str:
+        """Renders the metrics in the Prometheus text exposition format."""
+        report = self.report()
+        metric_families = [
+            ("stage_calls_total", "Number of stage executions.", "calls"),
+            ("stage_errors_total", "Number of failed stage executions.", "errors"),
+            (
+                "stage_wall_time_seconds_total",
+                "Wall time spent in the stage, nested stages included.",
+                "wall_time_seconds",
+            ),
+            (
+                "stage_self_time_seconds_total",
+                "Wall time spent in the stage itself.",
+                "self_time_seconds",
+            ),
+            (
+                "stage_requests_total",
+                "Remote requests issued by the stage.",
+                "requests",
+            ),
+            ("stage_bytes_total", "Bytes handled by the stage.", "bytes"),
+            (
+                "stage_avoided_requests_total",
+                "Llm calls made unnecessary by the stage.",
+                "avoided_requests",
+            ),
+            (
+                "stage_avoided_input_tokens_total",
+                "Estimated llm prompt tokens of the calls made unnecessary by the stage.",
+                "avoided_input_tokens",
+            ),
+        ]
+
+        lines = []
+        for metric_name, description, field in metric_families:
+            lines.append(f"# HELP reviewpal_{metric_name} {description}")
+            lines.append(f"# TYPE reviewpal_{metric_name} counter")
+            for stage_name, metrics in sorted(report.stages.items()):
+                lines.append(
+                    f'reviewpal_{metric_name}{{stage="{stage_name}"}} {getattr(metrics, field)}'
+                )
+
+        lines.append(
+            "# HELP reviewpal_stage_tokens_total Llm tokens consumed by the stage."
+        )
+        lines.append("# TYPE reviewpal_stage_tokens_total counter")
+        for stage_name, metrics in sorted(report.stages.items()):
+            for kind in ["input", "output", "cached"]:
+                lines.append(
+                    f'reviewpal_stage_tokens_total{{stage="{stage_name}",kind="{kind}"}} '
+                    f"{getattr(metrics, f'{kind}_tokens')}"
+                )
+
+        lines.append(
+            "# HELP reviewpal_run_wall_time_seconds Wall time of the run so far."
+        )
+        lines.append("# TYPE reviewpal_run_wall_time_seconds gauge")
+        lines.append(f"reviewpal_run_wall_time_seconds {report.wall_time_seconds}")
+
+        return "\n".join(lines) + "\n"
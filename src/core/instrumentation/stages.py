@@ -0,0 +1,130 @@
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+
+# itertools.count is thread-safe in CPython, which makes it a cheap source of unique span ids
+_span_ids = itertools.count(1)
+
+# Start times derive from the monotonic clock so that nested spans never overlap their parents
+_wall_clock_origin = time.time() - time.perf_counter()
+
+
+class StageRun:
+    """
+    This class represents one execution of a pipeline stage.
+
+      Attributes:
+          name             The stage name, for example "llm_call".
+          attributes       Free-form attributes of the execution (file path, requests, tokens, bytes...).
+          parent           The stage this one is nested in, if any.
+          start_time       The wall clock time (epoch seconds) at which the stage started.
+          duration         The wall time spent in the stage, children included.
+          children_duration The wall time spent in nested stages, which may end concurrently in worker threads.
+          error            The name of the exception that escaped the stage, if any.
+          thread_id        The identifier of the thread running the stage.
+          span_id          A process-unique identifier of this execution.
+    """
+
+    def __init__(self, name: str, attributes: dict, parent: Optional["StageRun"]):
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self._started_at = time.perf_counter()
+        self.start_time = _wall_clock_origin + self._started_at
+        self.duration = 0.0
+        self.children_duration = 0.0
+        self.error: Optional[str] = None
+        self.thread_id = threading.get_ident()
+        self.span_id = next(_span_ids)
+        self._children_lock = threading.Lock()
+
+    @property
+    def self_duration(self) -> float:
+        """The wall time spent in the stage itself, nested stages excluded."""
+        return max(self.duration - self.children_duration, 0.0)
+
+    def _end(self):
+        self.duration = time.perf_counter() - self._started_at
+        if self.parent is not None:
+            # The read-modify-write would lose the durations of children ending together in other threads
+            with self.parent._children_lock:
+                self.parent.children_duration += self.duration
+
+
+class StageObserver:
+    """
+    Base class of the objects notified whenever a pipeline stage starts or ends.
+    """
+
+    def on_stage_start(self, stage_run: StageRun) -> None:
+        pass
+
+    def on_stage_end(self, stage_run: StageRun) -> None:
+        pass
+
+
+# Observers are held in context variables so that concurrent runs can be observed separately.
+# Threads do not inherit them: submit work with `contextvars.copy_context().run` to keep observing.
+_active_observers: ContextVar[tuple[StageObserver, ...]] = ContextVar(
+    "active_stage_observers", default=()
+)
+_current_stage: ContextVar[Optional[StageRun]] = ContextVar(
+    "current_stage", default=None
+)
+
+
+@contextmanager
+def observe_stages(*observers: StageObserver) -> Iterator[None]:
+    """
+    Notifies the given observers of every stage run within this context.
+
+    Args:
+        *observers (StageObserver): The observers to notify.
+    """
+    token = _active_observers.set(_active_observers.get() + observers)
+    try:
+        yield
+    finally:
+        _active_observers.reset(token)
+
+
+@contextmanager
+def stage(name: str, **attributes) -> Iterator[dict]:
+    """
+    Marks a block of code as a pipeline stage.
+
+    The yielded dict holds the stage attributes, it can be updated from within the block
+    to record values only known once the work is done, like the number of bytes fetched.
+    Stages are free when no observer is active.
+
+    Args:
+        name (str): The stage name.
+        **attributes: The initial stage attributes.
+
+    Yields:
+        dict: The stage attributes.
+    """
+    observers = _active_observers.get()
+    if not observers:
+        yield attributes
+        return
+
+    stage_run = StageRun(name=name, attributes=attributes, parent=_current_stage.get())
+    token = _current_stage.set(stage_run)
+    for observer in observers:
+        observer.on_stage_start(stage_run)
+
+    try:
+        yield stage_run.attributes
+    except BaseException as e:
+        stage_run.error = type(e).__name__
+        raise
+    finally:
+        stage_run._end()
+        _current_stage.reset(token)
+        for observer in reversed(observers):
+            observer.on_stage_end(stage_run)
@@ -0,0 +1,70 @@
+import json
+import os
+import threading
+
+from core.instrumentation.stages import StageObserver, StageRun
+
+
+class Tracer(StageObserver):
+    """
+    Records every pipeline stage as a span and exports them in the Chrome Trace Event format,
+    which Perfetto (https://ui.perfetto.dev), chrome://tracing and speedscope can load.
+
+    Spans carry their stage attributes (file path, chunk index, tokens...) along with their
+    span id and the span id of their parent.
+    """
+
+    def __init__(self):
+        self.spans: list[dict] = []
+        self._lock = threading.Lock()
+
+    def on_stage_end(self, stage_run: StageRun) -> None:
+        span = {
+            "name": stage_run.name,
+            "span_id": stage_run.span_id,
+            "parent_id": stage_run.parent.span_id if stage_run.parent else None,
+            "start_time": stage_run.start_time,
+            "duration": stage_run.duration,
+            "thread_id": stage_run.thread_id,
+            "error": stage_run.error,
+            "attributes": dict(stage_run.attributes),
+        }
+        with self._lock:
+            self.spans.append(span)
+
+    def to_chrome_trace(self) -> dict:
+        """Returns the recorded spans as a Chrome Trace Event format document."""
+        process_id = os.getpid()
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["start_time"])
+
+        trace_events = []
+        for span in spans:
+            args = {
+                key: value if isinstance(value, (str, int, float, bool)) else str(value)
+                for key, value in span["attributes"].items()
+            }
+            args["span_id"] = span["span_id"]
+            args["parent_id"] = span["parent_id"]
+            if span["error"]:
+                args["error"] = span["error"]
+
+            trace_events.append(
+                {
+                    "name": span["name"],
+                    "cat": "reviewpal",
+                    "ph": "X",
+                    "ts": span["start_time"] * 1_000_000,
+                    "dur": span["duration"] * 1_000_000,
+                    "pid": process_id,
+                    "tid": span["thread_id"],
+                    "args": args,
+                }
+            )
+
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, trace_path: str):
+        """Writes the recorded spans to a Chrome Trace Event format JSON file."""
+        with open(trace_path, "w", encoding="utf-8") as trace_file:
+            json.dump(self.to_chrome_trace(), trace_file)
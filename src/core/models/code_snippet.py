@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+
+
+class CodeSnippet(BaseModel):
+    """
+    This class represents a few consecutive lines of a repository file, the unit of the related-code search.
+
+      Attributes:
+          path        The file path.
+          start_line  The first line of the snippet, from 1.
+          end_line    The last line of the snippet.
+          text        The lines of the snippet.
+    """
+
+    path: str
+    start_line: int
+    end_line: int
+    text: str
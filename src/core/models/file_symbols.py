@@ -0,0 +1,35 @@
+from pydantic import BaseModel, Field
+
+
+class SymbolDefinition(BaseModel):
+    """
+    This class represents the definition of a function, class or module variable in a repository.
+
+      Attributes:
+          name       The name of the symbol, a method is named after itself, not after its class.
+          kind       "function", "class" or "variable".
+          path       The file defining the symbol.
+          line       The line of the definition.
+          signature  The header of the definition, like "def parse_changes(file_diff) -> tuple".
+    """
+
+    name: str
+    kind: str
+    path: str
+    line: int
+    signature: str
+
+
+class FileSymbols(BaseModel):
+    """
+    This class represents the symbols a file of a repository defines and uses.
+
+      Attributes:
+          path         The file path.
+          definitions  The symbols defined in the file.
+          usages       The lines every name is used on in the file.
+    """
+
+    path: str
+    definitions: list[SymbolDefinition] = Field(default_factory=list)
+    usages: dict[str, list[int]] = Field(default_factory=dict)
@@ -0,0 +1,30 @@
+from pydantic import BaseModel, Field
+from core.models.llm_comment import LlmComment
+
+
+class LlmAnalysis(BaseModel):
+    """
+    This class represents the analysis an llm performs before commenting on a chunk.
+
+      Attributes:
+          reasoning       A short explanation of the analysis.
+          needs_comments  Whether the chunk requires any comment.
+    """
+
+    reasoning: str = Field(
+        default="", description="A short explanation of the analysis."
+    )
+    needs_comments: bool = Field(description="Whether the chunk requires any comment.")
+
+
+class LlmReview(BaseModel):
+    """
+    This class represents the full JSON review an llm outputs for a pull request file chunk.
+
+      Attributes:
+          analysis  The analysis of the chunk.
+          comments  The comments to add, empty when no comment is needed.
+    """
+
+    analysis: LlmAnalysis
+    comments: list[LlmComment] = Field(default_factory=list)
@@ -0,0 +1,39 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class PullRequestReviewResult(BaseModel):
+    """
+    This class represents the outcome of reviewing a pull request.
+
+      Attributes:
+          url                The pull request URL.
+          status             "reviewed" when the review completed, "cancelled" when it was superseded
+                             by a newer commit, "deferred" when a circuit breaker rejected it, "failed" otherwise.
+          error              The reason of the failure, of the cancellation or of the deferral, if any.
+          wall_time_seconds  The time the review took.
+          files              The number of reviewed files.
+          llm_calls          The number of llm calls, triage calls included.
+          input_tokens       The number of llm prompt tokens, cached ones included.
+          output_tokens      The number of llm completion tokens.
+          cached_tokens      The number of llm prompt tokens served from the prompt cache.
+          comments           The number of comments posted.
+          avoided_llm_calls     The number of review calls the triage made unnecessary.
+          avoided_input_tokens  The estimated prompt tokens of those review calls.
+          retry_after_seconds   When to try a deferred review again.
+    """
+
+    url: str
+    status: str
+    error: Optional[str] = None
+    wall_time_seconds: float = 0.0
+    files: int = 0
+    llm_calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    comments: int = 0
+    avoided_llm_calls: int = 0
+    avoided_input_tokens: int = 0
+    retry_after_seconds: Optional[float] = None
@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class ReviewJob(BaseModel):
+    """
+    This class represents a request to review a pull request at a given head commit.
+
+      Attributes:
+          repo_owner   GitHub repository owner.
+          repo_name    GitHub repository name.
+          pr_number    Pull request number.
+          head_sha     The head commit of the pull request when the review was requested.
+          head_updated_at When the pull request was last updated, telling which of two head commits is newer.
+          delivery_id  The id of the webhook delivery that requested the review, if any.
+          enqueued_at  When the job was created.
+          job_id       The id of the job in a durable job store, if it was claimed from one.
+          attempts     The number of times the job was claimed from a durable job store.
+    """
+
+    repo_owner: str
+    repo_name: str
+    pr_number: int
+    head_sha: Optional[str] = None
+    head_updated_at: Optional[datetime] = None
+    delivery_id: Optional[str] = None
+    enqueued_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    job_id: Optional[int] = None
+    attempts: int = 0
+
+    @property
+    def url(self) -> str:
+        return f"https://github.com/{self.repo_owner}/{self.repo_name}/pull/{self.pr_number}"
@@ -0,0 +1,23 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+from core.models.stage_metrics import StageMetrics
+
+
+class RunReport(BaseModel):
+    """
+    This class represents the instrumentation report of a review run.
+
+      Attributes:
+          pull_request       The pull request the run reviewed.
+          started_at         When the run started.
+          wall_time_seconds  The total wall time of the run.
+          stages             The metrics of every pipeline stage, by stage name.
+    """
+
+    pull_request: Optional[str] = None
+    started_at: datetime
+    wall_time_seconds: float
+    stages: dict[str, StageMetrics]
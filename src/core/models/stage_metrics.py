@@ -0,0 +1,32 @@
+from pydantic import BaseModel
+
+
+class StageMetrics(BaseModel):
+    """
+    This class represents the aggregated metrics of a pipeline stage over a run.
+
+      Attributes:
+          calls              The number of times the stage ran.
+          errors             The number of times the stage raised.
+          wall_time_seconds  The total wall time spent in the stage, nested stages included.
+          self_time_seconds  The total wall time spent in the stage itself, nested stages excluded.
+          requests           The number of remote requests (GitHub API, llm) issued by the stage.
+          input_tokens       The number of llm prompt tokens, cached ones included.
+          output_tokens      The number of llm completion tokens.
+          cached_tokens      The number of llm prompt tokens served from the prompt cache.
+          bytes              The number of bytes fetched, rendered or posted by the stage.
+          avoided_requests      The number of llm calls the stage made unnecessary, like chunks triaged out.
+          avoided_input_tokens  The estimated llm prompt tokens of those avoided calls.
+    """
+
+    calls: int = 0
+    errors: int = 0
+    wall_time_seconds: float = 0.0
+    self_time_seconds: float = 0.0
+    requests: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    bytes: int = 0
+    avoided_requests: int = 0
+    avoided_input_tokens: int = 0
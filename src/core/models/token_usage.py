@@ -0,0 +1,59 @@
+import math
+
+from pydantic import BaseModel
+
+# Average characters per token of English text and code, to estimate tokens without a tokenizer
+characters_per_token = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the tokens of a text from its length, for budgets that cannot afford to encode it."""
+    return math.ceil(len(text) / characters_per_token)
+
+
+class TokenUsage(BaseModel):
+    """
+    This class represents the tokens consumed by llm calls.
+
+      Attributes:
+          calls          The number of llm calls.
+          input_tokens   The number of prompt tokens, cached ones included.
+          output_tokens  The number of completion tokens.
+          cached_tokens  The number of prompt tokens served from the provider's prompt cache.
+    """
+
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+
+    @property
+    def cache_hit_rate(self) -> float:
+        """The share of prompt tokens that were served from the prompt cache."""
+        return self.cached_tokens / self.input_tokens if self.input_tokens else 0.0
+
+    def add(
+        self, input_tokens: int = 0, output_tokens: int = 0, cached_tokens: int = 0
+    ):
+        """Records the usage of a single llm call."""
+        self.calls += 1
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.cached_tokens += cached_tokens
+
+    def add_openai_usage(self, usage: dict):
+        """Records the `usage` object of an OpenAI chat completion response."""
+        prompt_tokens_details = usage.get("prompt_tokens_details") or {}
+        self.add(
+            input_tokens=usage.get("prompt_tokens") or 0,
+            output_tokens=usage.get("completion_tokens") or 0,
+            cached_tokens=prompt_tokens_details.get("cached_tokens") or 0,
+        )
+
+    def summary(self) -> str:
+        """Returns a human readable summary of the usage."""
+        return (
+            f"{self.calls} llm calls, {self.input_tokens} input tokens "
+            f"({self.cached_tokens} cached, {self.cache_hit_rate:.0%}), "
+            f"{self.output_tokens} output tokens"
+        )
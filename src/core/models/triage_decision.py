@@ -0,0 +1,27 @@
+from pydantic import BaseModel, Field
+
+
+class TriageDecision(BaseModel):
+    """
+    This class represents the verdict of the triage model on a pull request file chunk.
+
+      Attributes:
+          id      The id of the chunk in the triage request.
+          score   How likely the chunk needs review comments, from 0 to 1.
+          reason  A short justification of the score.
+    """
+
+    id: int
+    score: float = Field(ge=0.0, le=1.0)
+    reason: str = ""
+
+
+class TriageDecisions(BaseModel):
+    """
+    This class represents the full JSON output of the triage model.
+
+      Attributes:
+          chunks  A decision for every chunk of the request.
+    """
+
+    chunks: list[TriageDecision] = Field(default_factory=list)
@@ -1,17 +1,25 @@
-from langchain.prompts import PromptTemplate
+from functools import lru_cache
+
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
 
 class ReviewPromptTemplate:
     @staticmethod
-    def get_template() -> PromptTemplate:
+    @lru_cache(maxsize=None)
+    def get_template() -> ChatPromptTemplate:
         """
-        Returns an instance of the LangChain PromptTemplate configured for reviewing pull requests.
-        The template now includes both analysis and review functionality in a single prompt.
+        Returns an instance of the LangChain ChatPromptTemplate configured for reviewing pull requests.
+        The template includes both analysis and review functionality in a single prompt.
+
+        The instructions are a system message without any variable so that they form a byte-stable
+        prefix shared by every request, which lets provider-side prompt caching hit consistently.
+        The file path and changes follow in a separate message, with an optional `context` attachment of
+        definitions and usages from the rest of the repository. The template is built once per process.
 
-        :return: A PromptTemplate instance with the specified template and variables.
+        :return: A ChatPromptTemplate instance with the specified messages and variables.
         """
         # fmt: off
-        template = (
+        instructions = (
             "You are a senior Python developer specializing in reviewing pull requests.\n"
             "Your task is to review code changes presented in the following format:\n"
             "    + line 1\n"
@@ -51,12 +59,20 @@ class ReviewPromptTemplate:
             "- Focus only on substantial issues like bugs, performance inefficiencies, or major code design flaws\n"
             "- Be constructive and specific\n"
             "- Consider code quality, performance, and maintainability\n"
-            "- Suggest specific improvements when possible\n\n"
+            "- Suggest specific improvements when possible\n"
+        )
+        file_chunk = (
             "Here is the pull request file chunk you need to review under this path:\n"
             "path: {file_path}\n\n"
             "{file_changes}\n"
-            "The output of the tool execution:\n"
-            "{agent_scratchpad}\n"
+            "{context}"
         )
+        # fmt: on
 
-        return PromptTemplate(input_variables=["file_changes", "agent_scratchpad"], template=template)
+        return ChatPromptTemplate.from_messages(
+            [
+                ("system", instructions),
+                ("human", file_chunk),
+                MessagesPlaceholder(variable_name="agent_scratchpad"),
+            ]
+        ).partial(context="")
@@ -0,0 +1,46 @@
+from functools import lru_cache
+
+from langchain_core.prompts import ChatPromptTemplate
+
+
+class TriagePromptTemplate:
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_template() -> ChatPromptTemplate:
+        """
+        Returns the ChatPromptTemplate asking a small model which of many pull request file chunks
+        deserve a full review. Like the review prompt, the instructions are a variable-free system
+        message so that they stay cacheable.
+
+        :return: A ChatPromptTemplate instance with a single `chunks` variable.
+        """
+        # fmt: off
+        instructions = (
+            "You are triaging pull request changes before a senior developer reviews them.\n"
+            "You receive several chunks, each wrapped in a <chunk id=\"...\" path=\"...\"> tag and presented in the following format:\n"
+            "    + line 1\n"
+            "    - line 2\n"
+            "    [....] (Unchanged code chunk)\n"
+            "The + character indicates an addition, the - character indicates a deletion, and [....] represents unchanged code.\n\n"
+            "For every chunk, estimate how likely a careful reviewer would leave a comment about a real problem: "
+            "a bug or edge case, a security concern, a major inefficiency or a significant design or readability issue.\n"
+            "Trivial changes like formatting, renames, comments, imports, version bumps or generated code score low.\n"
+            "Your output must be in the following JSON format, with one entry per chunk:\n"
+            "{{\n"
+            "    \"chunks\": [\n"
+            "        {{\n"
+            "            \"id\": <chunk id>,\n"
+            "            \"score\": <number from 0 to 1>,\n"
+            "            \"reason\": \"<a few words>\"\n"
+            "        }}\n"
+            "    ]\n"
+            "}}\n"
+        )
+        # fmt: on
+
+        return ChatPromptTemplate.from_messages(
+            [
+                ("system", instructions),
+                ("human", "{chunks}"),
+            ]
+        )
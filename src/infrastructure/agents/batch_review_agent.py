@@ -0,0 +1,213 @@
+import os
+import tempfile
+from typing import Optional
+
+from dotenv import load_dotenv
+from langchain_core.messages import convert_to_openai_messages
+
+from core.models.pull_request_file import PullRequestFile
+from core.models.token_usage import TokenUsage
+from core.prompt_templates.review_prompt_template import ReviewPromptTemplate
+from application.tools.add_comment_tool import AddCommentTool
+from application.use_cases.add_comment_to_pull_request import AddCommentUseCase
+from application.parsers.github_pull_request_parser import parse_pull_request
+from application.parsers.llm_text_pull_request_parser import parse_pull_request_to_text
+from application.parsers.llm_review_parser import parse_llm_review
+from application.text_splitters.pull_request_file_text_splitter import (
+    split_pull_request_file,
+)
+from infrastructure.repositories.github_repository import GitHubRepository
+from infrastructure.repositories.openai_batch_repository import OpenAIBatchRepository
+
+
+class BatchReviewAgent:
+    """
+    BatchReviewAgent reviews many pull requests through the OpenAI Batch API.
+
+    Every pull request is rendered and chunked up front, all the chunk reviews are
+    submitted as a single batch, and the comments are posted once the batch completes.
+    This trades latency for the lower cost and higher throughput of the Batch API.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        pull_requests: list[tuple[str, str, int]],
+        poll_interval_seconds: float = 30,
+        timeout_seconds: Optional[float] = None,
+        batch_input_path: Optional[str] = None,
+        github_client=None,
+    ):
+        """
+        :param client: An `openai.OpenAI` client or an object exposing the same batch endpoints.
+        :param model: The model reviewing the chunks.
+        :param pull_requests: The (repo owner, repo name, pull request number) of each pull request to review.
+        :param poll_interval_seconds: The delay between two polls of the batch status.
+        :param timeout_seconds: The maximum time to wait for the batch, unlimited when None.
+        :param batch_input_path: Where to write the JSONL batch, a temporary file when None.
+        :param github_client: A GitHub client shared by every pull request, one per pull request when None.
+        """
+        self.review_prompt = ReviewPromptTemplate.get_template()
+        self.model = model
+        self.pull_requests = pull_requests
+        self.poll_interval_seconds = poll_interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self.batch_input_path = batch_input_path
+        self.github_client = github_client
+
+        self.batch_repository = OpenAIBatchRepository(client=client)
+        self.add_comment_use_case = AddCommentUseCase()
+        self.token_usage = TokenUsage()
+        # The chunks whose comments could not all be posted by the last `post_results`
+        self.failed_reviews = 0
+
+        # Maps every request custom id to the pull request file it reviews
+        self._requested_files: dict[str, tuple[GitHubRepository, PullRequestFile]] = {}
+
+    def build_requests(self) -> list[dict]:
+        """
+        Renders and chunks every pull request file into chat completion requests.
+
+        Returns:
+            list[dict]: The requests, each with a `custom_id` and a `body`.
+        """
+        requests = []
+        self._requested_files = {}
+
+        for pr_index, (repo_owner, repo_name, pr_number) in enumerate(
+            self.pull_requests
+        ):
+            github_repository = GitHubRepository(
+                repo_owner=repo_owner,
+                repo_name=repo_name,
+                pr_number=pr_number,
+                github_client=self.github_client,
+            )
+            parsed_content = parse_pull_request(github_repository)
+
+            for file_index, pr_file in enumerate(parsed_content.files):
+                pull_request_file = parse_pull_request_to_text(pr_file)
+                chunks = split_pull_request_file(
+                    pull_request_file, file_path=pr_file.path
+                )
+
+                for chunk_index, chunk in enumerate(chunks):
+                    custom_id = f"{pr_index}-{file_index}-{chunk_index}"
+                    self._requested_files[custom_id] = (github_repository, pr_file)
+                    requests.append(
+                        {
+                            "custom_id": custom_id,
+                            "body": self._build_request_body(
+                                chunk.page_content, pr_file.path
+                            ),
+                        }
+                    )
+
+        return requests
+
+    def review_pull_requests(self) -> int:
+        """
+        Reviews all the pull requests through a single batch and posts the resulting comments.
+
+        Returns:
+            int: The number of chunks whose review was posted.
+        """
+        requests = self.build_requests()
+        if not requests:
+            return 0
+
+        batch_input_path = self.batch_input_path
+        if batch_input_path is None:
+            file_descriptor, batch_input_path = tempfile.mkstemp(suffix=".jsonl")
+            os.close(file_descriptor)
+
+        try:
+            self.batch_repository.write_requests(requests, batch_input_path)
+            batch_id = self.batch_repository.submit(
+                batch_input_path, metadata={"description": "ReviewPal batch review"}
+            )
+        finally:
+            if self.batch_input_path is None:
+                os.remove(batch_input_path)
+
+        batch = self.batch_repository.wait_for_completion(
+            batch_id,
+            poll_interval_seconds=self.poll_interval_seconds,
+            timeout_seconds=self.timeout_seconds,
+        )
+        results = self.batch_repository.get_results(batch, token_usage=self.token_usage)
+        print(f"Token usage: {self.token_usage.summary()}")
+
+        return self.post_results(results)
+
+    def post_results(self, results: dict[str, str]) -> int:
+        """
+        Maps the batch results back to their pull request files and posts their comments.
+        A chunk whose comments fail to post is counted in `failed_reviews`, and the next results are still posted.
+
+        Args:
+            results (dict[str, str]): The raw llm output of each request, by custom id.
+
+        Returns:
+            int: The number of chunks whose review was posted.
+        """
+        posted_reviews = 0
+        self.failed_reviews = 0
+
+        for custom_id, output in results.items():
+            if custom_id not in self._requested_files:
+                print(f"Ignoring unknown batch result: {custom_id}")
+                continue
+
+            try:
+                review = parse_llm_review(output)
+            except ValueError as e:
+                print(e)
+                continue
+
+            if review.comments:
+                github_repository, pr_file = self._requested_files[custom_id]
+                add_comment_tool = AddCommentTool(
+                    pull_request_file=pr_file,
+                    add_comment_to_file_use_case=self.add_comment_use_case,
+                    github_repository=github_repository,
+                )
+                try:
+                    outcome = add_comment_tool._run(comments_to_add=review.comments)
+                except Exception as e:
+                    print(f"Failed to post the review of batch result {custom_id}: {e}")
+                    self.failed_reviews += 1
+                    continue
+                if outcome == "comments not added. Error":
+                    # The tool already printed the comment whose line was not found
+                    self.failed_reviews += 1
+                    continue
+            posted_reviews += 1
+
+        return posted_reviews
+
+    def _build_request_body(self, file_changes: str, file_path: str) -> dict:
+        messages = self.review_prompt.format_messages(
+            file_changes=file_changes, file_path=file_path, agent_scratchpad=[]
+        )
+        return {
+            "model": self.model,
+            "temperature": 0,
+            "response_format": {"type": "json_object"},
+            "messages": convert_to_openai_messages(messages),
+        }
+
+
+if __name__ == "__main__":
+    from openai import OpenAI
+
+    load_dotenv()
+
+    agent = BatchReviewAgent(
+        client=OpenAI(),
+        model="gpt-4o-mini",
+        pull_requests=[("Maokli", "ReviewPal", 6), ("Maokli", "ReviewPal", 9)],
+    )
+
+    print(f"Reviewed {agent.review_pull_requests()} chunks")
@@ -0,0 +1,198 @@
+import contextvars
+import queue
+import threading
+import time
+from typing import Any, Iterator, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.runnables.config import ensure_config
+
+from core.concurrency.hedging import HedgingPolicy
+
+
+def add_callbacks(config: Optional[RunnableConfig], handlers: list) -> RunnableConfig:
+    """Returns a copy of the config with more callback handlers."""
+    config = ensure_config(config)
+    if not handlers:
+        return config
+
+    callbacks = config.get("callbacks")
+    if callbacks is None:
+        callbacks = list(handlers)
+    elif isinstance(callbacks, list):
+        callbacks = callbacks + list(handlers)
+    else:
+        # A callback manager, given by a parent run
+        callbacks = callbacks.copy()
+        for handler in handlers:
+            callbacks.add_handler(handler, inherit=True)
+    return {**config, "callbacks": callbacks}
+
+
+class HedgedLlm(Runnable):
+    """
+    Wraps a chat model to hedge its slow calls: when a call is still running after the delay its
+    HedgingPolicy plans, the same request is sent again, to the same model or another endpoint,
+    and the first valid response wins. The other attempt is cancelled by closing its stream.
+
+    `invoke`, which the tool-calling agent uses, races the attempts to their complete response.
+    `stream` races them to their first streamed message, then streams the winner.
+    """
+
+    def __init__(
+        self,
+        llm,
+        hedging_policy: HedgingPolicy,
+        hedge_llm=None,
+        llm_callbacks: Optional[list] = None,
+        hedge_callbacks: Optional[list] = None,
+    ):
+        """
+        :param llm: A LangChain-compatible chat model.
+        :param hedging_policy: Decides when a call is hedged and records the outcome.
+        :param hedge_llm: The chat model hedges are sent to, `llm` when None.
+        :param llm_callbacks: Callback handlers added to the calls of `llm` only.
+        :param hedge_callbacks: Callback handlers added to the calls of `hedge_llm` only.
+        """
+        self.llm = llm
+        self.hedging_policy = hedging_policy
+        self.hedge_llm = hedge_llm if hedge_llm is not None else llm
+        self.llm_callbacks = llm_callbacks or []
+        self.hedge_callbacks = hedge_callbacks or []
+
+    def bind_tools(self, tools, **kwargs) -> "HedgedLlm":
+        bound_llm = self.llm.bind_tools(tools, **kwargs)
+        return HedgedLlm(
+            bound_llm,
+            self.hedging_policy,
+            hedge_llm=(
+                bound_llm
+                if self.hedge_llm is self.llm
+                else self.hedge_llm.bind_tools(tools, **kwargs)
+            ),
+            llm_callbacks=self.llm_callbacks,
+            hedge_callbacks=self.hedge_callbacks,
+        )
+
+    def invoke(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ):
+        message = None
+        for chunk in self._race(input, config, until_complete=True, **kwargs):
+            message = chunk if message is None else message + chunk
+        return message
+
+    def stream(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Iterator:
+        return self._race(input, config, until_complete=False, **kwargs)
+
+    def transform(
+        self,
+        input: Iterator[Any],
+        config: Optional[RunnableConfig] = None,
+        **kwargs: Any,
+    ) -> Iterator:
+        # Runnable sequences stream through their steps, the whole input is needed anyway
+        final_input = None
+        for input_chunk in input:
+            final_input = (
+                input_chunk if final_input is None else final_input + input_chunk
+            )
+        yield self.invoke(final_input, config, **kwargs)
+
+    def _race(
+        self,
+        input: Any,
+        config: Optional[RunnableConfig],
+        until_complete: bool,
+        **kwargs: Any,
+    ) -> Iterator:
+        """
+        Runs the call, and its hedge once the planned delay has passed, in background threads.
+
+        Yields:
+            The messages streamed by the winning attempt, all at once when `until_complete` is set.
+        """
+        events: queue.Queue = queue.Queue()
+        cancelled_attempts: list[threading.Event] = []
+
+        def start_attempt(llm, callbacks: list):
+            index = len(cancelled_attempts)
+            cancelled = threading.Event()
+            cancelled_attempts.append(cancelled)
+            attempt_config = add_callbacks(config, callbacks)
+
+            def run():
+                try:
+                    stream = llm.stream(input, attempt_config, **kwargs)
+                    try:
+                        for chunk in stream:
+                            if cancelled.is_set():
+                                break
+                            events.put((index, "chunk", chunk))
+                    finally:
+                        # Aborts the generation of a cancelled attempt
+                        stream.close()
+                    events.put((index, "end", None))
+                except Exception as e:
+                    events.put((index, "error", e))
+
+            threading.Thread(
+                target=contextvars.copy_context().run, args=(run,), daemon=True
+            ).start()
+
+        delay, control = self.hedging_policy.plan()
+        started_at = time.monotonic()
+        start_attempt(self.llm, self.llm_callbacks)
+        hedged = False
+        winner: Optional[int] = None
+        failed: set[int] = set()
+        chunks: dict[int, list] = {0: [], 1: []}
+
+        try:
+            while True:
+                timeout = None
+                if not hedged and delay is not None and not failed:
+                    timeout = max(started_at + delay - time.monotonic(), 0.0)
+                try:
+                    index, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    hedged = True
+                    start_attempt(self.hedge_llm, self.hedge_callbacks)
+                    continue
+
+                if winner is not None and index != winner:
+                    continue
+
+                if kind == "error":
+                    failed.add(index)
+                    # The other attempt may still respond, errors never win
+                    if winner is not None or len(failed) == len(cancelled_attempts):
+                        raise payload
+                    continue
+
+                if winner is None and (kind == "end" or not until_complete):
+                    winner = index
+                    for attempt_index, cancelled in enumerate(cancelled_attempts):
+                        if attempt_index != winner:
+                            cancelled.set()
+                    self.hedging_policy.record(
+                        time.monotonic() - started_at,
+                        delay,
+                        control,
+                        hedged,
+                        hedge_won=winner == 1,
+                    )
+                    if until_complete:
+                        yield from chunks[winner]
+
+                if kind == "end":
+                    return
+                if winner is not None:
+                    yield payload
+                else:
+                    chunks[index].append(payload)
+        finally:
+            for cancelled in cancelled_attempts:
+                cancelled.set()
@@ -0,0 +1,375 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from core.concurrency.adaptive_limiter import (
+    is_overload_error,
+    is_rate_limit_error,
+    retry_after_seconds,
+)
+from infrastructure.callbacks.rate_limit_headers_callback_handler import (
+    RateLimitHeadersCallbackHandler,
+)
+
+reset_duration_pattern = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+reset_duration_units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+# OpenAI and Azure OpenAI quotas are per minute, used when a response omits its reset delay
+default_reset_seconds = 60.0
+
+
+def parse_reset_duration(value: str) -> Optional[float]:
+    """
+    Parses the reset delay of a rate limit header, like "20ms", "1.5s", "6m0s" or "12".
+
+    Returns:
+        Optional[float]: The delay in seconds, None when it cannot be parsed.
+    """
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    parts = reset_duration_pattern.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * reset_duration_units[unit] for amount, unit in parts)
+
+
+class LlmEndpoint:
+    """
+    An llm client of an LlmPool, like a deployment or an API key, with the capacity its rate limit
+    headers and its failures tell.
+    """
+
+    def __init__(self, name: str, llm, weight: float = 1.0):
+        """
+        :param name: The name of the endpoint in logs and metrics.
+        :param llm: A LangChain-compatible chat model including its response headers in its output.
+        :param weight: The relative share of the calls the endpoint gets when every endpoint has room.
+        """
+        self.name = name
+        self.llm = llm
+        self.weight = weight
+        self.request_limit: Optional[int] = None
+        self.remaining_requests: Optional[int] = None
+        self.requests_reset_at = 0.0
+        self.token_limit: Optional[int] = None
+        self.remaining_tokens: Optional[int] = None
+        self.tokens_reset_at = 0.0
+        self.unavailable_until = 0.0
+        self.consecutive_failures = 0
+        self.in_flight = 0
+        self.outcomes = {"success": 0, "rate_limited": 0, "error": 0}
+        self.callback_handler: Optional[RateLimitHeadersCallbackHandler] = None
+
+    def _refresh(self, now: float):
+        if self.remaining_requests is not None and now >= self.requests_reset_at:
+            self.remaining_requests = self.request_limit
+        if self.remaining_tokens is not None and now >= self.tokens_reset_at:
+            self.remaining_tokens = self.token_limit
+
+    def _available_at(self, estimated_tokens: int) -> float:
+        available_at = self.unavailable_until
+        if self.remaining_requests is not None and self.remaining_requests <= 0:
+            available_at = max(available_at, self.requests_reset_at)
+        if self.remaining_tokens is not None and self.remaining_tokens < min(
+            estimated_tokens, self.token_limit or estimated_tokens
+        ):
+            available_at = max(available_at, self.tokens_reset_at)
+        return available_at
+
+    def _headroom(self) -> float:
+        """The share of the quota left, weighted and divided between the calls in flight."""
+        shares = [1.0]
+        if self.remaining_requests is not None and self.request_limit:
+            shares.append(self.remaining_requests / self.request_limit)
+        if self.remaining_tokens is not None and self.token_limit:
+            shares.append(self.remaining_tokens / self.token_limit)
+        return min(shares) * self.weight / (self.in_flight + 1)
+
+
+class LlmPool:
+    """
+    LlmPool spreads llm calls across several endpoints, like OpenAI and Azure OpenAI deployments
+    or API keys, to go past the tokens and requests per minute quota of a single one.
+
+    Every call goes to the available endpoint with the most quota left, as told by the
+    `x-ratelimit-*` headers of its last response minus the calls made since. An endpoint answering
+    with a 429 is left alone for its Retry-After delay, one failing with a 5xx or a timeout for a
+    cooldown doubling with every consecutive failure. When no endpoint is available, calls wait.
+    """
+
+    def __init__(
+        self,
+        endpoints: list[LlmEndpoint],
+        failure_cooldown_seconds: float = 2.0,
+        max_cooldown_seconds: float = 60.0,
+        default_retry_after_seconds: float = 1.0,
+    ):
+        """
+        :param endpoints: The endpoints to spread the calls across.
+        :param failure_cooldown_seconds: How long an endpoint is left alone after its first failure.
+        :param max_cooldown_seconds: The longest an endpoint is left alone after consecutive failures.
+        :param default_retry_after_seconds: How long an endpoint is left alone after a 429 without Retry-After.
+        """
+        if not endpoints:
+            raise ValueError("An llm pool needs at least one endpoint.")
+
+        self.endpoints = endpoints
+        self.failure_cooldown_seconds = failure_cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+        self.default_retry_after_seconds = default_retry_after_seconds
+        self._condition = threading.Condition()
+        for endpoint in endpoints:
+            endpoint.callback_handler = RateLimitHeadersCallbackHandler(
+                lambda headers, endpoint=endpoint: self.record_headers(
+                    endpoint, headers
+                )
+            )
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    @classmethod
+    def from_config_file(cls, path: str) -> "LlmPool":
+        """
+        Creates a pool from a JSON file listing its endpoints, for example:
+
+            [
+                {"name": "openai", "model": "gpt-4o-mini", "api_key_env": "OPENAI_API_KEY"},
+                {"name": "azure-eastus", "provider": "azure", "azure_deployment": "gpt-4o-mini",
+                 "azure_endpoint": "https://eastus.openai.azure.com", "api_version": "2024-05-01-preview",
+                 "api_key_env": "AZURE_OPENAI_API_KEY_EASTUS", "weight": 2}
+            ]
+
+        API keys are read from the environment variables the endpoints name, never from the file.
+
+        Args:
+            path (str): The JSON file.
+
+        Returns:
+            LlmPool: The pool.
+        """
+        from langchain_openai import AzureChatOpenAI, ChatOpenAI
+
+        with open(path, encoding="utf-8") as config_file:
+            endpoint_configs = json.load(config_file)
+
+        endpoints = []
+        for index, endpoint_config in enumerate(endpoint_configs):
+            endpoint_config = dict(endpoint_config)
+            name = endpoint_config.pop("name", f"endpoint-{index}")
+            weight = endpoint_config.pop("weight", 1.0)
+            provider = endpoint_config.pop("provider", "openai")
+            api_key_env = endpoint_config.pop("api_key_env", None)
+            if api_key_env:
+                api_key = os.getenv(api_key_env)
+                if not api_key:
+                    raise ValueError(
+                        f"Error: {api_key_env} of the llm endpoint {name} is not set."
+                    )
+                endpoint_config["api_key"] = api_key
+
+            llm_class = AzureChatOpenAI if provider == "azure" else ChatOpenAI
+            llm = llm_class(
+                temperature=0,
+                # The pool moves a failed call to another endpoint instead
+                max_retries=0,
+                include_response_headers=True,
+                # Streamed calls, like the ones of the agent executors, only report their usage when asked to
+                stream_usage=True,
+                **endpoint_config,
+            )
+            endpoints.append(LlmEndpoint(name, llm, weight=weight))
+
+        return cls(endpoints)
+
+    @contextmanager
+    def acquire(self, estimated_tokens: int = 0) -> Iterator[LlmEndpoint]:
+        """
+        Reserves the endpoint with the most quota left for a call, waiting for one to be available.
+        The rate limit headers of the call are recorded through the endpoint's `callback_handler`,
+        and its failure, if any, when it leaves the context.
+
+        Args:
+            estimated_tokens (int): The tokens the call is expected to consume.
+
+        Yields:
+            LlmEndpoint: The endpoint to call.
+        """
+        endpoint = self._reserve(estimated_tokens)
+        try:
+            yield endpoint
+        except Exception as e:
+            self._release(endpoint, e)
+            raise
+        else:
+            self._release(endpoint, None)
+
+    def _reserve(self, estimated_tokens: int) -> LlmEndpoint:
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                available_at = {}
+                for endpoint in self.endpoints:
+                    endpoint._refresh(now)
+                    available_at[endpoint] = endpoint._available_at(estimated_tokens)
+
+                available_endpoints = [
+                    endpoint
+                    for endpoint in self.endpoints
+                    if available_at[endpoint] <= now
+                ]
+                if available_endpoints:
+                    break
+                self._condition.wait(timeout=min(available_at.values()) - now)
+
+            endpoint = max(available_endpoints, key=LlmEndpoint._headroom)
+            endpoint.in_flight += 1
+            if endpoint.remaining_requests is not None:
+                endpoint.remaining_requests -= 1
+            if endpoint.remaining_tokens is not None:
+                endpoint.remaining_tokens -= estimated_tokens
+            return endpoint
+
+    def alternative(self, endpoint: LlmEndpoint) -> LlmEndpoint:
+        """
+        Picks the available endpoint with the most quota left other than the given one, for a
+        hedge request. Nothing is reserved on it.
+
+        Returns:
+            LlmEndpoint: The alternative endpoint, the given one when no other is available.
+        """
+        with self._condition:
+            now = time.monotonic()
+            other_endpoints = []
+            for other_endpoint in self.endpoints:
+                other_endpoint._refresh(now)
+                if (
+                    other_endpoint is not endpoint
+                    and other_endpoint._available_at(0) <= now
+                ):
+                    other_endpoints.append(other_endpoint)
+            return max(other_endpoints, key=LlmEndpoint._headroom, default=endpoint)
+
+    def _release(self, endpoint: LlmEndpoint, error: Optional[Exception]):
+        with self._condition:
+            endpoint.in_flight -= 1
+            now = time.monotonic()
+            if error is None:
+                endpoint.consecutive_failures = 0
+                endpoint.outcomes["success"] += 1
+            elif is_rate_limit_error(error):
+                endpoint.outcomes["rate_limited"] += 1
+                retry_after = retry_after_seconds(error)
+                endpoint.unavailable_until = now + (
+                    retry_after
+                    if retry_after is not None
+                    else self.default_retry_after_seconds
+                )
+            elif is_overload_error(error):
+                endpoint.outcomes["error"] += 1
+                endpoint.consecutive_failures += 1
+                endpoint.unavailable_until = now + min(
+                    self.failure_cooldown_seconds
+                    * 2 ** (endpoint.consecutive_failures - 1),
+                    self.max_cooldown_seconds,
+                )
+            self._condition.notify_all()
+
+    def record_headers(self, endpoint: LlmEndpoint, headers: dict):
+        """
+        Records the `x-ratelimit-*` headers of a response of an endpoint.
+
+        Args:
+            endpoint (LlmEndpoint): The endpoint that answered.
+            headers (dict): The response headers, their names in lower case.
+        """
+        with self._condition:
+            now = time.monotonic()
+            for kind in ["requests", "tokens"]:
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if remaining is None:
+                    continue
+                try:
+                    remaining = int(remaining)
+                    limit = int(headers.get(f"x-ratelimit-limit-{kind}") or remaining)
+                except ValueError:
+                    continue
+                reset_seconds = parse_reset_duration(
+                    headers.get(f"x-ratelimit-reset-{kind}") or ""
+                )
+                reset_at = now + (
+                    reset_seconds
+                    if reset_seconds is not None
+                    else default_reset_seconds
+                )
+                setattr(endpoint, f"remaining_{kind}", remaining)
+                setattr(endpoint, f"{kind[:-1]}_limit", max(limit, remaining))
+                setattr(endpoint, f"{kind}_reset_at", reset_at)
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        """Returns the quota left, availability, calls in flight and outcomes of every endpoint."""
+        with self._condition:
+            now = time.monotonic()
+            stats = {}
+            for endpoint in self.endpoints:
+                endpoint._refresh(now)
+                stats[endpoint.name] = {
+                    "available": endpoint._available_at(1) <= now,
+                    "remaining_requests": endpoint.remaining_requests,
+                    "remaining_tokens": endpoint.remaining_tokens,
+                    "in_flight": endpoint.in_flight,
+                    "outcomes": dict(endpoint.outcomes),
+                }
+            return stats
+
+    def to_prometheus(self) -> str:
+        """Renders the state of the endpoints in the Prometheus text exposition format."""
+        stats = self.stats()
+        gauges = [
+            (
+                "llm_endpoint_available",
+                "Whether the endpoint takes calls, 0 while it is throttled or cooling down.",
+                "available",
+            ),
+            (
+                "llm_endpoint_remaining_requests",
+                "Requests left in the endpoint's quota, as of its last response.",
+                "remaining_requests",
+            ),
+            (
+                "llm_endpoint_remaining_tokens",
+                "Tokens left in the endpoint's quota, as of its last response.",
+                "remaining_tokens",
+            ),
+            ("llm_endpoint_in_flight", "Calls in flight on the endpoint.", "in_flight"),
+        ]
+
+        lines = []
+        for metric_name, description, key in gauges:
+            lines.append(f"# HELP reviewpal_{metric_name} {description}")
+            lines.append(f"# TYPE reviewpal_{metric_name} gauge")
+            for name, endpoint_stats in stats.items():
+                if endpoint_stats[key] is not None:
+                    lines.append(
+                        f'reviewpal_{metric_name}{{endpoint="{name}"}} {int(endpoint_stats[key])}'
+                    )
+
+        lines.append(
+            "# HELP reviewpal_llm_endpoint_calls_total Calls completed by the endpoint, by outcome."
+        )
+        lines.append("# TYPE reviewpal_llm_endpoint_calls_total counter")
+        for name, endpoint_stats in stats.items():
+            for outcome, count in endpoint_stats["outcomes"].items():
+                lines.append(
+                    f'reviewpal_llm_endpoint_calls_total{{endpoint="{name}",outcome="{outcome}"}} {count}'
+                )
+
+        return "\n".join(lines) + "\n"
@@ -1,3 +1,8 @@
+import contextvars
+import posixpath
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
 from typing import Optional, List
 from langchain.prompts import PromptTemplate
 import json
@@ -5,16 +10,44 @@ import re
 from dotenv import load_dotenv
 from langchain_core.tools import Tool, tool
 import langchain
+import tenacity
 
+from application.indexes.symbol_index import SymbolIndex
+from application.indexes.vector_index import VectorIndex, format_related_snippets
+from application.parsers.streaming_llm_review_parser import StreamingLlmReviewParser
+from core.concurrency.adaptive_limiter import is_overload_error, is_rate_limit_error
+from core.concurrency.cancellation import CancellationToken
+from core.concurrency.dependency_guard import DependencyGuard
+from core.concurrency.hedging import HedgingPolicy
+from core.concurrency.memory_budget import MemoryBudget
+from core.concurrency.pipeline import Pipeline, PipelineStage
+from core.instrumentation.stages import stage
 from core.models.llm_comment import LlmComment
+from core.models.token_usage import estimate_tokens
+from application.sinks.comment_sink import CommentSink
 from application.tools.add_comment_tool import AddCommentTool
 from application.use_cases.add_comment_to_pull_request import AddCommentUseCase
 from application.use_cases.get_pull_request import GetPullRequestUseCase
+from infrastructure.agents.hedged_llm import HedgedLlm
+from infrastructure.agents.llm_pool import LlmEndpoint, LlmPool
+from infrastructure.agents.triage_agent import TriageAgent
 from infrastructure.repositories.github_repository import GitHubRepository
+from infrastructure.repositories.symbol_index_repository import SymbolIndexRepository
+from infrastructure.repositories.vector_index_repository import VectorIndexRepository
+from infrastructure.callbacks.cancellation_callback_handler import (
+    CancellationCallbackHandler,
+)
+from infrastructure.callbacks.token_usage_callback_handler import (
+    TokenUsageCallbackHandler,
+)
 from core.prompt_templates.review_prompt_template import ReviewPromptTemplate
 from langchain.agents import AgentExecutor, create_tool_calling_agent
 
-from application.parsers.github_pull_request_parser import parse_pull_request
+from application.parsers.github_pull_request_parser import (
+    fetch_pull_request_files,
+    parse_pull_request,
+    parse_pull_request_file,
+)
 from application.parsers.llm_text_pull_request_parser import parse_pull_request_to_text
 from application.text_splitters.pull_request_file_text_splitter import (
     split_pull_request_file,
@@ -26,58 +59,697 @@ class ReviewAgent:
     ReviewAgent integrates LLM and the AddCommentTool to generate and add comments to pull requests.
     """
 
-    def __init__(self, llm, repo_owner: str, repo_name: str, pr_number: int):
+    def __init__(
+        self,
+        llm,
+        repo_owner: str,
+        repo_name: str,
+        pr_number: int,
+        github_repository: Optional[GitHubRepository] = None,
+        max_concurrency: int = 1,
+        verbose: bool = True,
+        llm_limiter=None,
+        review_progress=None,
+        cancellation_token: Optional[CancellationToken] = None,
+        comment_sink: Optional[CommentSink] = None,
+        triage_agent: Optional[TriageAgent] = None,
+        streaming: bool = False,
+        rate_limit_retries: int = 0,
+        llm_pool: Optional[LlmPool] = None,
+        hedging_policy: Optional[HedgingPolicy] = None,
+        llm_guard: Optional[DependencyGuard] = None,
+        symbol_indexes: Optional[SymbolIndexRepository] = None,
+        context_tokens: int = 400,
+        vector_indexes: Optional[VectorIndexRepository] = None,
+        related_snippets: int = 3,
+        related_snippet_tokens: int = 600,
+        memory_budget: Optional[MemoryBudget] = None,
+        pipelined: bool = False,
+        fetch_concurrency: int = 1,
+        split_concurrency: int = 1,
+        post_concurrency: int = 1,
+    ):
         """
         Initialize the ReviewAgent with a provided LLM and repository details.
 
-        :param llm: An instance of a LangChain-compatible LLM.
+        :param llm: An instance of a LangChain-compatible LLM, unused with an llm pool.
         :param repo_owner: GitHub repository owner.
         :param repo_name: GitHub repository name.
         :param pr_number: Pull request number to review.
+        :param github_repository: The repository to use, one is created from the repository details when None.
+        :param max_concurrency: The number of files reviewed concurrently, 1 reviews them one after the other.
+        :param verbose: Whether the agent executors print their steps.
+        :param llm_limiter: A context manager, like a semaphore shared between agents, held during the llm request of every chunk review.
+        :param review_progress: A ReviewJobProgress of a durable job, chunks it records as reviewed are skipped.
+        :param cancellation_token: Once cancelled, the remaining llm calls and comment posts raise ReviewCancelledError.
+        :param comment_sink: Where the comments go, they are posted on the pull request when None.
+        :param triage_agent: A cheap model deciding which chunks deserve a review, every chunk is reviewed when None.
+        :param streaming: Whether to stream the JSON review of every chunk instead of running the tool-calling agent,
+            posting each comment as soon as it is generated and stopping once the llm decides a chunk needs none.
+        :param rate_limit_retries: How many times a chunk review rejected with a 429 is retried, once the llm limiter,
+            like an AdaptiveConcurrencyLimiter, lets calls through again.
+        :param llm_pool: Endpoints to spread the chunk reviews across instead of `llm`. A chunk review
+            failing with a 429, a 5xx or a timeout is retried on another endpoint.
+        :param hedging_policy: Hedges the slow llm calls with a duplicate request, sent to another endpoint of
+            the llm pool when there is one, the first valid response wins. No call is hedged when None.
+        :param llm_guard: The circuit breaker and retry budget shared by the llm calls of every review. Chunk reviews
+            are retried without a budget and never rejected when None.
+        :param symbol_indexes: The symbol indexes of the repositories, to attach to every chunk the definitions and
+            usages of its symbols in the rest of the repository. No context is attached when None.
+        :param context_tokens: The maximum size of the context attached to a chunk.
+        :param vector_indexes: The vector indexes of the repositories, to attach to every chunk the snippets of the
+            rest of the repository most similar to it. No snippet is attached when None.
+        :param related_snippets: The maximum number of snippets attached to a chunk.
+        :param related_snippet_tokens: The maximum size of the snippets attached to a chunk.
+        :param memory_budget: Streams the files of the pull request, fetching the content of a file only once the
+            budget, shared by every review, has room for its size on the target branch, listed beforehand with the
+            rest of its directory, and releasing it once reviewed. The triage agent then
+            flags the chunks of one file at a time. Every file is fetched before the first review when None.
+        :param pipelined: Whether the files go through a pipeline fetching, splitting, reviewing and posting the
+            comments of different files at once, as they do with a memory budget.
+        :param fetch_concurrency: The number of files fetched at once by the pipeline.
+        :param split_concurrency: The number of files split and triaged at once by the pipeline.
+        :param post_concurrency: The number of comments posted at once by the pipeline.
         """
         self.review_prompt = ReviewPromptTemplate.get_template()
         self.llm = llm
-        self.review_chain = self.review_prompt | llm
+        self.review_chain = self.review_prompt | llm if llm is not None else None
+        self.max_concurrency = max_concurrency
+        self.verbose = verbose
+        self.llm_limiter = llm_limiter or nullcontext()
+        self.review_progress = review_progress
+        self.cancellation_token = cancellation_token
+        self.comment_sink = comment_sink
+        self.triage_agent = triage_agent
+        self.streaming = streaming
+        self.rate_limit_retries = rate_limit_retries
+        self.llm_pool = llm_pool
+        self.hedging_policy = hedging_policy
+        self.llm_guard = llm_guard or DependencyGuard("llm")
+        self.symbol_indexes = symbol_indexes
+        self.context_tokens = context_tokens
+        self.symbol_index: Optional[SymbolIndex] = None
+        self.vector_indexes = vector_indexes
+        self.related_snippets = related_snippets
+        self.related_snippet_tokens = related_snippet_tokens
+        self.vector_index: Optional[VectorIndex] = None
+        self.memory_budget = memory_budget
+        self.pipelined = pipelined
+        self.fetch_concurrency = fetch_concurrency
+        self.split_concurrency = split_concurrency
+        self.post_concurrency = post_concurrency
+        # The sizes of the files of the directories of the streamed files, by directory
+        self._directory_file_sizes: dict[str, Future] = {}
+        self._directory_file_sizes_lock = threading.Lock()
+        # Where the comments of the review are posted while the pipeline runs
+        self._post_stage: Optional[PipelineStage] = None
+        # Hedged llms are kept so that the agent executors built for them are reused
+        self._hedged_llms: dict[tuple, HedgedLlm] = {}
+        # The tokens every review call sends on top of its chunk, to reserve quota in the llm pool
+        self.review_prompt_tokens = estimate_tokens(
+            self.review_prompt.messages[0].prompt.template
+        )
 
-        self.github_repository = GitHubRepository(
+        self.github_repository = github_repository or GitHubRepository(
             repo_owner=repo_owner, repo_name=repo_name, pr_number=pr_number
         )
         self.get_pull_request_use_case = GetPullRequestUseCase()
         self.add_comment_use_case = AddCommentUseCase()
+        self.token_usage_callback_handler = TokenUsageCallbackHandler()
 
     def review_pull_request(self):
         """
         Process the pull request files and generate comments for each file.
         """
 
-        parsed_content = parse_pull_request(self.github_repository)
+        with stage(
+            "review_pull_request",
+            repository=f"{self.github_repository.repo_owner}/{self.github_repository.repo_name}",
+            pr_number=self.github_repository.pr_number,
+        ):
+            if self.pipelined or self.memory_budget is not None:
+                self.symbol_index = self._get_index(self.symbol_indexes, "symbol index")
+                self.vector_index = self._get_index(self.vector_indexes, "vector index")
+                self._run_pipeline()
+                print(
+                    f"Token usage: {self.token_usage_callback_handler.token_usage.summary()}"
+                )
+                return
+
+            parsed_content = parse_pull_request(self.github_repository)
+            self.symbol_index = self._get_index(self.symbol_indexes, "symbol index")
+            self.vector_index = self._get_index(self.vector_indexes, "vector index")
+            file_reviews = self._triage_files(parsed_content.files)
+
+            if self.max_concurrency > 1:
+                with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                    # Each file runs in a copy of the current context to keep its stages observed
+                    futures = [
+                        executor.submit(
+                            contextvars.copy_context().run,
+                            self._review_file,
+                            *file_review,
+                        )
+                        for file_review in file_reviews
+                    ]
+                    for future in futures:
+                        future.result()
+            else:
+                for file_review in file_reviews:
+                    self._review_file(*file_review)
+
+        print(f"Token usage: {self.token_usage_callback_handler.token_usage.summary()}")
+
+    def _run_pipeline(self):
+        """
+        Reviews the files through a pipeline, so that the next files are fetched and split while the llm reviews
+        the previous ones and their comments are posted. Every stage has its own workers, the review stage has
+        `max_concurrency`, and bounded queues between them keep a slow stage from piling up files in memory.
+        With a memory budget, a file is also fetched only once the files held by every review leave room for it.
+        """
+        self._post_stage = PipelineStage(
+            "post", lambda post: post(), workers=self.post_concurrency
+        )
+        pipeline = Pipeline(
+            [
+                PipelineStage(
+                    "fetch", self._fetch_streamed_file, workers=self.fetch_concurrency
+                ),
+                PipelineStage(
+                    "split",
+                    self._split_streamed_file,
+                    workers=self.split_concurrency,
+                    discard=self._discard_streamed_file,
+                ),
+                PipelineStage(
+                    "review",
+                    self._review_streamed_file,
+                    workers=self.max_concurrency,
+                    discard=self._discard_streamed_file,
+                ),
+                self._post_stage,
+            ]
+        )
+        try:
+            pipeline.run(fetch_pull_request_files(self.github_repository))
+        finally:
+            self._post_stage = None
+
+    def _fetch_streamed_file(self, file) -> tuple:
+        if self.cancellation_token:
+            self.cancellation_token.raise_if_cancelled()
+        if self.memory_budget is None:
+            return parse_pull_request_file(self.github_repository, file), 0
+
+        reserved = self.memory_budget.acquire(self._estimate_file_bytes(file))
+        try:
+            pr_file = parse_pull_request_file(self.github_repository, file)
+        except BaseException:
+            self.memory_budget.release(reserved)
+            raise
+        reserved = self.memory_budget.resize(
+            reserved,
+            sum(len(line.content.encode()) + 1 for line in pr_file.content),
+        )
+        return pr_file, reserved
+
+    def _estimate_file_bytes(self, file) -> int:
+        """
+        Estimates the bytes of a file before fetching it, from the sizes of the files of its directory on the
+        target branch, listed once per directory. New files only hold their patch.
+        """
+        directory = posixpath.dirname(file.filename)
+        with self._directory_file_sizes_lock:
+            file_sizes = self._directory_file_sizes.get(directory)
+            lists_directory = file_sizes is None
+            if lists_directory:
+                # The other fetch workers wait for this listing instead of requesting it again
+                file_sizes = self._directory_file_sizes[directory] = Future()
+        if lists_directory:
+            try:
+                file_sizes.set_result(
+                    self.github_repository.get_directory_file_sizes(directory)
+                )
+            except Exception as e:
+                print(
+                    f"Estimating the sizes of {directory} files from their patch: {e}"
+                )
+                file_sizes.set_result({})
+        return file_sizes.result().get(file.filename) or len(
+            (file.patch or "").encode()
+        )
+
+    def _split_streamed_file(self, fetched_file: tuple) -> tuple:
+        pr_file, reserved = fetched_file
+        try:
+            chunks = self._split_file(pr_file)
+            needs_review = None
+            if self.triage_agent is not None and chunks:
+                needs_review = self.triage_agent.triage(
+                    [(pr_file.path, chunk.page_content) for chunk in chunks],
+                    cancellation_token=self.cancellation_token,
+                )
+        except BaseException:
+            self._release(reserved)
+            raise
+        return pr_file, chunks, needs_review, reserved
+
+    def _review_streamed_file(self, split_file: tuple):
+        pr_file, chunks, needs_review, reserved = split_file
+        try:
+            self._review_file(pr_file, chunks, needs_review)
+        finally:
+            self._release(reserved)
+
+    def _discard_streamed_file(self, streamed_file: tuple):
+        """Releases the memory held by a file the failed pipeline drops, the reserved bytes come last."""
+        self._release(streamed_file[-1])
+
+    def _release(self, reserved: int):
+        if self.memory_budget is not None:
+            self.memory_budget.release(reserved)
+
+    def _get_index(self, indexes, name: str):
+        """Gets an index of the base branch. The review goes on without its context when it cannot be built."""
+        if indexes is None:
+            return None
+        try:
+            return indexes.get_index(self.github_repository)
+        except Exception as e:
+            print(f"Reviewing without the {name}, it failed: {e}")
+            return None
+
+    def _chunk_context(self, chunk, file_path: str) -> str:
+        if self.symbol_index is None:
+            return ""
+        return self.symbol_index.context_for(
+            getattr(chunk, "page_content", str(chunk)),
+            file_path,
+            max_tokens=self.context_tokens,
+            count_tokens=estimate_tokens,
+        )
+
+    def _related_snippets(self, chunks, file_path: str, needs_review=None) -> list[str]:
+        """
+        Searches the snippets related to every chunk of a file at once, a single embedding call and matrix product.
+
+        Returns:
+            list[str]: The attachment of every chunk, empty for the chunks the triage did not flag.
+        """
+        related = [""] * len(chunks)
+        if self.vector_index is None or self.related_snippets <= 0:
+            return related
+        chunk_indexes = [
+            chunk_index
+            for chunk_index in range(len(chunks))
+            if needs_review is None or needs_review[chunk_index]
+        ]
+        if not chunk_indexes:
+            return related
+        try:
+            matches = self.vector_index.search(
+                self.vector_indexes.embed(
+                    [chunks[chunk_index].page_content for chunk_index in chunk_indexes]
+                ),
+                k=self.related_snippets,
+                exclude_path=file_path,
+            )
+        except Exception as e:
+            print(f"Reviewing {file_path} without related snippets: {e}")
+            return related
+        for chunk_index, chunk_matches in zip(chunk_indexes, matches):
+            related[chunk_index] = format_related_snippets(
+                chunk_matches,
+                max_tokens=self.related_snippet_tokens,
+                count_tokens=estimate_tokens,
+            )
+        return related
+
+    def _triage_files(self, pr_files) -> list[tuple]:
+        """
+        Splits every file and lets the triage agent flag the chunks worth a review, in as few calls as possible.
+
+        Returns:
+            list[tuple]: The arguments of `_review_file` for every file.
+        """
+        if self.triage_agent is None:
+            return [(pr_file, None, None) for pr_file in pr_files]
+
+        files_chunks = [self._split_file(pr_file) for pr_file in pr_files]
+        needs_review = self.triage_agent.triage(
+            [
+                (pr_file.path, chunk.page_content)
+                for pr_file, chunks in zip(pr_files, files_chunks)
+                for chunk in chunks
+            ],
+            cancellation_token=self.cancellation_token,
+        )
+
+        file_reviews = []
+        for pr_file, chunks in zip(pr_files, files_chunks):
+            file_reviews.append((pr_file, chunks, needs_review[: len(chunks)]))
+            needs_review = needs_review[len(chunks) :]
+        return file_reviews
+
+    def _split_file(self, pr_file) -> list:
+        return split_pull_request_file(
+            parse_pull_request_to_text(pr_file), file_path=pr_file.path
+        )
+
+    def _review_file(self, pr_file, chunks=None, needs_review=None):
+        """
+        Reviews every chunk of a single pull request file, or only the ones the triage flagged.
+        """
+        with stage("review_file", file_path=pr_file.path) as stage_attributes:
+            stage_attributes.update(
+                self._review_file_chunks(pr_file, chunks, needs_review)
+            )
+
+    def _review_file_chunks(
+        self, pr_file, chunks=None, needs_review=None
+    ) -> dict[str, int]:
+        """
+        Returns:
+            dict[str, int]: The number of chunks skipped because an earlier attempt reviewed them,
+                and because the triage did not flag them.
+        """
+        if chunks is None:
+            chunks = self._split_file(pr_file)
+
+        add_comment_tool = AddCommentTool(
+            pull_request_file=pr_file,
+            add_comment_to_file_use_case=self.add_comment_use_case,
+            github_repository=self.github_repository,
+            review_progress=self.review_progress,
+            cancellation_token=self.cancellation_token,
+            comment_sink=self.comment_sink,
+            post_stage=self._post_stage,
+            # Streamed comments are posted as soon as they are parsed, outside the llm call
+            queue_posts=not self.streaming,
+        )
+        # One agent executor per llm the chunks of the file are reviewed with
+        agent_executors: dict[int, AgentExecutor] = {}
+
+        related_snippets = self._related_snippets(chunks, pr_file.path, needs_review)
+
+        skipped_chunks = {"skipped_chunks": 0, "triaged_out_chunks": 0}
+        if self.review_progress:
+            self.review_progress.record_file(pr_file.path, len(chunks))
+        for chunk_index, chunk in enumerate(chunks):
+            if needs_review is not None and not needs_review[chunk_index]:
+                skipped_chunks["triaged_out_chunks"] += 1
+                continue
 
-        for pr_file in parsed_content.files:
-            pull_request_file = parse_pull_request_to_text(pr_file)
+            if self.review_progress:
+                if self.review_progress.is_chunk_reviewed(
+                    pr_file.path, chunk_index, chunk.page_content
+                ):
+                    skipped_chunks["skipped_chunks"] += 1
+                    continue
+                # Stops before spending tokens when another worker took the job over
+                self.review_progress.renew_lease()
 
-            add_comment_tool = AddCommentTool(
-                pull_request_file=pr_file,
-                add_comment_to_file_use_case=self.add_comment_use_case,
-                github_repository=self.github_repository,
+            context = (
+                self._chunk_context(chunk, pr_file.path) + related_snippets[chunk_index]
             )
+            if self.streaming:
+                self._stream_chunk_review(
+                    add_comment_tool, chunk, pr_file.path, chunk_index, context
+                )
+            else:
+                self._review_chunk(
+                    add_comment_tool,
+                    agent_executors,
+                    chunk,
+                    pr_file.path,
+                    chunk_index,
+                    context,
+                )
+            # A chunk is only recorded as reviewed once its comments are posted
+            add_comment_tool.wait_for_posts()
+            if self.review_progress:
+                self.review_progress.record_chunk_reviewed(
+                    pr_file.path, chunk_index, chunk.page_content
+                )
+        return skipped_chunks
+
+    def _get_agent_executor(
+        self, llm, add_comment_tool: AddCommentTool, agent_executors: dict
+    ) -> AgentExecutor:
+        if id(llm) not in agent_executors:
             agent = create_tool_calling_agent(
-                llm=self.llm, tools=[add_comment_tool], prompt=self.review_prompt
+                llm=llm, tools=[add_comment_tool], prompt=self.review_prompt
             )
-            agent_executor = AgentExecutor(
+            agent_executors[id(llm)] = AgentExecutor(
                 agent=agent,
                 tools=[add_comment_tool],
-                verbose=True,
+                verbose=self.verbose,
                 handle_parsing_errors=True,
                 return_intermediate_steps=True,
             )
+        return agent_executors[id(llm)]
+
+    def _review_chunk(
+        self,
+        add_comment_tool: AddCommentTool,
+        agent_executors: dict,
+        chunk,
+        file_path: str,
+        chunk_index: int,
+        context: str = "",
+    ):
+        """
+        Reviews a single chunk of a pull request file, recording its tokens on the llm_call stage.
+        """
+        chunk_token_usage_callback_handler = TokenUsageCallbackHandler()
+        callbacks = [
+            self.token_usage_callback_handler,
+            chunk_token_usage_callback_handler,
+        ]
+        if self.cancellation_token:
+            self.cancellation_token.raise_if_cancelled()
+            callbacks.append(CancellationCallbackHandler(self.cancellation_token))
 
-            chunks = split_pull_request_file(pull_request_file)
+        def review(llm, llm_callbacks):
+            # The comments of a failed attempt are never posted
+            add_comment_tool.discard_queued_comments()
+            return self._get_agent_executor(
+                llm, add_comment_tool, agent_executors
+            ).invoke(
+                {
+                    "file_changes": chunk,
+                    "file_path": file_path,
+                    "context": context,
+                },
+                config={"callbacks": callbacks + llm_callbacks},
+                include_run_info=True,
+            )
+
+        with stage(
+            "llm_call", file_path=file_path, chunk_index=chunk_index
+        ) as stage_attributes:
+            self._call_llm(review, chunk, stage_attributes)
+            chunk_token_usage = chunk_token_usage_callback_handler.token_usage
+            stage_attributes["requests"] = chunk_token_usage.calls
+            stage_attributes["input_tokens"] = chunk_token_usage.input_tokens
+            stage_attributes["output_tokens"] = chunk_token_usage.output_tokens
+            stage_attributes["cached_tokens"] = chunk_token_usage.cached_tokens
+        # The tool only queued the comments the llm chose, their GitHub errors are not llm failures
+        add_comment_tool.post_queued_comments()
+
+    def _stream_chunk_review(
+        self,
+        add_comment_tool: AddCommentTool,
+        chunk,
+        file_path: str,
+        chunk_index: int,
+        context: str = "",
+    ):
+        """
+        Streams the JSON review of a single chunk. Every comment is posted from a background thread
+        as soon as its object is complete, and the generation stops as soon as the analysis says the
+        chunk needs no comment.
+        """
+        chunk_token_usage_callback_handler = TokenUsageCallbackHandler()
+        callbacks = [
+            self.token_usage_callback_handler,
+            chunk_token_usage_callback_handler,
+        ]
+        if self.cancellation_token:
+            self.cancellation_token.raise_if_cancelled()
+            callbacks.append(CancellationCallbackHandler(self.cancellation_token))
 
-            for chunk in chunks:
-                agent_executor.invoke(
-                    {"file_changes": chunk, "file_path": pr_file.path},
-                    include_run_info=True,
+        messages = self.review_prompt.format_messages(
+            file_changes=chunk.page_content,
+            file_path=file_path,
+            context=context,
+            agent_scratchpad=[],
+        )
+
+        with ThreadPoolExecutor(max_workers=1) as comment_poster, stage(
+            "llm_call", file_path=file_path, chunk_index=chunk_index, streaming=True
+        ) as stage_attributes:
+            posted_comments: list[Future] = []
+            streamed_messages = self._call_llm(
+                lambda llm, llm_callbacks: self._stream_review(
+                    llm,
+                    messages,
+                    callbacks + llm_callbacks,
+                    add_comment_tool,
+                    comment_poster,
+                    posted_comments,
+                    stage_attributes,
+                ),
+                chunk,
+                stage_attributes,
+            )
+
+            chunk_token_usage = chunk_token_usage_callback_handler.token_usage
+            if chunk_token_usage.calls == 0:
+                # An aborted stream never receives its usage, every streamed message is about a token
+                chunk_token_usage.add(
+                    input_tokens=sum(
+                        estimate_tokens(message.content) for message in messages
+                    ),
+                    output_tokens=streamed_messages,
+                )
+            stage_attributes["requests"] = chunk_token_usage.calls
+            stage_attributes["input_tokens"] = chunk_token_usage.input_tokens
+            stage_attributes["output_tokens"] = chunk_token_usage.output_tokens
+            stage_attributes["cached_tokens"] = chunk_token_usage.cached_tokens
+            # Awaited outside the llm call, so that a failed post is not taken for an llm failure
+            for posted_comment in posted_comments:
+                posted_comment.result()
+
+    def _stream_review(
+        self,
+        llm,
+        messages,
+        callbacks,
+        add_comment_tool: AddCommentTool,
+        comment_poster: ThreadPoolExecutor,
+        posted_comments: list[Future],
+        stage_attributes,
+    ) -> int:
+        """
+        Streams the review, handing every comment to the comment poster without waiting for its post.
+
+        Returns:
+            int: The number of messages streamed by the llm.
+        """
+        review_parser = StreamingLlmReviewParser()
+        streamed_messages = 0
+        comments_count = 0
+
+        stream = llm.stream(messages, config={"callbacks": callbacks})
+        try:
+            for message in stream:
+                streamed_messages += 1
+                invalid_comments = len(review_parser.invalid_comments)
+                comments = review_parser.feed(message.content)
+                for invalid_comment in review_parser.invalid_comments[
+                    invalid_comments:
+                ]:
+                    print(invalid_comment)
+                for comment in comments:
+                    comments_count += 1
+                    posted_comments.append(
+                        comment_poster.submit(
+                            contextvars.copy_context().run,
+                            add_comment_tool._run,
+                            [comment],
+                        )
+                    )
+                if review_parser.needs_comments is False:
+                    stage_attributes["stopped_early"] = 1
+                    break
+        finally:
+            # Closing the stream before its end aborts the generation
+            stream.close()
+        stage_attributes["comments"] = comments_count
+
+        return streamed_messages
+
+    def _call_llm(self, call, chunk, stage_attributes: dict):
+        """
+        Runs a chunk review, retrying it when it is rejected with a 429. The llm limiter is only held
+        during the llm request, so that its latency and errors are the model's alone.
+        An adaptive limiter holds the retry back until the delay asked by the provider has passed.
+        With an llm pool, the review goes to the endpoint with the most quota left, and a review
+        failing with a 5xx or a timeout is retried too, the pool routing it around the failing endpoint.
+        Every attempt goes through the llm guard: its circuit breaker may reject it and its retry budget may
+        deny the retry. The call must not post comments nor wait for their posts, so that GitHub errors and
+        latency are never taken for the llm's.
+
+        Args:
+            call: Reviews the chunk, given the llm to use and the callbacks to add to its calls.
+            chunk: The reviewed chunk, to estimate its tokens.
+            stage_attributes (dict): The attributes of the llm_call stage.
+        """
+        retries = self.rate_limit_retries
+        if self.llm_pool is not None:
+            retries += len(self.llm_pool) - 1
+
+        def log_retry(retry_state: tenacity.RetryCallState):
+            stage_attributes["rate_limited_retries"] = retry_state.attempt_number
+            print(
+                f"Llm call failed, retrying ({retry_state.attempt_number}/{retries}): "
+                f"{retry_state.outcome.exception()}"
+            )
+
+        for attempt in self.llm_guard.retrying(
+            max_attempts=retries + 1,
+            is_retryable=lambda e: is_rate_limit_error(e)
+            or (self.llm_pool is not None and is_overload_error(e)),
+            # The adaptive limiter holds 429 retries back, the llm pool routes the others around failing endpoints
+            wait=tenacity.wait_none(),
+            before_sleep=log_retry,
+        ):
+            with attempt, self.llm_guard.attempt():
+                if self.llm_pool is None:
+                    with self.llm_limiter:
+                        return call(self._hedged(self.llm), [])
+
+                estimated_tokens = self.review_prompt_tokens + estimate_tokens(
+                    getattr(chunk, "page_content", str(chunk))
                 )
+                with self.llm_pool.acquire(estimated_tokens) as endpoint:
+                    stage_attributes["llm_endpoint"] = endpoint.name
+                    # Waiting for an endpoint with quota left is not llm latency
+                    with self.llm_limiter:
+                        if self.hedging_policy is None:
+                            return call(endpoint.llm, [endpoint.callback_handler])
+                        return call(
+                            self._hedged(
+                                endpoint.llm,
+                                endpoint,
+                                self.llm_pool.alternative(endpoint),
+                            ),
+                            [],
+                        )
+
+    def _hedged(
+        self,
+        llm,
+        endpoint: Optional[LlmEndpoint] = None,
+        hedge_endpoint: Optional[LlmEndpoint] = None,
+    ):
+        """Returns the llm hedged by the hedging policy, the llm itself without a policy."""
+        if self.hedging_policy is None:
+            return llm
+
+        key = (id(llm), id(hedge_endpoint))
+        if key not in self._hedged_llms:
+            self._hedged_llms[key] = HedgedLlm(
+                llm,
+                self.hedging_policy,
+                hedge_llm=hedge_endpoint.llm if hedge_endpoint else None,
+                llm_callbacks=[endpoint.callback_handler] if endpoint else None,
+                hedge_callbacks=(
+                    [hedge_endpoint.callback_handler] if hedge_endpoint else None
+                ),
+            )
+        return self._hedged_llms[key]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,244 @@
+import threading
+from typing import Optional
+
+from core.concurrency.adaptive_limiter import AdaptiveConcurrencyLimiter
+from core.concurrency.cancellation import CancellationToken, ReviewCancelledError
+from core.concurrency.circuit_breaker import find_circuit_open_error
+from core.instrumentation.run_metrics import RunMetrics
+from core.instrumentation.stages import StageObserver, observe_stages
+from core.models.pull_request_review_result import PullRequestReviewResult
+from core.models.run_report import RunReport
+from infrastructure.agents.review_agent import ReviewAgent
+from infrastructure.agents.triage_agent import TriageAgent
+from infrastructure.repositories.github_repository import GitHubRepository
+
+
+class ReviewRunner:
+    """
+    ReviewRunner reviews pull requests one call at a time while sharing a single llm client,
+    a single GitHub client and global concurrency limits between all of them.
+
+    It is safe to call `review` from several threads at once.
+    """
+
+    def __init__(
+        self,
+        llm,
+        github_client=None,
+        llm_concurrency: int = 4,
+        github_concurrency: int = 8,
+        file_concurrency: int = 1,
+        verbose: bool = False,
+        triage_llm=None,
+        triage_threshold: float = 0.3,
+        triage_batch_size: int = 20,
+        streaming: bool = False,
+        adaptive_concurrency: bool = False,
+        max_llm_concurrency: int = 16,
+        rate_limit_retries: int = 3,
+        llm_pool=None,
+        hedging_policy=None,
+        github_guard=None,
+        llm_guard=None,
+        symbol_indexes=None,
+        context_tokens: int = 400,
+        vector_indexes=None,
+        related_snippets: int = 3,
+        memory_budget=None,
+        pipelined: bool = False,
+        fetch_concurrency: int = 4,
+        split_concurrency: int = 1,
+        post_concurrency: int = 2,
+    ):
+        """
+        :param llm: An instance of a LangChain-compatible LLM, shared by every review, unused with an llm pool.
+        :param github_client: A GitHub client shared by every review, one is created when None.
+        :param llm_concurrency: The maximum number of chunk reviews in flight across all pull requests.
+        :param github_concurrency: The maximum number of GitHub requests in flight across all pull requests.
+        :param file_concurrency: The number of files of a pull request reviewed concurrently.
+        :param verbose: Whether the agent executors print their steps.
+        :param triage_llm: A cheap model triaging the chunks before the review, every chunk is reviewed when None.
+        :param triage_threshold: The triage score from which a chunk is reviewed.
+        :param triage_batch_size: The maximum number of chunks triaged by a single call.
+        :param streaming: Whether chunk reviews are streamed, posting every comment as soon as it is generated.
+        :param adaptive_concurrency: Whether the llm concurrency starts at `llm_concurrency` and then follows the
+            latency and the 429s of the provider, up to `max_llm_concurrency`.
+        :param max_llm_concurrency: The maximum number of chunk reviews in flight with an adaptive concurrency.
+        :param rate_limit_retries: How many times a chunk review rejected with a 429 is retried with an adaptive
+            concurrency, after the delay asked by the provider. The llm client should not retry them itself.
+        :param llm_pool: An LlmPool of endpoints shared by every review, to spread the chunk reviews across.
+        :param hedging_policy: A HedgingPolicy shared by every review, deciding when a slow chunk review is sent
+            again, no call is hedged when None.
+        :param github_guard: A DependencyGuard every GitHub request goes through, retrying them instead of the
+            GitHub client, and rejecting them while GitHub keeps failing.
+        :param llm_guard: A DependencyGuard every chunk review goes through, rejecting them while the llm keeps
+            failing and capping their retries. Reviews rejected by an open circuit are deferred.
+        :param symbol_indexes: A SymbolIndexRepository shared by every review, attaching to every chunk the
+            definitions and usages of its symbols in the rest of the repository, no context is attached when None.
+        :param context_tokens: The maximum size of the context attached to a chunk.
+        :param vector_indexes: A VectorIndexRepository shared by every review, attaching to every chunk the most
+            similar snippets of the rest of the repository, no snippet is attached when None.
+        :param related_snippets: The maximum number of snippets attached to a chunk.
+        :param memory_budget: A MemoryBudget shared by every review, capping the bytes of the files held at once
+            by streaming them one at a time. Every review fetches all its files first when None.
+        :param pipelined: Whether every review fetches, splits, reviews and posts the comments of its files in a
+            pipeline, the review stage with `file_concurrency` workers, as it does with a memory budget.
+        :param fetch_concurrency: The number of files of a pull request fetched at once by the pipeline.
+        :param split_concurrency: The number of files of a pull request split and triaged at once by the pipeline.
+        :param post_concurrency: The number of comments of a pull request posted at once by the pipeline.
+        """
+        self.llm = llm
+        self.github_client = github_client or GitHubRepository.create_github_client(
+            pool_size=github_concurrency, retry_requests=github_guard is None
+        )
+        if adaptive_concurrency:
+            self.llm_limiter = AdaptiveConcurrencyLimiter(
+                initial_limit=llm_concurrency,
+                max_limit=max(max_llm_concurrency, llm_concurrency),
+            )
+            self.rate_limit_retries = rate_limit_retries
+        else:
+            self.llm_limiter = threading.BoundedSemaphore(llm_concurrency)
+            self.rate_limit_retries = 0
+        self.github_limiter = threading.BoundedSemaphore(github_concurrency)
+        self.file_concurrency = file_concurrency
+        self.verbose = verbose
+        self.streaming = streaming
+        self.llm_pool = llm_pool
+        self.hedging_policy = hedging_policy
+        self.github_guard = github_guard
+        self.llm_guard = llm_guard
+        self.symbol_indexes = symbol_indexes
+        self.context_tokens = context_tokens
+        self.vector_indexes = vector_indexes
+        self.related_snippets = related_snippets
+        self.memory_budget = memory_budget
+        self.pipelined = pipelined
+        self.fetch_concurrency = fetch_concurrency
+        self.split_concurrency = split_concurrency
+        self.post_concurrency = post_concurrency
+        self.triage_agent = (
+            TriageAgent(
+                triage_llm,
+                threshold=triage_threshold,
+                max_chunks_per_call=triage_batch_size,
+                llm_limiter=self.llm_limiter,
+                llm_guard=self.llm_guard,
+            )
+            if triage_llm is not None
+            else None
+        )
+
+    def review(
+        self,
+        url: str,
+        repo_owner: str,
+        repo_name: str,
+        pr_number: int,
+        observers: Optional[list[StageObserver]] = None,
+        review_progress=None,
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> PullRequestReviewResult:
+        """
+        Reviews a pull request and summarizes the run. Failures are reported in the result.
+
+        Args:
+            url (str): The pull request URL, used to label the result.
+            repo_owner (str): GitHub repository owner.
+            repo_name (str): GitHub repository name.
+            pr_number (int): Pull request number to review.
+            observers (list[StageObserver], optional): Additional observers of the run's stages.
+            review_progress (ReviewJobProgress, optional): The progress of a durable job, to resume it.
+            cancellation_token (CancellationToken, optional): Cancels the review, for example when a newer commit is pushed.
+
+        Returns:
+            PullRequestReviewResult: The outcome of the review.
+        """
+        run_metrics = RunMetrics(pull_request=url)
+        error = None
+        status = None
+        retry_after_seconds = None
+
+        with observe_stages(run_metrics, *(observers or [])):
+            try:
+                github_repository = GitHubRepository(
+                    repo_owner=repo_owner,
+                    repo_name=repo_name,
+                    pr_number=pr_number,
+                    github_client=self.github_client,
+                    request_limiter=self.github_limiter,
+                    github_guard=self.github_guard,
+                )
+                review_agent = ReviewAgent(
+                    llm=self.llm,
+                    repo_owner=repo_owner,
+                    repo_name=repo_name,
+                    pr_number=pr_number,
+                    github_repository=github_repository,
+                    max_concurrency=self.file_concurrency,
+                    verbose=self.verbose,
+                    llm_limiter=self.llm_limiter,
+                    review_progress=review_progress,
+                    cancellation_token=cancellation_token,
+                    triage_agent=self.triage_agent,
+                    streaming=self.streaming,
+                    rate_limit_retries=self.rate_limit_retries,
+                    llm_pool=self.llm_pool,
+                    hedging_policy=self.hedging_policy,
+                    llm_guard=self.llm_guard,
+                    symbol_indexes=self.symbol_indexes,
+                    context_tokens=self.context_tokens,
+                    vector_indexes=self.vector_indexes,
+                    related_snippets=self.related_snippets,
+                    memory_budget=self.memory_budget,
+                    pipelined=self.pipelined,
+                    fetch_concurrency=self.fetch_concurrency,
+                    split_concurrency=self.split_concurrency,
+                    post_concurrency=self.post_concurrency,
+                )
+                review_agent.review_pull_request()
+            except ReviewCancelledError as e:
+                status, error = "cancelled", str(e)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                # A comment post rejected by the circuit breaker comes wrapped by the use case
+                circuit_open_error = find_circuit_open_error(e)
+                if circuit_open_error is not None:
+                    status, error = "deferred", str(circuit_open_error)
+                    retry_after_seconds = circuit_open_error.retry_after_seconds
+
+        return summarize_run(
+            url, run_metrics.report(), error, status, retry_after_seconds
+        )
+
+
+def summarize_run(
+    url: str,
+    report: RunReport,
+    error: Optional[str] = None,
+    status: Optional[str] = None,
+    retry_after_seconds: Optional[float] = None,
+) -> PullRequestReviewResult:
+    """Summarizes the run report of a pull request review, the status defaults to reviewed or failed."""
+    stages = report.stages
+    comment_post = stages.get("comment_post")
+    review_file = stages.get("review_file")
+    triage = stages.get("triage")
+    # Both the review and the triage calls are paid for
+    llm_stages = [stages[name] for name in ("llm_call", "triage") if name in stages]
+
+    return PullRequestReviewResult(
+        url=url,
+        status=status or ("failed" if error else "reviewed"),
+        error=error,
+        wall_time_seconds=report.wall_time_seconds,
+        files=review_file.calls if review_file else 0,
+        llm_calls=sum(metrics.requests for metrics in llm_stages),
+        input_tokens=sum(metrics.input_tokens for metrics in llm_stages),
+        output_tokens=sum(metrics.output_tokens for metrics in llm_stages),
+        cached_tokens=sum(metrics.cached_tokens for metrics in llm_stages),
+        comments=(comment_post.calls - comment_post.errors) if comment_post else 0,
+        avoided_llm_calls=triage.avoided_requests if triage else 0,
+        avoided_input_tokens=triage.avoided_input_tokens if triage else 0,
+        retry_after_seconds=retry_after_seconds,
+    )
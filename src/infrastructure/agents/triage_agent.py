@@ -0,0 +1,156 @@
+from contextlib import nullcontext
+from html import escape
+from typing import Optional
+
+from application.parsers.triage_parser import parse_triage_decisions
+from core.concurrency.cancellation import CancellationToken, ReviewCancelledError
+from core.concurrency.dependency_guard import DependencyGuard
+from core.instrumentation.stages import stage
+from core.models.token_usage import estimate_tokens
+from core.prompt_templates.review_prompt_template import ReviewPromptTemplate
+from core.prompt_templates.triage_prompt_template import TriagePromptTemplate
+from infrastructure.callbacks.cancellation_callback_handler import (
+    CancellationCallbackHandler,
+)
+from infrastructure.callbacks.token_usage_callback_handler import (
+    TokenUsageCallbackHandler,
+)
+
+
+class TriageAgent:
+    """
+    TriageAgent asks a small model, in one call over many chunks, which pull request file chunks
+    need a review from the stronger model.
+
+    It fails open: chunks of a call that fails, whose output cannot be parsed, or that the output
+    leaves out, are reviewed.
+    """
+
+    def __init__(
+        self,
+        llm,
+        threshold: float = 0.3,
+        max_chunks_per_call: int = 20,
+        max_characters_per_call: int = 48000,
+        llm_limiter=None,
+        llm_guard: Optional[DependencyGuard] = None,
+    ):
+        """
+        :param llm: A small, cheap LangChain-compatible chat model.
+        :param threshold: Chunks scored at or above it are reviewed, 0 reviews everything.
+        :param max_chunks_per_call: The maximum number of chunks triaged by a single call.
+        :param max_characters_per_call: The maximum size of the chunks triaged by a single call.
+        :param llm_limiter: A context manager, like a semaphore, held during every triage call.
+        :param llm_guard: The circuit breaker and retry budget shared with the reviews, every triage call is a
+            single attempt through it. Triage calls are never rejected when None.
+        """
+        self.llm = llm
+        self.threshold = threshold
+        self.max_chunks_per_call = max_chunks_per_call
+        self.max_characters_per_call = max_characters_per_call
+        self.llm_limiter = llm_limiter or nullcontext()
+        self.llm_guard = llm_guard or DependencyGuard("llm")
+        self.triage_chain = TriagePromptTemplate.get_template() | llm
+        # The tokens every review call sends on top of its chunk
+        review_instructions = ReviewPromptTemplate.get_template().messages[0]
+        self.review_prompt_tokens = estimate_tokens(review_instructions.prompt.template)
+
+    def triage(
+        self,
+        chunks: list[tuple[str, str]],
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> list[bool]:
+        """
+        Decides which chunks need a review.
+
+        Args:
+            chunks (list[tuple[str, str]]): The file path and text of every chunk.
+            cancellation_token (CancellationToken, optional): The token of the review, once cancelled the
+                remaining triage calls raise ReviewCancelledError.
+
+        Returns:
+            list[bool]: Whether each chunk needs a review, in the order of the chunks.
+        """
+        needs_review: list[bool] = []
+        for batch in self._batch(chunks):
+            needs_review.extend(self._triage_batch(batch, cancellation_token))
+        return needs_review
+
+    def _batch(self, chunks: list[tuple[str, str]]) -> list[list[tuple[str, str]]]:
+        batches: list[list[tuple[str, str]]] = []
+        batch_characters = 0
+        for chunk in chunks:
+            chunk_characters = len(chunk[1])
+            if not batches or (
+                len(batches[-1]) >= self.max_chunks_per_call
+                or batch_characters + chunk_characters > self.max_characters_per_call
+            ):
+                batches.append([])
+                batch_characters = 0
+            batches[-1].append(chunk)
+            batch_characters += chunk_characters
+        return batches
+
+    def _triage_batch(
+        self,
+        batch: list[tuple[str, str]],
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> list[bool]:
+        chunks_text = "\n".join(
+            f'<chunk id="{chunk_id}" path="{escape(file_path)}">\n{text}\n</chunk>'
+            for chunk_id, (file_path, text) in enumerate(batch)
+        )
+        token_usage_callback_handler = TokenUsageCallbackHandler()
+        callbacks = [token_usage_callback_handler]
+        if cancellation_token:
+            cancellation_token.raise_if_cancelled()
+            callbacks.append(CancellationCallbackHandler(cancellation_token))
+
+        with stage("triage", chunks=len(batch)) as stage_attributes, self.llm_limiter:
+            try:
+                response = self.llm_guard.call(
+                    lambda: self.triage_chain.invoke(
+                        {"chunks": chunks_text}, config={"callbacks": callbacks}
+                    ),
+                    retry=False,
+                )
+                output = response.content
+            except ReviewCancelledError:
+                raise
+            except Exception as e:
+                # A cheap pre-filter never fails a review
+                print(f"Triage call failed, reviewing its {len(batch)} chunks: {e}")
+                stage_attributes["failed"] = 1
+                output = None
+            token_usage = token_usage_callback_handler.token_usage
+            stage_attributes["requests"] = token_usage.calls
+            stage_attributes["input_tokens"] = token_usage.input_tokens
+            stage_attributes["output_tokens"] = token_usage.output_tokens
+            stage_attributes["cached_tokens"] = token_usage.cached_tokens
+
+            scores = {}
+            if output is not None:
+                try:
+                    decisions = parse_triage_decisions(output)
+                    scores = {
+                        decision.id: decision.score for decision in decisions.chunks
+                    }
+                except ValueError as e:
+                    print(
+                        f"Triage output ignored, reviewing its {len(batch)} chunks: {e}"
+                    )
+
+            needs_review = [
+                scores.get(chunk_id, 1.0) >= self.threshold
+                for chunk_id in range(len(batch))
+            ]
+            skipped_chunks = [
+                text for (_, text), reviewed in zip(batch, needs_review) if not reviewed
+            ]
+            stage_attributes["avoided_requests"] = len(skipped_chunks)
+            stage_attributes["avoided_input_tokens"] = sum(
+                self.review_prompt_tokens + estimate_tokens(text)
+                for text in skipped_chunks
+            )
+
+        return needs_review
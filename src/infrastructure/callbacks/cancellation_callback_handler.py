@@ -0,0 +1,31 @@
+from typing import Any
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from core.concurrency.cancellation import CancellationToken
+
+
+class CancellationCallbackHandler(BaseCallbackHandler):
+    """
+    Aborts an agent run once its cancellation token is cancelled, before its next llm call or tool
+    call, and between streamed tokens.
+    """
+
+    # Callback errors are only logged by LangChain unless raise_error is set
+    raise_error: bool = True
+
+    def __init__(self, cancellation_token: CancellationToken):
+        super().__init__()
+        self.cancellation_token = cancellation_token
+
+    def on_chat_model_start(self, *args: Any, **kwargs: Any) -> None:
+        self.cancellation_token.raise_if_cancelled()
+
+    def on_llm_start(self, *args: Any, **kwargs: Any) -> None:
+        self.cancellation_token.raise_if_cancelled()
+
+    def on_llm_new_token(self, *args: Any, **kwargs: Any) -> None:
+        self.cancellation_token.raise_if_cancelled()
+
+    def on_tool_start(self, *args: Any, **kwargs: Any) -> None:
+        self.cancellation_token.raise_if_cancelled()
@@ -0,0 +1,32 @@
+from typing import Any, Callable
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+
+class RateLimitHeadersCallbackHandler(BaseCallbackHandler):
+    """
+    Hands the response headers of every finished llm call, like its `x-ratelimit-remaining-tokens`,
+    to a callback. The model must include them in its output, like a ChatOpenAI created with
+    `include_response_headers=True`.
+    """
+
+    def __init__(self, on_headers: Callable[[dict], None]):
+        """
+        :param on_headers: Called with the response headers, their names in lower case.
+        """
+        super().__init__()
+        self.on_headers = on_headers
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                headers = (generation.generation_info or {}).get("headers") or (
+                    getattr(message, "response_metadata", None) or {}
+                ).get("headers")
+                if headers:
+                    self.on_headers(
+                        {name.lower(): value for name, value in headers.items()}
+                    )
+                    return
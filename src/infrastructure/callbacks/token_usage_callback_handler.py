@@ -0,0 +1,41 @@
+import threading
+from typing import Any
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from core.models.token_usage import TokenUsage
+
+
+class TokenUsageCallbackHandler(BaseCallbackHandler):
+    """
+    Accumulates the input, output and cached tokens reported by every llm call it observes.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.token_usage = TokenUsage()
+        self._lock = threading.Lock()
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        """Records the token usage of a finished llm call."""
+        usage_metadata = None
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage_metadata = (
+                    getattr(message, "usage_metadata", None) or usage_metadata
+                )
+
+        with self._lock:
+            if usage_metadata:
+                input_token_details = usage_metadata.get("input_token_details") or {}
+                self.token_usage.add(
+                    input_tokens=usage_metadata.get("input_tokens", 0),
+                    output_tokens=usage_metadata.get("output_tokens", 0),
+                    cached_tokens=input_token_details.get("cache_read") or 0,
+                )
+            elif response.llm_output and response.llm_output.get("token_usage"):
+                self.token_usage.add_openai_usage(response.llm_output["token_usage"])
+            else:
+                self.token_usage.add()
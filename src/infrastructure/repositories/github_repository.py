@@ -1,16 +1,77 @@
 import base64
 import os
+import tarfile
+from contextlib import nullcontext
+from typing import Callable, Iterator, Optional, TypeVar
+
+import requests
 from github.GithubException import GithubException
 from github import Github, Auth
 from github.ContentFile import ContentFile
 from dotenv import load_dotenv
 from core.models.comment import Comment
+from core.concurrency.dependency_guard import DependencyGuard
+from core.instrumentation.stages import stage
+
+T = TypeVar("T")
 
 
 class GitHubRepository:
     def __init__(
-        self, github_access_token=None, repo_owner=None, repo_name=None, pr_number=None
+        self,
+        github_access_token=None,
+        repo_owner=None,
+        repo_name=None,
+        pr_number=None,
+        github_client: Optional[Github] = None,
+        request_limiter=None,
+        github_guard: Optional[DependencyGuard] = None,
     ):
+        """
+        :param github_access_token: The GitHub token, read from the GITHUB_ACCESS_TOKEN environment variable when None.
+        :param repo_owner: GitHub repository owner.
+        :param repo_name: GitHub repository name.
+        :param pr_number: Pull request number.
+        :param github_client: A client shared with other repositories, one is created when None.
+        :param request_limiter: A context manager, like a semaphore, held during every GitHub request.
+        :param github_guard: The circuit breaker and retry budget every GitHub request goes through. The client
+            should not retry requests itself.
+        """
+        self.repo_owner = repo_owner
+        self.repo_name = repo_name
+        self.pr_number = pr_number
+        self.githubClient = github_client or self.create_github_client(
+            github_access_token, retry_requests=github_guard is None
+        )
+        self.request_limiter = request_limiter or nullcontext()
+        self.github_guard = github_guard
+        with stage("pr_fetch", requests=2):
+            self.repo = self._request(
+                lambda: self.githubClient.get_repo(
+                    f"{self.repo_owner}/{self.repo_name}"
+                )
+            )
+            self.pull_request = self._request(
+                lambda: self.repo.get_pull(self.pr_number)
+            )
+
+    @staticmethod
+    def create_github_client(
+        github_access_token=None, pool_size=None, retry_requests: bool = True
+    ) -> Github:
+        """
+        Creates an authenticated GitHub client.
+
+        Args:
+            github_access_token (str, optional): The GitHub token, read from the GITHUB_ACCESS_TOKEN
+                environment variable when None.
+            pool_size (int, optional): The size of the HTTP connection pool, to share the client between threads.
+            retry_requests (bool): Whether the client retries failed requests itself, up to 10 times. Disable it
+                when a DependencyGuard retries them.
+
+        Returns:
+            Github: The GitHub client.
+        """
         if not load_dotenv():
             raise ValueError(
                 "Warning: .env file not found. Ensure it exists in the project's root directory."
@@ -22,12 +83,21 @@ class GitHubRepository:
             )
 
         auth = Auth.Token(github_access_token)
-        self.repo_owner = repo_owner
-        self.repo_name = repo_name
-        self.pr_number = pr_number
-        self.githubClient = Github(auth=auth)
-        self.repo = self.githubClient.get_repo(f"{self.repo_owner}/{self.repo_name}")
-        self.pull_request = self.repo.get_pull(self.pr_number)
+        if retry_requests:
+            return Github(auth=auth, pool_size=pool_size)
+        return Github(auth=auth, pool_size=pool_size, retry=None)
+
+    def _request(self, request: Callable[[], T], retry: bool = True) -> T:
+        """Sends a GitHub request holding the request limiter, through the GitHub guard when there is one."""
+
+        def limited_request() -> T:
+            # The limiter is not held while a retry waits
+            with self.request_limiter:
+                return request()
+
+        if self.github_guard is None:
+            return limited_request()
+        return self.github_guard.call(limited_request, retry=retry)
 
     def get_pull_request_title(self) -> str:
         """Get the title of a pull request."""
@@ -39,14 +109,14 @@ class GitHubRepository:
 
     def get_pull_request_files(self):
         """Get the list of files changed in a pull request."""
-        return self.pull_request.get_files()
+        return self._request(lambda: list(self.pull_request.get_files()))
 
-    def get_file_content(self, file_path: str):
-        """Get the content of a file from the repository."""
+    def get_file_content(self, file_path: str, ref: Optional[str] = None):
+        """Get the content of a file from the repository, at the target branch of the pull request by default."""
         try:
-            pull_request_target_ref = self.pull_request.base.ref
-            fileData: ContentFile = self.repo.get_contents(
-                file_path, ref=pull_request_target_ref
+            pull_request_target_ref = ref or self.pull_request.base.ref
+            fileData: ContentFile = self._request(
+                lambda: self.repo.get_contents(file_path, ref=pull_request_target_ref)
             )
             return base64.b64decode(fileData.content).decode("utf-8")
         except GithubException as githubException:
@@ -54,6 +124,79 @@ class GitHubRepository:
                 # If the file didn't exist on the target branch of the PR then all changes are new content
                 return ""
 
+    def get_directory_file_sizes(
+        self, directory: str, ref: Optional[str] = None
+    ) -> dict[str, int]:
+        """
+        Lists the sizes of the files of a directory in a single request, without their content, at the target
+        branch of the pull request by default.
+
+        Returns:
+            dict[str, int]: The size in bytes of every file by path, empty when the directory does not exist.
+        """
+        try:
+            entries = self._request(
+                lambda: self.repo.get_contents(
+                    directory, ref=ref or self.pull_request.base.ref
+                )
+            )
+        except GithubException as githubException:
+            if githubException.status == 404:
+                return {}
+            raise
+        if not isinstance(entries, list):
+            entries = [entries]
+        return {entry.path: entry.size for entry in entries if entry.type == "file"}
+
+    def get_archive_files(
+        self, ref: str, suffixes: tuple[str, ...], max_file_bytes: int = 1_000_000
+    ) -> Iterator[tuple[str, str]]:
+        """
+        Downloads the repository at a ref as a single tarball and reads the files with the given suffixes,
+        instead of fetching them one request at a time.
+
+        Args:
+            ref (str): The branch, tag or commit.
+            suffixes (tuple[str, ...]): The suffixes of the files to read, like (".py",).
+            max_file_bytes (int): Larger files, often generated, are skipped.
+
+        Yields:
+            tuple[str, str]: The path and the text of every file.
+        """
+        archive_url = self._request(lambda: self.repo.get_archive_link("tarball", ref))
+        response = self._request(
+            lambda: requests.get(archive_url, stream=True, timeout=60)
+        )
+        response.raise_for_status()
+        with response, tarfile.open(fileobj=response.raw, mode="r|gz") as archive:
+            for member in archive:
+                if (
+                    not member.isfile()
+                    or not member.name.endswith(suffixes)
+                    or member.size > max_file_bytes
+                ):
+                    continue
+                # Paths start with an "<owner>-<repo>-<sha>/" directory
+                path = member.name.split("/", 1)[-1]
+                yield path, archive.extractfile(member).read().decode(
+                    "utf-8", errors="replace"
+                )
+
+    def compare_commits(self, base_sha: str, head_sha: str) -> tuple[str, list]:
+        """
+        Compares two commits of the repository.
+
+        Returns:
+            tuple[str, list]: The status of head relative to base, "ahead", "behind", "diverged" or
+                "identical", and the changed files, with their filename, status and previous_filename.
+        """
+
+        def compare() -> tuple[str, list]:
+            comparison = self.repo.compare(base_sha, head_sha)
+            return comparison.status, list(comparison.files)
+
+        return self._request(compare)
+
     def add_comment_to_file(
         self, text: str, file_path: str, line: int, commit_sha: str = None
     ) -> Comment:
@@ -76,15 +219,22 @@ class GitHubRepository:
             Comment: A model representing the comment created, including the text of the
             comment, file path, line number, and commit SHA.
         """
-        # Get the commit in the pull request using commit_sha or get the last commit
-        commit = (
-            self.repo.get_commit(commit_sha)
-            if commit_sha
-            else self.pull_request.get_commits()[self.pull_request.commits - 1]
-        )
-        created_comment = self.pull_request.create_comment(
-            text, commit, file_path, line
-        )
+        with stage(
+            "comment_post", file_path=file_path, requests=2, bytes=len(text.encode())
+        ):
+            # Get the commit in the pull request using commit_sha or get the last commit
+            commit = self._request(
+                lambda: (
+                    self.repo.get_commit(commit_sha)
+                    if commit_sha
+                    else self.pull_request.get_commits()[self.pull_request.commits - 1]
+                )
+            )
+            # A comment whose response was lost may have been created, it is not posted twice
+            created_comment = self._request(
+                lambda: self.pull_request.create_comment(text, commit, file_path, line),
+                retry=False,
+            )
 
         # Return as a Comment model
         return Comment(
@@ -0,0 +1,161 @@
+import json
+import time
+from typing import Optional
+
+from core.models.token_usage import TokenUsage
+
+# Batch statuses after which the batch will not progress anymore
+batch_terminal_statuses = ["completed", "failed", "expired", "cancelled"]
+
+
+class OpenAIBatchRepository:
+    """
+    Wraps the OpenAI Batch API: uploads a JSONL file of requests, creates a batch,
+    polls it until it is done and downloads its results.
+
+    The client only needs the `files` and `batches` resources of the OpenAI client,
+    which makes it possible to use a local stand-in emulating these endpoints.
+    """
+
+    def __init__(
+        self,
+        client,
+        endpoint: str = "/v1/chat/completions",
+        completion_window: str = "24h",
+    ):
+        """
+        :param client: An `openai.OpenAI` client or an object exposing the same batch endpoints.
+        :param endpoint: The endpoint every request of the batch targets.
+        :param completion_window: The time frame within which the batch should be processed.
+        """
+        self.client = client
+        self.endpoint = endpoint
+        self.completion_window = completion_window
+
+    def write_requests(self, requests: list[dict], batch_input_path: str) -> str:
+        """
+        Writes the requests to a JSONL file in the format expected by the Batch API.
+
+        Args:
+            requests (list[dict]): The requests, each with a `custom_id` and a `body`.
+            batch_input_path (str): The path of the JSONL file to write.
+
+        Returns:
+            str: The path of the written file.
+        """
+        with open(batch_input_path, "w", encoding="utf-8") as batch_input_file:
+            for request in requests:
+                line = {
+                    "custom_id": request["custom_id"],
+                    "method": "POST",
+                    "url": self.endpoint,
+                    "body": request["body"],
+                }
+                batch_input_file.write(json.dumps(line) + "\n")
+
+        return batch_input_path
+
+    def submit(self, batch_input_path: str, metadata: Optional[dict] = None) -> str:
+        """
+        Uploads a JSONL file of requests and creates a batch out of it.
+
+        Args:
+            batch_input_path (str): The path of the JSONL file to upload.
+            metadata (dict, optional): Metadata to attach to the batch.
+
+        Returns:
+            str: The id of the created batch.
+        """
+        with open(batch_input_path, "rb") as batch_input_file:
+            uploaded_file = self.client.files.create(
+                file=batch_input_file, purpose="batch"
+            )
+
+        batch = self.client.batches.create(
+            input_file_id=uploaded_file.id,
+            endpoint=self.endpoint,
+            completion_window=self.completion_window,
+            metadata=metadata,
+        )
+        return batch.id
+
+    def wait_for_completion(
+        self,
+        batch_id: str,
+        poll_interval_seconds: float = 30,
+        timeout_seconds: Optional[float] = None,
+    ):
+        """
+        Polls a batch until it reaches a terminal status.
+
+        Args:
+            batch_id (str): The id of the batch to poll.
+            poll_interval_seconds (float): The delay between two polls.
+            timeout_seconds (float, optional): The maximum time to wait, unlimited when None.
+
+        Returns:
+            The completed batch.
+
+        Raises:
+            RuntimeError: If the batch did not complete successfully or in time.
+        """
+        started_at = time.monotonic()
+        batch = self.client.batches.retrieve(batch_id)
+
+        while batch.status not in batch_terminal_statuses:
+            if (
+                timeout_seconds is not None
+                and time.monotonic() - started_at > timeout_seconds
+            ):
+                raise RuntimeError(
+                    f"Batch {batch_id} did not complete within {timeout_seconds} seconds (status: {batch.status})."
+                )
+            time.sleep(poll_interval_seconds)
+            batch = self.client.batches.retrieve(batch_id)
+
+        if batch.status != "completed":
+            raise RuntimeError(f"Batch {batch_id} ended with status: {batch.status}")
+
+        return batch
+
+    def get_results(
+        self, batch, token_usage: Optional[TokenUsage] = None
+    ) -> dict[str, str]:
+        """
+        Downloads the output of a completed batch.
+
+        Requests that failed are skipped, they can be found in the batch error file.
+
+        Args:
+            batch: The completed batch.
+            token_usage (TokenUsage, optional): Accumulates the token usage of the successful requests.
+
+        Returns:
+            dict[str, str]: The content of the assistant message of each successful request, by custom id.
+        """
+        if not batch.output_file_id:
+            return {}
+
+        output = self.client.files.content(batch.output_file_id).text
+        results: dict[str, str] = {}
+
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+
+            result = json.loads(line)
+            response = result.get("response") or {}
+            if result.get("error") or response.get("status_code") != 200:
+                print(
+                    f"Batch request {result.get('custom_id')} failed: {result.get('error')}"
+                )
+                continue
+
+            if token_usage is not None and response["body"].get("usage"):
+                token_usage.add_openai_usage(response["body"]["usage"])
+
+            results[result["custom_id"]] = response["body"]["choices"][0]["message"][
+                "content"
+            ]
+
+        return results
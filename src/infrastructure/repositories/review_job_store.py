@@ -0,0 +1,455 @@
+import hashlib
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+from core.concurrency.cancellation import ReviewCancelledError
+from core.models.review_job import ReviewJob
+
+schema = """
+CREATE TABLE IF NOT EXISTS review_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    repo_owner TEXT NOT NULL,
+    repo_name TEXT NOT NULL,
+    pr_number INTEGER NOT NULL,
+    head_sha TEXT NOT NULL DEFAULT '',
+    head_updated_at REAL,
+    delivery_id TEXT,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    deferred_until REAL,
+    error TEXT,
+    enqueued_at TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (repo_owner, repo_name, pr_number, head_sha)
+);
+CREATE INDEX IF NOT EXISTS review_jobs_by_status ON review_jobs (status, lease_expires_at);
+CREATE TABLE IF NOT EXISTS review_files (
+    job_id INTEGER NOT NULL REFERENCES review_jobs (id),
+    file_path TEXT NOT NULL,
+    chunk_count INTEGER NOT NULL,
+    PRIMARY KEY (job_id, file_path)
+);
+CREATE TABLE IF NOT EXISTS review_chunks (
+    job_id INTEGER NOT NULL REFERENCES review_jobs (id),
+    file_path TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    chunk_hash TEXT NOT NULL,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (job_id, file_path, chunk_index)
+);
+CREATE TABLE IF NOT EXISTS review_comments (
+    job_id INTEGER NOT NULL REFERENCES review_jobs (id),
+    file_path TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    text_hash TEXT NOT NULL,
+    posted_at REAL NOT NULL,
+    PRIMARY KEY (job_id, file_path, line, text_hash)
+);
+"""
+
+
+class LeaseLostError(RuntimeError):
+    """Raised when a worker records progress on a job whose lease was taken over by another worker."""
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ReviewJobStore:
+    """
+    ReviewJobStore persists review jobs and their per-file, per-chunk and per-comment progress in SQLite.
+
+    Jobs are keyed by (repository, pull request, head commit). Workers, possibly in different
+    processes, claim queued jobs with a time-limited lease that is renewed every time they record
+    progress. When a worker dies its lease expires and another worker resumes the job, skipping the
+    chunks already reviewed and the comments already posted.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 600, max_attempts: int = 3):
+        """
+        :param path: The SQLite database file, created when missing.
+        :param lease_seconds: How long a claimed job stays reserved to a worker without progress.
+        :param max_attempts: The number of claims after which a job is marked as failed.
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with closing(self._connect()) as connection:
+            # WAL lets workers read progress while another one writes
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(schema)
+            columns = {
+                row["name"]
+                for row in connection.execute("PRAGMA table_info(review_jobs)")
+            }
+            # Stores created before jobs could be deferred
+            if "deferred_until" not in columns:
+                connection.execute(
+                    "ALTER TABLE review_jobs ADD COLUMN deferred_until REAL"
+                )
+            # Stores created before head commits were ordered by update time
+            if "head_updated_at" not in columns:
+                connection.execute(
+                    "ALTER TABLE review_jobs ADD COLUMN head_updated_at REAL"
+                )
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    @contextmanager
+    def _transaction(self, immediate: bool = False):
+        # A connection per transaction keeps the store usable from any thread and process
+        with closing(self._connect()) as connection:
+            connection.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def enqueue(self, job: ReviewJob) -> bool:
+        """
+        Adds a job, a failed job for the same pull request and head commit is queued again.
+        A new job cancels the queued and running jobs of the older head commits of the pull request, the
+        workers of the running ones, in any process, stop at their next progress check. A head commit is
+        older when the pull request was updated earlier, or enqueued earlier when an update time is unknown.
+        A new job for a head commit older than another job of the pull request is cancelled right away.
+
+        Args:
+            job (ReviewJob): The job to add.
+
+        Returns:
+            bool: False when the job is already queued, running or done, or superseded by a newer head commit.
+        """
+        now = time.time()
+        head_updated_at = (
+            job.head_updated_at.timestamp() if job.head_updated_at else None
+        )
+        with self._transaction(immediate=True) as connection:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO review_jobs (repo_owner, repo_name, pr_number, head_sha,"
+                " head_updated_at, delivery_id, enqueued_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.repo_owner,
+                    job.repo_name,
+                    job.pr_number,
+                    job.head_sha or "",
+                    head_updated_at,
+                    job.delivery_id,
+                    job.enqueued_at.isoformat(),
+                    now,
+                ),
+            )
+            if not cursor.rowcount:
+                # A redelivery of a known head commit never cancels anything
+                return bool(
+                    connection.execute(
+                        "UPDATE review_jobs SET status = 'queued', attempts = 0, error = NULL,"
+                        " lease_owner = NULL, updated_at = ? WHERE repo_owner = ? AND repo_name = ?"
+                        " AND pr_number = ? AND head_sha = ? AND status = 'failed'",
+                        (
+                            now,
+                            job.repo_owner,
+                            job.repo_name,
+                            job.pr_number,
+                            job.head_sha or "",
+                        ),
+                    ).rowcount
+                )
+            if not job.head_sha:
+                return True
+
+            newer_job = connection.execute(
+                "SELECT head_sha FROM review_jobs WHERE repo_owner = ? AND repo_name = ?"
+                " AND pr_number = ? AND head_sha NOT IN (?, '') AND head_updated_at > ?"
+                " ORDER BY head_updated_at DESC LIMIT 1",
+                (
+                    job.repo_owner,
+                    job.repo_name,
+                    job.pr_number,
+                    job.head_sha,
+                    head_updated_at,
+                ),
+            ).fetchone()
+            if newer_job is not None:
+                connection.execute(
+                    "UPDATE review_jobs SET status = 'cancelled', error = ? WHERE id = ?",
+                    (f"superseded by {newer_job['head_sha']}", cursor.lastrowid),
+                )
+                return False
+
+            connection.execute(
+                "UPDATE review_jobs SET status = 'cancelled', error = ?, updated_at = ?"
+                " WHERE repo_owner = ? AND repo_name = ? AND pr_number = ? AND head_sha NOT IN (?, '')"
+                " AND status IN ('queued', 'running')"
+                " AND (? IS NULL OR head_updated_at IS NULL OR head_updated_at <= ?)",
+                (
+                    f"superseded by {job.head_sha}",
+                    now,
+                    job.repo_owner,
+                    job.repo_name,
+                    job.pr_number,
+                    job.head_sha,
+                    head_updated_at,
+                    head_updated_at,
+                ),
+            )
+            return True
+
+    def claim(self, worker_id: str) -> Optional[ReviewJob]:
+        """
+        Leases the oldest queued job, or a running job whose lease expired, to a worker.
+
+        Args:
+            worker_id (str): A name unique to the worker, for example "<hostname>-<pid>-<thread>".
+
+        Returns:
+            Optional[ReviewJob]: The claimed job, None when there is nothing to do.
+        """
+        now = time.time()
+        with self._transaction(immediate=True) as connection:
+            # Jobs that keep killing their workers are given up on
+            connection.execute(
+                "UPDATE review_jobs SET status = 'failed', lease_owner = NULL, updated_at = ?,"
+                " error = 'lease expired ' || attempts || ' times' WHERE status = 'running'"
+                " AND lease_expires_at < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = connection.execute(
+                "SELECT * FROM review_jobs WHERE (status = 'queued'"
+                " AND (deferred_until IS NULL OR deferred_until <= ?))"
+                " OR (status = 'running' AND lease_expires_at < ?) ORDER BY id LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                return None
+
+            connection.execute(
+                "UPDATE review_jobs SET status = 'running', lease_owner = ?, lease_expires_at = ?,"
+                " attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (worker_id, now + self.lease_seconds, now, row["id"]),
+            )
+
+        return ReviewJob(
+            repo_owner=row["repo_owner"],
+            repo_name=row["repo_name"],
+            pr_number=row["pr_number"],
+            head_sha=row["head_sha"] or None,
+            head_updated_at=(
+                datetime.fromtimestamp(row["head_updated_at"], timezone.utc)
+                if row["head_updated_at"] is not None
+                else None
+            ),
+            delivery_id=row["delivery_id"],
+            enqueued_at=datetime.fromisoformat(row["enqueued_at"]),
+            job_id=row["id"],
+            attempts=row["attempts"] + 1,
+        )
+
+    def complete(self, job_id: int, worker_id: str):
+        """Marks a job leased to the worker as done."""
+        self._release(job_id, worker_id, "done", None)
+
+    def cancel(self, job_id: int, worker_id: str, reason: str):
+        """Marks a job leased to the worker as cancelled, it is not retried."""
+        try:
+            self._release(job_id, worker_id, "cancelled", reason)
+        except ReviewCancelledError:
+            # Superseded in the store, the job is already cancelled
+            pass
+
+    def fail(self, job_id: int, worker_id: str, error: str):
+        """Queues a job leased to the worker again, or marks it as failed after max_attempts."""
+        with self._transaction(immediate=True) as connection:
+            self._renew_lease(connection, job_id, worker_id)
+            connection.execute(
+                "UPDATE review_jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,"
+                " error = ?, lease_owner = NULL, updated_at = ? WHERE id = ?",
+                (self.max_attempts, error, time.time(), job_id),
+            )
+
+    def defer(self, job_id: int, worker_id: str, reason: str, delay_seconds: float):
+        """
+        Queues a job leased to the worker again, claimable once the delay has passed.
+        A deferred attempt does not count towards max_attempts.
+        """
+        now = time.time()
+        with self._transaction(immediate=True) as connection:
+            self._renew_lease(connection, job_id, worker_id)
+            connection.execute(
+                "UPDATE review_jobs SET status = 'queued', attempts = attempts - 1, error = ?,"
+                " deferred_until = ?, lease_owner = NULL, updated_at = ? WHERE id = ?",
+                (reason, now + delay_seconds, now, job_id),
+            )
+
+    def renew_lease(self, job_id: int, worker_id: str):
+        """
+        Extends the lease of a job.
+
+        Raises:
+            LeaseLostError: When the job is no longer leased to the worker.
+            ReviewCancelledError: When the job was cancelled, by a job for a newer head commit.
+        """
+        with self._transaction() as connection:
+            self._renew_lease(connection, job_id, worker_id)
+
+    def count(self, status: str) -> int:
+        """Counts the jobs with a status: queued, running, done, failed or cancelled."""
+        with self._transaction() as connection:
+            return connection.execute(
+                "SELECT COUNT(*) FROM review_jobs WHERE status = ?", (status,)
+            ).fetchone()[0]
+
+    def stats(self) -> dict:
+        """Counts the jobs by status."""
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT status, COUNT(*) FROM review_jobs GROUP BY status"
+            ).fetchall()
+        return {
+            "queued": 0,
+            "running": 0,
+            "done": 0,
+            "failed": 0,
+            "cancelled": 0,
+            **dict(rows),
+        }
+
+    def job_status(self, job_id: int) -> dict:
+        """Gets the status of a job with its progress."""
+        with self._transaction() as connection:
+            job = connection.execute(
+                "SELECT status, attempts, error FROM review_jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            if job is None:
+                raise KeyError(f"Unknown review job {job_id}")
+
+            progress = connection.execute(
+                "SELECT (SELECT COUNT(*) FROM review_files WHERE job_id = :id),"
+                " (SELECT COALESCE(SUM(chunk_count), 0) FROM review_files WHERE job_id = :id),"
+                " (SELECT COUNT(*) FROM review_chunks WHERE job_id = :id),"
+                " (SELECT COUNT(*) FROM review_comments WHERE job_id = :id)",
+                {"id": job_id},
+            ).fetchone()
+
+        return {
+            "status": job["status"],
+            "attempts": job["attempts"],
+            "error": job["error"],
+            "files": progress[0],
+            "chunks": progress[1],
+            "reviewed_chunks": progress[2],
+            "comments": progress[3],
+        }
+
+    def progress(self, job: ReviewJob, worker_id: str) -> "ReviewJobProgress":
+        """Gets the progress recorder of a job leased to the worker."""
+        return ReviewJobProgress(self, job.job_id, worker_id)
+
+    def _release(self, job_id: int, worker_id: str, status: str, error: Optional[str]):
+        with self._transaction(immediate=True) as connection:
+            self._renew_lease(connection, job_id, worker_id)
+            connection.execute(
+                "UPDATE review_jobs SET status = ?, error = ?, lease_owner = NULL, updated_at = ?"
+                " WHERE id = ?",
+                (status, error, time.time(), job_id),
+            )
+
+    def _renew_lease(self, connection: sqlite3.Connection, job_id: int, worker_id: str):
+        renewed = connection.execute(
+            "UPDATE review_jobs SET lease_expires_at = ? WHERE id = ? AND lease_owner = ?"
+            " AND status = 'running'",
+            (time.time() + self.lease_seconds, job_id, worker_id),
+        ).rowcount
+        if not renewed:
+            self._raise_if_cancelled(connection, job_id)
+            raise LeaseLostError(
+                f"Review job {job_id} is no longer leased to {worker_id}"
+            )
+
+    def _raise_if_cancelled(self, connection: sqlite3.Connection, job_id: int):
+        row = connection.execute(
+            "SELECT status, error FROM review_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is not None and row["status"] == "cancelled":
+            raise ReviewCancelledError(
+                row["error"] or f"Review job {job_id} was cancelled"
+            )
+
+
+class ReviewJobProgress:
+    """
+    Records the progress of a leased review job so that a later attempt resumes where it stopped.
+
+    Recording progress renews the lease, and fails with LeaseLostError once another worker took the job over.
+    Recording or checking progress fails with ReviewCancelledError once the job is cancelled, even by another
+    process.
+    """
+
+    def __init__(self, job_store: ReviewJobStore, job_id: int, worker_id: str):
+        self.job_store = job_store
+        self.job_id = job_id
+        self.worker_id = worker_id
+
+    def renew_lease(self):
+        self.job_store.renew_lease(self.job_id, self.worker_id)
+
+    def record_file(self, file_path: str, chunk_count: int):
+        with self.job_store._transaction() as connection:
+            self.job_store._renew_lease(connection, self.job_id, self.worker_id)
+            connection.execute(
+                "INSERT OR REPLACE INTO review_files (job_id, file_path, chunk_count) VALUES (?, ?, ?)",
+                (self.job_id, file_path, chunk_count),
+            )
+
+    def is_chunk_reviewed(
+        self, file_path: str, chunk_index: int, chunk_text: str
+    ) -> bool:
+        """Whether the chunk was reviewed by an earlier attempt, its content must not have changed."""
+        with self.job_store._transaction() as connection:
+            self.job_store._raise_if_cancelled(connection, self.job_id)
+            row = connection.execute(
+                "SELECT chunk_hash FROM review_chunks WHERE job_id = ? AND file_path = ? AND chunk_index = ?",
+                (self.job_id, file_path, chunk_index),
+            ).fetchone()
+        return row is not None and row["chunk_hash"] == _hash(chunk_text)
+
+    def record_chunk_reviewed(self, file_path: str, chunk_index: int, chunk_text: str):
+        with self.job_store._transaction() as connection:
+            self.job_store._renew_lease(connection, self.job_id, self.worker_id)
+            connection.execute(
+                "INSERT OR REPLACE INTO review_chunks (job_id, file_path, chunk_index, chunk_hash,"
+                " completed_at) VALUES (?, ?, ?, ?, ?)",
+                (self.job_id, file_path, chunk_index, _hash(chunk_text), time.time()),
+            )
+
+    def is_comment_posted(self, file_path: str, line: int, text: str) -> bool:
+        with self.job_store._transaction() as connection:
+            self.job_store._raise_if_cancelled(connection, self.job_id)
+            return (
+                connection.execute(
+                    "SELECT 1 FROM review_comments WHERE job_id = ? AND file_path = ? AND line = ?"
+                    " AND text_hash = ?",
+                    (self.job_id, file_path, line, _hash(text)),
+                ).fetchone()
+                is not None
+            )
+
+    def record_comment_posted(self, file_path: str, line: int, text: str):
+        with self.job_store._transaction() as connection:
+            self.job_store._renew_lease(connection, self.job_id, self.worker_id)
+            connection.execute(
+                "INSERT OR IGNORE INTO review_comments (job_id, file_path, line, text_hash, posted_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (self.job_id, file_path, line, _hash(text), time.time()),
+            )
@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+from typing import Optional
+
+from application.indexes.symbol_index import SymbolIndex
+from application.parsers.python_symbol_parser import parse_python_symbols
+from core.instrumentation.stages import stage
+from core.models.file_symbols import FileSymbols
+from infrastructure.repositories.github_repository import GitHubRepository
+
+indexed_suffixes = (".py",)
+
+
+class SymbolIndexRepository:
+    """
+    Keeps a SymbolIndex per repository and base branch, shared by every review.
+
+    An index is built once from a tarball of the base branch, in a couple of requests. When a
+    later pull request targets a newer commit of the branch, only the files changed since the
+    indexed commit are fetched again. With a cache directory the indexes outlive the process.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_refreshed_files: int = 100,
+        max_file_bytes: int = 1_000_000,
+    ):
+        """
+        :param cache_dir: A directory where the indexes are saved and loaded from, they are kept in memory only when None.
+        :param max_refreshed_files: Past this number of changed files the index is rebuilt from a tarball instead.
+        :param max_file_bytes: Larger files are not indexed.
+        """
+        self.cache_dir = cache_dir
+        self.max_refreshed_files = max_refreshed_files
+        self.max_file_bytes = max_file_bytes
+        self._indexes: dict[str, SymbolIndex] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get_index(self, github_repository: GitHubRepository) -> SymbolIndex:
+        """
+        Gets the index of the base branch of a pull request, building or refreshing it when needed.
+
+        Args:
+            github_repository (GitHubRepository): The repository of the reviewed pull request.
+
+        Returns:
+            SymbolIndex: The index, at the base commit of the pull request or a newer one.
+        """
+        base = github_repository.pull_request.base
+        key = f"{github_repository.repo_owner}/{github_repository.repo_name}@{base.ref}"
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+
+        # Reviews of other repositories do not wait for this one to be indexed
+        with key_lock:
+            index = self._indexes.get(key) or self._load(key)
+            if index is not None and index.base_sha == base.sha:
+                self._indexes[key] = index
+                return index
+
+            with stage("symbol_index", repository=key) as stage_attributes:
+                if index is None or not self._refresh(
+                    github_repository, index, base.sha, stage_attributes
+                ):
+                    index = self._build(github_repository, base.sha, stage_attributes)
+            self._indexes[key] = index
+            self._save(key, index)
+            return index
+
+    def _build(
+        self, github_repository: GitHubRepository, sha: str, stage_attributes: dict
+    ) -> SymbolIndex:
+        index = SymbolIndex(base_sha=sha)
+        for path, source in github_repository.get_archive_files(
+            sha, indexed_suffixes, self.max_file_bytes
+        ):
+            index.update_file(parse_python_symbols(path, source))
+            stage_attributes["bytes"] = stage_attributes.get("bytes", 0) + len(
+                source.encode()
+            )
+        stage_attributes["requests"] = 2
+        stage_attributes["files"] = len(index)
+        return index
+
+    def _refresh(
+        self,
+        github_repository: GitHubRepository,
+        index: SymbolIndex,
+        sha: str,
+        stage_attributes: dict,
+    ) -> bool:
+        """
+        Updates the files changed between the indexed commit and a newer one.
+
+        Returns:
+            bool: False when the index must be rebuilt instead.
+        """
+        status, changed_files = github_repository.compare_commits(index.base_sha, sha)
+        stage_attributes["requests"] = 1
+        if status in ("behind", "identical"):
+            # The pull request targets an older commit, the index is recent enough
+            return True
+        if status != "ahead" or len(changed_files) > self.max_refreshed_files:
+            return False
+
+        for changed_file in changed_files:
+            if changed_file.previous_filename:
+                index.remove_file(changed_file.previous_filename)
+            if not changed_file.filename.endswith(indexed_suffixes):
+                continue
+            if changed_file.status == "removed":
+                index.remove_file(changed_file.filename)
+                continue
+            source = github_repository.get_file_content(changed_file.filename, ref=sha)
+            stage_attributes["requests"] += 1
+            index.update_file(parse_python_symbols(changed_file.filename, source or ""))
+        index.base_sha = sha
+        stage_attributes["files"] = len(changed_files)
+        return True
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(
+            self.cache_dir, key.replace("/", "__").replace("@", "__") + ".json"
+        )
+
+    def _load(self, key: str) -> Optional[SymbolIndex]:
+        if not self.cache_dir or not os.path.exists(self._cache_path(key)):
+            return None
+        with open(self._cache_path(key), encoding="utf-8") as cache_file:
+            cached = json.load(cache_file)
+        return SymbolIndex(
+            base_sha=cached["base_sha"],
+            files=[FileSymbols.model_validate(file) for file in cached["files"]],
+        )
+
+    def _save(self, key: str, index: SymbolIndex):
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Written aside then renamed, a crash never leaves a truncated index behind
+        temporary_path = self._cache_path(key) + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as cache_file:
+            json.dump(
+                {
+                    "base_sha": index.base_sha,
+                    "files": [file.model_dump() for file in index.files()],
+                },
+                cache_file,
+            )
+        os.replace(temporary_path, self._cache_path(key))
@@ -0,0 +1,204 @@
+import hashlib
+import os
+import re
+import threading
+
+import numpy as np
+
+from application.indexes.vector_index import VectorIndex
+from application.text_splitters.code_snippet_splitter import split_code_snippets
+from core.instrumentation.stages import stage
+from infrastructure.repositories.github_repository import GitHubRepository
+
+code_suffixes = (
+    ".py",
+    ".js",
+    ".jsx",
+    ".ts",
+    ".tsx",
+    ".java",
+    ".kt",
+    ".go",
+    ".rs",
+    ".rb",
+    ".php",
+    ".cs",
+    ".c",
+    ".h",
+    ".cpp",
+    ".hpp",
+    ".swift",
+)
+
+
+def git_blob_sha(content: bytes) -> str:
+    """Returns the SHA git names a file content with, the one GitHub reports for the files of a comparison."""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class VectorIndexRepository:
+    """
+    Keeps a VectorIndex per repository and base branch on disk, shared by every review.
+
+    The first index of a branch embeds every code file of a tarball of the branch. Later pull
+    requests only embed the files whose blob SHA changed since the indexed commit, whether the
+    index is refreshed from a comparison or rebuilt from a tarball.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        embedder,
+        max_refreshed_files: int = 100,
+        max_file_bytes: int = 200_000,
+        snippet_lines: int = 40,
+        embedding_batch_size: int = 64,
+    ):
+        """
+        :param directory: Where the indexes are saved, one sub-directory per repository and branch.
+        :param embedder: Embeds texts with `embed_documents`, like LangChain embeddings or a HashingEmbedder.
+        :param max_refreshed_files: Past this number of changed files the index is rebuilt from a tarball instead.
+        :param max_file_bytes: Larger files, often generated or minified, are not indexed.
+        :param snippet_lines: The maximum number of lines of an indexed snippet.
+        :param embedding_batch_size: The number of snippets embedded by a single call.
+        """
+        self.directory = directory
+        self.embedder = embedder
+        self.model = getattr(embedder, "model", type(embedder).__name__)
+        self.max_refreshed_files = max_refreshed_files
+        self.max_file_bytes = max_file_bytes
+        self.snippet_lines = snippet_lines
+        self.embedding_batch_size = embedding_batch_size
+        self._indexes: dict[str, VectorIndex] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Embeds texts in batches, into the rows of a matrix."""
+        batches = [
+            np.asarray(
+                self.embedder.embed_documents(
+                    texts[start : start + self.embedding_batch_size]
+                ),
+                dtype=np.float32,
+            )
+            for start in range(0, len(texts), self.embedding_batch_size)
+        ]
+        return np.concatenate(batches) if batches else np.zeros((0, 0), np.float32)
+
+    def get_index(self, github_repository: GitHubRepository) -> VectorIndex:
+        """
+        Gets the index of the base branch of a pull request, building or refreshing it when needed.
+
+        Args:
+            github_repository (GitHubRepository): The repository of the reviewed pull request.
+
+        Returns:
+            VectorIndex: The index, at the base commit of the pull request or a newer one.
+        """
+        base = github_repository.pull_request.base
+        key = f"{github_repository.repo_owner}/{github_repository.repo_name}@{base.ref}"
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = VectorIndex(
+                    os.path.join(self.directory, re.sub(r"[^\w.-]", "__", key)),
+                    model=self.model,
+                    dimensions=len(self.embedder.embed_query("dimensions")),
+                )
+                self._indexes[key] = index
+            if index.base_sha == base.sha:
+                return index
+
+            with stage("vector_index", repository=key) as stage_attributes:
+                stage_attributes.update(requests=0, files=0, snippets=0)
+                if not index.base_sha or not self._refresh(
+                    github_repository, index, base.sha, stage_attributes
+                ):
+                    self._build(github_repository, index, base.sha, stage_attributes)
+                index.base_sha = base.sha
+                index.save()
+            return index
+
+    def _build(
+        self,
+        github_repository: GitHubRepository,
+        index: VectorIndex,
+        sha: str,
+        stage_attributes: dict,
+    ):
+        archive_paths = set()
+        changed_files = []
+        for path, source in github_repository.get_archive_files(
+            sha, code_suffixes, self.max_file_bytes
+        ):
+            archive_paths.add(path)
+            blob_sha = git_blob_sha(source.encode())
+            if index.blob_sha(path) != blob_sha:
+                changed_files.append((path, blob_sha, source))
+        stage_attributes["requests"] += 2
+        for path in set(index.paths()) - archive_paths:
+            index.remove_file(path)
+        self._embed_files(index, changed_files, stage_attributes)
+
+    def _refresh(
+        self,
+        github_repository: GitHubRepository,
+        index: VectorIndex,
+        sha: str,
+        stage_attributes: dict,
+    ) -> bool:
+        """
+        Embeds the files changed between the indexed commit and a newer one.
+
+        Returns:
+            bool: False when the index must be rebuilt instead.
+        """
+        status, compared_files = github_repository.compare_commits(index.base_sha, sha)
+        stage_attributes["requests"] += 1
+        if status in ("behind", "identical"):
+            return True
+        if status != "ahead" or len(compared_files) > self.max_refreshed_files:
+            return False
+
+        changed_files = []
+        for compared_file in compared_files:
+            if compared_file.previous_filename:
+                index.remove_file(compared_file.previous_filename)
+            if not compared_file.filename.endswith(code_suffixes):
+                continue
+            if compared_file.status == "removed":
+                index.remove_file(compared_file.filename)
+                continue
+            if index.blob_sha(compared_file.filename) == compared_file.sha:
+                continue
+            source = github_repository.get_file_content(compared_file.filename, ref=sha)
+            stage_attributes["requests"] += 1
+            if source is None or len(source.encode()) > self.max_file_bytes:
+                index.remove_file(compared_file.filename)
+                continue
+            changed_files.append(
+                (compared_file.filename, git_blob_sha(source.encode()), source)
+            )
+        self._embed_files(index, changed_files, stage_attributes)
+        return True
+
+    def _embed_files(
+        self, index: VectorIndex, changed_files: list[tuple], stage_attributes: dict
+    ):
+        """Embeds the snippets of the changed files in as few calls as possible."""
+        files_snippets = [
+            (path, blob_sha, split_code_snippets(path, source, self.snippet_lines))
+            for path, blob_sha, source in changed_files
+        ]
+        vectors = self.embed(
+            [snippet.text for _, _, snippets in files_snippets for snippet in snippets]
+        )
+        for path, blob_sha, snippets in files_snippets:
+            index.update_file(path, blob_sha, snippets, vectors[: len(snippets)])
+            vectors = vectors[len(snippets) :]
+            stage_attributes["snippets"] += len(snippets)
+        stage_attributes["files"] += len(changed_files)
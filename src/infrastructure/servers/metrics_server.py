@@ -0,0 +1,68 @@
+import threading
+from typing import Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core.instrumentation.run_metrics import RunMetrics
+
+prometheus_content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsServer:
+    """
+    Serves run metrics in the Prometheus text format on `/metrics` from a background thread.
+    """
+
+    def __init__(
+        self,
+        run_metrics: RunMetrics,
+        host: str = "127.0.0.1",
+        port: int = 9464,
+        metric_sources: Optional[list] = None,
+    ):
+        """
+        :param run_metrics: The metrics to expose.
+        :param host: The interface to listen on.
+        :param port: The port to listen on, 0 picks a free one.
+        :param metric_sources: Other objects with a `to_prometheus` method, like an AdaptiveConcurrencyLimiter,
+            whose metrics are exposed after the run metrics.
+        """
+        self.run_metrics = run_metrics
+        self.metric_sources = metric_sources or []
+        self._server = ThreadingHTTPServer((host, port), self._create_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _create_handler(self):
+        metric_sources = [self.run_metrics, *self.metric_sources]
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = "".join(
+                    metric_source.to_prometheus() for metric_source in metric_sources
+                ).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", prometheus_content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Keep scrapes out of the console
+                pass
+
+        return MetricsRequestHandler
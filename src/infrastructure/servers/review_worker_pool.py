@@ -0,0 +1,307 @@
+import contextvars
+import os
+import queue
+import socket
+import threading
+from collections import deque
+from typing import Optional
+
+from core.concurrency.cancellation import (
+    CancellationToken,
+    ReviewCancelledError,
+    ReviewRunRegistry,
+)
+from core.instrumentation.stages import StageObserver
+from core.models.pull_request_review_result import PullRequestReviewResult
+from core.models.review_job import ReviewJob
+from infrastructure.agents.review_runner import ReviewRunner
+from infrastructure.repositories.review_job_store import LeaseLostError, ReviewJobStore
+
+
+class ReviewWorkerPool:
+    """
+    Processes review jobs from a bounded queue with a fixed number of long-lived worker threads.
+
+    Workers share the runner, so clients, connection pools, the prompt template and the
+    tokenizer stay warm between jobs. A job already waiting for the same pull request and
+    head commit is not enqueued twice, and a job for a newer head commit cancels the in-flight
+    and waiting reviews of the older commits of its pull request.
+
+    With a job store the queue is durable: jobs are claimed from the store with a lease, several
+    processes can serve the same store, and a job interrupted by a crash is resumed from its last
+    reviewed chunk by the next worker claiming it.
+
+    A review rejected by an open circuit breaker is deferred: the job is queued again once the
+    circuit lets probes through, without counting as a failed attempt.
+    """
+
+    def __init__(
+        self,
+        review_runner: ReviewRunner,
+        workers: int = 4,
+        max_queue_size: int = 100,
+        kept_results: int = 100,
+        observers: Optional[list[StageObserver]] = None,
+        job_store: Optional[ReviewJobStore] = None,
+        poll_interval_seconds: float = 1.0,
+        run_registry: Optional[ReviewRunRegistry] = None,
+    ):
+        """
+        :param review_runner: The runner reviewing the jobs.
+        :param workers: The number of worker threads.
+        :param max_queue_size: The maximum number of waiting jobs.
+        :param kept_results: The number of most recent results kept for inspection.
+        :param observers: Observers of the stages of every review, like server-wide metrics.
+        :param job_store: A durable job store replacing the in-memory queue.
+        :param poll_interval_seconds: How often idle workers look for jobs in the job store.
+        :param run_registry: The registry cancelling superseded reviews, one is created when None.
+        """
+        self.review_runner = review_runner
+        self.workers = workers
+        self.observers = observers or []
+        self.job_store = job_store
+        self.poll_interval_seconds = poll_interval_seconds
+        self.max_queue_size = max_queue_size
+        self.run_registry = run_registry or ReviewRunRegistry()
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.deferred = 0
+        self.in_flight = 0
+        # The llm work spent on reviews cancelled by a newer commit
+        self.wasted = {"llm_calls": 0, "input_tokens": 0, "output_tokens": 0}
+        self.results: deque[PullRequestReviewResult] = deque(maxlen=kept_results)
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._pending_keys: set[tuple] = set()
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self._stopping = threading.Event()
+
+    @property
+    def queue_depth(self) -> int:
+        if self.job_store:
+            return self.job_store.count("queued")
+        return self._queue.qsize()
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(self._work_from_store if self.job_store else self._work,),
+                name=f"review-worker-{index}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Lets the workers finish the queued jobs, then stops them.
+        With a job store the workers only finish their current job, the queued ones stay in the store.
+        """
+        self._stopping.set()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._stopping.clear()
+
+    def is_healthy(self) -> bool:
+        return bool(self._threads) and all(
+            thread.is_alive() for thread in self._threads
+        )
+
+    def submit(self, job: ReviewJob) -> bool:
+        """
+        Enqueues a review job.
+
+        Args:
+            job (ReviewJob): The job to enqueue.
+
+        Returns:
+            bool: False when an identical job is already waiting, or already reviewed with a job store.
+
+        Raises:
+            queue.Full: When the queue is full.
+        """
+        cancelled_reviews = self.run_registry.supersede(
+            job.repo_owner,
+            job.repo_name,
+            job.pr_number,
+            job.head_sha,
+            job.head_updated_at,
+        )
+        if cancelled_reviews:
+            print(f"Cancelled {cancelled_reviews} outdated reviews of {job.url}")
+
+        if self.job_store:
+            if self.job_store.count("queued") >= self.max_queue_size:
+                raise queue.Full()
+            return self.job_store.enqueue(job)
+
+        key = (job.repo_owner, job.repo_name, job.pr_number, job.head_sha)
+        with self._lock:
+            if key in self._pending_keys:
+                return False
+            # Registered while waiting, so that a newer head commit cancels the waiting review too
+            cancellation_token = self.run_registry.start(
+                job.repo_owner,
+                job.repo_name,
+                job.pr_number,
+                job.head_sha,
+                job.head_updated_at,
+            )
+            try:
+                self._queue.put_nowait((job, cancellation_token))
+            except queue.Full:
+                self.run_registry.finish(
+                    job.repo_owner, job.repo_name, job.pr_number, cancellation_token
+                )
+                raise
+            self._pending_keys.add(key)
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                "queue_depth": self.queue_depth,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "deferred": self.deferred,
+                "wasted": dict(self.wasted),
+                "workers": self.workers,
+            }
+        if self.job_store:
+            stats["jobs"] = self.job_store.stats()
+        return stats
+
+    def _work(self):
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                self._queue.task_done()
+                return
+
+            job, cancellation_token = entry
+            with self._lock:
+                self._pending_keys.discard(
+                    (job.repo_owner, job.repo_name, job.pr_number, job.head_sha)
+                )
+            result = self._review(job, cancellation_token)
+            if result.status == "deferred":
+                self._defer(job, result.retry_after_seconds)
+            self._queue.task_done()
+
+    def _work_from_store(self):
+        worker_id = (
+            f"{socket.gethostname()}-{os.getpid()}-{threading.current_thread().name}"
+        )
+        while not self._stopping.is_set():
+            job = self.job_store.claim(worker_id)
+            if job is None:
+                self._stopping.wait(self.poll_interval_seconds)
+                continue
+
+            result = self._review(
+                job, review_progress=self.job_store.progress(job, worker_id)
+            )
+            try:
+                if result.status == "cancelled":
+                    self.job_store.cancel(job.job_id, worker_id, result.error)
+                elif result.status == "deferred":
+                    self.job_store.defer(
+                        job.job_id,
+                        worker_id,
+                        result.error,
+                        result.retry_after_seconds or 0.0,
+                    )
+                elif result.status == "failed":
+                    self.job_store.fail(job.job_id, worker_id, result.error)
+                else:
+                    self.job_store.complete(job.job_id, worker_id)
+            except LeaseLostError as e:
+                # Another worker resumed the job, it reports the outcome
+                print(e)
+            except ReviewCancelledError as e:
+                # A job for a newer head commit cancelled it while the review ended
+                print(f"Review job {job.job_id} was cancelled: {e}")
+
+    def _defer(self, job: ReviewJob, delay_seconds: Optional[float]):
+        """Submits a deferred job again once the delay has passed, unless the pool is stopping."""
+
+        def resubmit():
+            if self._stopping.is_set():
+                return
+            try:
+                self.submit(job)
+            except queue.Full:
+                print(f"Gave up on deferred review of {job.url}: the queue is full")
+
+        timer = threading.Timer(delay_seconds or 0.0, resubmit)
+        timer.daemon = True
+        timer.start()
+
+    def _review(
+        self,
+        job: ReviewJob,
+        cancellation_token: Optional[CancellationToken] = None,
+        **kwargs,
+    ) -> PullRequestReviewResult:
+        if cancellation_token is None:
+            cancellation_token = self.run_registry.start(
+                job.repo_owner,
+                job.repo_name,
+                job.pr_number,
+                job.head_sha,
+                job.head_updated_at,
+            )
+        with self._lock:
+            self.in_flight += 1
+
+        try:
+            if cancellation_token.cancelled:
+                result = PullRequestReviewResult(
+                    url=job.url, status="cancelled", error=cancellation_token.reason
+                )
+            else:
+                result = self.review_runner.review(
+                    job.url,
+                    job.repo_owner,
+                    job.repo_name,
+                    job.pr_number,
+                    observers=self.observers,
+                    cancellation_token=cancellation_token,
+                    **kwargs,
+                )
+        except Exception as e:
+            result = PullRequestReviewResult(
+                url=job.url, status="failed", error=f"{type(e).__name__}: {e}"
+            )
+        finally:
+            self.run_registry.finish(
+                job.repo_owner, job.repo_name, job.pr_number, cancellation_token
+            )
+
+        with self._lock:
+            self.in_flight -= 1
+            if result.status == "failed":
+                self.failed += 1
+            elif result.status == "deferred":
+                self.deferred += 1
+            elif result.status == "cancelled":
+                self.cancelled += 1
+                self.wasted["llm_calls"] += result.llm_calls
+                self.wasted["input_tokens"] += result.input_tokens
+                self.wasted["output_tokens"] += result.output_tokens
+            else:
+                self.completed += 1
+            self.results.append(result)
+        print(
+            f"{result.status} {result.url} in {result.wall_time_seconds:.1f}s"
+            + (f": {result.error}" if result.error else "")
+        )
+        return result
@@ -0,0 +1,185 @@
+import json
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from application.parsers.github_webhook_parser import (
+    parse_pull_request_event,
+    verify_webhook_signature,
+)
+from core.instrumentation.run_metrics import RunMetrics
+from infrastructure.servers.metrics_server import prometheus_content_type
+from infrastructure.servers.review_worker_pool import ReviewWorkerPool
+
+
+class WebhookServer:
+    """
+    Receives GitHub webhook deliveries and enqueues a review job for every pull_request
+    event that brings new code.
+
+    Endpoints:
+        POST /webhook  Signed GitHub deliveries (X-Hub-Signature-256).
+        GET /healthz   200 while every worker is alive, 503 otherwise.
+        GET /queue     The queue depth and job counters, as JSON.
+        GET /metrics   The stage metrics of all the reviews, in the Prometheus text format.
+    """
+
+    def __init__(
+        self,
+        worker_pool: ReviewWorkerPool,
+        webhook_secret: str,
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        run_metrics: Optional[RunMetrics] = None,
+        max_body_bytes: int = 25 * 1024 * 1024,
+        metric_sources: Optional[list] = None,
+    ):
+        """
+        :param worker_pool: The pool processing the review jobs.
+        :param webhook_secret: The secret the webhook deliveries are signed with.
+        :param host: The interface to listen on.
+        :param port: The port to listen on, 0 picks a free one.
+        :param run_metrics: Metrics exposed on /metrics, usually observed by the worker pool.
+        :param max_body_bytes: Deliveries above this size are rejected, GitHub caps payloads at 25 MB.
+        :param metric_sources: Other objects with a `to_prometheus` method exposed on /metrics after the run metrics.
+        """
+        if not webhook_secret:
+            raise ValueError(
+                "A webhook secret is required to verify GitHub deliveries."
+            )
+
+        self.worker_pool = worker_pool
+        self.webhook_secret = webhook_secret
+        self.run_metrics = run_metrics
+        self.max_body_bytes = max_body_bytes
+        self.metric_sources = metric_sources or []
+        self._server = ThreadingHTTPServer((host, port), self._create_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def handle_delivery(
+        self, event: Optional[str], delivery_id: Optional[str], payload: dict
+    ) -> tuple[int, dict]:
+        """
+        Handles a verified webhook delivery.
+
+        Returns:
+            tuple[int, dict]: The HTTP status code and the JSON response.
+        """
+        if event == "ping":
+            return 200, {"status": "pong"}
+        if event != "pull_request":
+            return 202, {"status": "ignored", "reason": f"unsupported event {event}"}
+
+        try:
+            job = parse_pull_request_event(payload, delivery_id=delivery_id)
+        except (KeyError, TypeError, ValueError) as e:
+            return 400, {"status": "rejected", "reason": f"invalid payload: {e}"}
+        if job is None:
+            return 202, {"status": "ignored", "reason": "no new code to review"}
+
+        try:
+            enqueued = self.worker_pool.submit(job)
+        except queue.Full:
+            return 503, {"status": "rejected", "reason": "review queue is full"}
+
+        return 202, {
+            "status": "enqueued" if enqueued else "duplicate",
+            "pull_request": job.url,
+            "head_sha": job.head_sha,
+            "queue_depth": self.worker_pool.queue_depth,
+        }
+
+    def _create_handler(self):
+        server = self
+
+        class WebhookRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/healthz":
+                    healthy = server.worker_pool.is_healthy()
+                    self._send_json(
+                        200 if healthy else 503,
+                        {"status": "ok" if healthy else "unhealthy"},
+                    )
+                elif self.path == "/queue":
+                    self._send_json(200, server.worker_pool.stats())
+                elif self.path == "/metrics" and server.run_metrics is not None:
+                    body = "".join(
+                        metric_source.to_prometheus()
+                        for metric_source in [
+                            server.run_metrics,
+                            *server.metric_sources,
+                        ]
+                    ).encode("utf-8")
+                    self._send(200, prometheus_content_type, body)
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                if self.path != "/webhook":
+                    self.send_error(404)
+                    return
+
+                content_length = int(self.headers.get("Content-Length") or 0)
+                if content_length > server.max_body_bytes:
+                    self._send_json(
+                        413, {"status": "rejected", "reason": "payload too large"}
+                    )
+                    return
+
+                body = self.rfile.read(content_length)
+                if not verify_webhook_signature(
+                    server.webhook_secret, body, self.headers.get("X-Hub-Signature-256")
+                ):
+                    self._send_json(
+                        401, {"status": "rejected", "reason": "invalid signature"}
+                    )
+                    return
+
+                try:
+                    payload = json.loads(body)
+                except ValueError:
+                    self._send_json(
+                        400, {"status": "rejected", "reason": "invalid JSON"}
+                    )
+                    return
+
+                status, response = server.handle_delivery(
+                    self.headers.get("X-GitHub-Event"),
+                    self.headers.get("X-GitHub-Delivery"),
+                    payload,
+                )
+                self._send_json(status, response)
+
+            def _send_json(self, status: int, response: dict):
+                self._send(
+                    status, "application/json", json.dumps(response).encode("utf-8")
+                )
+
+            def _send(self, status: int, content_type: str, body: bytes):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Keep health checks and scrapes out of the console
+                pass
+
+        return WebhookRequestHandler
@@ -0,0 +1,125 @@
+import json
+import threading
+from typing import Optional
+
+from application.sinks.comment_sink import CommentSink
+from core.models.comment import Comment
+
+sarif_schema = "https://json.schemastore.org/sarif-2.1.0.json"
+sarif_rule_id = "review-comment"
+
+
+class FileCommentSink(CommentSink):
+    """
+    Writes comments to a file instead of posting them, for dry runs.
+
+    JSONL files get one comment per line as soon as it is added, so that an interrupted run keeps
+    its comments. SARIF files are written on close, in the format code scanning tools and CI
+    annotations consume.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        output_format: str = "jsonl",
+        head_sha: Optional[str] = None,
+        repository_url: Optional[str] = None,
+    ):
+        """
+        :param path: The file to write, overwritten if it exists.
+        :param output_format: "jsonl" or "sarif".
+        :param head_sha: The head commit of the pull request, set on the comments that have none.
+        :param repository_url: The repository URL, recorded in SARIF files.
+        """
+        if output_format not in ("jsonl", "sarif"):
+            raise ValueError(
+                f"Unsupported comment file format {output_format}, expected jsonl or sarif."
+            )
+
+        self.path = path
+        self.output_format = output_format
+        self.head_sha = head_sha
+        self.repository_url = repository_url
+        self.comments: list[Comment] = []
+        self._lock = threading.Lock()
+        self._file = (
+            open(path, "w", encoding="utf-8") if output_format == "jsonl" else None
+        )
+
+    @staticmethod
+    def for_path(path: str, **kwargs) -> "FileCommentSink":
+        """Creates a sink whose format follows the extension of the path, .sarif or JSONL otherwise."""
+        output_format = "sarif" if path.endswith((".sarif", ".sarif.json")) else "jsonl"
+        return FileCommentSink(path, output_format=output_format, **kwargs)
+
+    def add_comment(self, comment: Comment) -> Comment:
+        if comment.sha is None:
+            comment = comment.model_copy(update={"sha": self.head_sha})
+
+        with self._lock:
+            self.comments.append(comment)
+            if self._file is not None:
+                self._file.write(comment.model_dump_json() + "\n")
+                self._file.flush()
+        return comment
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            elif self.output_format == "sarif":
+                with open(self.path, "w", encoding="utf-8") as sarif_file:
+                    json.dump(self.to_sarif(), sarif_file, indent=2)
+
+    def to_sarif(self) -> dict:
+        """Converts the comments to a SARIF 2.1.0 log."""
+        run = {
+            "tool": {
+                "driver": {
+                    "name": "ReviewPal",
+                    "informationUri": "https://github.com/Maokli/ReviewPal",
+                    "rules": [
+                        {
+                            "id": sarif_rule_id,
+                            "shortDescription": {"text": "Code review comment"},
+                        }
+                    ],
+                }
+            },
+            "results": [
+                {
+                    "ruleId": sarif_rule_id,
+                    "level": "note",
+                    "message": {"text": comment.text},
+                    "locations": [
+                        {
+                            "physicalLocation": {
+                                "artifactLocation": {"uri": comment.file_path},
+                                "region": {"startLine": comment.line},
+                            }
+                        }
+                    ],
+                }
+                for comment in self.comments
+            ],
+        }
+        if self.repository_url:
+            run["versionControlProvenance"] = [
+                {
+                    "repositoryUri": self.repository_url,
+                    **({"revisionId": self.head_sha} if self.head_sha else {}),
+                }
+            ]
+
+        return {"$schema": sarif_schema, "version": "2.1.0", "runs": [run]}
+
+    @staticmethod
+    def read_comments(path: str) -> list[Comment]:
+        """Reads the comments of a JSONL file, for example to post the comments of a dry run."""
+        with open(path, encoding="utf-8") as comments_file:
+            return [
+                Comment.model_validate_json(line)
+                for line in comments_file
+                if line.strip()
+            ]
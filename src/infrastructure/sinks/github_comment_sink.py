@@ -0,0 +1,23 @@
+from application.sinks.comment_sink import CommentSink
+from application.use_cases.add_comment_to_pull_request import AddCommentUseCase
+from core.models.comment import Comment
+from infrastructure.repositories.github_repository import GitHubRepository
+
+
+class GitHubCommentSink(CommentSink):
+    """
+    Posts comments on the pull request.
+    """
+
+    def __init__(
+        self,
+        github_repository: GitHubRepository,
+        add_comment_use_case: AddCommentUseCase,
+    ):
+        self.github_repository = github_repository
+        self.add_comment_use_case = add_comment_use_case
+
+    def add_comment(self, comment: Comment) -> Comment:
+        return self.add_comment_use_case.invoke(
+            githubRepository=self.github_repository, comment=comment
+        )
@@ -0,0 +1,281 @@
+import argparse
+import contextvars
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Iterable
+
+from dotenv import load_dotenv
+from presentation.cli import (
+    add_adaptive_concurrency_arguments,
+    add_circuit_breaker_arguments,
+    add_hedging_arguments,
+    add_llm_endpoints_argument,
+    add_memory_cap_argument,
+    add_pipeline_arguments,
+    add_related_code_arguments,
+    add_streaming_argument,
+    add_symbol_context_arguments,
+    add_triage_arguments,
+    create_dependency_guards,
+    create_hedging_policy,
+    create_llm_pool,
+    create_memory_budget,
+    create_review_llm,
+    create_symbol_indexes,
+    create_vector_indexes,
+    create_triage_llm,
+    get_pull_request_info_from_github_url,
+)
+
+if TYPE_CHECKING:
+    # Imported where used, like in cli.py, to keep --help fast
+    from core.models.pull_request_review_result import PullRequestReviewResult
+    from infrastructure.agents.review_runner import ReviewRunner
+
+
+def read_pull_request_urls(lines: Iterable[str]) -> list[str]:
+    """
+    Reads pull request URLs, one per line. Blank lines, "#" comments and duplicates are skipped.
+
+    Args:
+        lines (Iterable[str]): The lines to read, for example an open file or stdin.
+
+    Returns:
+        list[str]: The pull request URLs in their original order.
+    """
+    urls: list[str] = []
+    for line in lines:
+        url = line.split("#", 1)[0].strip()
+        if url and url not in urls:
+            urls.append(url)
+    return urls
+
+
+def review_pull_requests(
+    urls: list[str], review_runner: "ReviewRunner", max_concurrent_reviews: int
+) -> list["PullRequestReviewResult"]:
+    """
+    Reviews pull requests concurrently, the global llm and GitHub limits being enforced by the runner.
+
+    Args:
+        urls (list[str]): The pull request URLs.
+        review_runner (ReviewRunner): The runner sharing clients and limits between reviews.
+        max_concurrent_reviews (int): The maximum number of pull requests reviewed at once.
+
+    Returns:
+        list[PullRequestReviewResult]: The result of every review, in the order of the URLs.
+    """
+
+    from core.models.pull_request_review_result import PullRequestReviewResult
+
+    def review(url: str) -> PullRequestReviewResult:
+        try:
+            repo_owner, repo_name, pull_request_number = (
+                get_pull_request_info_from_github_url(url)
+            )
+        except ValueError as e:
+            return PullRequestReviewResult(url=url, status="failed", error=str(e))
+
+        return review_runner.review(url, repo_owner, repo_name, pull_request_number)
+
+    with ThreadPoolExecutor(max_workers=max_concurrent_reviews) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, review, url) for url in urls
+        ]
+        return [future.result() for future in futures]
+
+
+def print_summary(results: list["PullRequestReviewResult"]):
+    """Prints a table with the outcome of every review."""
+    print(
+        f"{'status':<9} {'time s':>8} {'files':>6} {'llm calls':>9} {'tokens in':>10} "
+        f"{'cached':>8} {'tokens out':>10} {'comments':>8} {'avoided':>7}  url"
+    )
+    for result in results:
+        print(
+            f"{result.status:<9} {result.wall_time_seconds:>8.1f} {result.files:>6} "
+            f"{result.llm_calls:>9} {result.input_tokens:>10} {result.cached_tokens:>8} "
+            f"{result.output_tokens:>10} {result.comments:>8} {result.avoided_llm_calls:>7}  {result.url}"
+        )
+        if result.error:
+            print(f"          error: {result.error}")
+
+
+def get_args() -> argparse.Namespace:
+    """Gets the arguments passed in the command line.
+
+    Returns:
+        argparse.Namespace: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Review many pull requests concurrently with shared GitHub and llm clients."
+    )
+    parser.add_argument(
+        "--file",
+        help="File with one pull request URL per line, stdin is read when omitted",
+    )
+    parser.add_argument(
+        "--max-concurrent-reviews",
+        type=int,
+        default=4,
+        help="Pull requests reviewed at once",
+    )
+    parser.add_argument(
+        "--llm-concurrency",
+        type=int,
+        default=4,
+        help="Chunk reviews in flight across all pull requests",
+    )
+    parser.add_argument(
+        "--github-concurrency",
+        type=int,
+        default=8,
+        help="GitHub requests in flight across all pull requests",
+    )
+    parser.add_argument(
+        "--file-concurrency",
+        type=int,
+        default=1,
+        help="Files of a pull request reviewed concurrently",
+    )
+    parser.add_argument("--model", default="gpt-4o-mini", help="The reviewing model")
+    add_triage_arguments(parser)
+    add_streaming_argument(parser)
+    add_adaptive_concurrency_arguments(parser)
+    add_llm_endpoints_argument(parser)
+    add_hedging_arguments(parser)
+    add_circuit_breaker_arguments(parser)
+    add_symbol_context_arguments(parser)
+    add_related_code_arguments(parser)
+    add_memory_cap_argument(parser)
+    add_pipeline_arguments(parser)
+    parser.add_argument(
+        "--summary", help="Path of a JSON file with the result of every review"
+    )
+    parser.add_argument(
+        "--openai-batch",
+        action="store_true",
+        help="Submit every review through the OpenAI Batch API instead, cheaper but slower",
+    )
+
+    return parser.parse_args()
+
+
+def main() -> int:
+    """
+    Reviews every pull request listed in the input and prints a summary.
+
+    Returns:
+        int: The exit code, 1 when any review failed or was deferred by an open circuit.
+    """
+    args = get_args()
+    if not load_dotenv():
+        raise ValueError(
+            "Error: .env file not found. Ensure it exists in the project's root directory."
+        )
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as urls_file:
+            urls = read_pull_request_urls(urls_file)
+    else:
+        urls = read_pull_request_urls(sys.stdin)
+
+    if args.openai_batch:
+        return review_pull_requests_with_openai_batch(urls, args.model)
+
+    from infrastructure.agents.review_runner import ReviewRunner
+
+    llm_pool = create_llm_pool(args)
+    llm = (
+        create_review_llm(
+            args.model,
+            adaptive_concurrency=args.adaptive_concurrency,
+        )
+        if llm_pool is None
+        else None
+    )
+    github_guard, llm_guard = create_dependency_guards(args)
+    review_runner = ReviewRunner(
+        llm=llm,
+        llm_concurrency=args.llm_concurrency,
+        github_concurrency=args.github_concurrency,
+        file_concurrency=args.file_concurrency,
+        triage_llm=create_triage_llm(args),
+        triage_threshold=args.triage_threshold,
+        triage_batch_size=args.triage_batch_size,
+        streaming=args.stream,
+        adaptive_concurrency=args.adaptive_concurrency,
+        max_llm_concurrency=args.max_llm_concurrency,
+        rate_limit_retries=args.rate_limit_retries,
+        llm_pool=llm_pool,
+        hedging_policy=create_hedging_policy(args),
+        github_guard=github_guard,
+        llm_guard=llm_guard,
+        symbol_indexes=create_symbol_indexes(args),
+        context_tokens=args.context_tokens,
+        vector_indexes=create_vector_indexes(args),
+        related_snippets=args.related_snippets,
+        memory_budget=create_memory_budget(args),
+        pipelined=args.pipeline,
+        fetch_concurrency=args.fetch_concurrency,
+        split_concurrency=args.split_concurrency,
+        post_concurrency=args.post_concurrency,
+    )
+
+    results = review_pull_requests(urls, review_runner, args.max_concurrent_reviews)
+    print_summary(results)
+
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as summary_file:
+            json.dump(
+                [result.model_dump() for result in results], summary_file, indent=2
+            )
+
+    return (
+        1 if any(result.status in ("failed", "deferred") for result in results) else 0
+    )
+
+
+def review_pull_requests_with_openai_batch(urls: list[str], model: str) -> int:
+    """
+    Reviews every pull request through a single OpenAI batch, the invalid URLs being reported and skipped.
+
+    Returns:
+        int: The exit code, 1 when a URL is invalid or the comments of a chunk could not be posted.
+    """
+    from core.models.pull_request_review_result import PullRequestReviewResult
+
+    pull_requests = []
+    invalid_results = []
+    for url in urls:
+        try:
+            pull_requests.append(get_pull_request_info_from_github_url(url))
+        except ValueError as e:
+            invalid_results.append(
+                PullRequestReviewResult(url=url, status="failed", error=str(e))
+            )
+    if invalid_results:
+        print_summary(invalid_results)
+    if not pull_requests:
+        return 1 if invalid_results else 0
+
+    from openai import OpenAI
+    from infrastructure.agents.batch_review_agent import BatchReviewAgent
+    from infrastructure.repositories.github_repository import GitHubRepository
+
+    batch_review_agent = BatchReviewAgent(
+        client=OpenAI(),
+        model=model,
+        pull_requests=pull_requests,
+        github_client=GitHubRepository.create_github_client(),
+    )
+    print(
+        f"Reviewed {batch_review_agent.review_pull_requests()} chunks, "
+        f"{batch_review_agent.failed_reviews} failed to post"
+    )
+    return 1 if invalid_results or batch_review_agent.failed_reviews else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
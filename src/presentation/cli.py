@@ -1,9 +1,8 @@
 import argparse
 import re
 
-from dotenv import load_dotenv
-from infrastructure.agents.review_agent import ReviewAgent
-from langchain_openai import ChatOpenAI
+# langchain, langchain_openai, PyGithub and tiktoken take seconds to import, the review
+# dependencies are imported in main once the arguments are parsed so that --help stays fast.
 
 
 def get_pull_request_info_from_github_url(url: str) -> tuple:
@@ -37,57 +36,549 @@ def get_pull_request_info_from_github_url(url: str) -> tuple:
     return repo_owner, repo_name, pull_request_number
 
 
-def get_url_from_args() -> str:
-    """Gets the url passed in the args under the format "--url https://example.com/"
+def add_triage_arguments(parser: argparse.ArgumentParser):
+    """Adds the options of the triage of chunks by a cheap model before the review."""
+    parser.add_argument(
+        "--triage-model",
+        help="A cheap model, like gpt-4.1-nano, deciding which chunks the reviewing model reviews",
+    )
+    parser.add_argument(
+        "--triage-threshold",
+        type=float,
+        default=0.3,
+        help="Triage score, from 0 to 1, from which a chunk is reviewed",
+    )
+    parser.add_argument(
+        "--triage-batch-size",
+        type=int,
+        default=20,
+        help="Chunks triaged by a single call",
+    )
+
+
+def create_triage_llm(args: argparse.Namespace):
+    """Creates the triage model selected in the command line, if any."""
+    if not args.triage_model:
+        return None
+
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(model=args.triage_model, temperature=0, max_retries=2)
+
+
+def add_adaptive_concurrency_arguments(parser: argparse.ArgumentParser):
+    """Adds the options of the adaptive concurrency of the llm calls."""
+    parser.add_argument(
+        "--adaptive-concurrency",
+        action="store_true",
+        help="Raise the llm concurrency while the provider answers quickly and back off on 429s, "
+        "slow answers and server errors, waiting out their Retry-After",
+    )
+    parser.add_argument(
+        "--max-llm-concurrency",
+        type=int,
+        default=16,
+        help="Maximum llm calls in flight with --adaptive-concurrency",
+    )
+    parser.add_argument(
+        "--rate-limit-retries",
+        type=int,
+        default=3,
+        help="Retries of a chunk review rejected with a 429 with --adaptive-concurrency",
+    )
+
+
+def create_review_llm(model: str, adaptive_concurrency: bool = False):
+    """Creates the reviewing model."""
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=model,
+        temperature=0,
+        max_tokens=None,
+        timeout=None,
+        # An adaptive concurrency retries 429s itself, once the delay they ask for has passed
+        max_retries=0 if adaptive_concurrency else 2,
+        # The agent executors stream every call, and streamed responses only report their usage when asked to
+        stream_usage=True,
+    )
+
+
+def add_llm_endpoints_argument(parser: argparse.ArgumentParser):
+    """Adds the option spreading the reviews across several llm endpoints."""
+    parser.add_argument(
+        "--llm-endpoints",
+        metavar="PATH",
+        help="JSON file listing OpenAI and Azure OpenAI endpoints and keys to spread the chunk reviews across, "
+        "routing around throttled and failing ones",
+    )
+
+
+def create_llm_pool(args: argparse.Namespace):
+    """Creates the pool of llm endpoints selected in the command line, if any."""
+    if not args.llm_endpoints:
+        return None
+
+    from infrastructure.agents.llm_pool import LlmPool
+
+    return LlmPool.from_config_file(args.llm_endpoints)
+
+
+def add_hedging_arguments(parser: argparse.ArgumentParser):
+    """Adds the options hedging the slow llm calls."""
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        help="Send a duplicate of the llm calls slower than this percentile of the recent ones, "
+        "e.g. 0.95, to another endpoint with --llm-endpoints, keeping the first response",
+    )
+    parser.add_argument(
+        "--hedge-min-delay",
+        type=float,
+        default=0.5,
+        help="Seconds an llm call runs at least before it is hedged",
+    )
+
+
+def create_hedging_policy(args: argparse.Namespace):
+    """Creates the hedging policy selected in the command line, if any."""
+    if args.hedge_percentile is None:
+        return None
+
+    from core.concurrency.hedging import HedgingPolicy
+
+    return HedgingPolicy(
+        percentile=args.hedge_percentile, min_delay_seconds=args.hedge_min_delay
+    )
+
+
+def add_circuit_breaker_arguments(parser: argparse.ArgumentParser):
+    """Adds the options of the circuit breakers and retry budgets of GitHub and the llm."""
+    parser.add_argument(
+        "--circuit-breakers",
+        action="store_true",
+        help="Stop calling GitHub or the llm after --failure-threshold consecutive failures, failing or deferring "
+        "the reviews until a probe call succeeds, and draw every retry from a retry budget shared by the reviews",
+    )
+    parser.add_argument(
+        "--failure-threshold",
+        type=int,
+        default=5,
+        help="Consecutive failures opening a circuit with --circuit-breakers",
+    )
+    parser.add_argument(
+        "--retry-budget",
+        type=float,
+        default=0.2,
+        help="Share of the GitHub and llm calls that may be retries with --circuit-breakers",
+    )
+
+
+def create_dependency_guards(args: argparse.Namespace) -> tuple:
+    """
+    Creates the guards of GitHub and of the llm selected in the command line.
+
+    Returns:
+        tuple: The GitHub guard and the llm guard, both None without --circuit-breakers.
+    """
+    if not args.circuit_breakers:
+        return None, None
+
+    from core.concurrency.adaptive_limiter import (
+        is_rate_limit_error,
+        is_unavailable_error,
+        retry_after_seconds,
+    )
+    from core.concurrency.circuit_breaker import CircuitBreaker
+    from core.concurrency.dependency_guard import DependencyGuard, RetryBudget
+
+    github_guard = DependencyGuard(
+        "github",
+        # GitHub answers secondary rate limits with a 403 and a Retry-After
+        is_retryable=lambda e: is_unavailable_error(e)
+        or is_rate_limit_error(e)
+        or retry_after_seconds(e) is not None,
+        circuit_breaker=CircuitBreaker(
+            "github", failure_threshold=args.failure_threshold
+        ),
+        retry_budget=RetryBudget(ratio=args.retry_budget),
+    )
+    llm_guard = DependencyGuard(
+        "llm",
+        circuit_breaker=CircuitBreaker("llm", failure_threshold=args.failure_threshold),
+        retry_budget=RetryBudget(ratio=args.retry_budget),
+    )
+    return github_guard, llm_guard
+
+
+def add_symbol_context_arguments(parser: argparse.ArgumentParser):
+    """Adds the options attaching cross-file context from a symbol index to every chunk."""
+    parser.add_argument(
+        "--context-tokens",
+        type=int,
+        default=0,
+        help="Attach to every chunk up to this many tokens of definitions and usages of its symbols in the rest "
+        "of the repository, from a Python symbol index of the base branch built once per repository",
+    )
+    parser.add_argument(
+        "--symbol-index-dir",
+        metavar="PATH",
+        help="Directory where the symbol indexes are cached between runs with --context-tokens",
+    )
+
+
+def create_symbol_indexes(args: argparse.Namespace):
+    """Creates the repository of symbol indexes selected in the command line, if any."""
+    if args.context_tokens <= 0:
+        return None
+
+    from infrastructure.repositories.symbol_index_repository import (
+        SymbolIndexRepository,
+    )
+
+    return SymbolIndexRepository(cache_dir=args.symbol_index_dir)
+
+
+def add_related_code_arguments(parser: argparse.ArgumentParser):
+    """Adds the options attaching the most similar snippets of a vector index to every chunk."""
+    parser.add_argument(
+        "--related-snippets",
+        type=int,
+        default=0,
+        help="Attach to every chunk up to this many similar code snippets from the rest of the repository, "
+        "searched in a vector index of the base branch kept on disk",
+    )
+    parser.add_argument(
+        "--vector-index-dir",
+        metavar="PATH",
+        default=".reviewpal/vector_indexes",
+        help="Directory where the vector indexes are kept with --related-snippets",
+    )
+    parser.add_argument(
+        "--embedding-model",
+        default="hashing",
+        help="OpenAI model embedding the snippets, like text-embedding-3-small, "
+        "or 'hashing' for an offline deterministic embedding of their identifiers",
+    )
+
+
+def create_vector_indexes(args: argparse.Namespace):
+    """Creates the repository of vector indexes selected in the command line, if any."""
+    if args.related_snippets <= 0:
+        return None
+
+    from infrastructure.repositories.vector_index_repository import (
+        VectorIndexRepository,
+    )
+
+    if args.embedding_model == "hashing":
+        from application.indexes.hashing_embedder import HashingEmbedder
+
+        embedder = HashingEmbedder()
+    else:
+        from langchain_openai import OpenAIEmbeddings
+
+        embedder = OpenAIEmbeddings(model=args.embedding_model)
+    return VectorIndexRepository(args.vector_index_dir, embedder)
+
+
+def add_memory_cap_argument(parser: argparse.ArgumentParser):
+    """Adds the option streaming the files of the pull requests under a memory cap."""
+    parser.add_argument(
+        "--memory-cap-mb",
+        type=float,
+        help="Fetch, review and release the files of the pull requests one at a time, holding at most this many "
+        "megabytes of file content at once, instead of fetching every file before the first review",
+    )
+
+
+def create_memory_budget(args: argparse.Namespace):
+    """Creates the memory budget selected in the command line, if any."""
+    if args.memory_cap_mb is None:
+        return None
+
+    from core.concurrency.memory_budget import MemoryBudget
+
+    return MemoryBudget(max_bytes=int(args.memory_cap_mb * 1024 * 1024))
+
+
+def add_pipeline_arguments(parser: argparse.ArgumentParser):
+    """Adds the options of the pipeline fetching, splitting, reviewing and posting the files of a pull request."""
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Fetch and split the next files of a pull request while the llm reviews the previous ones and their "
+        "comments are posted, every stage with its own workers and a bounded queue in front of it",
+    )
+    parser.add_argument(
+        "--fetch-concurrency",
+        type=int,
+        default=4,
+        help="Files of a pull request fetched at once with --pipeline or --memory-cap-mb",
+    )
+    parser.add_argument(
+        "--split-concurrency",
+        type=int,
+        default=1,
+        help="Files of a pull request split and triaged at once with --pipeline or --memory-cap-mb",
+    )
+    parser.add_argument(
+        "--post-concurrency",
+        type=int,
+        default=2,
+        help="Comments of a pull request posted at once with --pipeline or --memory-cap-mb",
+    )
+
+
+def add_streaming_argument(parser: argparse.ArgumentParser):
+    """Adds the option streaming the review of every chunk."""
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream the review of every chunk, posting each comment as soon as it is generated "
+        "and stopping the generation early for chunks needing no comment",
+    )
+
+
+def get_args() -> argparse.Namespace:
+    """Gets the arguments passed in the command line, for example "--url https://example.com/"
 
     Returns:
-        str: the url "https://example.com/"
+        argparse.Namespace: the parsed arguments
     """
     # Set up argument parser
     parser = argparse.ArgumentParser(
         description="Extract pull request information from a URL."
     )
     parser.add_argument("--url", required=True, help="Pull request URL")
+    parser.add_argument(
+        "--report",
+        help="Path of a JSON report with the wall time, requests, tokens and bytes of every pipeline stage",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Serve the pipeline stage metrics in the Prometheus text format on this port during the review",
+    )
+    parser.add_argument(
+        "--trace",
+        help="Path of a Chrome Trace Event format JSON file with a span for every pipeline stage, viewable in Perfetto",
+    )
+    parser.add_argument(
+        "--profile",
+        help="Directory where to write cProfile stats and tracemalloc peak memory of every pipeline stage, with a summary.txt",
+    )
+
+    parser.add_argument(
+        "--dry-run",
+        metavar="PATH",
+        help="Write the comments to this file instead of posting them, as SARIF for a .sarif path and JSONL otherwise",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="PATH",
+        help="Post the comments of a JSONL dry run on the pull request instead of reviewing it",
+    )
+
+    add_triage_arguments(parser)
+    add_streaming_argument(parser)
+    add_adaptive_concurrency_arguments(parser)
+    add_llm_endpoints_argument(parser)
+    add_hedging_arguments(parser)
+    add_circuit_breaker_arguments(parser)
+    add_symbol_context_arguments(parser)
+    add_related_code_arguments(parser)
+    add_memory_cap_argument(parser)
+    add_pipeline_arguments(parser)
 
     # Parse arguments
-    args = parser.parse_args()
+    return parser.parse_args()
 
-    return args.url
+
+def replay_comments(url: str, path: str):
+    """
+    Posts the comments written by a JSONL dry run on a pull request.
+
+    Args:
+        url (str): The pull request URL.
+        path (str): The JSONL file of the dry run.
+    """
+    from application.use_cases.add_comment_to_pull_request import AddCommentUseCase
+    from infrastructure.repositories.github_repository import GitHubRepository
+    from infrastructure.sinks.file_comment_sink import FileCommentSink
+    from infrastructure.sinks.github_comment_sink import GitHubCommentSink
+
+    repo_owner, repo_name, pull_request_number = get_pull_request_info_from_github_url(
+        url
+    )
+    github_comment_sink = GitHubCommentSink(
+        GitHubRepository(
+            repo_owner=repo_owner, repo_name=repo_name, pr_number=pull_request_number
+        ),
+        AddCommentUseCase(),
+    )
+    comments = FileCommentSink.read_comments(path)
+    for comment in comments:
+        github_comment_sink.add_comment(comment)
+    print(f"Posted {len(comments)} comments from {path}")
 
 
 def main():
     """
     Main function to handle command-line arguments and call the parsing function.
     """
+    args = get_args()
+
+    from dotenv import load_dotenv
+
     if not load_dotenv():
         raise ValueError(
             "Error: .env file not found. Ensure it exists in the project's root directory."
         )
 
-    url = get_url_from_args()
-    llm = ChatOpenAI(
-        model="gpt-4o-mini",
-        temperature=0,
-        max_tokens=None,
-        timeout=None,
-        max_retries=2,
+    if args.replay:
+        replay_comments(args.url, args.replay)
+        return
+
+    from core.concurrency.adaptive_limiter import AdaptiveConcurrencyLimiter
+    from core.instrumentation.profiling import StageProfiler
+    from core.instrumentation.run_metrics import RunMetrics
+    from core.instrumentation.stages import observe_stages
+    from core.instrumentation.tracing import Tracer
+    from infrastructure.agents.review_agent import ReviewAgent
+    from infrastructure.agents.triage_agent import TriageAgent
+    from infrastructure.repositories.github_repository import GitHubRepository
+    from infrastructure.servers.metrics_server import MetricsServer
+    from infrastructure.sinks.file_comment_sink import FileCommentSink
+
+    llm_pool = create_llm_pool(args)
+    llm = (
+        create_review_llm(
+            "gpt-4o-mini",
+            adaptive_concurrency=args.adaptive_concurrency,
+        )
+        if llm_pool is None
+        else None
+    )
+    llm_limiter = (
+        AdaptiveConcurrencyLimiter(max_limit=args.max_llm_concurrency)
+        if args.adaptive_concurrency
+        else None
+    )
+    # Files are reviewed one after the other, unless the adaptive limiter decides how many llm calls fly,
+    # or a pool spreads them across its endpoints, one file per endpoint
+    if llm_limiter is not None:
+        max_concurrency = args.max_llm_concurrency
+    elif llm_pool is not None:
+        max_concurrency = len(llm_pool)
+    else:
+        max_concurrency = 1
+    hedging_policy = create_hedging_policy(args)
+    github_guard, llm_guard = create_dependency_guards(args)
+    memory_budget = create_memory_budget(args)
+    triage_llm = create_triage_llm(args)
+    triage_agent = (
+        TriageAgent(
+            triage_llm,
+            threshold=args.triage_threshold,
+            max_chunks_per_call=args.triage_batch_size,
+            llm_guard=llm_guard,
+        )
+        if triage_llm is not None
+        else None
     )
+    run_metrics = RunMetrics(pull_request=args.url)
+    tracer = Tracer()
+    observers = [run_metrics, tracer]
+    stage_profiler = StageProfiler().start() if args.profile else None
+    if stage_profiler is not None:
+        observers.append(stage_profiler)
+    metrics_server = (
+        MetricsServer(
+            run_metrics,
+            port=args.metrics_port,
+            metric_sources=[
+                metric_source
+                for metric_source in [
+                    llm_limiter,
+                    llm_pool,
+                    hedging_policy,
+                    github_guard,
+                    llm_guard,
+                    memory_budget,
+                ]
+                if metric_source is not None
+            ],
+        ).start()
+        if args.metrics_port is not None
+        else None
+    )
+
+    comment_sink = None
 
     # Call the function with the provided URL
     try:
         repo_owner, repo_name, pull_request_number = (
-            get_pull_request_info_from_github_url(url)
+            get_pull_request_info_from_github_url(args.url)
         )
 
-        review_agent = ReviewAgent(
-            llm=llm,
-            repo_owner=repo_owner,
-            repo_name=repo_name,
-            pr_number=pull_request_number,
-        )
-        review_agent.review_pull_request()
+        with observe_stages(*observers):
+            github_repository = GitHubRepository(
+                repo_owner=repo_owner,
+                repo_name=repo_name,
+                pr_number=pull_request_number,
+                github_guard=github_guard,
+            )
+            if args.dry_run:
+                # The head commit comes with the pull request, no extra request is made
+                comment_sink = FileCommentSink.for_path(
+                    args.dry_run,
+                    head_sha=github_repository.pull_request.head.sha,
+                    repository_url=f"https://github.com/{repo_owner}/{repo_name}",
+                )
+            review_agent = ReviewAgent(
+                llm=llm,
+                repo_owner=repo_owner,
+                repo_name=repo_name,
+                pr_number=pull_request_number,
+                github_repository=github_repository,
+                comment_sink=comment_sink,
+                triage_agent=triage_agent,
+                streaming=args.stream,
+                max_concurrency=max_concurrency,
+                llm_limiter=llm_limiter,
+                llm_pool=llm_pool,
+                hedging_policy=hedging_policy,
+                llm_guard=llm_guard,
+                symbol_indexes=create_symbol_indexes(args),
+                context_tokens=args.context_tokens,
+                vector_indexes=create_vector_indexes(args),
+                related_snippets=args.related_snippets,
+                memory_budget=memory_budget,
+                pipelined=args.pipeline,
+                fetch_concurrency=args.fetch_concurrency,
+                split_concurrency=args.split_concurrency,
+                post_concurrency=args.post_concurrency,
+                rate_limit_retries=(
+                    args.rate_limit_retries if llm_limiter is not None else 0
+                ),
+            )
+            review_agent.review_pull_request()
     except ValueError as e:
         print(e)
+    finally:
+        if comment_sink is not None:
+            comment_sink.close()
+            print(f"{len(comment_sink.comments)} comments written to {args.dry_run}")
+        if args.report:
+            run_metrics.write_report(args.report)
+        if args.trace:
+            tracer.export_chrome_trace(args.trace)
+        if stage_profiler is not None:
+            stage_profiler.stop()
+            print(f"Profile written to {stage_profiler.write(args.profile)}")
+        if metrics_server is not None:
+            metrics_server.stop()
 
 
 if __name__ == "__main__":
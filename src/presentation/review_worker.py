@@ -0,0 +1,175 @@
+import argparse
+import signal
+import sys
+import time
+
+from dotenv import load_dotenv
+from presentation.cli import (
+    add_adaptive_concurrency_arguments,
+    add_circuit_breaker_arguments,
+    add_hedging_arguments,
+    add_llm_endpoints_argument,
+    add_memory_cap_argument,
+    add_pipeline_arguments,
+    add_related_code_arguments,
+    add_symbol_context_arguments,
+    create_dependency_guards,
+    create_hedging_policy,
+    create_llm_pool,
+    create_memory_budget,
+    create_review_llm,
+    create_symbol_indexes,
+    create_vector_indexes,
+    get_pull_request_info_from_github_url,
+)
+
+
+def get_args() -> argparse.Namespace:
+    """Gets the arguments passed in the command line.
+
+    Returns:
+        argparse.Namespace: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Review the jobs of a durable job store, resuming the ones interrupted by a crash."
+    )
+    parser.add_argument("job_store", help="The SQLite job store file")
+    parser.add_argument(
+        "--enqueue",
+        action="append",
+        default=[],
+        metavar="URL",
+        help="Add a pull request to the job store before working, can be repeated",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=4, help="Pull requests reviewed at once"
+    )
+    parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=600,
+        help="How long a job stays reserved to a worker that stopped recording progress",
+    )
+    parser.add_argument(
+        "--llm-concurrency",
+        type=int,
+        default=4,
+        help="Chunk reviews in flight across all pull requests",
+    )
+    parser.add_argument(
+        "--github-concurrency",
+        type=int,
+        default=8,
+        help="GitHub requests in flight across all pull requests",
+    )
+    parser.add_argument(
+        "--file-concurrency",
+        type=int,
+        default=1,
+        help="Files of a pull request reviewed concurrently",
+    )
+    parser.add_argument("--model", default="gpt-4o-mini", help="The reviewing model")
+    add_adaptive_concurrency_arguments(parser)
+    add_llm_endpoints_argument(parser)
+    add_hedging_arguments(parser)
+    add_circuit_breaker_arguments(parser)
+    add_symbol_context_arguments(parser)
+    add_related_code_arguments(parser)
+    add_memory_cap_argument(parser)
+    add_pipeline_arguments(parser)
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Serve the stage metrics in the Prometheus text format on this port",
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+    if not load_dotenv():
+        raise ValueError(
+            "Error: .env file not found. Ensure it exists in the project's root directory."
+        )
+
+    from core.instrumentation.run_metrics import RunMetrics
+    from core.models.review_job import ReviewJob
+    from infrastructure.agents.review_runner import ReviewRunner
+    from infrastructure.repositories.review_job_store import ReviewJobStore
+    from infrastructure.servers.metrics_server import MetricsServer
+    from infrastructure.servers.review_worker_pool import ReviewWorkerPool
+
+    job_store = ReviewJobStore(args.job_store, lease_seconds=args.lease_seconds)
+    for url in args.enqueue:
+        repo_owner, repo_name, pr_number = get_pull_request_info_from_github_url(url)
+        job_store.enqueue(
+            ReviewJob(repo_owner=repo_owner, repo_name=repo_name, pr_number=pr_number)
+        )
+
+    llm_pool = create_llm_pool(args)
+    llm = (
+        create_review_llm(args.model, adaptive_concurrency=args.adaptive_concurrency)
+        if llm_pool is None
+        else None
+    )
+    github_guard, llm_guard = create_dependency_guards(args)
+    review_runner = ReviewRunner(
+        llm=llm,
+        llm_concurrency=args.llm_concurrency,
+        github_concurrency=args.github_concurrency,
+        file_concurrency=args.file_concurrency,
+        adaptive_concurrency=args.adaptive_concurrency,
+        max_llm_concurrency=args.max_llm_concurrency,
+        rate_limit_retries=args.rate_limit_retries,
+        llm_pool=llm_pool,
+        hedging_policy=create_hedging_policy(args),
+        github_guard=github_guard,
+        llm_guard=llm_guard,
+        symbol_indexes=create_symbol_indexes(args),
+        context_tokens=args.context_tokens,
+        vector_indexes=create_vector_indexes(args),
+        related_snippets=args.related_snippets,
+        memory_budget=create_memory_budget(args),
+        pipelined=args.pipeline,
+        fetch_concurrency=args.fetch_concurrency,
+        split_concurrency=args.split_concurrency,
+        post_concurrency=args.post_concurrency,
+    )
+    metric_sources = [review_runner.llm_limiter] if args.adaptive_concurrency else []
+    if llm_pool is not None:
+        metric_sources.append(llm_pool)
+    if review_runner.hedging_policy is not None:
+        metric_sources.append(review_runner.hedging_policy)
+    metric_sources += [
+        guard for guard in [github_guard, llm_guard] if guard is not None
+    ]
+    if review_runner.memory_budget is not None:
+        metric_sources.append(review_runner.memory_budget)
+    run_metrics = RunMetrics()
+    if args.metrics_port is not None:
+        MetricsServer(
+            run_metrics, port=args.metrics_port, metric_sources=metric_sources
+        ).start()
+
+    worker_pool = ReviewWorkerPool(
+        review_runner,
+        workers=args.workers,
+        observers=[run_metrics],
+        job_store=job_store,
+    ).start()
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Working on {args.job_store}: {job_store.stats()}")
+    try:
+        while worker_pool.is_healthy():
+            time.sleep(1)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        print("Finishing the jobs in progress")
+        worker_pool.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import argparse
+import os
+import signal
+import sys
+
+from dotenv import load_dotenv
+from presentation.cli import (
+    add_adaptive_concurrency_arguments,
+    add_circuit_breaker_arguments,
+    add_hedging_arguments,
+    add_llm_endpoints_argument,
+    add_memory_cap_argument,
+    add_pipeline_arguments,
+    add_related_code_arguments,
+    add_symbol_context_arguments,
+    create_dependency_guards,
+    create_hedging_policy,
+    create_llm_pool,
+    create_memory_budget,
+    create_review_llm,
+    create_symbol_indexes,
+    create_vector_indexes,
+)
+
+# Heavy imports live in main and warm_up so that argument errors are reported instantly
+
+
+def get_args() -> argparse.Namespace:
+    """Gets the arguments passed in the command line.
+
+    Returns:
+        argparse.Namespace: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Review pull requests as GitHub webhook deliveries come in."
+    )
+    parser.add_argument("--host", default="0.0.0.0", help="The interface to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="The port to listen on")
+    parser.add_argument(
+        "--workers", type=int, default=4, help="Pull requests reviewed at once"
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=100,
+        help="Review jobs waiting before deliveries are rejected with 503",
+    )
+    parser.add_argument(
+        "--llm-concurrency",
+        type=int,
+        default=4,
+        help="Chunk reviews in flight across all pull requests",
+    )
+    parser.add_argument(
+        "--github-concurrency",
+        type=int,
+        default=8,
+        help="GitHub requests in flight across all pull requests",
+    )
+    parser.add_argument(
+        "--file-concurrency",
+        type=int,
+        default=1,
+        help="Files of a pull request reviewed concurrently",
+    )
+    parser.add_argument("--model", default="gpt-4o-mini", help="The reviewing model")
+    add_adaptive_concurrency_arguments(parser)
+    add_llm_endpoints_argument(parser)
+    add_hedging_arguments(parser)
+    add_circuit_breaker_arguments(parser)
+    add_symbol_context_arguments(parser)
+    add_related_code_arguments(parser)
+    add_memory_cap_argument(parser)
+    add_pipeline_arguments(parser)
+    parser.add_argument(
+        "--job-store",
+        help="SQLite file queuing the jobs durably, review_worker.py processes can share it",
+    )
+
+    return parser.parse_args()
+
+
+def warm_up():
+    """Builds the prompt template and loads the tokenizer before the first delivery."""
+    from core.prompt_templates.review_prompt_template import ReviewPromptTemplate
+
+    ReviewPromptTemplate.get_template()
+    try:
+        import tiktoken
+
+        tiktoken.encoding_for_model("gpt-4")
+    except Exception as e:
+        print(f"Tokenizer warm up failed, it will be loaded by the first review: {e}")
+
+
+def main():
+    args = get_args()
+    if not load_dotenv():
+        raise ValueError(
+            "Error: .env file not found. Ensure it exists in the project's root directory."
+        )
+
+    webhook_secret = os.getenv("GITHUB_WEBHOOK_SECRET")
+    if not webhook_secret:
+        raise ValueError(
+            "Error: GITHUB_WEBHOOK_SECRET not found in .env file. Please add it."
+        )
+
+    from core.instrumentation.run_metrics import RunMetrics
+    from infrastructure.agents.review_runner import ReviewRunner
+    from infrastructure.repositories.review_job_store import ReviewJobStore
+    from infrastructure.servers.review_worker_pool import ReviewWorkerPool
+    from infrastructure.servers.webhook_server import WebhookServer
+
+    warm_up()
+
+    llm_pool = create_llm_pool(args)
+    llm = (
+        create_review_llm(args.model, adaptive_concurrency=args.adaptive_concurrency)
+        if llm_pool is None
+        else None
+    )
+    github_guard, llm_guard = create_dependency_guards(args)
+    review_runner = ReviewRunner(
+        llm=llm,
+        llm_concurrency=args.llm_concurrency,
+        github_concurrency=args.github_concurrency,
+        file_concurrency=args.file_concurrency,
+        adaptive_concurrency=args.adaptive_concurrency,
+        max_llm_concurrency=args.max_llm_concurrency,
+        rate_limit_retries=args.rate_limit_retries,
+        llm_pool=llm_pool,
+        hedging_policy=create_hedging_policy(args),
+        github_guard=github_guard,
+        llm_guard=llm_guard,
+        symbol_indexes=create_symbol_indexes(args),
+        context_tokens=args.context_tokens,
+        vector_indexes=create_vector_indexes(args),
+        related_snippets=args.related_snippets,
+        memory_budget=create_memory_budget(args),
+        pipelined=args.pipeline,
+        fetch_concurrency=args.fetch_concurrency,
+        split_concurrency=args.split_concurrency,
+        post_concurrency=args.post_concurrency,
+    )
+    metric_sources = [review_runner.llm_limiter] if args.adaptive_concurrency else []
+    if llm_pool is not None:
+        metric_sources.append(llm_pool)
+    if review_runner.hedging_policy is not None:
+        metric_sources.append(review_runner.hedging_policy)
+    metric_sources += [
+        guard for guard in [github_guard, llm_guard] if guard is not None
+    ]
+    if review_runner.memory_budget is not None:
+        metric_sources.append(review_runner.memory_budget)
+    run_metrics = RunMetrics()
+    worker_pool = ReviewWorkerPool(
+        review_runner,
+        workers=args.workers,
+        max_queue_size=args.queue_size,
+        observers=[run_metrics],
+        job_store=ReviewJobStore(args.job_store) if args.job_store else None,
+    ).start()
+    server = WebhookServer(
+        worker_pool,
+        webhook_secret,
+        host=args.host,
+        port=args.port,
+        run_metrics=run_metrics,
+        metric_sources=metric_sources,
+    )
+
+    # serve_forever returns on SIGTERM so that queued reviews can finish
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Listening for GitHub webhooks on {args.host}:{server.port}")
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.stop()
+        print(f"Finishing {worker_pool.queue_depth} queued reviews")
+        worker_pool.stop()
+
+
+if __name__ == "__main__":
+    main()
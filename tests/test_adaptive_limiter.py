@@ -0,0 +1,156 @@
+import threading
+import time
+
+import pytest
+
+from core.concurrency.adaptive_limiter import (
+    AdaptiveConcurrencyLimiter,
+    is_overload_error,
+    is_rate_limit_error,
+    retry_after_seconds,
+)
+from core.concurrency.cancellation import ReviewCancelledError
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, headers: dict):
+        self.status_code = status_code
+        self.headers = headers
+
+
+class FakeApiError(Exception):
+    def __init__(self, status_code: int, headers: dict = None):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+        self.response = FakeResponse(status_code, headers or {})
+
+
+def run(limiter: AdaptiveConcurrencyLimiter, error: Exception = None):
+    try:
+        with limiter:
+            # Calls of a few microseconds would be slow or fast at the whim of the scheduler
+            time.sleep(0.005)
+            if error is not None:
+                raise error
+    except Exception:
+        pass
+
+
+def test_errors_are_classified_from_their_status_code():
+    assert is_rate_limit_error(FakeApiError(429))
+    assert not is_rate_limit_error(FakeApiError(500))
+    assert is_overload_error(FakeApiError(503))
+    assert is_overload_error(TimeoutError())
+    assert not is_overload_error(FakeApiError(400))
+    assert not is_overload_error(ValueError("Invalid llm review output"))
+
+
+def test_retry_after_is_read_from_the_response_headers():
+    assert retry_after_seconds(FakeApiError(429, {"retry-after-ms": "1500"})) == 1.5
+    assert retry_after_seconds(FakeApiError(429, {"retry-after": "7"})) == 7
+    assert (
+        retry_after_seconds(
+            FakeApiError(429, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})
+        )
+        == 0
+    )
+    assert retry_after_seconds(FakeApiError(429)) is None
+    assert retry_after_seconds(ValueError()) is None
+
+
+def test_limit_grows_by_about_one_per_limit_successes():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=3)
+
+    for _ in range(2):
+        run(limiter)
+    assert limiter.limit == 2
+    run(limiter)
+    assert limiter.limit == 3
+
+    for _ in range(10):
+        run(limiter)
+    assert limiter.limit == 3
+    assert limiter.stats()["outcomes"]["success"] == 13
+
+
+def test_rate_limit_halves_the_limit_and_pauses_new_calls():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+
+    run(limiter, FakeApiError(429, {"retry-after-ms": "200"}))
+
+    assert limiter.limit == 4
+    assert limiter.stats()["outcomes"]["rate_limited"] == 1
+    start = time.monotonic()
+    with limiter:
+        pass
+    assert time.monotonic() - start >= 0.15
+
+
+def test_a_burst_of_failures_backs_off_once():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+    with limiter:
+        time.sleep(0.05)
+
+    for _ in range(3):
+        run(limiter, FakeApiError(503))
+
+    assert limiter.limit == 4
+    assert limiter.stats()["outcomes"]["error"] == 3
+
+
+def test_review_errors_and_cancellations_leave_the_limit_alone():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4)
+
+    run(limiter, ValueError("Invalid llm review output"))
+    run(limiter, ReviewCancelledError("superseded"))
+
+    assert limiter.limit == 4
+    assert limiter.in_flight == 0
+
+
+def test_slow_calls_back_off():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, latency_tolerance=2.0)
+    with limiter:
+        time.sleep(0.01)
+
+    with limiter:
+        time.sleep(0.1)
+
+    assert limiter.limit == 4
+    assert limiter.stats()["outcomes"]["slow"] == 1
+
+
+def test_calls_above_the_limit_wait_for_a_slot():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=2)
+    release = threading.Event()
+    max_in_flight = []
+
+    def call():
+        with limiter:
+            max_in_flight.append(limiter.in_flight)
+            release.wait(timeout=5)
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    assert limiter.in_flight == 2
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert max(max_in_flight) == 2
+    assert limiter.in_flight == 0
+
+
+def test_limiter_exposes_its_state_as_prometheus_metrics():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=3)
+    run(limiter)
+
+    text = limiter.to_prometheus()
+
+    assert "# TYPE reviewpal_llm_concurrency_limit gauge" in text
+    assert "reviewpal_llm_concurrency_limit 3" in text
+    assert "reviewpal_llm_in_flight 0" in text
+    assert 'reviewpal_llm_calls_total{outcome="success"} 1' in text
+    assert limiter.stats()["throughput_per_second"] == pytest.approx(1 / 60)
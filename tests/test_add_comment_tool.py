@@ -1,4 +1,5 @@
 from application.use_cases.add_comment_to_pull_request import AddCommentUseCase
+from core.concurrency.cancellation import CancellationToken, ReviewCancelledError
 from core.models.comment import Comment
 from core.models.content_with_line import ContentWithLine
 from core.models.llm_comment import LlmComment
@@ -104,3 +105,96 @@ def test_get_change_line_from_file_no_match(mocker):
     with pytest.raises(StopIteration):
         add_comment_tool._get_change_line_from_file("+non_existing_line")
 
+
+def test_add_comment_tool_skips_comments_posted_by_an_earlier_attempt(mocker):
+    additions = [
+        ContentWithLine(line=3, content="return True"),
+        ContentWithLine(line=4, content="print('done')"),
+    ]
+    mock_pull_request_file = PullRequestFile(path="test_file.py", additions=additions, deletions=[], content=[])
+    mock_add_comment_use_case = mocker.Mock()
+    review_progress = mocker.Mock()
+    review_progress.is_comment_posted.side_effect = lambda file_path, line, text: line == 3
+
+    add_comment_tool = AddCommentTool(
+        pull_request_file=mock_pull_request_file,
+        add_comment_to_file_use_case=mock_add_comment_use_case,
+        github_repository=mocker.Mock(),
+        review_progress=review_progress,
+    )
+    add_comment_tool._run(
+        comments_to_add=[
+            LlmComment(line_content="+return True", comment="Already posted."),
+            LlmComment(line_content="+print('done')", comment="New comment."),
+        ]
+    )
+
+    assert mock_add_comment_use_case.invoke.call_count == 1
+    review_progress.record_comment_posted.assert_called_once_with("test_file.py", 4, "New comment.")
+
+def test_add_comment_tool_does_not_post_comments_of_a_cancelled_review(mocker):
+    additions = [ContentWithLine(line=3, content="return True")]
+    mock_pull_request_file = PullRequestFile(path="test_file.py", additions=additions, deletions=[], content=[])
+    mock_add_comment_use_case = mocker.Mock()
+    cancellation_token = CancellationToken("abc")
+    cancellation_token.cancel("superseded by def")
+
+    add_comment_tool = AddCommentTool(
+        pull_request_file=mock_pull_request_file,
+        add_comment_to_file_use_case=mock_add_comment_use_case,
+        github_repository=mocker.Mock(),
+        cancellation_token=cancellation_token,
+    )
+    with pytest.raises(ReviewCancelledError):
+        add_comment_tool._run(
+            comments_to_add=[LlmComment(line_content="+return True", comment="Stale comment.")]
+        )
+
+    mock_add_comment_use_case.invoke.assert_not_called()
+
+def test_add_comment_tool_sends_comments_to_the_given_sink(mocker):
+    additions = [ContentWithLine(line=3, content="return True")]
+    mock_pull_request_file = PullRequestFile(path="test_file.py", additions=additions, deletions=[], content=[])
+    mock_add_comment_use_case = mocker.Mock()
+    mock_github_repository = mocker.Mock()
+    comment_sink = mocker.Mock()
+
+    add_comment_tool = AddCommentTool(
+        pull_request_file=mock_pull_request_file,
+        add_comment_to_file_use_case=mock_add_comment_use_case,
+        github_repository=mock_github_repository,
+        comment_sink=comment_sink,
+    )
+    result = add_comment_tool._run(
+        comments_to_add=[LlmComment(line_content="+return True", comment="Dry run comment.")]
+    )
+
+    assert result == "all comments added successfully"
+    comment_sink.add_comment.assert_called_once_with(
+        Comment(text="Dry run comment.", file_path="test_file.py", line=3)
+    )
+    mock_add_comment_use_case.invoke.assert_not_called()
+    assert not mock_github_repository.mock_calls
+
+def test_add_comment_tool_queues_comments_until_they_are_posted(mocker):
+    additions = [ContentWithLine(line=3, content="return True")]
+    mock_pull_request_file = PullRequestFile(path="test_file.py", additions=additions, deletions=[], content=[])
+    comment_sink = mocker.Mock()
+
+    add_comment_tool = AddCommentTool(
+        pull_request_file=mock_pull_request_file,
+        add_comment_to_file_use_case=mocker.Mock(),
+        github_repository=mocker.Mock(),
+        comment_sink=comment_sink,
+        queue_posts=True,
+    )
+    comments_to_add = [LlmComment(line_content="+return True", comment="Queued comment.")]
+    add_comment_tool._run(comments_to_add=comments_to_add)
+    add_comment_tool.discard_queued_comments()
+    add_comment_tool._run(comments_to_add=comments_to_add)
+
+    comment_sink.add_comment.assert_not_called()
+    add_comment_tool.post_queued_comments()
+    comment_sink.add_comment.assert_called_once_with(
+        Comment(text="Queued comment.", file_path="test_file.py", line=3)
+    )
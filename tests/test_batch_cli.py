@@ -0,0 +1,78 @@
+import threading
+import time
+
+from core.models.pull_request_review_result import PullRequestReviewResult
+from presentation.batch_cli import (
+    read_pull_request_urls,
+    review_pull_requests,
+    review_pull_requests_with_openai_batch,
+)
+
+
+def test_read_pull_request_urls_skips_blanks_comments_and_duplicates():
+    lines = [
+        "https://github.com/o/r/pull/1\n",
+        "\n",
+        "# nightly sweep\n",
+        "https://github.com/o/r/pull/2  # flaky\n",
+        "https://github.com/o/r/pull/1\n",
+    ]
+
+    assert read_pull_request_urls(lines) == [
+        "https://github.com/o/r/pull/1",
+        "https://github.com/o/r/pull/2",
+    ]
+
+
+class FakeReviewRunner:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def review(self, url, repo_owner, repo_name, pr_number):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self.lock:
+            self.in_flight -= 1
+        return PullRequestReviewResult(url=url, status="reviewed", files=pr_number)
+
+
+def test_review_pull_requests_runs_concurrently_and_keeps_order():
+    urls = [f"https://github.com/o/r/pull/{number}" for number in range(1, 7)]
+    review_runner = FakeReviewRunner()
+
+    results = review_pull_requests(urls, review_runner, max_concurrent_reviews=3)
+
+    assert [result.url for result in results] == urls
+    assert [result.files for result in results] == [1, 2, 3, 4, 5, 6]
+    assert review_runner.max_in_flight == 3
+
+
+def test_review_pull_requests_reports_invalid_urls():
+    results = review_pull_requests(["https://example.com/o/r/pull/1"], FakeReviewRunner(), 2)
+
+    assert results[0].status == "failed"
+    assert "Invalid GitHub pull request URL format" in results[0].error
+
+
+def test_openai_batch_skips_invalid_urls_and_reviews_the_others(mocker):
+    mocker.patch("openai.OpenAI")
+    mocker.patch(
+        "infrastructure.repositories.github_repository.GitHubRepository.create_github_client"
+    )
+    batch_review_agent = mocker.patch(
+        "infrastructure.agents.batch_review_agent.BatchReviewAgent"
+    )
+    batch_review_agent.return_value.review_pull_requests.return_value = 3
+    batch_review_agent.return_value.failed_reviews = 0
+
+    exit_code = review_pull_requests_with_openai_batch(
+        ["https://example.com/o/r/pull/1", "https://github.com/o/r/pull/2"],
+        "gpt-4o-mini",
+    )
+
+    assert exit_code == 1
+    assert batch_review_agent.call_args.kwargs["pull_requests"] == [("o", "r", 2)]
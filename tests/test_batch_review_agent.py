@@ -0,0 +1,268 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.documents import Document
+
+from infrastructure.agents.batch_review_agent import BatchReviewAgent
+from infrastructure.repositories.openai_batch_repository import OpenAIBatchRepository
+
+
+class FakeBatchClient:
+    """
+    A local stand-in emulating the OpenAI files and batches endpoints.
+
+    Batches go through the validating and in_progress statuses before completing,
+    and each request is answered by the given responder.
+    """
+
+    def __init__(self, responder, final_status="completed"):
+        self.responder = responder
+        self.final_status = final_status
+        self.uploaded_files: dict[str, str] = {}
+        self.created_batches: list[dict] = []
+        self.retrieve_count = 0
+        self.files = SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve_batch)
+        self._statuses: dict[str, list[str]] = {}
+
+    def _create_file(self, file, purpose):
+        assert purpose == "batch"
+        file_id = f"file-{len(self.uploaded_files)}"
+        self.uploaded_files[file_id] = file.read().decode("utf-8")
+        return SimpleNamespace(id=file_id)
+
+    def _file_content(self, file_id):
+        return SimpleNamespace(text=self.uploaded_files[file_id])
+
+    def _create_batch(self, input_file_id, endpoint, completion_window, metadata=None):
+        batch_id = f"batch-{len(self.created_batches)}"
+        self.created_batches.append(
+            {"id": batch_id, "input_file_id": input_file_id, "endpoint": endpoint}
+        )
+        self._statuses[batch_id] = ["validating", "in_progress", self.final_status]
+        return SimpleNamespace(id=batch_id, status="validating")
+
+    def _retrieve_batch(self, batch_id):
+        self.retrieve_count += 1
+        statuses = self._statuses[batch_id]
+        status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+        output_file_id = None
+
+        if status == "completed":
+            batch = next(b for b in self.created_batches if b["id"] == batch_id)
+            output_lines = []
+            for line in self.uploaded_files[batch["input_file_id"]].splitlines():
+                request = json.loads(line)
+                output_lines.append(json.dumps(self.responder(request)))
+            output_file_id = f"file-{len(self.uploaded_files)}"
+            self.uploaded_files[output_file_id] = "\n".join(output_lines)
+
+        return SimpleNamespace(id=batch_id, status=status, output_file_id=output_file_id)
+
+
+def completion_result(request, content):
+    return {
+        "custom_id": request["custom_id"],
+        "response": {
+            "status_code": 200,
+            "body": {
+                "choices": [{"message": {"role": "assistant", "content": content}}],
+                "usage": {
+                    "prompt_tokens": 1100,
+                    "completion_tokens": 20,
+                    "prompt_tokens_details": {"cached_tokens": 1024},
+                },
+            },
+        },
+        "error": None,
+    }
+
+
+def no_comment_responder(request):
+    return completion_result(
+        request, '{"analysis": {"reasoning": "", "needs_comments": false}, "comments": []}'
+    )
+
+
+@pytest.fixture
+def mock_dependencies(mocker):
+    return {
+        "mock_github_repository": mocker.patch("infrastructure.agents.batch_review_agent.GitHubRepository"),
+        "mock_parse_pull_request": mocker.patch("infrastructure.agents.batch_review_agent.parse_pull_request"),
+        "mock_parse_pull_request_to_text": mocker.patch(
+            "infrastructure.agents.batch_review_agent.parse_pull_request_to_text"),
+        "mock_split_pull_request_file": mocker.patch("infrastructure.agents.batch_review_agent.split_pull_request_file"),
+        "mock_add_comment_tool": mocker.patch("infrastructure.agents.batch_review_agent.AddCommentTool"),
+    }
+
+
+def set_up_pull_request_files(mock_deps, mocker, chunks_per_file):
+    parsed_content = mock_deps["mock_parse_pull_request"].return_value
+    parsed_content.files = [mocker.Mock(path=f"file{i}.py") for i in range(len(chunks_per_file))]
+    mock_deps["mock_split_pull_request_file"].side_effect = [
+        [Document(page_content=chunk) for chunk in chunks] for chunks in chunks_per_file
+    ]
+    return parsed_content.files
+
+
+def test_build_requests_renders_every_chunk(mock_dependencies, mocker):
+    mock_deps = mock_dependencies
+    set_up_pull_request_files(mock_deps, mocker, [["+a = 1", "+b = 2"], ["+c = 3"]])
+
+    agent = BatchReviewAgent(
+        client=FakeBatchClient(no_comment_responder),
+        model="gpt-4o-mini",
+        pull_requests=[("owner", "repo", 1)],
+    )
+
+    requests = agent.build_requests()
+
+    assert [request["custom_id"] for request in requests] == ["0-0-0", "0-0-1", "0-1-0"]
+    mock_deps["mock_github_repository"].assert_called_once_with(
+        repo_owner="owner", repo_name="repo", pr_number=1, github_client=None
+    )
+    first_body = requests[0]["body"]
+    assert first_body["model"] == "gpt-4o-mini"
+    assert first_body["response_format"] == {"type": "json_object"}
+    assert first_body["messages"][0]["role"] == "system"
+    assert first_body["messages"][0]["content"] == requests[2]["body"]["messages"][0]["content"]
+    assert "path: file0.py" in first_body["messages"][-1]["content"]
+    assert "+a = 1" in first_body["messages"][-1]["content"]
+
+
+def test_review_pull_requests_posts_comments_from_batch_results(mock_dependencies, mocker):
+    mock_deps = mock_dependencies
+    files = set_up_pull_request_files(mock_deps, mocker, [["+a = 1"], ["+c = 3"]])
+
+    def responder(request):
+        if request["custom_id"] == "0-1-0":
+            return completion_result(
+                request,
+                '{"analysis": {"reasoning": "", "needs_comments": true},'
+                ' "comments": [{"line_content": "+c = 3", "comment": "Name the constant."}]}',
+            )
+        return no_comment_responder(request)
+
+    client = FakeBatchClient(responder)
+    agent = BatchReviewAgent(
+        client=client,
+        model="gpt-4o-mini",
+        pull_requests=[("owner", "repo", 1)],
+        poll_interval_seconds=0,
+    )
+
+    reviewed_chunks = agent.review_pull_requests()
+
+    assert reviewed_chunks == 2
+    assert agent.token_usage.calls == 2
+    assert agent.token_usage.cached_tokens == 2048
+    assert len(client.created_batches) == 1
+    assert client.created_batches[0]["endpoint"] == "/v1/chat/completions"
+    assert client.retrieve_count == 3
+    mock_deps["mock_add_comment_tool"].assert_called_once_with(
+        pull_request_file=files[1],
+        add_comment_to_file_use_case=agent.add_comment_use_case,
+        github_repository=mock_deps["mock_github_repository"].return_value,
+    )
+    comments = mock_deps["mock_add_comment_tool"].return_value._run.call_args.kwargs["comments_to_add"]
+    assert [comment.comment for comment in comments] == ["Name the constant."]
+
+
+def test_review_pull_requests_skips_failed_and_invalid_results(mock_dependencies, mocker):
+    mock_deps = mock_dependencies
+    set_up_pull_request_files(mock_deps, mocker, [["+a = 1", "+b = 2"]])
+
+    def responder(request):
+        if request["custom_id"] == "0-0-0":
+            return {"custom_id": "0-0-0", "response": None, "error": {"message": "boom"}}
+        return completion_result(request, "not json")
+
+    agent = BatchReviewAgent(
+        client=FakeBatchClient(responder),
+        model="gpt-4o-mini",
+        pull_requests=[("owner", "repo", 1)],
+        poll_interval_seconds=0,
+    )
+
+    assert agent.review_pull_requests() == 0
+    mock_deps["mock_add_comment_tool"].assert_not_called()
+
+
+def test_post_results_counts_failed_posts_and_goes_on(mock_dependencies, mocker):
+    mock_deps = mock_dependencies
+    set_up_pull_request_files(mock_deps, mocker, [["+a = 1", "+b = 2", "+c = 3"]])
+    mock_deps["mock_add_comment_tool"].return_value._run.side_effect = [
+        RuntimeError("GitHub is down"),
+        "comments not added. Error",
+        "all comments added successfully",
+    ]
+    output = (
+        '{"analysis": {"reasoning": "", "needs_comments": true},'
+        ' "comments": [{"line_content": "+a = 1", "comment": "Name the constant."}]}'
+    )
+
+    agent = BatchReviewAgent(
+        client=FakeBatchClient(no_comment_responder),
+        model="gpt-4o-mini",
+        pull_requests=[("owner", "repo", 1)],
+    )
+    agent.build_requests()
+
+    assert agent.post_results({"0-0-0": output, "0-0-1": output, "0-0-2": output}) == 1
+    assert agent.failed_reviews == 2
+    assert mock_deps["mock_add_comment_tool"].return_value._run.call_count == 3
+
+
+def test_review_pull_requests_writes_batch_input_file(mock_dependencies, mocker, tmp_path):
+    mock_deps = mock_dependencies
+    set_up_pull_request_files(mock_deps, mocker, [["+a = 1"]])
+    batch_input_path = tmp_path / "batch.jsonl"
+
+    agent = BatchReviewAgent(
+        client=FakeBatchClient(no_comment_responder),
+        model="gpt-4o-mini",
+        pull_requests=[("owner", "repo", 1)],
+        poll_interval_seconds=0,
+        batch_input_path=str(batch_input_path),
+    )
+    agent.review_pull_requests()
+
+    lines = [json.loads(line) for line in batch_input_path.read_text().splitlines()]
+    assert len(lines) == 1
+    assert lines[0]["method"] == "POST"
+    assert lines[0]["url"] == "/v1/chat/completions"
+    assert lines[0]["custom_id"] == "0-0-0"
+
+
+def test_review_pull_requests_without_chunks_does_not_submit(mock_dependencies):
+    mock_deps = mock_dependencies
+    mock_deps["mock_parse_pull_request"].return_value.files = []
+    client = FakeBatchClient(no_comment_responder)
+
+    agent = BatchReviewAgent(client=client, model="gpt-4o-mini", pull_requests=[("owner", "repo", 1)])
+
+    assert agent.review_pull_requests() == 0
+    assert client.created_batches == []
+
+
+def test_wait_for_completion_raises_when_batch_fails():
+    client = FakeBatchClient(no_comment_responder, final_status="failed")
+    batch_id = client.batches.create(
+        input_file_id="file-0", endpoint="/v1/chat/completions", completion_window="24h"
+    ).id
+
+    with pytest.raises(RuntimeError, match="ended with status: failed"):
+        OpenAIBatchRepository(client=client).wait_for_completion(batch_id, poll_interval_seconds=0)
+
+
+def test_wait_for_completion_raises_on_timeout():
+    client = FakeBatchClient(no_comment_responder)
+    batch_id = client.batches.create(
+        input_file_id="file-0", endpoint="/v1/chat/completions", completion_window="24h"
+    ).id
+
+    with pytest.raises(RuntimeError, match="did not complete"):
+        OpenAIBatchRepository(client=client).wait_for_completion(
+            batch_id, poll_interval_seconds=0, timeout_seconds=-1
+        )
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from core.concurrency.cancellation import (
+    CancellationToken,
+    ReviewCancelledError,
+    ReviewRunRegistry,
+)
+from infrastructure.callbacks.cancellation_callback_handler import (
+    CancellationCallbackHandler,
+)
+
+
+def test_cancelled_token_raises_with_its_reason():
+    cancellation_token = CancellationToken("abc")
+    cancellation_token.raise_if_cancelled()
+
+    cancellation_token.cancel("superseded by def")
+    cancellation_token.cancel("superseded by ghi")
+
+    assert cancellation_token.cancelled
+    with pytest.raises(ReviewCancelledError, match="superseded by def"):
+        cancellation_token.raise_if_cancelled()
+
+
+def test_newer_head_commit_cancels_in_flight_reviews_of_the_pull_request():
+    run_registry = ReviewRunRegistry()
+    old_review = run_registry.start("o", "r", 1, "abc")
+    same_commit_review = run_registry.start("o", "r", 1, "abc")
+    other_pull_request_review = run_registry.start("o", "r", 2, "abc")
+
+    assert run_registry.supersede("o", "r", 1, "def") == 2
+
+    assert old_review.cancelled
+    assert same_commit_review.cancelled
+    assert old_review.reason == "superseded by def"
+    assert not other_pull_request_review.cancelled
+    assert not run_registry.start("o", "r", 1, "def").cancelled
+
+
+def test_review_of_an_outdated_commit_starts_cancelled():
+    updated_at = datetime(2024, 5, 2, tzinfo=timezone.utc)
+    run_registry = ReviewRunRegistry()
+    new_review = run_registry.start("o", "r", 1, "def", updated_at)
+
+    assert run_registry.is_superseded("o", "r", 1, "abc", updated_at - timedelta(minutes=5))
+    assert run_registry.start("o", "r", 1, "abc", updated_at - timedelta(minutes=5)).cancelled
+    assert not run_registry.is_superseded("o", "r", 1, None)
+    assert not new_review.cancelled
+
+
+def test_redelivered_older_commit_does_not_cancel_the_newer_review():
+    updated_at = datetime(2024, 5, 2, tzinfo=timezone.utc)
+    run_registry = ReviewRunRegistry()
+    new_review = run_registry.start("o", "r", 1, "def", updated_at)
+
+    assert run_registry.supersede("o", "r", 1, "abc", updated_at - timedelta(minutes=5)) == 0
+
+    assert not new_review.cancelled
+    assert run_registry.supersede("o", "r", 1, "ghi", updated_at + timedelta(minutes=5)) == 1
+    assert new_review.reason == "superseded by ghi"
+
+
+def test_finished_reviews_are_unregistered():
+    run_registry = ReviewRunRegistry()
+    cancellation_token = run_registry.start("o", "r", 1, "abc")
+    assert run_registry.in_flight() == 1
+
+    run_registry.finish("o", "r", 1, cancellation_token)
+
+    assert run_registry.in_flight() == 0
+    assert run_registry.supersede("o", "r", 1, "def") == 0
+    assert run_registry._latest_heads == {}
+
+
+def test_callback_handler_aborts_the_agent_run_once_cancelled():
+    cancellation_token = CancellationToken("abc")
+    callback_handler = CancellationCallbackHandler(cancellation_token)
+    callback_handler.on_chat_model_start({}, [])
+
+    cancellation_token.cancel("superseded by def")
+
+    assert callback_handler.raise_error
+    with pytest.raises(ReviewCancelledError):
+        callback_handler.on_chat_model_start({}, [])
+    with pytest.raises(ReviewCancelledError):
+        callback_handler.on_tool_start({}, "")
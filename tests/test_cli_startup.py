@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+heavy_modules = ["langchain", "langchain_openai", "github", "tiktoken", "openai", "pydantic"]
+
+
+@pytest.mark.parametrize(
+    "entry_point",
+    [
+        "presentation.cli",
+        "presentation.batch_cli",
+        "presentation.webhook_server",
+        "presentation.review_worker",
+    ],
+)
+def test_entry_points_do_not_import_review_dependencies_at_load(entry_point):
+    source_root = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys, {entry_point}; "
+            f"print(','.join(name for name in {heavy_modules!r} if name in sys.modules))",
+        ],
+        env={**os.environ, "PYTHONPATH": source_root},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert completed.stdout.strip() == ""
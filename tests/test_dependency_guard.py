@@ -0,0 +1,158 @@
+import pytest
+
+from core.concurrency.circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    find_circuit_open_error,
+)
+from core.concurrency.dependency_guard import DependencyGuard, RetryBudget
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeApiError(Exception):
+    def __init__(self, status: int):
+        super().__init__(f"Error code: {status}")
+        self.status = status
+
+
+def failing_request(status: int = 502):
+    def request():
+        raise FakeApiError(status)
+
+    return request
+
+
+def run(guard: DependencyGuard, request, retry: bool = True):
+    try:
+        return guard.call(request, retry=retry)
+    except Exception as e:
+        return e
+
+
+def test_breaker_opens_after_consecutive_failures_and_lets_a_probe_through():
+    clock = FakeClock()
+    circuit_breaker = CircuitBreaker(
+        "github", failure_threshold=2, reset_timeout_seconds=10, clock=clock
+    )
+
+    for _ in range(2):
+        assert circuit_breaker.allow() is False
+        circuit_breaker.record_failure(probe=False)
+    assert circuit_breaker.state == "open"
+    with pytest.raises(CircuitOpenError) as error:
+        circuit_breaker.allow()
+    assert error.value.retry_after_seconds == 10
+
+    clock.now = 10
+    assert circuit_breaker.state == "half_open"
+    assert circuit_breaker.allow() is True
+    # A single probe at a time
+    with pytest.raises(CircuitOpenError):
+        circuit_breaker.allow()
+    circuit_breaker.record_success(probe=True)
+    assert circuit_breaker.state == "closed"
+
+
+def test_failed_probe_opens_the_circuit_for_longer():
+    clock = FakeClock()
+    circuit_breaker = CircuitBreaker(
+        "llm", failure_threshold=1, reset_timeout_seconds=10, clock=clock
+    )
+    circuit_breaker.allow()
+    circuit_breaker.record_failure(probe=False)
+
+    clock.now = 10
+    circuit_breaker.record_failure(probe=circuit_breaker.allow())
+
+    clock.now = 29
+    assert circuit_breaker.state == "open"
+    clock.now = 30
+    assert circuit_breaker.state == "half_open"
+    assert circuit_breaker.stats()["times_opened"] == 2
+
+
+def test_guard_retries_failures_then_fails_fast_once_the_circuit_is_open():
+    guard = DependencyGuard(
+        "github",
+        circuit_breaker=CircuitBreaker("github", failure_threshold=3),
+        max_attempts=3,
+        initial_wait_seconds=0,
+    )
+    request_count = 0
+
+    def request():
+        nonlocal request_count
+        request_count += 1
+        raise FakeApiError(503)
+
+    assert isinstance(run(guard, request), FakeApiError)
+    assert request_count == 3
+    assert isinstance(run(guard, request), CircuitOpenError)
+    assert request_count == 3
+    assert guard.stats()["outcomes"] == {"success": 0, "failure": 3, "rejected": 1}
+    assert "reviewpal_github_circuit_open 1" in guard.to_prometheus()
+
+
+def test_errors_of_the_request_itself_are_not_retried_nor_failures():
+    guard = DependencyGuard(
+        "github",
+        circuit_breaker=CircuitBreaker("github", failure_threshold=1),
+        initial_wait_seconds=0,
+    )
+
+    assert isinstance(run(guard, failing_request(404)), FakeApiError)
+
+    assert guard.stats()["retries"] == 0
+    assert guard.circuit_breaker.state == "closed"
+
+
+def test_unsafe_requests_are_not_retried():
+    guard = DependencyGuard("github", initial_wait_seconds=0)
+
+    run(guard, failing_request(502), retry=False)
+
+    assert guard.stats()["outcomes"]["failure"] == 1
+    assert guard.stats()["retries"] == 0
+
+
+def test_retry_budget_caps_the_retries_of_every_call():
+    clock = FakeClock()
+    guard = DependencyGuard(
+        "llm",
+        retry_budget=RetryBudget(
+            ratio=0.5, min_retries_per_second=0, window_seconds=10, clock=clock
+        ),
+        max_attempts=2,
+        initial_wait_seconds=0,
+    )
+
+    for _ in range(4):
+        run(guard, failing_request())
+
+    # 4 calls earn 2 retries
+    assert guard.stats()["retries"] == 2
+    assert guard.stats()["denied_retries"] == 2
+
+    clock.now = 11
+    run(guard, failing_request())
+    assert guard.stats()["retries"] == 3
+
+
+def test_circuit_open_error_is_found_through_wrapping_errors():
+    circuit_open_error = CircuitOpenError("github", 5)
+    try:
+        try:
+            raise circuit_open_error
+        except CircuitOpenError as e:
+            raise TypeError("Failed to invoke AddCommentUseCase") from e
+    except TypeError as e:
+        assert find_circuit_open_error(e) is circuit_open_error
+
+    assert find_circuit_open_error(ValueError("Not Found")) is None
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from application.sinks.comment_sink import CommentSink
+from core.models.comment import Comment
+from infrastructure.sinks.file_comment_sink import FileCommentSink
+
+
+def test_jsonl_sink_writes_every_comment_as_it_is_added(tmp_path):
+    path = str(tmp_path / "comments.jsonl")
+    comment_sink = FileCommentSink(path, head_sha="abc")
+
+    added = comment_sink.add_comment(Comment(text="Use a constant.", file_path="a.py", line=3))
+    with open(path, encoding="utf-8") as comments_file:
+        written_before_close = comments_file.read()
+    comment_sink.add_comment(Comment(text="Typo.", file_path="b.py", line=7, sha="def"))
+    comment_sink.close()
+
+    assert added.sha == "abc"
+    assert json.loads(written_before_close) == {
+        "sha": "abc",
+        "text": "Use a constant.",
+        "file_path": "a.py",
+        "line": 3,
+    }
+    assert FileCommentSink.read_comments(path) == [
+        Comment(text="Use a constant.", file_path="a.py", line=3, sha="abc"),
+        Comment(text="Typo.", file_path="b.py", line=7, sha="def"),
+    ]
+
+
+def test_sarif_sink_writes_a_sarif_log_on_close(tmp_path):
+    path = str(tmp_path / "comments.sarif")
+    comment_sink = FileCommentSink.for_path(
+        path, head_sha="abc", repository_url="https://github.com/Maokli/ReviewPal"
+    )
+    comment_sink.add_comment(Comment(text="Use a constant.", file_path="src/a.py", line=3))
+    comment_sink.close()
+
+    with open(path, encoding="utf-8") as sarif_file:
+        sarif = json.load(sarif_file)
+
+    assert sarif["version"] == "2.1.0"
+    run = sarif["runs"][0]
+    assert run["tool"]["driver"]["name"] == "ReviewPal"
+    assert run["versionControlProvenance"][0]["revisionId"] == "abc"
+    assert run["results"] == [
+        {
+            "ruleId": "review-comment",
+            "level": "note",
+            "message": {"text": "Use a constant."},
+            "locations": [
+                {
+                    "physicalLocation": {
+                        "artifactLocation": {"uri": "src/a.py"},
+                        "region": {"startLine": 3},
+                    }
+                }
+            ],
+        }
+    ]
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        FileCommentSink(str(tmp_path / "comments.xml"), output_format="xml")
+
+
+def test_sink_without_add_comment_cannot_be_built():
+    class IncompleteSink(CommentSink):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteSink()
@@ -0,0 +1,65 @@
+import hashlib
+import hmac
+from datetime import datetime, timezone
+
+import pytest
+
+from application.parsers.github_webhook_parser import (
+    parse_pull_request_event,
+    verify_webhook_signature,
+)
+
+
+def pull_request_payload(action="opened", draft=False, state="open"):
+    return {
+        "action": action,
+        "number": 7,
+        "pull_request": {
+            "number": 7,
+            "draft": draft,
+            "state": state,
+            "head": {"sha": "abc123"},
+            "updated_at": "2024-05-02T10:15:00Z",
+        },
+        "repository": {"name": "ReviewPal", "owner": {"login": "Maokli"}},
+    }
+
+
+def sign(secret: str, body: bytes) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def test_valid_signature_is_accepted():
+    assert verify_webhook_signature("secret", b"{}", sign("secret", b"{}"))
+
+
+@pytest.mark.parametrize(
+    "signature", [None, "", "sha1=abc", sign("other secret", b"{}"), sign("secret", b"[]")]
+)
+def test_invalid_signature_is_rejected(signature):
+    assert not verify_webhook_signature("secret", b"{}", signature)
+
+
+def test_opened_pull_request_becomes_a_review_job():
+    job = parse_pull_request_event(pull_request_payload(), delivery_id="delivery-1")
+
+    assert job.repo_owner == "Maokli"
+    assert job.repo_name == "ReviewPal"
+    assert job.pr_number == 7
+    assert job.head_sha == "abc123"
+    assert job.head_updated_at == datetime(2024, 5, 2, 10, 15, tzinfo=timezone.utc)
+    assert job.delivery_id == "delivery-1"
+    assert job.url == "https://github.com/Maokli/ReviewPal/pull/7"
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        pull_request_payload(action="closed", state="closed"),
+        pull_request_payload(action="labeled"),
+        pull_request_payload(draft=True),
+        pull_request_payload(action="synchronize", state="closed"),
+    ],
+)
+def test_events_without_new_code_are_ignored(payload):
+    assert parse_pull_request_event(payload) is None
@@ -0,0 +1,170 @@
+import time
+from typing import Iterator
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.prompts import ChatPromptTemplate
+
+from core.concurrency.hedging import HedgingPolicy, percentile
+from infrastructure.agents.hedged_llm import HedgedLlm
+
+
+class SlowChatModel(BaseChatModel):
+    """Streams its words one by one, after waiting `first_delay` seconds for the first one."""
+
+    text: str
+    first_delay: float = 0.0
+    word_delay: float = 0.0
+    streamed_words: list = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=self.text))]
+        )
+
+    def _stream(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_delay)
+        for index, word in enumerate(self.text.split(" ")):
+            if index:
+                time.sleep(self.word_delay)
+            self.streamed_words.append(word)
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(content=(" " if index else "") + word)
+            )
+
+
+def hedging_policy(**kwargs) -> HedgingPolicy:
+    return HedgingPolicy(
+        **{"min_samples": 0, "min_delay_seconds": 0.05, "control_share": 0.0, **kwargs}
+    )
+
+
+def test_percentile_of_recent_latencies():
+    assert percentile([], 0.95) == 0.0
+    assert percentile([float(value) for value in range(1, 101)], 0.95) == 96.0
+
+
+def test_policy_hedges_only_once_warmed_up_and_outside_the_control_group():
+    random_values = iter([0.01, 0.5])
+    policy = HedgingPolicy(
+        min_samples=3,
+        min_delay_seconds=0.0,
+        control_share=0.05,
+        random_source=lambda: next(random_values),
+    )
+    assert policy.plan() == (None, False)
+
+    for latency in [1.0, 2.0, 10.0]:
+        policy.record(latency, None, False, False, False)
+
+    assert policy.plan() == (None, True)
+    assert policy.plan() == (10.0, False)
+
+
+def test_policy_compares_the_tail_latency_of_hedgeable_and_control_calls():
+    policy = HedgingPolicy()
+    for _ in range(10):
+        policy.record(1.0, 0.8, control=False, hedged=True, hedge_won=True)
+        policy.record(4.0, None, control=True, hedged=False, hedge_won=False)
+
+    stats = policy.stats()
+
+    assert stats["hedge_rate"] == 0.5
+    assert stats["hedge_wins"] == 10
+    assert stats["hedgeable_p99_seconds"] == 1.0
+    assert stats["control_p99_seconds"] == 4.0
+    assert stats["p99_improvement_seconds"] == 3.0
+    assert "reviewpal_llm_hedge_rate 0.5" in policy.to_prometheus()
+
+
+def test_fast_call_is_not_hedged():
+    policy = hedging_policy(min_delay_seconds=1.0)
+    hedge_llm = SlowChatModel(text="hedge", streamed_words=[])
+    hedged_llm = HedgedLlm(
+        SlowChatModel(text="primary answer", streamed_words=[]),
+        policy,
+        hedge_llm=hedge_llm,
+    )
+
+    message = hedged_llm.invoke("review")
+
+    assert message.content == "primary answer"
+    assert hedge_llm.streamed_words == []
+    assert policy.stats()["hedged_calls"] == 0
+
+
+def test_slow_call_is_hedged_and_the_first_complete_response_wins():
+    policy = hedging_policy()
+    primary_llm = SlowChatModel(
+        text="slow primary answer", first_delay=0.01, word_delay=0.5, streamed_words=[]
+    )
+    hedged_llm = HedgedLlm(
+        primary_llm,
+        policy,
+        hedge_llm=SlowChatModel(text="hedge answer", streamed_words=[]),
+    )
+
+    start = time.monotonic()
+    message = hedged_llm.invoke("review")
+
+    assert message.content == "hedge answer"
+    assert time.monotonic() - start < 0.4
+    assert policy.stats()["hedge_wins"] == 1
+    # The primary attempt is cancelled at its next streamed word
+    time.sleep(0.6)
+    assert primary_llm.streamed_words == ["slow", "primary"]
+
+
+def test_stream_races_to_the_first_message_then_streams_the_winner():
+    policy = hedging_policy()
+    hedged_llm = HedgedLlm(
+        SlowChatModel(text="late", first_delay=0.5, streamed_words=[]),
+        policy,
+        hedge_llm=SlowChatModel(text="hedge streamed answer", streamed_words=[]),
+    )
+
+    assert [chunk.content for chunk in hedged_llm.stream("review")] == [
+        "hedge",
+        " streamed",
+        " answer",
+    ]
+    assert policy.stats()["hedged_calls"] == 1
+
+
+def test_failed_attempt_lets_the_other_one_win():
+    class FailingChatModel(SlowChatModel):
+        def _stream(self, *args, **kwargs):
+            time.sleep(0.1)
+            raise ConnectionError("reset")
+            yield
+
+    policy = hedging_policy()
+    hedged_llm = HedgedLlm(
+        FailingChatModel(text="", streamed_words=[]),
+        policy,
+        hedge_llm=SlowChatModel(
+            text="hedge answer", first_delay=0.2, streamed_words=[]
+        ),
+    )
+
+    assert hedged_llm.invoke("review").content == "hedge answer"
+
+
+def test_hedged_llm_composes_with_prompts():
+    prompt = ChatPromptTemplate.from_messages([("human", "{file_changes}")])
+    chain = prompt | HedgedLlm(
+        SlowChatModel(text="looks good", streamed_words=[]), hedging_policy()
+    )
+
+    assert chain.invoke({"file_changes": "+x = 1"}).content == "looks good"
+    assert (
+        "".join(chunk.content for chunk in chain.stream({"file_changes": "+x = 1"}))
+        == "looks good"
+    )
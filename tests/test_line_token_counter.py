@@ -0,0 +1,61 @@
+from application.text_splitters.line_token_counter import LineTokenCounter
+from application.text_splitters.python_text_splitter import (
+    split_python_pull_request_file,
+)
+
+
+class CountingTokens:
+    def __init__(self):
+        self.encoded_lines = []
+
+    def __call__(self, line: str) -> int:
+        self.encoded_lines.append(line)
+        return len(line.split())
+
+
+def test_every_distinct_line_is_encoded_once():
+    count_tokens = CountingTokens()
+    token_counter = LineTokenCounter(count_tokens)
+
+    assert token_counter.count_text("a b\nc\na b") == 5 + 2
+    assert token_counter.count_text("c\na b") == 3 + 1
+
+    assert count_tokens.encoded_lines == ["a b", "c"]
+    assert token_counter.stats() == {"lines": 2, "hits": 3, "misses": 2}
+
+
+def test_least_recently_used_lines_are_forgotten():
+    count_tokens = CountingTokens()
+    token_counter = LineTokenCounter(count_tokens, max_lines=2)
+
+    for line in ["a", "b", "a", "c", "a", "b"]:
+        token_counter.count_line(line)
+
+    assert count_tokens.encoded_lines == ["a", "b", "c", "b"]
+    assert token_counter.stats()["lines"] == 2
+
+
+def test_line_ranges_are_counted_from_prefix_sums():
+    line_counts = LineTokenCounter(CountingTokens()).count_lines(
+        ["one", "two words", "", "three more words"]
+    )
+
+    assert line_counts.range(0, 0) == 1
+    assert line_counts.range(1, 3) == 2 + 0 + 3 + 2
+    assert line_counts.range(2, 1) == 0
+    assert line_counts.total == 1 + 2 + 0 + 3 + 3
+
+
+def test_python_chunks_are_packed_without_encoding_lines_again():
+    count_tokens = CountingTokens()
+    text = "\n\n\n".join(
+        f"def function_{i}(value):\n-    return value\n+    return value * {i}"
+        for i in range(20)
+    )
+
+    chunks = split_python_pull_request_file(
+        text, chunk_size=40, token_counter=LineTokenCounter(count_tokens)
+    )
+
+    assert len(chunks) > 1
+    assert len(count_tokens.encoded_lines) == len(set(text.split("\n")))
@@ -0,0 +1,145 @@
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from infrastructure.agents.llm_pool import LlmEndpoint, LlmPool, parse_reset_duration
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, headers: dict):
+        self.status_code = status_code
+        self.headers = headers
+
+
+class FakeApiError(Exception):
+    def __init__(self, status_code: int, headers: dict = None):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+        self.response = FakeResponse(status_code, headers or {})
+
+
+def rate_limit_headers(remaining_tokens: int, limit_tokens: int = 1000) -> dict:
+    return {
+        "x-ratelimit-limit-requests": "100",
+        "x-ratelimit-remaining-requests": "99",
+        "x-ratelimit-reset-requests": "600ms",
+        "x-ratelimit-limit-tokens": str(limit_tokens),
+        "x-ratelimit-remaining-tokens": str(remaining_tokens),
+        "x-ratelimit-reset-tokens": "6m0s",
+    }
+
+
+def acquired_endpoint_name(llm_pool: LlmPool, estimated_tokens: int = 0) -> str:
+    with llm_pool.acquire(estimated_tokens) as endpoint:
+        return endpoint.name
+
+
+def test_reset_durations_are_parsed_in_seconds():
+    assert parse_reset_duration("20ms") == pytest.approx(0.02)
+    assert parse_reset_duration("1.5s") == 1.5
+    assert parse_reset_duration("6m0s") == 360
+    assert parse_reset_duration("1h2m") == 3720
+    assert parse_reset_duration("12") == 12
+    assert parse_reset_duration("soon") is None
+
+
+def test_calls_go_to_the_endpoint_with_the_most_quota_left():
+    llm_pool = LlmPool([LlmEndpoint("a", "llm-a"), LlmEndpoint("b", "llm-b")])
+    llm_pool.record_headers(llm_pool.endpoints[0], rate_limit_headers(100))
+    llm_pool.record_headers(llm_pool.endpoints[1], rate_limit_headers(900))
+
+    assert acquired_endpoint_name(llm_pool, estimated_tokens=50) == "b"
+    # Reserved tokens count until the next response tells the actual quota
+    llm_pool.record_headers(llm_pool.endpoints[1], rate_limit_headers(60))
+    assert acquired_endpoint_name(llm_pool, estimated_tokens=50) == "a"
+
+
+def test_endpoint_without_enough_tokens_is_skipped_until_its_quota_resets():
+    llm_pool = LlmPool([LlmEndpoint("a", "llm-a"), LlmEndpoint("b", "llm-b", weight=0.1)])
+    llm_pool.record_headers(llm_pool.endpoints[0], rate_limit_headers(10))
+
+    assert acquired_endpoint_name(llm_pool, estimated_tokens=500) == "b"
+    assert llm_pool.stats()["a"]["available"] is True
+
+
+def test_rate_limited_endpoint_is_left_alone_for_its_retry_after_delay():
+    llm_pool = LlmPool([LlmEndpoint("a", "llm-a", weight=2), LlmEndpoint("b", "llm-b")])
+
+    with pytest.raises(FakeApiError):
+        with llm_pool.acquire() as endpoint:
+            assert endpoint.name == "a"
+            raise FakeApiError(429, {"retry-after-ms": "150"})
+
+    assert acquired_endpoint_name(llm_pool) == "b"
+    assert llm_pool.stats()["a"]["outcomes"]["rate_limited"] == 1
+    time.sleep(0.2)
+    assert acquired_endpoint_name(llm_pool) == "a"
+
+
+def test_calls_wait_when_every_endpoint_is_unavailable():
+    llm_pool = LlmPool([LlmEndpoint("a", "llm-a")], failure_cooldown_seconds=0.15)
+
+    with pytest.raises(FakeApiError):
+        with llm_pool.acquire():
+            raise FakeApiError(503)
+
+    start = time.monotonic()
+    assert acquired_endpoint_name(llm_pool) == "a"
+    assert time.monotonic() - start >= 0.1
+    assert llm_pool.stats()["a"]["outcomes"] == {"success": 1, "rate_limited": 0, "error": 1}
+
+
+def test_review_errors_do_not_make_an_endpoint_unavailable():
+    llm_pool = LlmPool([LlmEndpoint("a", "llm-a")])
+
+    with pytest.raises(ValueError):
+        with llm_pool.acquire():
+            raise ValueError("Invalid llm review output")
+
+    assert llm_pool.stats()["a"]["available"] is True
+    assert llm_pool.stats()["a"]["in_flight"] == 0
+
+
+def test_endpoint_callback_handler_records_response_headers():
+    llm_pool = LlmPool([LlmEndpoint("a", "llm-a")])
+    generation = ChatGeneration(
+        message=AIMessage(content="{}"),
+        generation_info={"headers": {"X-RateLimit-Remaining-Tokens": "42", "X-RateLimit-Limit-Tokens": "50"}},
+    )
+
+    llm_pool.endpoints[0].callback_handler.on_llm_end(LLMResult(generations=[[generation]]))
+
+    assert llm_pool.stats()["a"]["remaining_tokens"] == 42
+    assert 'reviewpal_llm_endpoint_remaining_tokens{endpoint="a"} 42' in llm_pool.to_prometheus()
+
+
+def test_review_agent_retries_a_failed_chunk_review_on_another_endpoint(mocker):
+    mocker.patch("infrastructure.agents.review_agent.GitHubRepository")
+    mocker.patch("infrastructure.agents.review_agent.parse_pull_request").return_value.files = [
+        mocker.Mock(path="test_file.py")
+    ]
+    mocker.patch("infrastructure.agents.review_agent.parse_pull_request_to_text")
+    mocker.patch("infrastructure.agents.review_agent.split_pull_request_file").return_value = [
+        mocker.Mock(page_content="chunk1")
+    ]
+    create_tool_calling_agent = mocker.patch("infrastructure.agents.review_agent.create_tool_calling_agent")
+    agent_executor = mocker.patch("infrastructure.agents.review_agent.AgentExecutor")
+    agent_executor.return_value.invoke.side_effect = [FakeApiError(500), None]
+    llm_pool = LlmPool([LlmEndpoint("a", "llm-a", weight=2), LlmEndpoint("b", "llm-b")])
+
+    from infrastructure.agents.review_agent import ReviewAgent
+
+    review_agent = ReviewAgent(
+        llm=None,
+        repo_owner="test_owner",
+        repo_name="test_repo",
+        pr_number=1,
+        llm_pool=llm_pool,
+    )
+    review_agent.review_pull_request()
+
+    assert [call.kwargs["llm"] for call in create_tool_calling_agent.call_args_list] == ["llm-a", "llm-b"]
+    assert llm_pool.stats()["a"]["outcomes"]["error"] == 1
+    assert llm_pool.stats()["b"]["outcomes"]["success"] == 1
@@ -0,0 +1,44 @@
+import pytest
+
+from application.parsers.llm_review_parser import parse_llm_review
+
+
+def test_parse_llm_review_with_comments():
+    output = (
+        '{"analysis": {"reasoning": "Possible bug", "needs_comments": true},'
+        ' "comments": [{"line_content": "+return None", "comment": "Return a value."}]}'
+    )
+
+    review = parse_llm_review(output)
+
+    assert review.analysis.needs_comments is True
+    assert review.analysis.reasoning == "Possible bug"
+    assert len(review.comments) == 1
+    assert review.comments[0].line_content == "+return None"
+    assert review.comments[0].comment == "Return a value."
+
+
+def test_parse_llm_review_inside_code_fence():
+    output = '```json\n{"analysis": {"reasoning": "", "needs_comments": false}, "comments": []}\n```'
+
+    review = parse_llm_review(output)
+
+    assert review.analysis.needs_comments is False
+    assert review.comments == []
+
+
+def test_parse_llm_review_drops_comments_when_not_needed():
+    output = (
+        '{"analysis": {"reasoning": "Fine", "needs_comments": false},'
+        ' "comments": [{"line_content": "+x = 1", "comment": "Nitpick."}]}'
+    )
+
+    review = parse_llm_review(output)
+
+    assert review.comments == []
+
+
+@pytest.mark.parametrize("output", ["not json", '{"comments": []}', ""])
+def test_parse_llm_review_invalid_output(output):
+    with pytest.raises(ValueError, match="Invalid llm review output"):
+        parse_llm_review(output)
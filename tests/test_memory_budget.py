@@ -0,0 +1,55 @@
+import threading
+
+from core.concurrency.memory_budget import MemoryBudget
+
+
+def test_a_file_waits_until_the_files_in_flight_leave_room_for_it():
+    memory_budget = MemoryBudget(max_bytes=100)
+    first = memory_budget.acquire(60)
+    acquired = threading.Event()
+
+    def acquire_second_file():
+        memory_budget.acquire(60)
+        acquired.set()
+
+    thread = threading.Thread(target=acquire_second_file)
+    thread.start()
+    assert not acquired.wait(0.1)
+
+    memory_budget.release(first)
+    assert acquired.wait(1)
+    thread.join()
+    assert memory_budget.stats() == {
+        "max_bytes": 100,
+        "used_bytes": 60,
+        "peak_bytes": 60,
+        "waits": 1,
+    }
+
+
+def test_a_file_larger_than_the_budget_is_held_alone():
+    memory_budget = MemoryBudget(max_bytes=100)
+
+    reserved = memory_budget.acquire(500)
+
+    assert reserved == 100
+    memory_budget.release(reserved)
+    assert memory_budget.stats()["used_bytes"] == 0
+    assert "reviewpal_memory_budget_peak_bytes 100" in memory_budget.to_prometheus()
+
+
+def test_a_reservation_is_resized_to_the_fetched_file():
+    memory_budget = MemoryBudget(max_bytes=100)
+    reserved = memory_budget.acquire(10)
+
+    reserved = memory_budget.resize(reserved, 80)
+
+    assert reserved == 80
+    assert memory_budget.stats()["used_bytes"] == 80
+    memory_budget.release(reserved)
+    assert memory_budget.stats() == {
+        "max_bytes": 100,
+        "used_bytes": 0,
+        "peak_bytes": 80,
+        "waits": 0,
+    }
@@ -0,0 +1,49 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from core.concurrency.adaptive_limiter import AdaptiveConcurrencyLimiter
+from core.instrumentation.run_metrics import RunMetrics
+from core.instrumentation.stages import observe_stages, stage
+from infrastructure.servers.metrics_server import MetricsServer
+
+
+@pytest.fixture
+def metrics_server():
+    run_metrics = RunMetrics()
+    with observe_stages(run_metrics):
+        with stage("render", bytes=12):
+            pass
+    server = MetricsServer(run_metrics, port=0).start()
+    yield server
+    server.stop()
+
+
+def test_metrics_endpoint_serves_prometheus_text(metrics_server):
+    with urllib.request.urlopen(f"http://127.0.0.1:{metrics_server.port}/metrics") as response:
+        body = response.read().decode("utf-8")
+        content_type = response.headers["Content-Type"]
+
+    assert content_type.startswith("text/plain; version=0.0.4")
+    assert 'reviewpal_stage_bytes_total{stage="render"} 12' in body
+
+
+def test_unknown_path_returns_404(metrics_server):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(f"http://127.0.0.1:{metrics_server.port}/other")
+
+    assert error.value.code == 404
+
+
+def test_metrics_endpoint_appends_other_metric_sources():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=3)
+    server = MetricsServer(RunMetrics(), port=0, metric_sources=[limiter]).start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+            body = response.read().decode("utf-8")
+    finally:
+        server.stop()
+
+    assert "reviewpal_run_wall_time_seconds" in body
+    assert "reviewpal_llm_concurrency_limit 3" in body
@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+from core.concurrency.pipeline import Pipeline, PipelineStage
+
+
+def test_items_go_through_every_stage():
+    results = []
+    lock = threading.Lock()
+
+    def collect(item):
+        with lock:
+            results.append(item)
+
+    Pipeline(
+        [
+            PipelineStage("double", lambda item: item * 2, workers=3),
+            PipelineStage("odd", lambda item: item + 1 if item % 4 else None),
+            PipelineStage("collect", collect, workers=2),
+        ]
+    ).run(range(10))
+
+    assert sorted(results) == [3, 7, 11, 15, 19]
+
+
+def test_a_full_queue_holds_the_previous_stages_back():
+    release_consumer = threading.Event()
+    produced = []
+
+    def produce(item):
+        produced.append(item)
+        return item
+
+    pipeline = Pipeline(
+        [
+            PipelineStage("produce", produce, queue_size=1),
+            PipelineStage(
+                "consume", lambda item: release_consumer.wait(5), queue_size=1
+            ),
+        ]
+    )
+    thread = threading.Thread(target=pipeline.run, args=(range(100),))
+    thread.start()
+    threading.Event().wait(0.2)
+
+    # The consumer holds an item, its queue a second one and the producer a third one
+    assert len(produced) <= 4
+    release_consumer.set()
+    thread.join()
+    assert len(produced) == 100
+
+
+def test_the_first_error_stops_the_pipeline_and_discards_the_queued_items():
+    discarded = []
+    consumed = []
+
+    def consume(item):
+        if item == 3:
+            raise ValueError("boom")
+        consumed.append(item)
+
+    with pytest.raises(ValueError, match="boom"):
+        Pipeline(
+            [
+                PipelineStage("produce", lambda item: item),
+                PipelineStage(
+                    "consume", consume, queue_size=50, discard=discarded.append
+                ),
+            ]
+        ).run(range(100))
+
+    assert consumed == [0, 1, 2]
+    assert len(consumed) + 1 + len(discarded) < 100
@@ -0,0 +1,121 @@
+import cProfile
+import os
+import pstats
+import threading
+
+from core.instrumentation.profiling import StageProfiler
+from core.instrumentation.stages import observe_stages, stage
+
+
+def build_strings(count):
+    return ["x" * 100 + str(i) for i in range(count)]
+
+
+def run_profiled_stages(stage_profiler):
+    with observe_stages(stage_profiler):
+        with stage("render"):
+            rendered = build_strings(20_000)
+            with stage("split"):
+                chunks = [string.split("x") for string in rendered[:100]]
+    return rendered, chunks
+
+
+def test_stage_profiler_writes_stats_and_summary(tmp_path):
+    stage_profiler = StageProfiler(top=5).start()
+    try:
+        run_profiled_stages(stage_profiler)
+    finally:
+        stage_profiler.stop()
+
+    summary_path = stage_profiler.write(str(tmp_path))
+
+    assert os.path.exists(tmp_path / "render.prof")
+    assert os.path.exists(tmp_path / "split.prof")
+    assert os.path.exists(tmp_path / "all_stages.prof")
+    summary = open(summary_path).read()
+    assert "=== render: 1 calls" in summary
+    assert "=== split: 1 calls" in summary
+    assert "Top 5 hot functions (self time):" in summary
+    assert "Largest live allocations" in summary
+
+
+def test_nested_stage_profiles_are_separate(tmp_path):
+    stage_profiler = StageProfiler().start()
+    try:
+        run_profiled_stages(stage_profiler)
+    finally:
+        stage_profiler.stop()
+    stage_profiler.write(str(tmp_path))
+
+    render_functions = {function for _, _, function in pstats.Stats(str(tmp_path / "render.prof")).stats}
+    split_functions = {function for _, _, function in pstats.Stats(str(tmp_path / "split.prof")).stats}
+    assert "build_strings" in render_functions
+    assert "build_strings" not in split_functions
+    assert "<method 'split' of 'str' objects>" in split_functions
+    assert "<method 'split' of 'str' objects>" not in render_functions
+
+
+def test_peak_memory_includes_nested_stages():
+    stage_profiler = StageProfiler().start()
+    try:
+        run_profiled_stages(stage_profiler)
+    finally:
+        stage_profiler.stop()
+
+    # 20,000 strings of ~105 bytes
+    assert stage_profiler.peak_memory["render"] > 2_000_000
+    assert stage_profiler.peak_memory["render"] >= stage_profiler.peak_memory["split"]
+
+
+class ProcessWideProfile(cProfile.Profile):
+    """Allows a single enabled profile per process, like cProfile does from Python 3.12."""
+
+    active = None
+    lock = threading.Lock()
+
+    def enable(self):
+        with ProcessWideProfile.lock:
+            if ProcessWideProfile.active is not None:
+                raise ValueError("Another profiling tool is already active")
+            ProcessWideProfile.active = self
+        super().enable()
+
+    def disable(self):
+        super().disable()
+        with ProcessWideProfile.lock:
+            if ProcessWideProfile.active is self:
+                ProcessWideProfile.active = None
+
+
+def test_concurrent_stage_is_skipped_while_the_profiler_is_held(tmp_path, monkeypatch):
+    monkeypatch.setattr(cProfile, "Profile", ProcessWideProfile)
+    stage_profiler = StageProfiler()
+    first_stage_started = threading.Event()
+    second_stage_ended = threading.Event()
+
+    def review_first_file():
+        with observe_stages(stage_profiler):
+            with stage("llm_call"):
+                first_stage_started.set()
+                second_stage_ended.wait(timeout=5)
+                with stage("split"):
+                    build_strings(10)
+
+    thread = threading.Thread(target=review_first_file)
+    thread.start()
+    first_stage_started.wait(timeout=5)
+    with observe_stages(stage_profiler):
+        with stage("llm_call"):
+            with stage("render"):
+                build_strings(10)
+    second_stage_ended.set()
+    thread.join()
+
+    summary = open(stage_profiler.write(str(tmp_path))).read()
+    assert ProcessWideProfile.active is None
+    assert "=== llm_call: 2 calls" in summary
+    assert "1 calls not fully profiled" in summary
+    assert "=== split: 1 calls" in summary
+    assert "=== render: 1 calls, not profiled" in summary
+    assert os.path.exists(tmp_path / "split.prof")
+    assert not os.path.exists(tmp_path / "render.prof")
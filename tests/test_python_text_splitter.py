@@ -0,0 +1,116 @@
+from langchain_core.documents import Document
+
+from application.text_splitters.line_token_counter import LineTokenCounter
+from application.text_splitters.pull_request_file_text_splitter import (
+    split_pull_request_file,
+)
+from application.text_splitters.python_text_splitter import (
+    split_python_pull_request_file,
+)
+
+
+def count_characters(text: str) -> int:
+    return len(text) // 4
+
+
+def render(*blocks: str) -> str:
+    return "\n\n\n".join(blocks)
+
+
+UNCHANGED = "def unchanged(value):\n    return value + 1"
+CHANGED = "def changed(value):\n-    return value\n+    return value * 2"
+ADDED = "+def added(value):\n+    return value - 1"
+
+
+def split(text: str, chunk_size: int = 500, **kwargs) -> list[str]:
+    return [
+        chunk.page_content
+        for chunk in split_python_pull_request_file(
+            text,
+            chunk_size=chunk_size,
+            token_counter=LineTokenCounter(count_characters),
+            **kwargs,
+        )
+    ]
+
+
+def test_unchanged_definitions_are_left_out():
+    chunks = split(
+        render("import os", UNCHANGED, CHANGED, UNCHANGED.replace("unchanged", "other"))
+    )
+
+    assert chunks == [CHANGED]
+
+
+def test_chunks_are_cut_between_definitions_without_overlap():
+    text = render(CHANGED, ADDED, CHANGED.replace("changed", "third"))
+
+    chunks = split(text, chunk_size=20)
+
+    assert len(chunks) == 3
+    assert chunks[0] == CHANGED
+    assert chunks[1] == ADDED
+    assert "def third" in chunks[2]
+
+
+def test_changed_definitions_apart_are_packed_with_a_gap_marker():
+    chunks = split(render(CHANGED, UNCHANGED, ADDED))
+
+    assert chunks == [CHANGED + "\n....\n\n\n" + ADDED]
+
+
+def test_large_classes_are_cut_between_their_methods_under_the_class_header():
+    methods = [f"    def method_{i}(self):\n        return {i}" for i in range(10)]
+    methods[2] = "    def method_2(self):\n-        return 2\n+        return 20"
+    methods[8] = "+    def method_8(self):\n+        return 80"
+    text = "class Service(Base):\n" + "\n\n".join(methods)
+
+    chunks = split(text, chunk_size=25)
+
+    assert chunks == [
+        "class Service(Base):\n\n    def method_2(self):\n-        return 2\n+        return 20",
+        "class Service(Base):\n\n+    def method_8(self):\n+        return 80",
+    ]
+
+
+def test_deleted_definitions_are_reviewed():
+    text = render(UNCHANGED, "-def removed():\n-    pass", "def last():\n    pass")
+
+    chunks = split(text)
+
+    assert len(chunks) == 1
+    assert "-def removed():" in chunks[0]
+
+
+def test_functions_larger_than_a_chunk_go_to_the_fallback_splitter():
+    large_function = "def large():\n" + "\n".join(
+        f"+    value_{i} = {i}" if i == 30 else f"    value_{i} = {i}"
+        for i in range(40)
+    )
+
+    def fallback_splitter(text: str) -> list[Document]:
+        lines = text.split("\n")
+        return [
+            Document(page_content="\n".join(lines[start : start + 10]))
+            for start in range(0, len(lines), 10)
+        ]
+
+    chunks = split(large_function, chunk_size=50, fallback_splitter=fallback_splitter)
+
+    assert len(chunks) == 1
+    assert "+    value_30 = 30" in chunks[0]
+
+
+def test_invalid_python_is_not_split():
+    assert split_python_pull_request_file("+def broken(:\n+    pass") is None
+
+
+def test_python_files_are_split_between_definitions(mocker):
+    mocker.patch(
+        "application.text_splitters.python_text_splitter.default_line_token_counter",
+        return_value=LineTokenCounter(count_characters),
+    )
+
+    chunks = split_pull_request_file(render(UNCHANGED, CHANGED), file_path="src/a.py")
+
+    assert [chunk.page_content for chunk in chunks] == [CHANGED]
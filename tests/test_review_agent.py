@@ -1,4 +1,16 @@
+import threading
+import time
+from contextlib import contextmanager
+
 import pytest
+from core.concurrency.cancellation import CancellationToken, ReviewCancelledError
+from core.concurrency.circuit_breaker import CircuitBreaker
+from core.concurrency.dependency_guard import DependencyGuard
+from core.concurrency.memory_budget import MemoryBudget
+from core.models.content_with_line import ContentWithLine
+from core.models.llm_comment import LlmComment
+from core.models.pull_request_file import PullRequestFile
+from infrastructure.agents.llm_pool import LlmEndpoint, LlmPool
 from infrastructure.agents.review_agent import ReviewAgent
 
 
@@ -133,3 +145,620 @@ def test_review_pull_request_when_no_files(mock_dependencies):
     mock_deps["mock_split_pull_request_file"].assert_not_called()
     mock_deps["mock_create_tool_calling_agent"].assert_not_called()
     mock_deps["mock_agent_executor"].assert_not_called()
+
+
+def test_review_agent_uses_given_github_repository(mock_dependencies, mocker):
+    """
+    Test that a provided repository is used instead of creating one.
+    """
+    mock_deps = mock_dependencies
+    github_repository = mocker.Mock()
+
+    review_agent = ReviewAgent(
+        llm=mock_deps["mock_llm"],
+        repo_owner="test_owner",
+        repo_name="test_repo",
+        pr_number=1,
+        github_repository=github_repository,
+    )
+
+    assert review_agent.github_repository is github_repository
+    mock_deps["mock_github_repository"].assert_not_called()
+
+
+def test_review_pull_request_concurrently(mock_dependencies, mocker):
+    """
+    Test that every chunk of every file is reviewed when files are reviewed concurrently.
+    """
+    mock_deps = mock_dependencies
+    files = [mocker.Mock(path=f"file{i}.py") for i in range(4)]
+    mock_deps["mock_parse_pull_request"].return_value.files = files
+    mock_deps["mock_split_pull_request_file"].return_value = ["chunk1", "chunk2"]
+
+    review_agent = ReviewAgent(
+        llm=mock_deps["mock_llm"],
+        repo_owner="test_owner",
+        repo_name="test_repo",
+        pr_number=1,
+        max_concurrency=3,
+    )
+    review_agent.review_pull_request()
+
+    assert mock_deps["mock_parse_pull_request_to_text"].call_count == 4
+    assert mock_deps["mock_agent_executor"].return_value.invoke.call_count == 8
+
+
+def test_review_pull_request_skips_chunks_reviewed_by_an_earlier_attempt(
+    mock_dependencies, mocker
+):
+    """
+    Test that a resumed review only reviews the chunks its progress does not record.
+    """
+    mock_deps = mock_dependencies
+    mock_deps["mock_parse_pull_request"].return_value.files = [
+        mocker.Mock(path="test_file.py")
+    ]
+    chunks = [mocker.Mock(page_content="chunk1"), mocker.Mock(page_content="chunk2")]
+    mock_deps["mock_split_pull_request_file"].return_value = chunks
+    review_progress = mocker.Mock()
+    review_progress.is_chunk_reviewed.side_effect = (
+        lambda file_path, chunk_index, chunk_text: chunk_index == 0
+    )
+
+    review_agent = ReviewAgent(
+        llm=mock_deps["mock_llm"],
+        repo_owner="test_owner",
+        repo_name="test_repo",
+        pr_number=1,
+        review_progress=review_progress,
+    )
+    review_agent.review_pull_request()
+
+    invoke = mock_deps["mock_agent_executor"].return_value.invoke
+    assert invoke.call_count == 1
+    assert invoke.call_args.args[0]["file_changes"] is chunks[1]
+    review_progress.record_file.assert_called_once_with("test_file.py", 2)
+    review_progress.record_chunk_reviewed.assert_called_once_with(
+        "test_file.py", 1, "chunk2"
+    )
+
+
+def test_review_pull_request_stops_before_llm_calls_once_cancelled(mock_dependencies, mocker):
+    """
+    Test that a cancelled review makes no more llm calls.
+    """
+    mock_deps = mock_dependencies
+    mock_deps["mock_parse_pull_request"].return_value.files = [mocker.Mock(path="test_file.py")]
+    mock_deps["mock_split_pull_request_file"].return_value = ["chunk1", "chunk2"]
+    cancellation_token = CancellationToken("abc")
+    invoke = mock_deps["mock_agent_executor"].return_value.invoke
+    invoke.side_effect = lambda *args, **kwargs: cancellation_token.cancel("superseded by def")
+
+    review_agent = ReviewAgent(
+        llm=mock_deps["mock_llm"],
+        repo_owner="test_owner",
+        repo_name="test_repo",
+        pr_number=1,
+        cancellation_token=cancellation_token,
+    )
+    with pytest.raises(ReviewCancelledError):
+        review_agent.review_pull_request()
+
+    assert invoke.call_count == 1
+
+
+def test_review_pull_request_reviews_only_triaged_chunks(mock_dependencies, mocker):
+    """
+    Test that the chunks of every file are triaged in one go and only flagged ones are reviewed.
+    """
+    mock_deps = mock_dependencies
+    mock_deps["mock_parse_pull_request"].return_value.files = [
+        mocker.Mock(path="a.py"),
+        mocker.Mock(path="b.py"),
+    ]
+    mock_deps["mock_split_pull_request_file"].side_effect = [
+        [mocker.Mock(page_content="a1"), mocker.Mock(page_content="a2")],
+        [mocker.Mock(page_content="b1")],
+    ]
+    triage_agent = mocker.Mock()
+    triage_agent.triage.return_value = [False, True, False]
+
+    review_agent = ReviewAgent(
+        llm=mock_deps["mock_llm"],
+        repo_owner="test_owner",
+        repo_name="test_repo",
+        pr_number=1,
+        triage_agent=triage_agent,
+    )
+    review_agent.review_pull_request()
+
+    triage_agent.triage.assert_called_once_with(
+        [("a.py", "a1"), ("a.py", "a2"), ("b.py", "b1")], cancellation_token=None
+    )
+    invoke = mock_deps["mock_agent_executor"].return_value.invoke
+    assert invoke.call_count == 1
+    assert invoke.call_args.args[0]["file_changes"].page_content == "a2"
+
+
+def test_files_are_streamed_under_the_memory_budget(mock_dependencies, mocker):
+    """
+    Test that a file is only fetched once the reviews in flight leave room for its size on the target branch.
+    """
+    mock_deps = mock_dependencies
+    events = []
+    files = [mocker.Mock(filename=f"src/file{i}.py", patch="+x") for i in range(3)]
+
+    def parse_pull_request_file(github_repository, file):
+        events.append(f"fetched {file.filename}")
+        return mocker.Mock(path=file.filename, content=[mocker.Mock(content="x" * 60)])
+
+    mocker.patch("infrastructure.agents.review_agent.fetch_pull_request_files", return_value=files)
+    mocker.patch("infrastructure.agents.review_agent.parse_pull_request_file", parse_pull_request_file)
+    mock_deps["mock_parse_pull_request_to_text"].side_effect = lambda pr_file: pr_file.path
+    mock_deps["mock_split_pull_request_file"].side_effect = lambda text, file_path: [
+        mocker.Mock(page_content=file_path)
+    ]
+    mock_deps["mock_agent_executor"].return_value.invoke.side_effect = lambda inputs, **kwargs: events.append(
+        f"reviewed {inputs['file_path']}"
+    )
+    memory_budget = MemoryBudget(max_bytes=100)
+
+    review_agent = ReviewAgent(
+        llm=mock_deps["mock_llm"],
+        repo_owner="test_owner",
+        repo_name="test_repo",
+        pr_number=1,
+        max_concurrency=2,
+        memory_budget=memory_budget,
+        fetch_concurrency=2,
+    )
+    get_directory_file_sizes = review_agent.github_repository.get_directory_file_sizes
+    get_directory_file_sizes.return_value = {file.filename: 61 for file in files}
+    review_agent.review_pull_request()
+
+    mock_deps["mock_parse_pull_request"].assert_not_called()
+    get_directory_file_sizes.assert_called_once_with("src")
+    # Two files never fit the budget, so no file is fetched before the previous one is reviewed
+    held_files = 0
+    for event in events:
+        held_files += 1 if event.startswith("fetched") else -1
+        assert held_files <= 1
+    assert sorted(events) == [f"{verb} src/file{i}.py" for verb in ["fetched", "reviewed"] for i in range(3)]
+    assert memory_budget.stats()["peak_bytes"] == 61
+    assert memory_budget.stats()["used_bytes"] == 0
+
+
+def test_pipeline_fetches_the_next_files_while_the_llm_reviews(mock_dependencies, mocker):
+    """
+    Test that the pipeline fetches a file while the previous one is reviewed, and posts the comments on its own.
+    """
+    mock_deps = mock_dependencies
+    second_file_fetched = threading.Event()
+
+    def parse_pull_request_file(github_repository, file):
+        if file == "file1.py":
+            second_file_fetched.set()
+        return mocker.Mock(path=file, content=[])
+
+    def review_chunk(inputs, **kwargs):
+        if inputs["file_path"] == "file0.py":
+            assert second_file_fetched.wait(5)
+        add_comment_tool = mock_deps["mock_agent_executor"].call_args.kwargs["tools"][0]
+        add_comment_tool._run([LlmComment(line_content="line", comment=inputs["file_path"])])
+
+    mocker.patch(
+        "infrastructure.agents.review_agent.fetch_pull_request_files",
+        return_value=["file0.py", "file1.py"],
+    )
+    mocker.patch("infrastructure.agents.review_agent.parse_pull_request_file", parse_pull_request_file)
+    mocker.patch("application.tools.add_comment_tool.AddCommentTool._get_change_line_from_file", return_value=1)
+    mock_deps["mock_split_pull_request_file"].side_effect = lambda text, file_path: [
+        mocker.Mock(page_content=file_path)
+    ]
+    mock_deps["mock_agent_executor"].return_value.invoke.side_effect = review_chunk
+    comment_sink = mocker.Mock()
+    post_threads = []
+    comment_sink.add_comment.side_effect = lambda comment: post_threads.append(threading.current_thread().name)
+
+    review_agent = ReviewAgent(
+        llm=mock_deps["mock_llm"],
+        repo_owner="test_owner",
+        repo_name="test_repo",
+        pr_number=1,
+        comment_sink=comment_sink,
+        pipelined=True,
+        fetch_concurrency=2,
+        post_concurrency=2,
+    )
+    review_agent.review_pull_request()
+
+    mock_deps["mock_parse_pull_request"].assert_not_called()
+    posted = sorted(call.args[0].text for call in comment_sink.add_comment.call_args_list)
+    assert posted == ["file0.py", "file1.py"]
+    assert all(name.startswith("post-") for name in post_threads)
+
+
+def test_streaming_review_posts_comments_while_the_llm_streams(mock_dependencies, mocker):
+    """
+    Test that every comment is posted as soon as it is streamed, without the tool-calling agent.
+    """
+    mock_deps = mock_dependencies
+    mock_deps["mock_parse_pull_request"].return_value.files = [mocker.Mock(path="test_file.py")]
+    mock_deps["mock_split_pull_request_file"].return_value = [mocker.Mock(page_content="chunk1")]
+    add_comment_tool = mocker.patch("infrastructure.agents.review_agent.AddCommentTool").return_value
+    first_comment_posted = threading.Event()
+    posted_during_stream = []
+
+    def stream(messages, config):
+        yield mocker.Mock(content='{"analysis": {"reasoning": "Bug", "needs_comments": true}, "comments": [')
+        yield mocker.Mock(content='{"line_content": "+a", "comment": "First"}')
+        # The rest of the output is only generated once the first comment is posted
+        posted_during_stream.append(first_comment_posted.wait(timeout=5))
+        yield mocker.Mock(content=', {"line_content": "+b", "comment": "Second"}]}')
+
+    mock_deps["mock_llm"].stream.side_effect = stream
+    posted_comments = []
+
+    def post(comments):
+        posted_comments.extend(comment.comment for comment in comments)
+        first_comment_posted.set()
+
+    add_comment_tool._run.side_effect = post
+
+    review_agent = ReviewAgent(
+        llm=mock_deps["mock_llm"],
+        repo_owner="test_owner",
+        repo_name="test_repo",
+        pr_number=1,
+        streaming=True,
+    )
+    review_agent.review_pull_request()
+
+    mock_deps["mock_create_tool_calling_agent"].assert_not_called()
+    assert posted_during_stream == [True]
+    assert posted_comments == ["First", "Second"]
+
+
+def test_streaming_review_stops_generation_when_no_comment_is_needed(mock_dependencies, mocker):
+    """
+    Test that the stream is closed as soon as the analysis says the chunk needs no comment.
+    """
+    mock_deps = mock_dependencies
+    mock_deps["mock_parse_pull_request"].return_value.files = [mocker.Mock(path="test_file.py")]
+    mock_deps["mock_split_pull_request_file"].return_value = [mocker.Mock(page_content="chunk1")]
+    add_comment_tool = mocker.patch("infrastructure.agents.review_agent.AddCommentTool").return_value
+    pieces = ['{"analysis": {"reasoning": "Fine", ', '"needs_comments": false', "}, ", '"comments": []}']
+    streamed_pieces = []
+
+    def stream(messages, config):
+        for piece in pieces:
+            streamed_pieces.append(piece)
+            yield mocker.Mock(content=piece)
+
+    mock_deps["mock_llm"].stream.side_effect = stream
+
+    review_agent = ReviewAgent(
+        llm=mock_deps["mock_llm"],
+        repo_owner="test_owner",
+        repo_name="test_repo",
+        pr_number=1,
+        streaming=True,
+    )
+    review_agent.review_pull_request()
+
+    assert streamed_pieces == pieces[:2]
+    add_comment_tool._run.assert_not_called()
+
+
+def test_rate_limited_chunk_review_is_retried(mock_dependencies, mocker):
+    """
+    Test that a chunk review rejected with a 429 is retried, and that other errors are not.
+    """
+    mock_deps = mock_dependencies
+    mock_deps["mock_parse_pull_request"].return_value.files = [mocker.Mock(path="test_file.py")]
+    mock_deps["mock_split_pull_request_file"].return_value = [mocker.Mock(page_content="chunk1")]
+    rate_limit_error = Exception("Error code: 429")
+    rate_limit_error.status_code = 429
+    invoke = mock_deps["mock_agent_executor"].return_value.invoke
+    invoke.side_effect = [rate_limit_error, None]
+
+    review_agent = ReviewAgent(
+        llm=mock_deps["mock_llm"],
+        repo_owner="test_owner",
+        repo_name="test_repo",
+        pr_number=1,
+        rate_limit_retries=2,
+    )
+    review_agent.review_pull_request()
+    assert invoke.call_count == 2
+
+    invoke.reset_mock()
+    invoke.side_effect = ValueError("not a rate limit")
+    with pytest.raises(ValueError):
+        review_agent.review_pull_request()
+    assert invoke.call_count == 1
+
+
+def test_chunks_are_reviewed_with_the_context_of_the_symbol_index(mock_dependencies, mocker):
+    mock_deps = mock_dependencies
+    mock_deps["mock_parse_pull_request"].return_value.files = [mocker.Mock(path="test_file.py")]
+    mock_deps["mock_split_pull_request_file"].return_value = ["chunk1"]
+    symbol_indexes = mocker.Mock()
+    symbol_indexes.get_index.return_value.context_for.return_value = "\n- `helper` is defined at a.py:1"
+
+    review_agent = ReviewAgent(
+        llm=mock_deps["mock_llm"],
+        repo_owner="test_owner",
+        repo_name="test_repo",
+        pr_number=1,
+        symbol_indexes=symbol_indexes,
+        context_tokens=200,
+    )
+    review_agent.review_pull_request()
+
+    symbol_indexes.get_index.assert_called_once_with(review_agent.github_repository)
+    symbol_indexes.get_index.return_value.context_for.assert_called_once_with(
+        "chunk1", "test_file.py", max_tokens=200, count_tokens=mocker.ANY
+    )
+    invoke_input = mock_deps["mock_agent_executor"].return_value.invoke.call_args.args[0]
+    assert invoke_input["context"] == "\n- `helper` is defined at a.py:1"
+
+
+def test_chunks_are_reviewed_without_context_when_the_symbol_index_fails(mock_dependencies, mocker):
+    mock_deps = mock_dependencies
+    mock_deps["mock_parse_pull_request"].return_value.files = [mocker.Mock(path="test_file.py")]
+    mock_deps["mock_split_pull_request_file"].return_value = ["chunk1"]
+    symbol_indexes = mocker.Mock()
+    symbol_indexes.get_index.side_effect = RuntimeError("archive unavailable")
+
+    review_agent = ReviewAgent(
+        llm=mock_deps["mock_llm"],
+        repo_owner="test_owner",
+        repo_name="test_repo",
+        pr_number=1,
+        symbol_indexes=symbol_indexes,
+    )
+    review_agent.review_pull_request()
+
+    invoke_input = mock_deps["mock_agent_executor"].return_value.invoke.call_args.args[0]
+    assert invoke_input["context"] == ""
+
+
+def test_related_snippets_of_a_file_are_searched_in_one_batch(mock_dependencies, mocker):
+    mock_deps = mock_dependencies
+    mock_deps["mock_parse_pull_request"].return_value.files = [mocker.Mock(path="test_file.py")]
+    mock_deps["mock_split_pull_request_file"].return_value = [
+        mocker.Mock(page_content="chunk1"),
+        mocker.Mock(page_content="chunk2"),
+    ]
+    snippet = mocker.Mock(path="other.py", start_line=3, end_line=4, text="def helper(): ...")
+    vector_indexes = mocker.Mock()
+    vector_index = vector_indexes.get_index.return_value
+    vector_index.search.return_value = [[(snippet, 0.9)], []]
+
+    review_agent = ReviewAgent(
+        llm=mock_deps["mock_llm"],
+        repo_owner="test_owner",
+        repo_name="test_repo",
+        pr_number=1,
+        vector_indexes=vector_indexes,
+        related_snippets=2,
+    )
+    review_agent.review_pull_request()
+
+    vector_indexes.embed.assert_called_once_with(["chunk1", "chunk2"])
+    vector_index.search.assert_called_once_with(
+        vector_indexes.embed.return_value, k=2, exclude_path="test_file.py"
+    )
+    invoke_calls = mock_deps["mock_agent_executor"].return_value.invoke.call_args_list
+    assert "other.py:3-4" in invoke_calls[0].args[0]["context"]
+    assert invoke_calls[1].args[0]["context"] == ""
+
+
+class GitHubError(Exception):
+    """Stands for the exceptions of PyGithub, which carry the HTTP status as `status`."""
+
+    def __init__(self, status):
+        super().__init__(f"GitHub answered {status}")
+        self.status = status
+
+
+class FlakyCommentSink:
+    """Records the posted comments, failing the posts listed in `failing_posts` with a 502."""
+
+    def __init__(self, failing_posts=()):
+        self.failing_posts = set(failing_posts)
+        self.posts = []
+
+    def add_comment(self, comment):
+        self.posts.append(comment.text)
+        if len(self.posts) in self.failing_posts:
+            raise GitHubError(502)
+        return comment
+
+    def close(self):
+        pass
+
+
+def set_up_reviewed_file(mock_deps, mocker):
+    mock_deps["mock_parse_pull_request"].return_value.files = [
+        PullRequestFile(
+            path="test_file.py",
+            additions=[ContentWithLine(line=1, content="a = 1"), ContentWithLine(line=2, content="b = 2")],
+            deletions=[],
+            content=[],
+        )
+    ]
+    mock_deps["mock_split_pull_request_file"].return_value = [mocker.Mock(page_content="chunk1")]
+
+
+def call_add_comment_tool(mock_deps):
+    add_comment_tool = mock_deps["mock_agent_executor"].call_args.kwargs["tools"][0]
+    add_comment_tool._run(
+        comments_to_add=[
+            LlmComment(line_content="+a = 1", comment="1"),
+            LlmComment(line_content="+b = 2", comment="2"),
+        ]
+    )
+
+
+def test_failed_comment_post_is_not_an_llm_failure(mock_dependencies, mocker):
+    """
+    Test that a GitHub 5xx on a comment post neither trips the llm circuit nor retries the chunk review.
+    """
+    mock_deps = mock_dependencies
+    set_up_reviewed_file(mock_deps, mocker)
+    mock_deps["mock_agent_executor"].return_value.invoke.side_effect = (
+        lambda *args, **kwargs: call_add_comment_tool(mock_deps)
+    )
+    comment_sink = FlakyCommentSink(failing_posts={2})
+    llm_guard = DependencyGuard("llm", circuit_breaker=CircuitBreaker("llm", failure_threshold=1))
+
+    review_agent = ReviewAgent(
+        llm=None,
+        repo_owner="test_owner",
+        repo_name="test_repo",
+        pr_number=1,
+        comment_sink=comment_sink,
+        llm_guard=llm_guard,
+        llm_pool=LlmPool([LlmEndpoint("a", mocker.Mock()), LlmEndpoint("b", mocker.Mock())]),
+    )
+    with pytest.raises(GitHubError):
+        review_agent.review_pull_request()
+
+    assert comment_sink.posts == ["1", "2"]
+    assert mock_deps["mock_agent_executor"].return_value.invoke.call_count == 1
+    assert llm_guard.stats()["outcomes"]["failure"] == 0
+    assert llm_guard.stats()["outcomes"]["success"] == 1
+
+
+def overloaded_error():
+    error = Exception("Error code: 502")
+    error.status_code = 502
+    return error
+
+
+def test_retried_chunk_review_posts_its_comments_once(mock_dependencies, mocker):
+    """
+    Test that the comments chosen by a chunk review failing with a 5xx are not posted again by its retry.
+    """
+    mock_deps = mock_dependencies
+    set_up_reviewed_file(mock_deps, mocker)
+
+    invoke_calls = []
+
+    def invoke(*args, **kwargs):
+        invoke_calls.append(kwargs)
+        call_add_comment_tool(mock_deps)
+        if len(invoke_calls) == 1:
+            raise overloaded_error()
+
+    mock_deps["mock_agent_executor"].return_value.invoke.side_effect = invoke
+    comment_sink = FlakyCommentSink()
+
+    review_agent = ReviewAgent(
+        llm=None,
+        repo_owner="test_owner",
+        repo_name="test_repo",
+        pr_number=1,
+        comment_sink=comment_sink,
+        llm_pool=LlmPool([LlmEndpoint("a", mocker.Mock()), LlmEndpoint("b", mocker.Mock())]),
+    )
+    review_agent.review_pull_request()
+
+    assert len(invoke_calls) == 2
+    assert comment_sink.posts == ["1", "2"]
+
+
+def test_retried_streaming_review_posts_its_comments_once(mock_dependencies, mocker):
+    """
+    Test that the comments streamed before a 5xx are not posted again when the retry streams them.
+    """
+    mock_deps = mock_dependencies
+    set_up_reviewed_file(mock_deps, mocker)
+    llm = mocker.Mock()
+    analysis = '{"analysis": {"reasoning": "Bug", "needs_comments": true}, "comments": ['
+    first_comment = '{"line_content": "+a = 1", "comment": "1"}'
+
+    def failing_stream(messages, config):
+        yield mocker.Mock(content=analysis)
+        yield mocker.Mock(content=first_comment)
+        raise overloaded_error()
+
+    def stream(messages, config):
+        yield mocker.Mock(content=analysis)
+        yield mocker.Mock(content=first_comment)
+        yield mocker.Mock(content=', {"line_content": "+b = 2", "comment": "2"}]}')
+
+    llm.stream.side_effect = [failing_stream(None, None), stream(None, None)]
+    comment_sink = FlakyCommentSink()
+
+    review_agent = ReviewAgent(
+        llm=None,
+        repo_owner="test_owner",
+        repo_name="test_repo",
+        pr_number=1,
+        comment_sink=comment_sink,
+        streaming=True,
+        llm_pool=LlmPool([LlmEndpoint("a", llm), LlmEndpoint("b", llm)]),
+    )
+    review_agent.review_pull_request()
+
+    assert llm.stream.call_count == 2
+    assert comment_sink.posts == ["1", "2"]
+
+
+class RecordingLimiter:
+    def __init__(self):
+        self.held_seconds = []
+
+    def __enter__(self):
+        self._entered_at = time.monotonic()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.held_seconds.append(time.monotonic() - self._entered_at)
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_llm_limiter_does_not_measure_comment_posts(mock_dependencies, mocker, streaming):
+    """
+    Test that neither GitHub posts nor waiting for llm quota count in the latency the llm limiter adapts to.
+    """
+    mock_deps = mock_dependencies
+    set_up_reviewed_file(mock_deps, mocker)
+    mock_deps["mock_agent_executor"].return_value.invoke.side_effect = (
+        lambda *args, **kwargs: call_add_comment_tool(mock_deps)
+    )
+
+    def stream(messages, config):
+        yield mocker.Mock(content='{"analysis": {"reasoning": "Bug", "needs_comments": true}, "comments": [')
+        yield mocker.Mock(content='{"line_content": "+a = 1", "comment": "1"}]}')
+
+    mock_deps["mock_llm"].stream.side_effect = stream
+    comment_sink = mocker.Mock()
+    comment_sink.add_comment.side_effect = lambda comment: time.sleep(0.3)
+    llm_limiter = RecordingLimiter()
+    llm_pool = LlmPool([LlmEndpoint("a", mock_deps["mock_llm"])])
+
+    @contextmanager
+    def acquire_after_quota_wait(estimated_tokens):
+        time.sleep(0.3)
+        yield llm_pool.endpoints[0]
+
+    llm_pool.acquire = acquire_after_quota_wait
+
+    review_agent = ReviewAgent(
+        llm=None,
+        repo_owner="test_owner",
+        repo_name="test_repo",
+        pr_number=1,
+        comment_sink=comment_sink,
+        llm_limiter=llm_limiter,
+        streaming=streaming,
+        llm_pool=llm_pool,
+    )
+    review_agent.review_pull_request()
+
+    assert comment_sink.add_comment.called
+    assert len(llm_limiter.held_seconds) == 1
+    assert llm_limiter.held_seconds[0] < 0.3
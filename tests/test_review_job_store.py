@@ -0,0 +1,184 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from core.concurrency.cancellation import ReviewCancelledError
+from core.models.review_job import ReviewJob
+from infrastructure.repositories.review_job_store import LeaseLostError, ReviewJobStore
+
+
+@pytest.fixture
+def job_store(tmp_path):
+    return ReviewJobStore(str(tmp_path / "jobs.sqlite"), lease_seconds=60, max_attempts=2)
+
+
+def job(pr_number=1, head_sha="abc", head_updated_at=None):
+    return ReviewJob(
+        repo_owner="Maokli",
+        repo_name="ReviewPal",
+        pr_number=pr_number,
+        head_sha=head_sha,
+        head_updated_at=head_updated_at,
+    )
+
+
+def expire_leases(job_store):
+    with job_store._transaction() as connection:
+        connection.execute("UPDATE review_jobs SET lease_expires_at = 0")
+
+
+def test_enqueue_is_idempotent_per_head_commit(job_store):
+    assert job_store.enqueue(job())
+    assert not job_store.enqueue(job())
+    assert job_store.enqueue(job(pr_number=2))
+    assert job_store.count("queued") == 2
+
+
+def test_newer_head_commit_cancels_queued_jobs_of_the_pull_request(job_store):
+    job_store.enqueue(job(head_sha="abc"))
+    job_store.enqueue(job(pr_number=2, head_sha="abc"))
+
+    assert job_store.enqueue(job(head_sha="def"))
+
+    assert job_store.stats()["cancelled"] == 1
+    claimed = [job_store.claim("worker-1"), job_store.claim("worker-1")]
+    assert [(job.pr_number, job.head_sha) for job in claimed] == [(2, "abc"), (1, "def")]
+
+
+def test_newer_head_commit_cancels_running_jobs_of_the_pull_request(job_store):
+    job_store.enqueue(job(head_sha="abc"))
+    claimed = job_store.claim("worker-1")
+    progress = job_store.progress(claimed, "worker-1")
+
+    assert job_store.enqueue(job(head_sha="def"))
+
+    assert job_store.job_status(claimed.job_id)["status"] == "cancelled"
+    with pytest.raises(ReviewCancelledError):
+        progress.is_chunk_reviewed("app.py", 0, "first chunk")
+    with pytest.raises(ReviewCancelledError):
+        progress.is_comment_posted("app.py", 3, "Rename this variable.")
+    with pytest.raises(ReviewCancelledError):
+        progress.renew_lease()
+    with pytest.raises(ReviewCancelledError):
+        job_store.complete(claimed.job_id, "worker-1")
+    job_store.cancel(claimed.job_id, "worker-1", "Review cancelled")
+    assert job_store.claim("worker-2").head_sha == "def"
+
+
+def test_redelivered_older_commit_does_not_cancel_the_newest_job(job_store):
+    updated_at = datetime(2024, 5, 2, tzinfo=timezone.utc)
+    job_store.enqueue(job(head_sha="abc", head_updated_at=updated_at))
+    job_store.complete(job_store.claim("worker-1").job_id, "worker-1")
+    assert job_store.enqueue(job(head_sha="def", head_updated_at=updated_at + timedelta(minutes=5)))
+
+    assert not job_store.enqueue(job(head_sha="abc", head_updated_at=updated_at))
+
+    assert job_store.stats()["done"] == 1
+    assert job_store.stats()["cancelled"] == 0
+    assert job_store.claim("worker-1").head_sha == "def"
+
+
+def test_late_older_commit_is_cancelled_on_arrival(job_store):
+    updated_at = datetime(2024, 5, 2, tzinfo=timezone.utc)
+    job_store.enqueue(job(head_sha="def", head_updated_at=updated_at))
+    claimed = job_store.claim("worker-1")
+
+    assert not job_store.enqueue(job(head_sha="abc", head_updated_at=updated_at - timedelta(minutes=5)))
+
+    assert job_store.stats()["running"] == 1
+    assert job_store.stats()["cancelled"] == 1
+    assert claimed.head_updated_at == updated_at
+    job_store.complete(claimed.job_id, "worker-1")
+
+
+def test_claimed_job_is_leased_to_a_single_worker(job_store):
+    job_store.enqueue(job())
+
+    claimed = job_store.claim("worker-1")
+
+    assert claimed.pr_number == 1
+    assert claimed.head_sha == "abc"
+    assert claimed.attempts == 1
+    assert job_store.claim("worker-2") is None
+
+
+def test_expired_lease_is_claimed_by_another_worker(job_store):
+    job_store.enqueue(job())
+    first_claim = job_store.claim("worker-1")
+    expire_leases(job_store)
+
+    second_claim = job_store.claim("worker-2")
+
+    assert second_claim.job_id == first_claim.job_id
+    assert second_claim.attempts == 2
+    with pytest.raises(LeaseLostError):
+        job_store.complete(first_claim.job_id, "worker-1")
+    job_store.complete(second_claim.job_id, "worker-2")
+    assert job_store.stats()["done"] == 1
+    assert not job_store.enqueue(job())
+
+
+def test_job_is_given_up_after_max_attempts(job_store):
+    job_store.enqueue(job())
+    for worker_id in ("worker-1", "worker-2"):
+        job_store.claim(worker_id)
+        expire_leases(job_store)
+
+    assert job_store.claim("worker-3") is None
+    assert job_store.stats()["failed"] == 1
+    assert job_store.enqueue(job())
+    assert job_store.count("queued") == 1
+
+
+def test_failed_job_is_queued_again_until_max_attempts(job_store):
+    job_store.enqueue(job())
+
+    job_store.fail(job_store.claim("worker-1").job_id, "worker-1", "GitHub is down")
+    assert job_store.count("queued") == 1
+
+    job_id = job_store.claim("worker-1").job_id
+    job_store.fail(job_id, "worker-1", "GitHub is down")
+    assert job_store.job_status(job_id)["status"] == "failed"
+    assert job_store.job_status(job_id)["error"] == "GitHub is down"
+
+
+def test_deferred_job_waits_and_keeps_its_attempts(job_store):
+    job_store.enqueue(job())
+    job_id = job_store.claim("worker-1").job_id
+
+    job_store.defer(job_id, "worker-1", "The github circuit is open", delay_seconds=60)
+
+    assert job_store.claim("worker-1") is None
+    assert job_store.job_status(job_id)["status"] == "queued"
+    with job_store._transaction() as connection:
+        connection.execute("UPDATE review_jobs SET deferred_until = 0")
+    assert job_store.claim("worker-1").attempts == 1
+
+
+def test_progress_survives_a_new_attempt(job_store):
+    job_store.enqueue(job())
+    claimed = job_store.claim("worker-1")
+    progress = job_store.progress(claimed, "worker-1")
+    progress.record_file("app.py", 2)
+    progress.record_chunk_reviewed("app.py", 0, "first chunk")
+    progress.record_comment_posted("app.py", 3, "Rename this variable.")
+    expire_leases(job_store)
+
+    resumed = job_store.progress(job_store.claim("worker-2"), "worker-2")
+
+    assert resumed.is_chunk_reviewed("app.py", 0, "first chunk")
+    assert not resumed.is_chunk_reviewed("app.py", 0, "changed chunk")
+    assert not resumed.is_chunk_reviewed("app.py", 1, "second chunk")
+    assert resumed.is_comment_posted("app.py", 3, "Rename this variable.")
+    assert not resumed.is_comment_posted("app.py", 4, "Rename this variable.")
+    assert job_store.job_status(claimed.job_id) == {
+        "status": "running",
+        "attempts": 2,
+        "error": None,
+        "files": 1,
+        "chunks": 2,
+        "reviewed_chunks": 1,
+        "comments": 1,
+    }
+    with pytest.raises(LeaseLostError):
+        progress.record_chunk_reviewed("app.py", 1, "second chunk")
@@ -0,0 +1,49 @@
+from core.prompt_templates.review_prompt_template import ReviewPromptTemplate
+
+
+def test_get_template_is_built_once():
+    assert ReviewPromptTemplate.get_template() is ReviewPromptTemplate.get_template()
+
+
+def test_instructions_prefix_is_byte_stable():
+    template = ReviewPromptTemplate.get_template()
+
+    first_messages = template.format_messages(
+        file_path="src/a.py", file_changes="+a = 1", agent_scratchpad=[]
+    )
+    second_messages = template.format_messages(
+        file_path="src/other/b.py", file_changes="-b = 2", agent_scratchpad=[]
+    )
+
+    assert first_messages[0].type == "system"
+    assert first_messages[0].content == second_messages[0].content
+    assert "src/a.py" not in first_messages[0].content
+    assert '"needs_comments": true/false' in first_messages[0].content
+
+
+def test_file_chunk_is_in_the_variable_suffix():
+    template = ReviewPromptTemplate.get_template()
+
+    messages = template.format_messages(
+        file_path="src/a.py", file_changes="+a = 1", agent_scratchpad=[]
+    )
+
+    assert len(messages) == 2
+    assert messages[1].type == "human"
+    assert "path: src/a.py" in messages[1].content
+    assert "+a = 1" in messages[1].content
+
+
+def test_context_attachment_follows_the_file_chunk():
+    template = ReviewPromptTemplate.get_template()
+
+    messages = template.format_messages(
+        file_path="src/a.py",
+        file_changes="+a = helper()",
+        context="\n- `helper` is defined at src/b.py:3: def helper()",
+        agent_scratchpad=[],
+    )
+
+    assert messages[1].content.index("+a = helper()") < messages[1].content.index(
+        "`helper` is defined at src/b.py:3"
+    )
@@ -0,0 +1,136 @@
+import pytest
+
+from core.concurrency.cancellation import CancellationToken, ReviewCancelledError
+from core.concurrency.circuit_breaker import CircuitOpenError
+from core.instrumentation.stages import stage
+from infrastructure.agents.review_runner import ReviewRunner
+
+
+@pytest.fixture
+def mock_dependencies(mocker):
+    return {
+        "mock_llm": mocker.Mock(),
+        "mock_github_client": mocker.Mock(),
+        "mock_github_repository": mocker.patch("infrastructure.agents.review_runner.GitHubRepository"),
+        "mock_review_agent": mocker.patch("infrastructure.agents.review_runner.ReviewAgent"),
+    }
+
+
+def simulate_review():
+    with stage("review_file", file_path="a.py"):
+        with stage("llm_call", requests=1, input_tokens=1000, output_tokens=50, cached_tokens=768):
+            with stage("comment_post", requests=2):
+                pass
+        with stage("llm_call", requests=1, input_tokens=1000, output_tokens=10, cached_tokens=768):
+            pass
+
+
+def test_review_shares_clients_and_limits(mock_dependencies):
+    mock_deps = mock_dependencies
+    review_runner = ReviewRunner(
+        llm=mock_deps["mock_llm"],
+        github_client=mock_deps["mock_github_client"],
+        llm_concurrency=2,
+        github_concurrency=3,
+        file_concurrency=2,
+    )
+
+    review_runner.review("https://github.com/o/r/pull/1", "o", "r", 1)
+    review_runner.review("https://github.com/o/r/pull/2", "o", "r", 2)
+
+    for call in mock_deps["mock_github_repository"].call_args_list:
+        assert call.kwargs["github_client"] is mock_deps["mock_github_client"]
+        assert call.kwargs["request_limiter"] is review_runner.github_limiter
+    for call in mock_deps["mock_review_agent"].call_args_list:
+        assert call.kwargs["llm"] is mock_deps["mock_llm"]
+        assert call.kwargs["llm_limiter"] is review_runner.llm_limiter
+        assert call.kwargs["max_concurrency"] == 2
+    assert mock_deps["mock_review_agent"].call_count == 2
+
+
+def test_review_summarizes_the_run(mock_dependencies):
+    mock_deps = mock_dependencies
+    mock_deps["mock_review_agent"].return_value.review_pull_request.side_effect = simulate_review
+    review_runner = ReviewRunner(llm=mock_deps["mock_llm"], github_client=mock_deps["mock_github_client"])
+
+    result = review_runner.review("https://github.com/o/r/pull/1", "o", "r", 1)
+
+    assert result.status == "reviewed"
+    assert result.error is None
+    assert result.files == 1
+    assert result.llm_calls == 2
+    assert result.input_tokens == 2000
+    assert result.cached_tokens == 1536
+    assert result.output_tokens == 60
+    assert result.comments == 1
+
+
+def test_review_reports_failures(mock_dependencies):
+    mock_deps = mock_dependencies
+    mock_deps["mock_github_repository"].side_effect = ValueError("Not Found")
+    review_runner = ReviewRunner(llm=mock_deps["mock_llm"], github_client=mock_deps["mock_github_client"])
+
+    result = review_runner.review("https://github.com/o/r/pull/1", "o", "r", 1)
+
+    assert result.status == "failed"
+    assert result.error == "ValueError: Not Found"
+    mock_deps["mock_review_agent"].assert_not_called()
+
+
+def test_review_reports_cancellation_with_the_wasted_work(mock_dependencies):
+    mock_deps = mock_dependencies
+
+    def simulate_cancelled_review():
+        simulate_review()
+        raise ReviewCancelledError("superseded by def")
+
+    mock_deps["mock_review_agent"].return_value.review_pull_request.side_effect = simulate_cancelled_review
+    review_runner = ReviewRunner(llm=mock_deps["mock_llm"], github_client=mock_deps["mock_github_client"])
+    cancellation_token = CancellationToken("abc")
+
+    result = review_runner.review(
+        "https://github.com/o/r/pull/1", "o", "r", 1, cancellation_token=cancellation_token
+    )
+
+    assert result.status == "cancelled"
+    assert result.error == "superseded by def"
+    assert result.llm_calls == 2
+    assert mock_deps["mock_review_agent"].call_args.kwargs["cancellation_token"] is cancellation_token
+
+
+def test_review_rejected_by_an_open_circuit_is_deferred(mock_dependencies):
+    mock_deps = mock_dependencies
+    mock_deps["mock_github_repository"].side_effect = CircuitOpenError("github", 12)
+    review_runner = ReviewRunner(llm=mock_deps["mock_llm"], github_client=mock_deps["mock_github_client"])
+
+    result = review_runner.review("https://github.com/o/r/pull/1", "o", "r", 1)
+
+    assert result.status == "deferred"
+    assert result.retry_after_seconds == 12
+    assert result.error == "The github circuit is open, retry in 12.0s"
+
+
+def test_review_counts_triage_calls_and_avoided_reviews(mock_dependencies):
+    mock_deps = mock_dependencies
+
+    def simulate_triaged_review():
+        with stage("triage", requests=1, input_tokens=500, output_tokens=40, avoided_requests=3,
+                   avoided_input_tokens=4200):
+            pass
+        simulate_review()
+
+    mock_deps["mock_review_agent"].return_value.review_pull_request.side_effect = simulate_triaged_review
+    review_runner = ReviewRunner(
+        llm=mock_deps["mock_llm"],
+        github_client=mock_deps["mock_github_client"],
+        triage_llm=mock_deps["mock_llm"],
+    )
+
+    result = review_runner.review("https://github.com/o/r/pull/1", "o", "r", 1)
+
+    assert mock_deps["mock_review_agent"].call_args.kwargs["triage_agent"] is review_runner.triage_agent
+    assert result.llm_calls == 3
+    assert result.input_tokens == 2500
+    assert result.output_tokens == 100
+    assert result.avoided_llm_calls == 3
+    assert result.avoided_input_tokens == 4200
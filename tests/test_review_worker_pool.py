@@ -0,0 +1,178 @@
+import queue
+import threading
+import time
+
+import pytest
+
+from core.models.pull_request_review_result import PullRequestReviewResult
+from core.models.review_job import ReviewJob
+from infrastructure.repositories.review_job_store import ReviewJobStore
+from infrastructure.servers.review_worker_pool import ReviewWorkerPool
+
+
+class FakeReviewRunner:
+    def __init__(self, fail_for=()):
+        self.fail_for = fail_for
+        self.reviewed = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def review(
+        self,
+        url,
+        repo_owner,
+        repo_name,
+        pr_number,
+        observers=None,
+        review_progress=None,
+        cancellation_token=None,
+    ):
+        self.release.wait(5)
+        self.reviewed.append(pr_number)
+        if pr_number in self.fail_for:
+            raise RuntimeError("GitHub is down")
+        return PullRequestReviewResult(url=url, status="succeeded")
+
+
+def job(pr_number, head_sha="abc"):
+    return ReviewJob(
+        repo_owner="Maokli", repo_name="ReviewPal", pr_number=pr_number, head_sha=head_sha
+    )
+
+
+def test_workers_review_every_submitted_job():
+    review_runner = FakeReviewRunner(fail_for=(2,))
+    worker_pool = ReviewWorkerPool(review_runner, workers=2).start()
+
+    for pr_number in (1, 2, 3):
+        assert worker_pool.submit(job(pr_number))
+    worker_pool.stop(timeout=5)
+
+    assert sorted(review_runner.reviewed) == [1, 2, 3]
+    stats = worker_pool.stats()
+    assert stats["completed"] == 2
+    assert stats["failed"] == 1
+    assert stats["queue_depth"] == 0
+    assert stats["in_flight"] == 0
+
+
+def test_deferred_job_is_submitted_again_after_its_delay():
+    class DeferringReviewRunner(FakeReviewRunner):
+        def review(self, url, repo_owner, repo_name, pr_number, **kwargs):
+            self.reviewed.append(pr_number)
+            if len(self.reviewed) == 1:
+                return PullRequestReviewResult(
+                    url=url, status="deferred", retry_after_seconds=0.05
+                )
+            return PullRequestReviewResult(url=url, status="reviewed")
+
+    review_runner = DeferringReviewRunner()
+    worker_pool = ReviewWorkerPool(review_runner, workers=1).start()
+
+    assert worker_pool.submit(job(1))
+    deadline = time.monotonic() + 5
+    while worker_pool.stats()["completed"] < 1:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    worker_pool.stop(timeout=5)
+
+    assert review_runner.reviewed == [1, 1]
+    assert worker_pool.stats()["deferred"] == 1
+
+
+def test_identical_waiting_jobs_are_not_enqueued_twice():
+    worker_pool = ReviewWorkerPool(FakeReviewRunner(), workers=1)
+
+    assert worker_pool.submit(job(1))
+    assert not worker_pool.submit(job(1))
+    assert worker_pool.submit(job(1, head_sha="def"))
+    assert worker_pool.queue_depth == 2
+
+
+def test_full_queue_rejects_jobs():
+    worker_pool = ReviewWorkerPool(FakeReviewRunner(), workers=1, max_queue_size=1)
+
+    worker_pool.submit(job(1))
+    with pytest.raises(queue.Full):
+        worker_pool.submit(job(2))
+
+
+def test_pool_is_healthy_only_while_workers_run():
+    worker_pool = ReviewWorkerPool(FakeReviewRunner(), workers=2)
+    assert not worker_pool.is_healthy()
+
+    worker_pool.start()
+    assert worker_pool.is_healthy()
+
+    worker_pool.stop(timeout=5)
+    assert not worker_pool.is_healthy()
+
+
+def test_durable_pool_reviews_jobs_from_the_job_store(tmp_path):
+    job_store = ReviewJobStore(str(tmp_path / "jobs.sqlite"), max_attempts=1)
+    review_runner = FakeReviewRunner(fail_for=(2,))
+    worker_pool = ReviewWorkerPool(
+        review_runner, workers=2, job_store=job_store, poll_interval_seconds=0.01
+    )
+
+    assert worker_pool.submit(job(1))
+    assert worker_pool.submit(job(2))
+    assert not worker_pool.submit(job(1))
+    worker_pool.start()
+    deadline = time.monotonic() + 5
+    while job_store.count("queued") or job_store.count("running"):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    worker_pool.stop(timeout=5)
+
+    assert sorted(review_runner.reviewed) == [1, 2]
+    assert job_store.stats() == {
+        "queued": 0,
+        "running": 0,
+        "done": 1,
+        "failed": 1,
+        "cancelled": 0,
+    }
+    assert not worker_pool.submit(job(1))
+    assert worker_pool.stats()["jobs"]["done"] == 1
+
+
+class CancellableReviewRunner:
+    """Reviews until cancelled, spending one llm call per 10 ms."""
+
+    def __init__(self):
+        self.started = threading.Event()
+
+    def review(
+        self, url, repo_owner, repo_name, pr_number, observers=None, cancellation_token=None
+    ):
+        self.started.set()
+        llm_calls = 0
+        while not cancellation_token.cancelled and llm_calls < 50:
+            llm_calls += 1
+            time.sleep(0.01)
+        status = "cancelled" if cancellation_token.cancelled else "reviewed"
+        return PullRequestReviewResult(
+            url=url, status=status, error=cancellation_token.reason, llm_calls=llm_calls
+        )
+
+
+def test_newer_push_cancels_the_in_flight_review_and_reports_wasted_work():
+    review_runner = CancellableReviewRunner()
+    worker_pool = ReviewWorkerPool(review_runner, workers=1).start()
+
+    worker_pool.submit(job(1, head_sha="abc"))
+    assert review_runner.started.wait(5)
+    worker_pool.submit(job(1, head_sha="def"))
+    worker_pool.submit(job(1, head_sha="ghi"))
+    worker_pool.stop(timeout=10)
+
+    stats = worker_pool.stats()
+    assert stats["cancelled"] == 2
+    assert stats["completed"] == 1
+    assert 0 < stats["wasted"]["llm_calls"] < 50
+    assert [result.error for result in worker_pool.results] == [
+        "superseded by def",
+        "superseded by ghi",
+        None,
+    ]
@@ -0,0 +1,91 @@
+import json
+from unittest.mock import Mock
+
+from application.parsers.github_pull_request_parser import parse_pull_request_files
+from core.instrumentation.run_metrics import RunMetrics
+from core.instrumentation.stages import observe_stages, stage
+from infrastructure.repositories.github_repository import GitHubRepository
+
+
+def test_run_metrics_aggregates_stages():
+    run_metrics = RunMetrics(pull_request="https://github.com/owner/repo/pull/1")
+
+    with observe_stages(run_metrics):
+        for chunk_index in range(2):
+            with stage("llm_call", chunk_index=chunk_index) as stage_attributes:
+                stage_attributes.update(requests=1, input_tokens=100, output_tokens=10, cached_tokens=64)
+                with stage("comment_post", requests=2, bytes=5):
+                    pass
+
+    report = run_metrics.report()
+    llm_call = report.stages["llm_call"]
+    assert report.pull_request == "https://github.com/owner/repo/pull/1"
+    assert llm_call.calls == 2
+    assert llm_call.requests == 2
+    assert llm_call.input_tokens == 200
+    assert llm_call.output_tokens == 20
+    assert llm_call.cached_tokens == 128
+    assert llm_call.self_time_seconds <= llm_call.wall_time_seconds
+    assert report.stages["comment_post"].requests == 4
+    assert report.stages["comment_post"].bytes == 10
+
+
+def test_run_metrics_counts_errors():
+    run_metrics = RunMetrics()
+
+    with observe_stages(run_metrics):
+        try:
+            with stage("pr_fetch"):
+                raise ValueError("boom")
+        except ValueError:
+            pass
+
+    assert run_metrics.report().stages["pr_fetch"].errors == 1
+
+
+def test_write_report(tmp_path):
+    run_metrics = RunMetrics()
+    with observe_stages(run_metrics):
+        with stage("split", bytes=42):
+            pass
+
+    report_path = tmp_path / "report.json"
+    run_metrics.write_report(str(report_path))
+
+    report = json.loads(report_path.read_text())
+    assert report["stages"]["split"]["bytes"] == 42
+    assert report["stages"]["split"]["calls"] == 1
+    assert "wall_time_seconds" in report
+
+
+def test_to_prometheus():
+    run_metrics = RunMetrics()
+    with observe_stages(run_metrics):
+        with stage("llm_call", requests=1, input_tokens=7, cached_tokens=3):
+            pass
+
+    text = run_metrics.to_prometheus()
+
+    assert "# TYPE reviewpal_stage_calls_total counter" in text
+    assert 'reviewpal_stage_calls_total{stage="llm_call"} 1' in text
+    assert 'reviewpal_stage_requests_total{stage="llm_call"} 1' in text
+    assert 'reviewpal_stage_tokens_total{stage="llm_call",kind="input"} 7' in text
+    assert 'reviewpal_stage_tokens_total{stage="llm_call",kind="cached"} 3' in text
+    assert text.endswith("\n")
+
+
+def test_parse_pull_request_files_records_fetch_and_parse_stages():
+    github_repository = Mock(spec=GitHubRepository)
+    mock_file = Mock(filename="test.py", patch="@@ -1,1 +1,1 @@\n-old\n+new")
+    github_repository.get_pull_request_files.return_value = [mock_file]
+    github_repository.get_file_content.return_value = "old"
+    run_metrics = RunMetrics()
+
+    with observe_stages(run_metrics):
+        parse_pull_request_files(github_repository)
+
+    stages = run_metrics.report().stages
+    assert stages["pr_fetch"].requests == 1
+    assert stages["diff_parse"].calls == 1
+    assert stages["file_content_fetch"].requests == 1
+    assert stages["file_content_fetch"].bytes == 3
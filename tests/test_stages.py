@@ -0,0 +1,97 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core.instrumentation.stages import StageObserver, observe_stages, stage
+
+
+class RecordingObserver(StageObserver):
+    def __init__(self):
+        self.events = []
+
+    def on_stage_start(self, stage_run):
+        self.events.append(("start", stage_run.name))
+
+    def on_stage_end(self, stage_run):
+        self.events.append(("end", stage_run.name, stage_run))
+
+
+def test_stage_without_observer_yields_attributes():
+    with stage("render", file_path="a.py") as stage_attributes:
+        stage_attributes["bytes"] = 3
+
+    assert stage_attributes == {"file_path": "a.py", "bytes": 3}
+
+
+def test_nested_stages_notify_observers_with_parent_and_self_time():
+    observer = RecordingObserver()
+
+    with observe_stages(observer):
+        with stage("llm_call", chunk_index=0):
+            with stage("comment_post") as stage_attributes:
+                stage_attributes["requests"] = 2
+
+    assert [event[:2] for event in observer.events] == [
+        ("start", "llm_call"),
+        ("start", "comment_post"),
+        ("end", "comment_post"),
+        ("end", "llm_call"),
+    ]
+    comment_post = observer.events[2][2]
+    llm_call = observer.events[3][2]
+    assert comment_post.parent is llm_call
+    assert comment_post.attributes == {"requests": 2}
+    assert llm_call.children_duration == comment_post.duration
+    assert llm_call.self_duration <= llm_call.duration
+
+
+def test_children_ending_concurrently_add_up_in_the_parent():
+    observer = RecordingObserver()
+
+    def review_chunk(_):
+        with stage("llm_call"):
+            pass
+
+    with observe_stages(observer):
+        with stage("file_review"):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                contexts = [contextvars.copy_context() for _ in range(400)]
+                list(
+                    executor.map(
+                        lambda context: context.run(review_chunk, None), contexts
+                    )
+                )
+
+    file_review = observer.events[-1][2]
+    llm_calls = [
+        event[2] for event in observer.events if event[:2] == ("end", "llm_call")
+    ]
+    assert len(llm_calls) == 400
+    assert all(llm_call.parent is file_review for llm_call in llm_calls)
+    assert file_review.children_duration == pytest.approx(
+        sum(llm_call.duration for llm_call in llm_calls)
+    )
+
+
+def test_stage_records_errors_and_reraises():
+    observer = RecordingObserver()
+
+    with observe_stages(observer):
+        with pytest.raises(KeyError):
+            with stage("file_content_fetch"):
+                raise KeyError("missing")
+
+    assert observer.events[-1][2].error == "KeyError"
+
+
+def test_observers_are_scoped_to_the_context():
+    observer = RecordingObserver()
+
+    with observe_stages(observer):
+        with stage("split"):
+            pass
+    with stage("split"):
+        pass
+
+    assert len(observer.events) == 2
@@ -0,0 +1,102 @@
+from application.parsers.streaming_llm_review_parser import StreamingLlmReviewParser
+
+review_output = (
+    '```json\n{"analysis": {"reasoning": "Two {bugs} in \\"comments\\"", "needs_comments": true},'
+    ' "comments": [{"line_content": "+return None", "comment": "Return a value."},'
+    ' {"line_content": "+x = [1, 2]", "comment": "Use a tuple, see {docs}."}]}\n```'
+)
+
+
+def feed_characters(parser: StreamingLlmReviewParser, text: str) -> list[list[str]]:
+    """Feeds the text one character at a time, returning the comments completed after each one."""
+    return [
+        [comment.comment for comment in parser.feed(character)] for character in text
+    ]
+
+
+def test_streaming_parser_returns_each_comment_as_soon_as_it_closes():
+    parser = StreamingLlmReviewParser()
+
+    completed = feed_characters(parser, review_output)
+
+    first_comment_end = review_output.index('value."}') + len('value."}') - 1
+    assert completed[first_comment_end] == ["Return a value."]
+    assert [comments for comments in completed if comments] == [
+        ["Return a value."],
+        ["Use a tuple, see {docs}."],
+    ]
+    assert [comment.line_content for comment in parser.comments] == [
+        "+return None",
+        "+x = [1, 2]",
+    ]
+
+
+def test_streaming_parser_matches_whole_output():
+    parser = StreamingLlmReviewParser()
+
+    comments = parser.feed(review_output)
+
+    assert parser.needs_comments is True
+    assert [comment.comment for comment in comments] == [
+        "Return a value.",
+        "Use a tuple, see {docs}.",
+    ]
+
+
+def test_streaming_parser_detects_needs_comments_before_the_end():
+    parser = StreamingLlmReviewParser()
+
+    parser.feed('{"analysis": {"reasoning": "Fine", "needs_comments": fal')
+    assert parser.needs_comments is None
+
+    parser.feed("se},")
+    assert parser.needs_comments is False
+    assert parser.comments == []
+
+
+def test_streaming_parser_ignores_objects_outside_the_comments_array():
+    parser = StreamingLlmReviewParser()
+
+    comments = parser.feed(
+        '{"analysis": {"reasoning": "", "needs_comments": true, "extra": [{"comment": "no"}]},'
+        ' "comments": []}'
+    )
+
+    assert comments == []
+
+
+def test_streaming_parser_keeps_going_after_an_invalid_comment():
+    parser = StreamingLlmReviewParser()
+    parser.feed('{"analysis": {"reasoning": "", "needs_comments": true}, "comments": [')
+
+    assert parser.feed('{"comment": "No line"}') == []
+    comments = parser.feed(', {"line_content": "+a", "comment": "Fine"}]}')
+
+    assert [comment.comment for comment in comments] == ["Fine"]
+    assert len(parser.invalid_comments) == 1
+    assert "Invalid llm comment output" in parser.invalid_comments[0]
+
+
+def test_streaming_parser_keeps_the_valid_comments_fed_with_an_invalid_one():
+    parser = StreamingLlmReviewParser()
+
+    comments = parser.feed(
+        '{"analysis": {"reasoning": "", "needs_comments": true}, "comments": ['
+        '{"line_content": "+a", "comment": "First"}, {"comment": "No line"},'
+        ' {"line_content": "+b", "comment": "Last"}]}'
+    )
+
+    assert [comment.comment for comment in comments] == ["First", "Last"]
+    assert [comment.comment for comment in parser.comments] == ["First", "Last"]
+    assert parser.needs_comments is True
+    assert len(parser.invalid_comments) == 1
+
+
+def test_streaming_parser_ignores_needs_comments_inside_strings():
+    parser = StreamingLlmReviewParser()
+
+    parser.feed('{"analysis": {"reasoning": "no \\"needs_comments\\": false here", ')
+    assert parser.needs_comments is None
+
+    parser.feed('"needs_comments":\n true}')
+    assert parser.needs_comments is True
@@ -0,0 +1,263 @@
+import io
+import tarfile
+from types import SimpleNamespace
+
+from application.indexes.symbol_index import SymbolIndex
+from application.parsers.python_symbol_parser import parse_python_symbols
+from infrastructure.repositories.github_repository import GitHubRepository
+from infrastructure.repositories.symbol_index_repository import SymbolIndexRepository
+
+UTILS = """
+import os
+
+retry_limit: int = 3
+
+
+def parse_changes(file_diff: str, strict=False) -> tuple:
+    return os.path.split(file_diff)
+
+
+class ChangeParser(BaseParser):
+    def parse(self, text):
+        return parse_changes(text)
+"""
+
+CALLER = """
+from utils import parse_changes
+
+
+def review(diff):
+    return parse_changes(diff)
+"""
+
+
+def test_parser_indexes_definitions_and_usages():
+    file_symbols = parse_python_symbols("utils.py", UTILS)
+
+    definitions = {
+        definition.name: definition for definition in file_symbols.definitions
+    }
+    assert definitions["parse_changes"].signature == (
+        "def parse_changes(file_diff: str, strict=False) -> tuple"
+    )
+    assert definitions["parse_changes"].line == 7
+    assert definitions["ChangeParser"].signature == "class ChangeParser(BaseParser)"
+    assert definitions["parse"].kind == "function"
+    assert definitions["retry_limit"].kind == "variable"
+    assert file_symbols.usages["parse_changes"] == [13]
+    assert file_symbols.usages["split"] == [8]
+
+
+def test_parser_skips_files_that_do_not_parse():
+    file_symbols = parse_python_symbols("broken.py", "def broken(:\n")
+
+    assert file_symbols.definitions == []
+    assert file_symbols.usages == {}
+
+
+def create_index() -> SymbolIndex:
+    return SymbolIndex(
+        base_sha="base",
+        files=[
+            parse_python_symbols("utils.py", UTILS),
+            parse_python_symbols("review.py", CALLER),
+        ],
+    )
+
+
+def test_context_lists_the_definitions_of_the_used_symbols():
+    context = create_index().context_for("+ result = parse_changes(diff)", "review.py")
+
+    assert "Attachments, definitions and usages" in context
+    assert (
+        "- `parse_changes` is defined at utils.py:7: "
+        "def parse_changes(file_diff: str, strict=False) -> tuple"
+    ) in context
+
+
+def test_context_lists_the_usages_of_the_changed_definitions_in_other_files():
+    context = create_index().context_for(
+        "- def parse_changes(file_diff: str, strict=False) -> tuple:\n"
+        "+ def parse_changes(file_diff: str) -> tuple:",
+        "utils.py",
+    )
+
+    assert "- `parse_changes` is used at review.py:6" in context
+    assert "is defined at" not in context
+
+
+def test_context_is_empty_for_unknown_symbols():
+    assert create_index().context_for("+ value = compute(total)", "a.py") == ""
+
+
+def test_context_skips_ambiguous_names():
+    index = SymbolIndex(
+        files=[
+            parse_python_symbols(f"module_{i}.py", "def handle(event):\n    pass\n")
+            for i in range(4)
+        ]
+    )
+
+    assert index.context_for("+ handle(event)", "a.py") == ""
+
+
+def test_context_stays_under_the_token_cap():
+    index = SymbolIndex(
+        files=[
+            parse_python_symbols(
+                f"module_{i}.py", f"def function_{i}(value):\n    pass\n"
+            )
+            for i in range(50)
+        ]
+    )
+    chunk = "\n".join(f"+ function_{i}(x)" for i in range(50))
+
+    context = index.context_for(chunk, "a.py", max_tokens=100)
+
+    assert 0 < len(context) / 4 <= 100
+    assert context.count("is defined at") < 50
+
+
+def test_updating_or_removing_a_file_replaces_its_symbols():
+    index = create_index()
+
+    index.update_file(
+        parse_python_symbols("review.py", "def review(diff):\n    pass\n")
+    )
+    assert index.usages("parse_changes") == {"utils.py": [13]}
+
+    index.remove_file("utils.py")
+    assert index.definitions("parse_changes") == []
+    assert index.usages("parse_changes") == {}
+    assert len(index) == 1
+
+
+def create_tarball(files: dict[str, str]) -> bytes:
+    tarball = io.BytesIO()
+    with tarfile.open(fileobj=tarball, mode="w:gz") as archive:
+        for path, content in files.items():
+            data = content.encode()
+            member = tarfile.TarInfo(f"owner-repo-abc123/{path}")
+            member.size = len(data)
+            archive.addfile(member, io.BytesIO(data))
+    return tarball.getvalue()
+
+
+def test_archive_files_are_read_from_the_tarball(mocker):
+    github_client = mocker.Mock()
+    github_client.get_repo.return_value.get_archive_link.return_value = (
+        "https://archive"
+    )
+    github_repository = GitHubRepository(
+        repo_owner="owner", repo_name="repo", pr_number=1, github_client=github_client
+    )
+    response = mocker.Mock(
+        raw=io.BytesIO(
+            create_tarball(
+                {"utils.py": UTILS, "README.md": "# Readme", "pkg/review.py": CALLER}
+            )
+        )
+    )
+    response.__enter__ = mocker.Mock(return_value=response)
+    response.__exit__ = mocker.Mock(return_value=False)
+    mocker.patch(
+        "infrastructure.repositories.github_repository.requests.get",
+        return_value=response,
+    )
+
+    files = dict(github_repository.get_archive_files("base", (".py",)))
+
+    assert files == {"utils.py": UTILS, "pkg/review.py": CALLER}
+
+
+class FakeGitHubRepository:
+    def __init__(self, base_sha: str, files: dict[str, str]):
+        self.repo_owner = "owner"
+        self.repo_name = "repo"
+        self.pull_request = SimpleNamespace(
+            base=SimpleNamespace(ref="main", sha=base_sha)
+        )
+        self.files = files
+        self.changed_files = []
+        self.compare_status = "ahead"
+        self.archive_requests = 0
+        self.content_requests = 0
+
+    def get_archive_files(self, ref, suffixes, max_file_bytes):
+        self.archive_requests += 1
+        return list(self.files.items())
+
+    def compare_commits(self, base_sha, head_sha):
+        return self.compare_status, self.changed_files
+
+    def get_file_content(self, file_path, ref=None):
+        self.content_requests += 1
+        return self.files[file_path]
+
+
+def changed_file(filename: str, status: str = "modified", previous_filename=None):
+    return SimpleNamespace(
+        filename=filename, status=status, previous_filename=previous_filename
+    )
+
+
+def test_index_is_built_once_per_base_commit():
+    symbol_indexes = SymbolIndexRepository()
+    github_repository = FakeGitHubRepository("base", {"utils.py": UTILS})
+
+    first_index = symbol_indexes.get_index(github_repository)
+    second_index = symbol_indexes.get_index(github_repository)
+
+    assert first_index is second_index
+    assert github_repository.archive_requests == 1
+    assert first_index.definitions("parse_changes")[0].path == "utils.py"
+
+
+def test_index_is_refreshed_with_the_files_changed_since_the_indexed_commit():
+    symbol_indexes = SymbolIndexRepository()
+    github_repository = FakeGitHubRepository(
+        "base", {"utils.py": UTILS, "old.py": CALLER}
+    )
+    symbol_indexes.get_index(github_repository)
+
+    github_repository.pull_request.base.sha = "newer"
+    github_repository.files = {
+        "utils.py": "def parse_diff(file_diff):\n    pass\n",
+        "review.py": CALLER,
+    }
+    github_repository.changed_files = [
+        changed_file("utils.py"),
+        changed_file("review.py", "renamed", previous_filename="old.py"),
+        changed_file("README.md"),
+    ]
+    index = symbol_indexes.get_index(github_repository)
+
+    assert github_repository.archive_requests == 1
+    assert github_repository.content_requests == 2
+    assert index.base_sha == "newer"
+    assert index.definitions("parse_changes") == []
+    assert index.definitions("parse_diff")[0].path == "utils.py"
+    assert index.usages("parse_changes") == {"review.py": [6]}
+
+
+def test_index_is_rebuilt_when_the_base_branch_diverged():
+    symbol_indexes = SymbolIndexRepository()
+    github_repository = FakeGitHubRepository("base", {"utils.py": UTILS})
+    symbol_indexes.get_index(github_repository)
+
+    github_repository.pull_request.base.sha = "force-pushed"
+    github_repository.compare_status = "diverged"
+    index = symbol_indexes.get_index(github_repository)
+
+    assert github_repository.archive_requests == 2
+    assert index.base_sha == "force-pushed"
+
+
+def test_index_is_loaded_from_the_cache_directory(tmp_path):
+    github_repository = FakeGitHubRepository("base", {"utils.py": UTILS})
+    SymbolIndexRepository(cache_dir=str(tmp_path)).get_index(github_repository)
+
+    index = SymbolIndexRepository(cache_dir=str(tmp_path)).get_index(github_repository)
+
+    assert github_repository.archive_requests == 1
+    assert index.definitions("parse_changes")[0].line == 7
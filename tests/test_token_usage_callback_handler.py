@@ -0,0 +1,122 @@
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from infrastructure.callbacks.token_usage_callback_handler import TokenUsageCallbackHandler
+
+
+def test_on_llm_end_records_usage_metadata_with_cached_tokens():
+    handler = TokenUsageCallbackHandler()
+    message = AIMessage(
+        content="{}",
+        usage_metadata={
+            "input_tokens": 1200,
+            "output_tokens": 40,
+            "total_tokens": 1240,
+            "input_token_details": {"cache_read": 1024},
+        },
+    )
+
+    handler.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]))
+    handler.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]))
+
+    usage = handler.token_usage
+    assert usage.calls == 2
+    assert usage.input_tokens == 2400
+    assert usage.output_tokens == 80
+    assert usage.cached_tokens == 2048
+    assert round(usage.cache_hit_rate, 3) == 0.853
+
+
+def test_on_llm_end_falls_back_to_llm_output_token_usage():
+    handler = TokenUsageCallbackHandler()
+    result = LLMResult(
+        generations=[[ChatGeneration(message=AIMessage(content="{}"))]],
+        llm_output={
+            "token_usage": {
+                "prompt_tokens": 100,
+                "completion_tokens": 10,
+                "prompt_tokens_details": {"cached_tokens": 64},
+            }
+        },
+    )
+
+    handler.on_llm_end(result)
+
+    assert handler.token_usage.input_tokens == 100
+    assert handler.token_usage.output_tokens == 10
+    assert handler.token_usage.cached_tokens == 64
+
+
+def test_agent_executor_calls_of_the_review_llm_report_their_usage(mocker, monkeypatch):
+    import json
+
+    import httpx
+    from langchain.agents import AgentExecutor, create_tool_calling_agent
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.tools import tool
+
+    from presentation.cli import create_review_llm
+
+    requests = []
+
+    def send(self, request, **kwargs):
+        body = json.loads(request.content)
+        requests.append(body)
+        chunk = {
+            "id": "chatcmpl-1",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "gpt-4o-mini",
+        }
+        events = [
+            {**chunk, "choices": [{"index": 0, "delta": {"role": "assistant", "content": "No comment"}}]},
+            {**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]},
+        ]
+        # Like the OpenAI API, a streamed response only reports its usage when asked to
+        if (body.get("stream_options") or {}).get("include_usage"):
+            events.append(
+                {
+                    **chunk,
+                    "choices": [],
+                    "usage": {
+                        "prompt_tokens": 1200,
+                        "completion_tokens": 3,
+                        "total_tokens": 1203,
+                        "prompt_tokens_details": {"cached_tokens": 1024},
+                    },
+                }
+            )
+        content = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            content=content.encode(),
+            request=request,
+        )
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    mocker.patch.object(httpx.Client, "send", send)
+
+    @tool
+    def add_comment(comment: str) -> str:
+        """Adds a comment."""
+        return comment
+
+    prompt = ChatPromptTemplate.from_messages(
+        [("human", "{input}"), ("placeholder", "{agent_scratchpad}")]
+    )
+    llm = create_review_llm("gpt-4o-mini")
+    agent_executor = AgentExecutor(
+        agent=create_tool_calling_agent(llm=llm, tools=[add_comment], prompt=prompt),
+        tools=[add_comment],
+    )
+    handler = TokenUsageCallbackHandler()
+
+    agent_executor.invoke({"input": "Review this"}, config={"callbacks": [handler]})
+
+    assert requests[0]["stream"] is True
+    usage = handler.token_usage
+    assert usage.calls == 1
+    assert usage.input_tokens == 1200
+    assert usage.output_tokens == 3
+    assert usage.cached_tokens == 1024
@@ -0,0 +1,57 @@
+import json
+
+from core.instrumentation.stages import observe_stages, stage
+from core.instrumentation.tracing import Tracer
+
+
+def record_review_spans(tracer):
+    with observe_stages(tracer):
+        with stage("review_file", file_path="a.py"):
+            with stage("llm_call", file_path="a.py", chunk_index=0) as stage_attributes:
+                stage_attributes["input_tokens"] = 120
+                with stage("comment_post", file_path="a.py"):
+                    pass
+
+
+def test_tracer_records_parent_child_relationships():
+    tracer = Tracer()
+
+    record_review_spans(tracer)
+
+    spans = {span["name"]: span for span in tracer.spans}
+    assert spans["review_file"]["parent_id"] is None
+    assert spans["llm_call"]["parent_id"] == spans["review_file"]["span_id"]
+    assert spans["comment_post"]["parent_id"] == spans["llm_call"]["span_id"]
+    assert spans["llm_call"]["attributes"] == {"file_path": "a.py", "chunk_index": 0, "input_tokens": 120}
+
+
+def test_export_chrome_trace(tmp_path):
+    tracer = Tracer()
+    record_review_spans(tracer)
+    trace_path = tmp_path / "trace.json"
+
+    tracer.export_chrome_trace(str(trace_path))
+
+    trace = json.loads(trace_path.read_text())
+    events = trace["traceEvents"]
+    assert [event["name"] for event in events] == ["review_file", "llm_call", "comment_post"]
+    assert all(event["ph"] == "X" for event in events)
+    parent, child = events[0], events[1]
+    assert parent["ts"] <= child["ts"]
+    assert child["ts"] + child["dur"] <= parent["ts"] + parent["dur"]
+    assert child["args"]["chunk_index"] == 0
+    assert child["args"]["parent_id"] == parent["args"]["span_id"]
+    assert child["tid"] == parent["tid"]
+
+
+def test_chrome_trace_records_errors():
+    tracer = Tracer()
+
+    with observe_stages(tracer):
+        try:
+            with stage("pr_fetch"):
+                raise RuntimeError("GitHub is down")
+        except RuntimeError:
+            pass
+
+    assert tracer.to_chrome_trace()["traceEvents"][0]["args"]["error"] == "RuntimeError"
@@ -0,0 +1,103 @@
+import json
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from application.parsers.triage_parser import parse_triage_decisions
+from core.concurrency.cancellation import CancellationToken, ReviewCancelledError
+from core.concurrency.circuit_breaker import CircuitBreaker
+from core.concurrency.dependency_guard import DependencyGuard
+from core.instrumentation.run_metrics import RunMetrics
+from core.instrumentation.stages import observe_stages
+from infrastructure.agents.triage_agent import TriageAgent
+
+
+def triage_output(scores: dict) -> str:
+    return json.dumps(
+        {"chunks": [{"id": chunk_id, "score": score} for chunk_id, score in scores.items()]}
+    )
+
+
+chunks = [
+    ("app.py", "+ password = request.args['password']"),
+    ("README.md", "+ Fix a typo"),
+    ("app.py", "+ return eval(expression)"),
+]
+
+
+def test_only_chunks_scored_above_the_threshold_need_review():
+    llm = FakeListChatModel(responses=[triage_output({0: 0.9, 1: 0.05, 2: 0.5})])
+    triage_agent = TriageAgent(llm, threshold=0.5)
+    run_metrics = RunMetrics()
+
+    with observe_stages(run_metrics):
+        needs_review = triage_agent.triage(chunks)
+
+    assert needs_review == [True, False, True]
+    triage = run_metrics.report().stages["triage"]
+    assert triage.calls == 1
+    assert triage.avoided_requests == 1
+    assert triage.avoided_input_tokens > triage_agent.review_prompt_tokens
+
+
+def test_chunks_are_triaged_in_batches():
+    llm = FakeListChatModel(
+        responses=[triage_output({0: 0.0, 1: 0.0}), triage_output({0: 1.0})]
+    )
+    triage_agent = TriageAgent(llm, max_chunks_per_call=2)
+    run_metrics = RunMetrics()
+
+    with observe_stages(run_metrics):
+        needs_review = triage_agent.triage(chunks)
+
+    assert needs_review == [False, False, True]
+    assert run_metrics.report().stages["triage"].calls == 2
+    assert run_metrics.report().stages["triage"].avoided_requests == 2
+
+
+@pytest.mark.parametrize(
+    "response", ["I cannot help with that.", '```json\n{"chunks": [{"id": 1, "score": 0}]}\n```']
+)
+def test_unparsable_or_missing_decisions_fail_open(response):
+    triage_agent = TriageAgent(FakeListChatModel(responses=[response]))
+
+    needs_review = triage_agent.triage(chunks)
+
+    assert needs_review[0] and needs_review[2]
+
+
+
+class FailingChatModel(FakeListChatModel):
+    """Fails every call like an unavailable provider."""
+
+    def _call(self, *args, **kwargs):
+        raise TimeoutError("The llm did not answer")
+
+
+def test_failed_triage_calls_fail_open():
+    llm_guard = DependencyGuard(
+        "llm", circuit_breaker=CircuitBreaker("llm", failure_threshold=1)
+    )
+    triage_agent = TriageAgent(
+        FailingChatModel(responses=[""]), max_chunks_per_call=2, llm_guard=llm_guard
+    )
+
+    needs_review = triage_agent.triage(chunks)
+
+    assert needs_review == [True, True, True]
+    # The first failure opens the circuit, the second batch is rejected without a call
+    assert llm_guard.stats()["outcomes"] == {"success": 0, "failure": 1, "rejected": 1}
+
+
+def test_triage_of_a_cancelled_review_raises():
+    cancellation_token = CancellationToken()
+    cancellation_token.cancel("superseded")
+    triage_agent = TriageAgent(FakeListChatModel(responses=[triage_output({0: 1.0})]))
+
+    with pytest.raises(ReviewCancelledError):
+        triage_agent.triage(chunks, cancellation_token=cancellation_token)
+
+
+def test_invalid_triage_output_is_rejected():
+    with pytest.raises(ValueError, match="Invalid llm triage output"):
+        parse_triage_decisions('{"chunks": [{"id": 0, "score": 3}]}')
@@ -0,0 +1,235 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from application.indexes.hashing_embedder import HashingEmbedder
+from application.indexes.vector_index import VectorIndex, format_related_snippets
+from application.text_splitters.code_snippet_splitter import split_code_snippets
+from core.models.code_snippet import CodeSnippet
+from infrastructure.repositories.vector_index_repository import (
+    VectorIndexRepository,
+    git_blob_sha,
+)
+
+PARSER = """def parse_pull_request(github_repository):
+    files = github_repository.get_pull_request_files()
+    return [parse_file(file) for file in files]
+"""
+
+COMMENTS = """def add_comment(github_repository, comment):
+    github_repository.add_comment_to_pull_request(comment.line, comment.text)
+"""
+
+MATH = """def mean(values):
+    return sum(values) / len(values)
+"""
+
+
+def test_hashing_embedder_is_deterministic_and_groups_shared_names():
+    embedder = HashingEmbedder(dimensions=64)
+
+    vectors = embedder.embed_documents([PARSER, PARSER, COMMENTS, MATH])
+
+    assert vectors.shape == (4, 64)
+    assert np.allclose(vectors[0], vectors[1])
+    assert np.isclose(np.linalg.norm(vectors[0]), 1.0)
+    assert vectors[0] @ vectors[2] > vectors[0] @ vectors[3]
+
+
+def test_snippets_end_at_blank_lines():
+    source = "\n".join(f"def function_{i}():\n    return {i}\n" for i in range(10))
+
+    snippets = split_code_snippets("module.py", source, max_lines=8)
+
+    assert snippets[0].start_line == 1
+    assert snippets[0].end_line == 6
+    assert snippets[0].text.startswith("def function_0")
+    assert snippets[1].start_line == 7
+    assert all(snippet.end_line - snippet.start_line < 8 for snippet in snippets)
+    assert snippets[-1].text.endswith("return 9")
+
+
+def snippet(path: str, text: str) -> CodeSnippet:
+    return CodeSnippet(
+        path=path, start_line=1, end_line=text.count("\n") + 1, text=text
+    )
+
+
+def create_index(directory, embedder: HashingEmbedder) -> VectorIndex:
+    index = VectorIndex(
+        str(directory), model=embedder.model, dimensions=embedder.dimensions
+    )
+    for path, text in [
+        ("parser.py", PARSER),
+        ("comments.py", COMMENTS),
+        ("math.py", MATH),
+    ]:
+        index.update_file(
+            path,
+            git_blob_sha(text.encode()),
+            [snippet(path, text)],
+            embedder.embed_documents([text]),
+        )
+    return index
+
+
+def test_search_returns_the_most_similar_snippets_of_other_files(tmp_path):
+    embedder = HashingEmbedder()
+    index = create_index(tmp_path, embedder)
+    queries = embedder.embed_documents(
+        ["+ files = github_repository.get_pull_request_files()", "+ return sum(values)"]
+    )
+
+    first_matches, second_matches = index.search(queries, k=2, min_score=0.0)
+    excluded_matches = index.search(
+        queries[:1], k=3, exclude_path="parser.py", min_score=0.0
+    )[0]
+
+    assert first_matches[0][0].path == "parser.py"
+    assert first_matches[0][1] > first_matches[1][1]
+    assert second_matches[0][0].path == "math.py"
+    assert [match.path for match, _ in excluded_matches] == ["comments.py", "math.py"]
+
+
+def test_updated_and_removed_files_leave_the_search(tmp_path):
+    embedder = HashingEmbedder()
+    index = create_index(tmp_path, embedder)
+
+    index.update_file(
+        "parser.py",
+        "new",
+        [snippet("parser.py", MATH)],
+        embedder.embed_documents([MATH]),
+    )
+    index.remove_file("math.py")
+    matches = index.search(embedder.embed_documents([MATH]), k=5, min_score=0.0)[0]
+
+    assert [match.path for match, _ in matches] == ["parser.py", "comments.py"]
+    assert index.blob_sha("parser.py") == "new"
+    assert index.blob_sha("math.py") is None
+
+
+def test_index_is_reloaded_from_disk_and_compacted(tmp_path):
+    embedder = HashingEmbedder()
+    index = create_index(tmp_path, embedder)
+    for i in range(100):
+        text = f"def function_{i}(value):\n    return value * {i}\n"
+        index.update_file(
+            "generated.py",
+            str(i),
+            [snippet("generated.py", text)],
+            embedder.embed_documents([text]),
+        )
+    index.base_sha = "base"
+    index.save()
+
+    reloaded_index = VectorIndex(
+        str(tmp_path), model=embedder.model, dimensions=embedder.dimensions
+    )
+    matches = reloaded_index.search(embedder.embed_documents([PARSER]), k=1)[0]
+
+    assert reloaded_index.base_sha == "base"
+    assert reloaded_index.snippet_count == 4
+    assert matches[0][0].path == "parser.py"
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "index.json",
+        "vectors-3.npy",
+    ]
+    assert isinstance(reloaded_index._vectors, np.memmap)
+
+
+def test_index_of_another_model_is_discarded(tmp_path):
+    embedder = HashingEmbedder()
+    index = create_index(tmp_path, embedder)
+    index.save()
+
+    assert len(VectorIndex(str(tmp_path), model="other-model", dimensions=256)) == 0
+
+
+def test_related_snippets_are_formatted_under_the_token_cap():
+    matches = [
+        (snippet("parser.py", PARSER), 0.9),
+        (snippet("math.py", MATH * 20), 0.8),
+    ]
+
+    context = format_related_snippets(matches, max_tokens=100)
+
+    assert "- parser.py:1-4\n```\ndef parse_pull_request" in context
+    assert "math.py" not in context
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dimensions=64)
+        self.embedded_texts = []
+
+    def embed_documents(self, texts):
+        self.embedded_texts.extend(texts)
+        return super().embed_documents(texts)
+
+
+class FakeGitHubRepository:
+    def __init__(self, base_sha: str, files: dict[str, str]):
+        self.repo_owner = "owner"
+        self.repo_name = "repo"
+        self.pull_request = SimpleNamespace(
+            base=SimpleNamespace(ref="main", sha=base_sha)
+        )
+        self.files = files
+        self.compare_status = "ahead"
+
+    def get_archive_files(self, ref, suffixes, max_file_bytes):
+        return list(self.files.items())
+
+    def compare_commits(self, base_sha, head_sha):
+        return self.compare_status, [
+            SimpleNamespace(
+                filename=path,
+                status="modified",
+                previous_filename=None,
+                sha=git_blob_sha(source.encode()),
+            )
+            for path, source in self.files.items()
+        ]
+
+    def get_file_content(self, file_path, ref=None):
+        return self.files[file_path]
+
+
+def test_only_files_with_a_new_blob_sha_are_embedded_again(tmp_path):
+    embedder = CountingEmbedder()
+    vector_indexes = VectorIndexRepository(str(tmp_path), embedder)
+    github_repository = FakeGitHubRepository(
+        "base", {"parser.py": PARSER, "math.py": MATH}
+    )
+    vector_indexes.get_index(github_repository)
+    assert embedder.embedded_texts == [PARSER.strip("\n"), MATH.strip("\n")]
+
+    embedder.embedded_texts = []
+    github_repository.pull_request.base.sha = "newer"
+    github_repository.files["math.py"] = MATH + "\n\ndef median(values):\n    pass\n"
+    vector_indexes.get_index(github_repository)
+    assert len(embedder.embedded_texts) == 1
+
+    embedder.embedded_texts = []
+    github_repository.pull_request.base.sha = "force-pushed"
+    github_repository.compare_status = "diverged"
+    github_repository.files["comments.py"] = COMMENTS
+    index = vector_indexes.get_index(github_repository)
+
+    assert embedder.embedded_texts == [COMMENTS.strip("\n")]
+    assert index.base_sha == "force-pushed"
+    assert sorted(index.paths()) == ["comments.py", "math.py", "parser.py"]
+
+
+def test_index_outlives_the_repository_of_indexes(tmp_path):
+    github_repository = FakeGitHubRepository("base", {"parser.py": PARSER})
+    VectorIndexRepository(str(tmp_path), CountingEmbedder()).get_index(
+        github_repository
+    )
+
+    embedder = CountingEmbedder()
+    index = VectorIndexRepository(str(tmp_path), embedder).get_index(github_repository)
+
+    assert embedder.embedded_texts == []
+    assert index.blob_sha("parser.py") == git_blob_sha(PARSER.encode())
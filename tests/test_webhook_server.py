@@ -0,0 +1,125 @@
+import hashlib
+import hmac
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from core.instrumentation.run_metrics import RunMetrics
+from core.models.review_job import ReviewJob
+from infrastructure.servers.review_worker_pool import ReviewWorkerPool
+from infrastructure.servers.webhook_server import WebhookServer
+
+secret = "webhook secret"
+
+
+class FakeReviewRunner:
+    def review(self, url, repo_owner, repo_name, pr_number, observers=None):
+        raise AssertionError("The workers are not started in these tests")
+
+
+@pytest.fixture
+def worker_pool():
+    return ReviewWorkerPool(FakeReviewRunner(), workers=1, max_queue_size=1)
+
+
+@pytest.fixture
+def webhook_server(worker_pool):
+    server = WebhookServer(
+        worker_pool, secret, host="127.0.0.1", port=0, run_metrics=RunMetrics()
+    ).start()
+    yield server
+    server.stop()
+
+
+def post(server, event, payload, signature=None):
+    body = json.dumps(payload).encode("utf-8")
+    signature = (
+        signature
+        or "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    )
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{server.port}/webhook",
+        data=body,
+        headers={
+            "X-GitHub-Event": event,
+            "X-GitHub-Delivery": "delivery-1",
+            "X-Hub-Signature-256": signature,
+            "Content-Type": "application/json",
+        },
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+def pull_request_payload(pr_number=7):
+    return {
+        "action": "synchronize",
+        "number": pr_number,
+        "pull_request": {"number": pr_number, "state": "open", "head": {"sha": "abc"}},
+        "repository": {"name": "ReviewPal", "owner": {"login": "Maokli"}},
+    }
+
+
+def get(server, path):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}{path}") as response:
+            return response.status, response.read().decode("utf-8")
+    except urllib.error.HTTPError as error:
+        return error.code, error.read().decode("utf-8")
+
+
+def test_pull_request_event_is_enqueued(webhook_server, worker_pool):
+    status, response = post(webhook_server, "pull_request", pull_request_payload())
+
+    assert status == 202
+    assert response["status"] == "enqueued"
+    assert response["pull_request"] == "https://github.com/Maokli/ReviewPal/pull/7"
+    assert worker_pool.queue_depth == 1
+
+
+def test_redelivered_event_is_a_duplicate(webhook_server):
+    post(webhook_server, "pull_request", pull_request_payload())
+    status, response = post(webhook_server, "pull_request", pull_request_payload())
+
+    assert status == 202
+    assert response["status"] == "duplicate"
+
+
+def test_full_queue_returns_503(webhook_server):
+    post(webhook_server, "pull_request", pull_request_payload(7))
+    status, _ = post(webhook_server, "pull_request", pull_request_payload(8))
+
+    assert status == 503
+
+
+def test_invalid_signature_returns_401(webhook_server, worker_pool):
+    status, _ = post(
+        webhook_server, "pull_request", pull_request_payload(), signature="sha256=00"
+    )
+
+    assert status == 401
+    assert worker_pool.queue_depth == 0
+
+
+def test_ping_and_other_events_are_not_enqueued(webhook_server, worker_pool):
+    assert post(webhook_server, "ping", {"zen": "Keep it simple."})[0] == 200
+    assert post(webhook_server, "issues", {"action": "opened"})[0] == 202
+    assert worker_pool.queue_depth == 0
+
+
+def test_health_queue_and_metrics_endpoints(webhook_server, worker_pool):
+    worker_pool.submit(
+        ReviewJob(repo_owner="Maokli", repo_name="ReviewPal", pr_number=1)
+    )
+
+    assert get(webhook_server, "/healthz")[0] == 503
+    status, body = get(webhook_server, "/queue")
+    assert status == 200
+    assert json.loads(body)["queue_depth"] == 1
+    assert get(webhook_server, "/metrics")[0] == 200
+    assert get(webhook_server, "/other")[0] == 404